@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from sklearn.ensemble import IsolationForest
+from sklearn.neighbors import LocalOutlierFactor
+
+from transactions.services.anomaly_detection.anomaly_detection import (
+    CHOSEN_QUANTILE,
+    COMPUTED_QUANTILES,
+    DEFAULT_IF_PARAMS,
+    DEFAULT_LOF_PARAMS,
+    EMISSION_GROUP_COLS,
+)
+from transactions.services.anomaly_detection.detect_outliers import detect_outliers
+from transactions.tests.legacy_anomaly_detection import detect_outliers_legacy
+from transactions.tests.utils import create_synthetic_groups
+
+
+class Command(BaseCommand):
+    help = "Compare the duration of the sequential and parallel outlier detection on synthetic groups of lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=50, help="Number of feedstock groups")
+        parser.add_argument("--lots", type=int, default=2000, help="Number of lots per group")
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to benchmark")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        df = create_synthetic_groups(options["groups"], options["lots"], options["seed"])
+        print(f"> Benchmark outlier detection over {options['groups']} groups of {options['lots']} lots")
+
+        args = (df, "eec", EMISSION_GROUP_COLS, CHOSEN_QUANTILE, COMPUTED_QUANTILES)
+
+        start = time.perf_counter()
+        clf_if = IsolationForest(**DEFAULT_IF_PARAMS)
+        clf_lof = LocalOutlierFactor(**DEFAULT_LOF_PARAMS)
+        outliers = detect_outliers_legacy(*args, clf_if, clf_lof)
+        print(f"> legacy: {len(outliers)} outliers in {time.perf_counter() - start:.2f}s")
+
+        for workers in options["workers"]:
+            start = time.perf_counter()
+            outliers = detect_outliers(*args, DEFAULT_IF_PARAMS, DEFAULT_LOF_PARAMS, workers=workers)
+            print(f"> {workers} workers: {len(outliers)} outliers in {time.perf_counter() - start:.2f}s")
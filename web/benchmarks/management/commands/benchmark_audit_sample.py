@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elec.repositories.charge_point_repository import ChargePointRepository
+from elec.services.extract_audit_sample import extract_audit_sample
+from elec.tests.services.legacy_extract_audit_sample import extract_audit_sample_legacy
+from elec.tests.utils import create_charge_points_with_positions
+
+
+class Command(BaseCommand):
+    help = "Time the extraction of an audit sample from the charge points of an application"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--charge-points", type=int, default=20000, help="Number of charge points of the application")
+        parser.add_argument("--percentage", type=float, default=0.1, help="Share of the power to sample")
+        parser.add_argument("--samples", type=int, default=5, help="Number of samples with different seeds")
+
+    def handle(self, *args, **options):
+        # everything is rolled back once the timings are done
+        with transaction.atomic():
+            application = create_charge_points_with_positions(options["charge_points"])
+            charge_points = ChargePointRepository.get_application_charge_points(application.cpo, application)
+            print(f"> {charge_points.count()} charge points, {options['samples']} samples")
+
+            timings = {}
+            start = time.perf_counter()
+            expected = [
+                extract_audit_sample_legacy(charge_points, options["percentage"], random.Random(seed))
+                for seed in range(options["samples"])
+            ]
+            timings["before: distance to every station"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            samples = [
+                extract_audit_sample(charge_points, options["percentage"], seed=seed) for seed in range(options["samples"])
+            ]
+            timings["after: k-d tree"] = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        for name, duration in timings.items():
+            print(f"> {name}: {duration:.3f}s")
+        sample_sizes = ", ".join(str(len(sample)) for sample in samples)
+        same_samples = [[cp.pk for cp in sample] for sample in samples] == [[cp.pk for cp in sample] for sample in expected]
+        print(f"> sample sizes: {sample_sizes}, same samples: {same_samples}")
@@ -0,0 +1,115 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Q
+
+from core.models import Biocarburant, CarbureLot, Entity, MatierePremiere, Pays
+from tiruert.models import Operation, OperationDetail
+from tiruert.services.balance import BalanceService
+from tiruert.tests.services.legacy_balance import calculate_balance_legacy
+from transactions.models import Depot
+
+
+class Rollback(Exception):
+    pass
+
+
+OPERATION_KINDS = [
+    # (type, status, credited)
+    (Operation.INCORPORATION, Operation.VALIDATED, True),
+    (Operation.CESSION, Operation.ACCEPTED, True),
+    (Operation.CESSION, Operation.PENDING, True),
+    (Operation.CESSION, Operation.ACCEPTED, False),
+    (Operation.TENEUR, Operation.PENDING, False),
+    (Operation.TENEUR, Operation.DECLARED, False),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare the duration of the balance computed operation by operation and with numpy, without saving anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, required=True, help="Id of the entity owning the generated operations")
+        parser.add_argument("--details", type=int, default=50000, help="Number of generated operation details")
+        parser.add_argument("--lots", type=int, default=2000, help="Number of lots the details are spread on")
+        parser.add_argument("--group-by", default="lot", help="Balance grouping: sector, customs_category, lot or depot")
+
+    def handle(self, *args, **options):
+        entity = Entity.objects.get(pk=options["entity"])
+        print(f"> Benchmark balance over {options['details']} operation details and {options['lots']} lots")
+
+        try:
+            with transaction.atomic():
+                create_operations(entity, options["details"], options["lots"])
+                operations = Operation.objects.filter(Q(credited_entity=entity) | Q(debited_entity=entity))
+                for name, calculate_balance in [
+                    ("legacy", calculate_balance_legacy),
+                    ("vectorized", BalanceService.calculate_balance),
+                ]:
+                    start = time.perf_counter()
+                    balance = calculate_balance(operations, entity.id, options["group_by"], "l")
+                    duration = time.perf_counter() - start
+                    available = sum(entry["available_balance"] for entry in balance.values())
+                    print(f"> {name}: {len(balance)} entries, {available:.2f} l available, in {duration:.2f}s")
+                raise Rollback
+        except Rollback:
+            pass
+
+
+def create_operations(entity, nb_details, nb_lots):
+    today = datetime.date.today()
+    biofuel = Biocarburant.objects.get(code="ETH")
+    depot = Depot.objects.first()
+
+    lots = [
+        CarbureLot(
+            biofuel=biofuel,
+            feedstock=MatierePremiere.objects.first(),
+            country_of_origin=Pays.objects.first(),
+            carbure_client=entity,
+            delivery_date=today,
+            period=today.year * 100 + today.month,
+            year=today.year,
+            lot_status=CarbureLot.ACCEPTED,
+            volume=100000,
+            ghg_reduction_red_ii=random.uniform(50, 90),
+        )
+        for _ in range(nb_lots)
+    ]
+    last_lot_id = CarbureLot.objects.aggregate(last=Max("id"))["last"] or 0
+    CarbureLot.objects.bulk_create(lots, batch_size=1000)
+    lot_ids = list(CarbureLot.objects.filter(id__gt=last_lot_id).values_list("id", flat=True))
+
+    # 5 details per operation
+    operations = []
+    for i in range(nb_details // 5):
+        type, status, credited = OPERATION_KINDS[i % len(OPERATION_KINDS)]
+        operations.append(
+            Operation(
+                type=type,
+                status=status,
+                customs_category=MatierePremiere.CONV,
+                biofuel=biofuel,
+                credited_entity=entity if credited else None,
+                debited_entity=None if credited else entity,
+                to_depot=depot if credited else None,
+                from_depot=None if credited else depot,
+            )
+        )
+    last_operation_id = Operation.objects.aggregate(last=Max("id"))["last"] or 0
+    Operation.objects.bulk_create(operations, batch_size=1000)
+    operation_ids = list(Operation.objects.filter(id__gt=last_operation_id).values_list("id", flat=True))
+
+    details = [
+        OperationDetail(
+            operation_id=operation_ids[i // 5],
+            lot_id=lot_ids[i % len(lot_ids)],
+            volume=random.uniform(10, 1000),
+            emission_rate_per_mj=random.uniform(10, 40),
+        )
+        for i in range(len(operation_ids) * 5)
+    ]
+    OperationDetail.objects.bulk_create(details, batch_size=1000)
@@ -0,0 +1,54 @@
+import os
+import time
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from elec.services.import_charge_point_excel import ExcelChargePoints
+from elec.services.transport_data_gouv import TransportDataGouv
+from elec.tests.services.legacy_transport_data_gouv import enrich_charge_point_data_legacy, strip_cells_legacy
+from elec.tests.utils import create_charge_point_excel_data, write_transport_data_csv
+
+
+class Command(BaseCommand):
+    help = "Time the enrichment of the charge points of an application with the transport.data.gouv data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=150000, help="Number of charge points in the generated csv")
+        parser.add_argument("--application", type=int, default=50000, help="Number of charge points in the application")
+
+    def handle(self, *args, **options):
+        file_path = write_transport_data_csv(options["points"])
+        excel_data = create_charge_point_excel_data(options["application"], options["points"])
+        charge_point_data = ExcelChargePoints.strip_cells(excel_data)
+        try:
+            # the whole national dataset is merged with the application
+            all_charge_point_ids = pd.DataFrame({"charge_point_id": [f"FRBEN{i:07d}" for i in range(options["points"])]})
+            with patch.object(TransportDataGouv, "download_csv", return_value=file_path):
+                transport_data = TransportDataGouv.get_transport_data(all_charge_point_ids)
+            os.remove(TransportDataGouv.get_csv_index(file_path))
+        finally:
+            os.remove(file_path)
+        print(f"> {len(transport_data)} points from transport.data.gouv, {len(excel_data)} points in the application")
+
+        timings = {}
+        start = time.perf_counter()
+        expected_cells = strip_cells_legacy(excel_data)
+        timings["before: strip cells"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cells = ExcelChargePoints.strip_cells(excel_data)
+        timings["after: strip cells"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = enrich_charge_point_data_legacy(charge_point_data.copy(), transport_data.copy())
+        timings["before: enrichment"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        merged_data = TransportDataGouv.enrich_charge_point_data(charge_point_data.copy(), transport_data.copy())
+        timings["after: enrichment"] = time.perf_counter() - start
+
+        for name, duration in timings.items():
+            print(f"> {name}: {duration:.3f}s")
+        print(f"> same cells: {cells.equals(expected_cells)}, same charge points: {merged_data.equals(expected)}")
@@ -0,0 +1,114 @@
+import datetime
+import os
+import tempfile
+import time
+
+import openpyxl
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.common import convert_template_row_to_formdata
+from core.models import CarbureLotEvent, Entity
+from transactions.helpers import bulk_insert_lots, construct_carbure_lot
+from transactions.sanity_checks import get_prefetched_data
+
+# a 20k rows template should be imported within this duration
+TARGET_SECONDS = 60
+
+HEADER = [
+    "champ_libre",
+    "volume",
+    "biocarburant_code",
+    "matiere_premiere_code",
+    "pays_origine_code",
+    "eec",
+    "dae",
+    "client",
+    "delivery_date",
+    "delivery_site",
+    "delivery_site_country",
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time the import of a generated excel template, phase by phase, without saving anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, required=True, help="Id of the entity importing the template")
+        parser.add_argument("--rows", type=int, default=20000, help="Number of rows in the generated template")
+
+    def handle(self, *args, **options):
+        entity = Entity.objects.get(pk=options["entity"])
+        prefetched_data = get_prefetched_data(entity)
+
+        path = write_template(options["rows"])
+        print(f"> Benchmark import of {options['rows']} rows for {entity.name}")
+
+        timings = {}
+        try:
+            with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                lots, lots_errors = [], []
+                for row in convert_template_row_to_formdata(entity, prefetched_data, path):
+                    lot, errors = construct_carbure_lot(prefetched_data, entity, row)
+                    lots.append(lot)
+                    lots_errors.append(errors)
+                timings["parse and build lots"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                lots_created = list(bulk_insert_lots(entity, lots, lots_errors, prefetched_data))
+                timings["insert lots and errors"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                events = [
+                    CarbureLotEvent(
+                        event_type=CarbureLotEvent.CREATED, lot_id=lot.id, entity=entity, metadata={"source": "EXCEL"}
+                    )
+                    for lot in lots_created
+                ]
+                CarbureLotEvent.objects.bulk_create(events, batch_size=1000)
+                timings["create events"] = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            os.remove(path)
+
+        for phase, duration in timings.items():
+            print(f"> {phase}: {duration:.2f}s")
+        total = sum(timings.values())
+        status = "OK" if total <= TARGET_SECONDS else "TOO SLOW"
+        print(f"> total: {total:.2f}s for {len(lots_created)} lots, {len(queries)} queries")
+        print(f"> target: {TARGET_SECONDS}s, {status}")
+
+
+def write_template(nb_rows):
+    file, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(file)
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for i in range(nb_rows):
+        sheet.append(
+            [
+                f"benchmark {i}",
+                1000 + i % 5000,
+                "ETH",
+                "BETTERAVE",
+                "FR",
+                1.5,
+                f"DAE{i}",
+                "BENCHMARK CLIENT",
+                datetime.datetime(2024, 1, 1) + datetime.timedelta(days=i % 365),
+                "BENCHMARK DEPOT",
+                "FR",
+            ]
+        )
+    workbook.save(path)
+    return path
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from elec.services.import_charge_point_excel import ExcelChargePointValidator
+from elec.services.import_meter_reading_excel import ExcelMeterReadingValidator
+from elec.tests.services.legacy_excel_validation import (
+    ExcelChargePointValidatorLegacy,
+    to_comparable,
+    validate_meter_readings_legacy,
+)
+from elec.tests.utils import BEGINNING_OF_QUARTER, END_OF_QUARTER, create_charge_points, create_meter_readings
+
+
+class Command(BaseCommand):
+    help = "Compare the columnar validation of excel imports with the validation of one django form per row"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50000, help="Number of generated rows")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        nb_rows = options["rows"]
+        meter_readings, charge_point_by_id = create_meter_readings(nb_rows, options["seed"])
+        context = {
+            "charge_point_by_id": charge_point_by_id,
+            "beginning_of_quarter": BEGINNING_OF_QUARTER,
+            "end_of_quarter": END_OF_QUARTER,
+        }
+        charge_points = create_charge_points(nb_rows, options["seed"])
+
+        benchmarks = [
+            (
+                "meter readings",
+                lambda: validate_meter_readings_legacy(meter_readings, context),
+                lambda: ExcelMeterReadingValidator.bulk_validate(meter_readings, context),
+            ),
+            (
+                "charge points",
+                lambda: ExcelChargePointValidatorLegacy.bulk_validate(charge_points),
+                lambda: ExcelChargePointValidator.bulk_validate(charge_points),
+            ),
+        ]
+
+        for name, legacy, columnar in benchmarks:
+            start = time.perf_counter()
+            legacy_result = legacy()
+            legacy_duration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            columnar_result = columnar()
+            columnar_duration = time.perf_counter() - start
+
+            valid_items, errors = columnar_result
+            same = to_comparable(columnar_result) == to_comparable(legacy_result)
+            print(f"> {name}: {nb_rows} rows, {len(valid_items)} valid, {len(errors)} with errors")
+            print(f"> form per row: {legacy_duration:.2f}s")
+            print(f"> columnar: {columnar_duration:.2f}s (x{legacy_duration / columnar_duration:.1f})")
+            print(f"> same results: {same}")
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.helpers import get_entity_lots_by_status
+from core.models import CarbureLot, Entity
+from core.search import Matches
+from core.tests.legacy_search import search_lots_legacy
+
+
+class Command(BaseCommand):
+    help = "Compare the duration of the previous and indexed lots search, on the lots of an entity or on all the lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, help="Only search the lots received by this entity")
+        parser.add_argument("--query", action="append", required=True, help="Searched text, can be given several times")
+        parser.add_argument("--runs", type=int, default=3, help="Number of runs of each search, the best one is kept")
+
+    def handle(self, *args, **options):
+        if options["entity"]:
+            entity = Entity.objects.get(pk=options["entity"])
+            lots = get_entity_lots_by_status(entity, "IN")
+        else:
+            lots = CarbureLot.objects.all()
+
+        print(f"> Benchmark search over {lots.count()} lots")
+        for search in options["query"]:
+            for name, filter in [("icontains", search_lots_legacy), ("indexed", search_lots)]:
+                total, page, duration = run_search(filter(lots, search), options["runs"])
+                print(f"> '{search}' {name}: {total} lots, first page of {page} in {duration:.3f}s")
+
+
+def run_search(lots, runs):
+    # same queries as the lots list: a count and the first page
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        total = lots.count()
+        page = len(lots.order_by("-id").values_list("id", flat=True)[:100])
+        durations.append(time.perf_counter() - start)
+    return total, page, min(durations)
+
+
+def search_lots(lots, search):
+    return lots.filter(Matches("search__content", search))
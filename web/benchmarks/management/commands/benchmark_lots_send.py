@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.models import CarbureLot, Entity
+from transactions.api.lots.tests.legacy_send import run_and_rollback, send_lots_legacy
+from transactions.services.send_lots import send_lots
+
+
+class Command(BaseCommand):
+    help = "Compare the number of queries and duration of the previous and bulk lots sending, without saving anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, required=True, help="Id of the entity sending its drafts")
+        parser.add_argument("--limit", type=int, help="Maximum number of sent drafts")
+
+    def handle(self, *args, **options):
+        entity = Entity.objects.get(pk=options["entity"])
+
+        lot_ids = CarbureLot.objects.filter(added_by=entity, lot_status=CarbureLot.DRAFT).order_by("id")
+        if options["limit"]:
+            lot_ids = lot_ids[: options["limit"]]
+        lot_ids = list(lot_ids.values_list("id", flat=True))
+
+        print(f"> Benchmark sending of {len(lot_ids)} drafts for {entity.name}")
+        for name, send in [("lot by lot", send_lots_legacy), ("bulk", send_lots)]:
+            queries, duration, sent = run_and_rollback(send, entity, lot_ids)
+            per_lot = queries / len(lot_ids) if lot_ids else 0
+            print(f"> {name}: {sent} sent, {queries} queries ({per_lot:.1f} per lot), {duration:.2f}s")
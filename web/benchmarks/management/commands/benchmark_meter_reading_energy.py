@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elec.models.elec_charge_point import ElecChargePoint
+from elec.models.elec_meter_reading import ElecMeterReading
+from elec.models.elec_meter_reading_application import ElecMeterReadingApplication
+from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
+from elec.repositories.meter_reading_repository import MeterReadingRepository
+from elec.services.meter_reading_energy import get_meter_readings_energy
+from elec.tests.services.legacy_meter_reading_energy import (
+    annotate_charge_points_with_latest_index_legacy,
+    get_latest_indexes,
+    get_renewable_energy_legacy,
+)
+from elec.tests.utils import create_meter_reading_view, create_meter_readings_history
+
+
+class Command(BaseCommand):
+    help = "Time the lookup of the latest meter readings of a CPO and the energy of its readings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--charge-points", type=int, default=5000, help="Number of charge points of the CPO")
+        parser.add_argument("--quarters", type=int, default=4, help="Number of quarters of meter readings")
+
+    def handle(self, *args, **options):
+        # everything is rolled back once the timings are done
+        with transaction.atomic():
+            create_meter_reading_view()
+            cpo = create_meter_readings_history(options["charge_points"], options["quarters"])
+            charge_points = ElecChargePoint.objects.filter(cpo=cpo, is_deleted=False).order_by("charge_point_id")
+            application = ElecMeterReadingApplication.objects.filter(cpo=cpo).order_by("-year", "-quarter").first()
+            print(f"> {charge_points.count()} charge points, {ElecMeterReading.objects.filter(cpo=cpo).count()} readings")
+
+            timings = {}
+            start = time.perf_counter()
+            expected = get_latest_indexes(annotate_charge_points_with_latest_index_legacy(charge_points))
+            timings["before: latest readings, subquery per charge point"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            latest_indexes = get_latest_indexes(
+                MeterReadingRepository.annotate_charge_points_with_latest_index(charge_points)
+            )
+            timings["after: latest readings, window query"] = time.perf_counter() - start
+
+            meter_readings = ElecMeterReadingVirtual.objects.filter(application=application).order_by("reading_id")
+            start = time.perf_counter()
+            expected_energy = get_renewable_energy_legacy(meter_readings)
+            timings["before: renewable energy, per reading"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            energy = get_meter_readings_energy(meter_readings)
+            timings["after: renewable energy, vectorized"] = time.perf_counter() - start
+
+            transaction.set_rollback(True)
+
+        for name, duration in timings.items():
+            print(f"> {name}: {duration:.3f}s")
+        same_energy = energy.to_dict(orient="records") == expected_energy
+        print(f"> same latest readings: {latest_indexes == expected}, same renewable energy: {same_energy}")
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import CarbureLot
+from ml.scripts.calc_ml_score import DATE_BEGIN, calc_ml_score
+from ml.tests.legacy_ml_score import calc_ml_score_legacy
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare the duration of the ml scores computed lot by lot and period by period, without saving anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Only score the lots of this year")
+        parser.add_argument("--period", type=int, help="Only score the lots of this period")
+
+    def handle(self, *args, **options):
+        for name, calculate in [("legacy", calc_ml_score_legacy), ("set-based", calc_ml_score)]:
+            try:
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    calculate(options["year"], options["period"])
+                    duration = time.perf_counter() - start
+                    flagged = CarbureLot.objects.filter(created_at__gt=DATE_BEGIN, ml_scoring__gt=0).count()
+                    print(f"> {name}: {flagged} lots with a score in {duration:.2f}s")
+                    raise Rollback
+            except Rollback:
+                pass
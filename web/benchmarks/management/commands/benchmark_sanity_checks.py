@@ -0,0 +1,96 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Biocarburant, CarbureLot, Entity, MatierePremiere, Pays
+from transactions.models import Depot, ProductionSite
+from transactions.sanity_checks import bulk_sanity_checks, get_prefetched_data
+
+
+class Command(BaseCommand):
+    help = "Compare the per-lot and columnar sanity check engines on synthetic lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=str,
+            default="10000,100000,1000000",
+            help="Comma separated list of batch sizes to benchmark",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Seed used to generate the synthetic lots",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        random.seed(options["seed"])
+
+        prefetched_data = get_prefetched_data()
+
+        print("> Benchmark sanity check engines")
+        for size in sizes:
+            lots = create_synthetic_lots(size)
+
+            start = time.perf_counter()
+            lot_by_lot_errors = bulk_sanity_checks(lots, prefetched_data, dry_run=True)
+            lot_by_lot_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            columnar_errors = bulk_sanity_checks(lots, prefetched_data, dry_run=True, columnar=True)
+            columnar_time = time.perf_counter() - start
+
+            same = len(lot_by_lot_errors) == len(columnar_errors)
+            print(
+                f"> {size} lots: lot by lot {lot_by_lot_time:.2f}s, columnar {columnar_time:.2f}s "
+                f"(x{lot_by_lot_time / max(columnar_time, 1e-9):.1f}), {len(columnar_errors)} errors, same count: {same}"
+            )
+
+
+def create_synthetic_lots(size: int) -> list[CarbureLot]:
+    biofuels = [*Biocarburant.objects.all(), None]
+    feedstocks = [*MatierePremiere.biofuel.all(), None]
+    countries = [*Pays.objects.all(), None]
+    entities = [*Entity.objects.all(), None]
+    depots = [*Depot.objects.all(), None]
+    production_sites = [*ProductionSite.objects.all(), None]
+
+    statuses = [CarbureLot.DRAFT, CarbureLot.PENDING, CarbureLot.ACCEPTED]
+    delivery_types = [delivery_type for delivery_type, _ in CarbureLot.DELIVERY_TYPES]
+
+    lots = []
+    for i in range(size):
+        delivery_date = datetime.date(2024, random.randint(1, 12), 15)
+        lots.append(
+            CarbureLot(
+                id=i + 1,
+                year=delivery_date.year,
+                period=delivery_date.year * 100 + delivery_date.month,
+                delivery_date=delivery_date,
+                lot_status=random.choice(statuses),
+                delivery_type=random.choice(delivery_types),
+                volume=random.choice([0, 1000, 5000, 30000]),
+                biofuel=random.choice(biofuels),
+                feedstock=random.choice(feedstocks),
+                country_of_origin=random.choice(countries),
+                delivery_site_country=random.choice(countries),
+                carbure_client=random.choice(entities),
+                carbure_supplier=random.choice(entities),
+                added_by=random.choice(entities[:-1]),
+                carbure_delivery_site=random.choice(depots),
+                carbure_production_site=random.choice(production_sites),
+                supplier_certificate=random.choice(["", "UNKNOWN"]),
+                transport_document_reference=random.choice(["", "DAE"]),
+                eec=random.uniform(0, 50),
+                ep=random.uniform(-1, 50),
+                etd=random.uniform(0, 30),
+                el=random.uniform(-1, 1),
+                ghg_reduction=random.uniform(30, 100),
+                ghg_reduction_red_ii=random.uniform(30, 100),
+            )
+        )
+    return lots
@@ -0,0 +1,46 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from tiruert.services.teneur import TeneurService
+from tiruert.tests.services.legacy_teneur import optimize_biofuel_blending_legacy
+
+
+class Command(BaseCommand):
+    help = "Compare the duration of the previous and current teneur blending optimization on random lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Numbers of candidate lots")
+        parser.add_argument("--max-n-batches", type=int, default=10, help="Limit on the lots used, for the MILP cases")
+        parser.add_argument("--legacy-max-size", type=int, default=2000, help="Larger sizes skip the dense legacy solver")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+
+        for size in options["sizes"]:
+            volumes = rng.uniform(100, 5000, size)
+            emissions = rng.uniform(10, 60, size)
+            # reachable with half of the lots allowed in the MILP cases
+            target_volume = volumes.mean() * options["max_n_batches"] / 2
+            target_emission = float(np.median(emissions))
+            print(f"> Benchmark blending over {size} lots")
+
+            for max_n_batches in [None, options["max_n_batches"]]:
+                for name, optimize in [
+                    ("legacy", optimize_biofuel_blending_legacy),
+                    ("current", TeneurService.optimize_biofuel_blending),
+                ]:
+                    case = f"max {max_n_batches} lots" if max_n_batches else "no limit"
+                    if name == "legacy" and size > options["legacy_max_size"]:
+                        print(f"> {case} {name}: skipped, the dense constraint matrix is too large")
+                        continue
+
+                    start = time.perf_counter()
+                    try:
+                        selected, fun = optimize(volumes, emissions, target_volume, target_emission, None, max_n_batches)
+                        result = f"{len(selected)} lots, objective {fun:.4f}"
+                    except ValueError as e:
+                        result = str(e)
+                    print(f"> {case} {name}: {result} in {time.perf_counter() - start:.3f}s")
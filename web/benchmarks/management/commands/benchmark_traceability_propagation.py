@@ -0,0 +1,170 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.counters import track_counters
+from core.models import Biocarburant, CarbureLot, CarbureStock, Entity, MatierePremiere, Pays
+from core.search import refresh_lot_search, refresh_stock_search
+from core.traceability import Node, bulk_update_traceability_nodes, get_traceability_nodes
+from core.traceability.bulk_update_traceability_nodes import MODELS
+from core.traceability.closure import LOT, STOCK, index_nodes
+from core.traceability.group_nodes_by_type import group_nodes_by_type
+from transactions.services.carbure_id import bulk_generate_lot_carbure_id, bulk_generate_stock_carbure_id
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time the propagation of a correction made on the root of a generated family, without saving anything"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, required=True, help="Id of the entity owning the generated lots")
+        parser.add_argument("--lots", type=int, default=5000, help="Number of descendant lots in the family")
+        parser.add_argument("--stocks", type=int, default=50, help="Number of stocks the descendant lots come from")
+
+    def handle(self, *args, **options):
+        entity = Entity.objects.get(pk=options["entity"])
+        print(f"> Benchmark propagation over a family of {options['lots']} lots and {options['stocks']} stocks")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                root_id = create_family(entity, options["lots"], options["stocks"])
+                for name, propagate_nodes, write_nodes in [
+                    ("legacy", propagate_legacy, bulk_update_traceability_nodes_legacy),
+                    ("batched", propagate_batched, bulk_update_traceability_nodes),
+                ]:
+                    results[name] = run_correction(root_id, propagate_nodes, write_nodes)
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, (changed, durations, queries) in results.items():
+            timings = ", ".join(f"{phase} {duration:.2f}s" for phase, duration in durations.items())
+            print(f"> {name}: {changed} changed nodes, {timings}, {queries} queries to write them")
+
+
+def create_family(entity, nb_lots, nb_stocks):
+    today = datetime.date.today()
+    base = {
+        "biofuel": Biocarburant.objects.first(),
+        "feedstock": MatierePremiere.objects.first(),
+        "country_of_origin": Pays.objects.first(),
+        "carbure_client": entity,
+    }
+    period = {"delivery_date": today, "period": today.year * 100 + today.month, "year": today.year}
+
+    root = CarbureLot.objects.create(
+        **base, **period, lot_status=CarbureLot.ACCEPTED, delivery_type=CarbureLot.STOCK, volume=nb_lots * 10
+    )
+    stocks = [CarbureStock(**base, parent_lot=root, remaining_volume=nb_lots * 10 / nb_stocks) for _ in range(nb_stocks)]
+    CarbureStock.objects.bulk_create(stocks)
+    stock_ids = list(CarbureStock.objects.filter(parent_lot=root).values_list("id", flat=True))
+    index_nodes(STOCK, stock_ids)
+
+    lots = [
+        CarbureLot(**base, **period, parent_stock_id=stock_ids[i % nb_stocks], lot_status=CarbureLot.ACCEPTED, volume=10)
+        for i in range(nb_lots)
+    ]
+    CarbureLot.objects.bulk_create(lots, batch_size=1000)
+    index_nodes(LOT, CarbureLot.objects.filter(parent_stock_id__in=stock_ids).values_list("id", flat=True))
+    return root.id
+
+
+def run_correction(root_id, propagate_nodes, write_nodes):
+    durations = {}
+    try:
+        with transaction.atomic():
+            start = time.perf_counter()
+            node = get_traceability_nodes([CarbureLot.objects.get(id=root_id)])[0]
+            durations["load"] = time.perf_counter() - start
+
+            # a correction of the emissions of the root lot, to be copied to every descendant
+            start = time.perf_counter()
+            node.update({"eec": node.data.eec + 1, "unknown_production_site": "BENCHMARK SITE"})
+            changed_nodes = propagate_nodes(node)
+            durations["propagate"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                write_nodes(changed_nodes)
+            durations["write"] = time.perf_counter() - start
+            raise Rollback
+    except Rollback:
+        pass
+    return len(changed_nodes), durations, len(queries)
+
+
+def propagate_batched(node):
+    return node.propagate()
+
+
+# copy of the recursive propagation used before, kept as a reference point
+def propagate_legacy(node, changed_only=False):
+    node.changed_only = changed_only
+    return [node] + propagate_down_legacy(node) + propagate_up_legacy(node)
+
+
+def propagate_up_legacy(node):
+    if not node.parent:
+        return []
+
+    node.parent.changed_only = node.changed_only
+    diff = node.parent.diff_with_child(node)
+
+    changed_nodes = []
+    if len(diff) > 0:
+        node.parent.apply_diff(diff)
+        changed_nodes += [node.parent]
+
+    changed_nodes += propagate_down_legacy(node.parent, skip=node)
+    changed_nodes += propagate_up_legacy(node.parent)
+    return changed_nodes
+
+
+def propagate_down_legacy(node, skip=None):
+    changed = []
+    for child in node.children:
+        if child == skip:
+            continue
+
+        child.changed_only = node.changed_only
+        diff = child.diff_with_parent()
+        if len(diff) > 0:
+            child.apply_diff(diff)
+            changed += [child]
+
+        changed += propagate_down_legacy(child)
+    return changed
+
+
+# copy of the bulk update used before, writing the union of the changed fields on every node, kept as a reference point
+def bulk_update_traceability_nodes_legacy(nodes):
+    nodes_by_type = group_nodes_by_type(nodes)
+
+    fields = {node_type: {} for node_type in MODELS}
+    for node in nodes:
+        fields[node.type].update(node.diff)
+
+    for node_type, model in MODELS.items():
+        objects = nodes_by_type[node_type]
+        if len(fields[node_type]) == 0:
+            continue
+
+        if node_type == Node.LOT:
+            with track_counters(lots=objects):
+                model.objects.bulk_update(objects, list(fields[node_type]))
+            bulk_generate_lot_carbure_id(CarbureLot.objects.filter(pk__in=[lot.pk for lot in objects]), save=True)
+            refresh_lot_search([lot.pk for lot in objects])
+        elif node_type == Node.STOCK:
+            with track_counters(stocks=objects):
+                model.objects.bulk_update(objects, list(fields[node_type]))
+            bulk_generate_stock_carbure_id(CarbureStock.objects.filter(pk__in=[stock.pk for stock in objects]), save=True)
+            refresh_stock_search([stock.pk for stock in objects])
+        else:
+            model.objects.bulk_update(objects, list(fields[node_type]))
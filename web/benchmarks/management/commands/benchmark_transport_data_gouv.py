@@ -0,0 +1,56 @@
+import os
+import time
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from elec.services.transport_data_gouv import TransportDataGouv
+from elec.tests.services.legacy_transport_data_gouv import get_transport_data_legacy, is_check_point_in_tdg_legacy
+from elec.tests.utils import write_transport_data_csv
+
+
+class Command(BaseCommand):
+    help = "Time the lookup of the charge points of an application in the transport.data.gouv csv"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=100000, help="Number of charge points in the generated csv")
+        parser.add_argument("--application", type=int, default=5000, help="Number of charge points in the application")
+
+    def handle(self, *args, **options):
+        file_path = write_transport_data_csv(options["points"])
+        charge_point_data = pd.DataFrame(
+            {"charge_point_id": [f"FRBEN{i:07d}" for i in range(options["application"])] + ["FRUNKNOWN"]}
+        )
+        print(f"> {options['points']} points in the csv, {options['application']} points in the application")
+
+        timings = {}
+        try:
+            start = time.perf_counter()
+            expected = get_transport_data_legacy(charge_point_data, file_path)
+            timings["before: csv scan"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            is_check_point_in_tdg_legacy("FRUNKNOWN", file_path)
+            timings["before: csv scan, single point"] = time.perf_counter() - start
+
+            with patch.object(TransportDataGouv, "download_csv", return_value=file_path):
+                start = time.perf_counter()
+                transport_data = TransportDataGouv.get_transport_data(charge_point_data)
+                timings["after: index build and lookup"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                transport_data = TransportDataGouv.get_transport_data(charge_point_data)
+                timings["after: index lookup"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                TransportDataGouv.is_check_point_in_tdg("FRUNKNOWN")
+                timings["after: index lookup, single point"] = time.perf_counter() - start
+
+                os.remove(TransportDataGouv.get_csv_index(file_path))
+        finally:
+            os.remove(file_path)
+
+        for name, duration in timings.items():
+            print(f"> {name}: {duration:.3f}s")
+        print(f"> {len(transport_data)} points found, same results: {transport_data.equals(expected)}")
@@ -0,0 +1,103 @@
+import datetime
+import os
+import resource
+import time
+
+import pandas as pd
+import xlsxwriter
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.excel import make_export_location
+from core.models import CarbureLot, Entity
+from core.serializers import CarbureLotCSVSerializer
+from core.xlsx_v3 import (
+    export_carbure_lots,
+    make_biofuels_sheet,
+    make_clients_sheet,
+    make_countries_sheet,
+    make_deliverysites_sheet,
+    make_mps_sheet,
+)
+from transactions.serializers.power_heat_lot_serializer import CarbureLotPowerOrHeatProducerCSVSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare peak memory and duration of the previous and streaming lots excel exports"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, required=True, help="Id of the entity doing the export")
+        parser.add_argument("--year", type=int, help="Only export the lots of this year")
+        parser.add_argument("--limit", type=int, help="Maximum number of exported lots")
+
+    def handle(self, *args, **options):
+        entity = Entity.objects.get(pk=options["entity"])
+
+        lots = CarbureLot.objects.all().order_by("-id")
+        if options["year"]:
+            lots = lots.filter(year=options["year"])
+        if options["limit"]:
+            lots = lots[: options["limit"]]
+
+        print(f"> Benchmark excel export of {lots.count()} lots for {entity.name}")
+        for name, export in [("serializer + pandas", export_lots_legacy), ("streaming", export_carbure_lots)]:
+            peak_rss, duration = run_in_child_process(export, entity, lots)
+            print(f"> {name}: {duration:.2f}s, peak RSS +{peak_rss / 1024:.1f} MB")
+
+
+# each export runs in a forked process so its peak memory isn't hidden by the previous one
+def run_in_child_process(export, entity, lots):
+    connections.close_all()
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        location = export(entity, lots)
+        duration = time.perf_counter() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        os.remove(location)
+        os.write(write_fd, f"{peak_rss} {duration}".encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as result:
+        peak_rss, duration = result.read().split()
+    os.waitpid(pid, 0)
+    return int(peak_rss), float(duration)
+
+
+# copy of the export used before the streaming writer, kept as a reference point
+def export_lots_legacy(entity, lots):
+    location = make_export_location("carbure_lots_legacy")
+    workbook = xlsxwriter.Workbook(location)
+    worksheet_lots = workbook.add_worksheet("lots")
+
+    if entity.entity_type in [Entity.ADMIN, Entity.POWER_OR_HEAT_PRODUCER]:
+        serializer = CarbureLotPowerOrHeatProducerCSVSerializer(lots, many=True)
+    else:
+        serializer = CarbureLotCSVSerializer(lots, many=True)
+    df = pd.DataFrame(serializer.data)
+
+    bold = workbook.add_format({"bold": True})
+    for i, c in enumerate(df.columns):
+        worksheet_lots.write(0, i, c, bold)
+
+    for index, row in df.iterrows():
+        date_format = workbook.add_format({"num_format": "dd/mm/yyyy"})
+        for colid, elem in enumerate(row):
+            try:
+                date = datetime.datetime.strptime(elem, "%d/%m/%Y").date()
+                worksheet_lots.write_datetime(index + 1, colid, date, date_format)
+            except Exception:
+                worksheet_lots.write(index + 1, colid, elem)
+
+    make_countries_sheet(workbook)
+    make_mps_sheet(workbook)
+    make_biofuels_sheet(workbook)
+    make_clients_sheet(workbook)
+    make_deliverysites_sheet(workbook)
+    workbook.close()
+    return location
@@ -1,5 +1,6 @@
 from django.urls import path, include
 
+from .export_status import get_export_status
 from .home_stats import get_home_stats
 from .nav_stats import get_nav_stats
 
@@ -17,4 +18,5 @@ urlpatterns = [
     path("biomethane/", include("biomethane.urls")),
     path("feedstocks/", include("feedstocks.urls")),
     path("nav-stats", get_nav_stats, name="carbure-nav-stats"),
+    path("exports/status", get_export_status, name="carbure-exports-status"),
 ]
@@ -0,0 +1,28 @@
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from core.models import ExportJob
+from core.permissions import HasUserRights
+from core.serializers import ExportJobSerializer
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter("entity_id", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Entity ID", required=True),
+        OpenApiParameter("job_id", OpenApiTypes.INT, OpenApiParameter.QUERY, description="Export job ID", required=True),
+    ],
+    responses={200: ExportJobSerializer},
+)
+@api_view(["GET"])
+@permission_classes([HasUserRights])
+def get_export_status(request, *args, **kwargs):
+    job_id = request.query_params.get("job_id")
+    if not job_id or not job_id.isdigit():
+        return Response({"message": "Missing job_id"}, status=400)
+
+    job = ExportJob.objects.filter(id=job_id, entity=request.entity).first()
+    if job is None:
+        return Response({"message": "Export not found"}, status=404)
+
+    return Response(ExportJobSerializer(job).data)
@@ -4,8 +4,9 @@ from rest_framework import serializers
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from core.counters import get_entity_counters
 from core.models import (
-    CarbureLot,
+    CarbureLotCounter,
     Entity,
     ExternalAdminRights,
 )
@@ -57,10 +58,9 @@ def get_nav_stats(request):
         response_data["total_pending_action_for_admin"] = total_pending_action_for_admin
 
     if entity.entity_type != Entity.ADMIN:
-        drafts = CarbureLot.objects.filter(added_by_id=entity_id, lot_status=CarbureLot.DRAFT)
-        in_pending = CarbureLot.objects.filter(carbure_client_id=entity_id, lot_status=CarbureLot.PENDING)
-        response_data["pending_draft_lots"] = drafts.count()
-        response_data["in_pending_lots"] = in_pending.count()
+        counters = get_entity_counters(entity_id)
+        response_data["pending_draft_lots"] = counters[CarbureLotCounter.DRAFT]
+        response_data["in_pending_lots"] = counters[CarbureLotCounter.IN_PENDING]
 
     if entity.entity_type in [Entity.ADMIN, Entity.EXTERNAL_ADMIN]:
         doublecount_agreement_pending = DoubleCountingApplication.objects.filter(status=DoubleCountingApplication.PENDING)
@@ -9,6 +9,7 @@ from django.db.models import Sum
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "carbure.settings")
 django.setup()
 
+from core.counters import track_counters  # noqa: E402
 from core.models import CarbureLot, CarbureLotEvent, CarbureStock, CarbureStockEvent  # noqa: E402
 
 
@@ -71,9 +72,11 @@ def recompute_stocks(apply, batch):
                 update_events.append(update_event)
 
         if apply:
-            CarbureStock.objects.bulk_update(
-                stocks_to_update, ["remaining_volume", "remaining_weight", "remaining_lhv_amount"]
-            )
+            # bulk_update sends no signals, the stock counters are updated by the tracker
+            with track_counters(stocks=stocks_to_update):
+                CarbureStock.objects.bulk_update(
+                    stocks_to_update, ["remaining_volume", "remaining_weight", "remaining_lhv_amount"]
+                )
             CarbureStockEvent.objects.bulk_create(update_events)
 
     print(f"> {bad_count} stocks with wrong remaining volumes were updated")
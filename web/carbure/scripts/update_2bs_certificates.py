@@ -21,6 +21,7 @@ django.setup()
 
 from core.models import GenericCertificate  # noqa: E402
 from core.utils import bulk_update_or_create  # noqa: E402
+from transactions.sanity_checks.reference_cache import invalidate_reference_data  # noqa: E402
 
 DESTINATION_FOLDER = "/tmp"
 
@@ -102,6 +103,8 @@ def save_2bs_certificates(valid: bool = True) -> Tuple[int, list]:
             }
         )
     existing, new = bulk_update_or_create(GenericCertificate, "certificate_id", certificates)
+    # bulk operations send no signals, the cached certificates are outdated by hand
+    invalidate_reference_data()
     print("[2BS Certificates] %d updated, %d created" % (len(existing), len(new)))
     csvfile.close()
     return i, new
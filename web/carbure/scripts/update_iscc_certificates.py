@@ -26,6 +26,7 @@ from django.core.mail import get_connection, send_mail  # noqa: E402
 
 from core.models import GenericCertificate  # noqa: E402
 from core.utils import bulk_update_or_create  # noqa: E402
+from transactions.sanity_checks.reference_cache import invalidate_reference_data  # noqa: E402
 
 ISCC_DATA_URL = "https://www.iscc-system.org/wp-admin/admin-ajax.php?action=get_wdtable&table_id=2"
 ISCC_CERT_PAGE = "https://www.iscc-system.org/certificates/all-certificates/"
@@ -153,6 +154,8 @@ def save_iscc_certificates(email: bool, batch: int) -> Tuple[int, list]:
         )
 
     existing, new = bulk_update_or_create(GenericCertificate, "certificate_id", certificates, batch)
+    # bulk operations send no signals, the cached certificates are outdated by hand
+    invalidate_reference_data()
 
     print("[ISCC Certificates] %d updated, %d created" % (len(existing), len(new)))
     return len(certificates), new
@@ -19,6 +19,7 @@ django.setup()
 
 from core.models import GenericCertificate  # noqa: E402
 from core.utils import bulk_update_or_create  # noqa: E402
+from transactions.sanity_checks.reference_cache import invalidate_reference_data  # noqa: E402
 
 today = datetime.date.today()
 REDCERT_CERT_PAGE = "https://redcert.eu/ZertifikateDatenAnzeige.aspx"
@@ -101,6 +102,8 @@ def save_redcert_certificates() -> Tuple[int, list, list]:
         )
         
     existing, new = bulk_update_or_create(GenericCertificate, "certificate_id", certificates)
+    # bulk operations send no signals, the cached certificates are outdated by hand
+    invalidate_reference_data()
     print("[REDcert Certificates] %d updated, %d created" % (len(existing), len(new)))
     return i, new, invalidated
 
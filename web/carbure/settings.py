@@ -48,6 +48,11 @@ env = environ.Env(
     ELEC_READJUSTMENT_ENTITY=(str, ""),
     ENABLE_SAF_LOGISTICS=(bool, True),
     FILE_UPLOAD_MAX_MEMORY_SIZE_MB=(int, 10),
+    PREFETCHED_DATA_CACHE_TIMEOUT=(int, 3600),
+    FILTERS_CACHE_TIMEOUT=(int, 300),
+    TENEUR_SIMULATION_CACHE_TIMEOUT=(int, 600),
+    ANOMALY_DETECTION_WORKERS=(int, 4),
+    ANOMALY_DETECTION_RETRAIN_MONTHS=(int, 6),
     DATA_UPLOAD_MAX_MEMORY_SIZE_MB=(int, 10),
 )
 
@@ -460,6 +465,21 @@ if not env("TEST"):
         }
     }
 
+# lifetime of the reference data snapshots used by sanity checks, 0 disables the cache
+PREFETCHED_DATA_CACHE_TIMEOUT = 0 if env("TEST") else env("PREFETCHED_DATA_CACHE_TIMEOUT")
+
+# lifetime of the cached lot and stock filter values, 0 disables the cache
+FILTERS_CACHE_TIMEOUT = 0 if env("TEST") else env("FILTERS_CACHE_TIMEOUT")
+
+# lifetime of the memoized teneur simulations, 0 disables the cache
+TENEUR_SIMULATION_CACHE_TIMEOUT = 0 if env("TEST") else env("TENEUR_SIMULATION_CACHE_TIMEOUT")
+
+# number of processes fitting the anomaly detection groups, 1 fits them in the current process
+ANOMALY_DETECTION_WORKERS = env("ANOMALY_DETECTION_WORKERS")
+
+# age of the saved anomaly detection models after which the monthly run refits them on all the lots
+ANOMALY_DETECTION_RETRAIN_MONTHS = env("ANOMALY_DETECTION_RETRAIN_MONTHS")
+
 API_KEY_CUSTOM_HEADER = "HTTP_X_API_KEY"
 
 if env("IMAGE_TAG") in ("dev", "local"):
@@ -467,6 +487,9 @@ if env("IMAGE_TAG") in ("dev", "local"):
 
     factory.Faker._DEFAULT_LOCALE = "fr_FR"
 
+    # the benchmarks compare the code with the previous implementations kept next to the tests, not shipped in prod
+    INSTALLED_APPS += ["benchmarks"]
+
 if env("IMAGE_TAG") not in ["dev", "staging", "prod"]:
     MIDDLEWARE.remove("django.middleware.csrf.CsrfViewMiddleware")
 
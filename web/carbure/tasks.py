@@ -12,6 +12,7 @@ from carbure.scripts.send_notification_emails import send_notification_emails
 from carbure.scripts.update_2bs_certificates import update_2bs_certificates
 from carbure.scripts.update_iscc_certificates import update_iscc_certificates
 from carbure.scripts.update_redcert_certificates import update_redcert_certificates
+from core.exports import run_export_job
 from elec.scripts.create_meter_readings_application_deadline_reminder import (
     create_meter_readings_application_deadline_reminder,
 )
@@ -20,6 +21,7 @@ from ml.scripts.calc_ml_score import calc_ml_score
 from ml.scripts.load_data import load_ml_data
 from saf.models.saf_ticket_source import create_ticket_sources_from_lots
 from tiruert.services.operation import OperationService
+from transactions.sanity_checks.incremental import recheck_lots_for_data
 from transactions.sanity_checks.sanity_checks import bulk_sanity_checks, bulk_scoring
 
 
@@ -28,11 +30,21 @@ def background_bulk_sanity_checks(lots: QuerySet, prefetched_data: dict | None =
     bulk_sanity_checks(lots, prefetched_data)
 
 
+@db_task()
+def background_recheck_lots_for_data(lots: QuerySet, data_keys: list[str]) -> None:
+    recheck_lots_for_data(lots, data_keys)
+
+
 @db_task()
 def background_bulk_scoring(lots: QuerySet, prefetched_data: dict | None = None) -> None:
     bulk_scoring(lots, prefetched_data)
 
 
+@db_task()
+def background_export(job_id: int, query: tuple) -> None:
+    run_export_job(job_id, query)
+
+
 @db_task()
 def background_create_ticket_sources_from_lots(lots: QuerySet) -> None:
     create_ticket_sources_from_lots(lots)
@@ -16,6 +16,7 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from auth.validators import validate_name
+from core.counters import track_counters
 from core.models import (
     Biocarburant,
     CarbureLot,
@@ -402,7 +403,8 @@ class CarbureLotAdmin(admin.ModelAdmin):
 
     @transaction.atomic
     def delete_lots(self, request, queryset):
-        queryset.update(lot_status="DELETED")
+        with track_counters(lots=queryset):
+            queryset.update(lot_status="DELETED")
 
         events = [
             CarbureLotEvent(lot=lot, user=request.user, event_type=CarbureLotEvent.DELETED_BY_ADMIN) for lot in queryset
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        from core import counters, facets, search
+        from core.traceability import closure
+
+        facets.connect_signals()
+        counters.connect_signals()
+        search.connect_signals()
+        closure.connect_signals()
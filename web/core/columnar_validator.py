@@ -0,0 +1,278 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+import pandas as pd
+from django import forms
+from django.core import validators
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.forms.forms import DeclarativeFieldsMetaclass
+from django.forms.utils import ErrorDict, ErrorList
+
+from core.utils import Validator
+
+# widgets that read the raw value of their field as is
+RAW_VALUE_WIDGETS = (forms.TextInput, forms.NumberInput, forms.DateInput, forms.Select)
+
+
+class ColumnarValidator(metaclass=DeclarativeFieldsMetaclass):
+    """
+    Validate a list of dicts column by column, with the same fields, cleaned data and errors as a `Validator`.
+
+    Fields are declared like on a django Form. Each column is cleaned at once with pandas, and only the cells
+    that the column parser doesn't accept are cleaned one by one by the django field, so the error messages are
+    the ones of django. Checks across fields are written for the whole frame in `validate_frame()`.
+    """
+
+    INVALID_DATA = Validator.INVALID_DATA
+    DATE_FORMATS = Validator.DATE_FORMATS
+
+    @classmethod
+    def bulk_validate(SpecializedValidator, items, context=None) -> tuple[list, list]:
+        """
+        Same as `Validator.bulk_validate`:
+        `valid_items, errors = ExcelMeterReadingValidator.bulk_validate(list_of_meter_readings, context)`
+        """
+        validator = SpecializedValidator(items, context)
+        validator.clean_fields()
+        validator.validate_frame(validator.cleaned_data)
+        return validator.get_results()
+
+    def __init__(self, items, context=None):
+        if context is None:
+            context = {}
+        self.context = context
+
+        # keep the raw python values, pandas would turn None into NaN in numeric columns
+        columns = dict.fromkeys(key for item in items for key in item)
+        data = pd.DataFrame({column: [item.get(column) for item in items] for column in columns}, dtype=object)
+        data.index = pd.RangeIndex(len(items))
+        self.missing_columns = {column for column in self.base_fields if column not in data}
+
+        self.data = self.extend_frame(data)
+        self.cleaned_data = pd.DataFrame(index=self.data.index)
+        self.errors = defaultdict(dict)
+
+    # dynamically set data inside the source frame before cleaning data and validation
+    def extend_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        return data
+
+    # validate the cleaned data of all the rows, failed cells being None
+    # useful to do checks across all fields or use external resources
+    def validate_frame(self, data: pd.DataFrame):
+        pass
+
+    def add_error(self, rows, field, message):
+        """
+        Add an error on the given field of the selected rows.
+        `rows` is a boolean mask or a list of row indexes, `message` a string or a Series of messages per row.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = self.data.index[rows]
+        field = field or NON_FIELD_ERRORS
+        error_list = None if isinstance(message, pd.Series) else ValidationError(message).error_list
+        for row in rows.tolist():
+            row_error_list = ValidationError(message[row]).error_list if error_list is None else error_list
+            self.errors[row].setdefault(field, []).extend(row_error_list)
+
+    def clean_fields(self):
+        for name, field in self.base_fields.items():
+            values = self.data[name] if name in self.data else pd.Series(None, index=self.data.index, dtype=object)
+            cleaned = np.full(len(values), None, dtype=object)
+
+            parsed = self.parse_column(field, values)
+            cleaned[parsed.index.to_numpy()] = parsed.tolist()
+
+            # the cells that couldn't be parsed at once are cleaned by the django field, once per distinct value
+            raw_values = values.tolist()
+            results = {}
+            for row in values.index.difference(parsed.index).tolist():
+                value = raw_values[row]
+                key = (type(value), value) if is_hashable(value) else None
+                result = results.get(key) if key is not None else None
+                if result is None:
+                    try:
+                        result = (self.clean_cell(name, field, value), [])
+                    except ValidationError as error:
+                        result = (None, error.error_list)
+                    if key is not None:
+                        results[key] = result
+
+                cleaned[row], error_list = result
+                if error_list:
+                    self.errors[row].setdefault(name, []).extend(error_list)
+
+            self.cleaned_data[name] = pd.Series(cleaned, index=self.data.index, dtype=object)
+
+    def clean_cell(self, name, field, value):
+        # same as django's Form._clean_fields()
+        data = {} if name in self.missing_columns else {name: value}
+        return field.clean(field.widget.value_from_datadict(data, {}, name))
+
+    def parse_column(self, field, values: pd.Series) -> pd.Series:
+        """Returns the cleaned values of the cells of the column that are valid for sure"""
+        parser = COLUMN_PARSERS.get(type(field))
+        if (
+            parser is None
+            or type(field.widget) not in RAW_VALUE_WIDGETS
+            or field.disabled
+            or getattr(field, "localize", False)
+        ):
+            return values.iloc[:0]
+        return parser(field, values)
+
+    def get_results(self):
+        valid = ~self.data.index.isin(list(self.errors))
+        valid_items = self.cleaned_data[valid].to_dict(orient="records")
+
+        lines = self.data["line"].tolist() if "line" in self.data else [None] * len(self.data)
+        errors = [
+            {"error": self.INVALID_DATA, "line": lines[row], "meta": to_error_dict(field_errors)}
+            for row, field_errors in sorted(self.errors.items())
+        ]
+        return valid_items, sorted(errors, key=lambda x: x["line"])
+
+
+def to_error_dict(field_errors):
+    return ErrorDict(
+        {
+            field: ErrorList(error_list, error_class="nonfield" if field == NON_FIELD_ERRORS else None)
+            for field, error_list in field_errors.items()
+        }
+    )
+
+
+def is_hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def get_value_types(values: pd.Series) -> pd.Series:
+    return values.map(type)
+
+
+def check_limits(field, numbers: pd.Series):
+    """Returns a mask of the numbers accepted by the validators of the field, None if some validators are unknown"""
+    valid = pd.Series(True, index=numbers.index)
+    for validator in field.validators:
+        limit = validator.limit_value() if callable(validator.limit_value) else validator.limit_value
+        if type(validator) is validators.MinValueValidator:
+            valid &= numbers >= limit
+        elif type(validator) is validators.MaxValueValidator:
+            valid &= numbers <= limit
+        else:
+            return None
+    return valid
+
+
+def parse_char_column(field: forms.CharField, values: pd.Series) -> pd.Series:
+    text = values[get_value_types(values).isin([str])]
+    if field.strip:
+        text = text.str.strip()
+    lengths = text.str.len()
+
+    valid = ~text.str.contains("\x00", regex=False) & (lengths > 0)
+    for validator in field.validators:
+        if type(validator) is validators.MaxLengthValidator:
+            valid &= lengths <= validator.limit_value
+        elif type(validator) is validators.MinLengthValidator:
+            valid &= lengths >= validator.limit_value
+        elif type(validator) is not validators.ProhibitNullCharactersValidator:
+            return values.iloc[:0]
+    return text[valid]
+
+
+def parse_float_column(field: forms.FloatField, values: pd.Series) -> pd.Series:
+    value_types = get_value_types(values)
+    text = values[value_types.isin([str])].str.strip()
+    # pandas only tells which strings are numbers, python parses them to get the exact same floats
+    text = text[pd.to_numeric(text, errors="coerce").notna()]
+    try:
+        numbers = pd.concat([values[value_types.isin([int, float])], text]).astype(float).sort_index()
+    except (ValueError, OverflowError):
+        return values.iloc[:0]
+
+    valid = check_limits(field, numbers)
+    if valid is None:
+        return values.iloc[:0]
+    return numbers[valid & np.isfinite(numbers)]
+
+
+def parse_decimal_column(field: forms.DecimalField, values: pd.Series) -> pd.Series:
+    value_types = get_value_types(values)
+    text = values[value_types.isin([str, int, float])].astype(str).str.strip()
+    numbers = pd.to_numeric(text, errors="coerce")
+    text = text[numbers.notna() & np.isfinite(numbers.astype(float))]
+
+    for validator in field.validators:
+        if type(validator) is not validators.DecimalValidator or validator.max_digits or validator.decimal_places:
+            return values.iloc[:0]
+    try:
+        return text.map(Decimal)
+    except InvalidOperation:
+        return values.iloc[:0]
+
+
+def parse_date_column(field: forms.DateField, values: pd.Series) -> pd.Series:
+    value_types = get_value_types(values)
+    dates = [values[value_types.isin([datetime.date])]]
+
+    timestamps = values[value_types.map(lambda value_type: issubclass(value_type, datetime.datetime))]
+    dates.append(timestamps[timestamps.notna()].map(lambda timestamp: timestamp.date()))
+
+    # like django, the formats are tried in order on the stripped strings
+    text = values[value_types.isin([str])].str.strip()
+    for date_format in field.input_formats:
+        parsed = pd.to_datetime(text, format=date_format, errors="coerce")
+        dates.append(parsed[parsed.notna()].dt.date)
+        text = text[parsed.isna()]
+
+    dates = pd.concat(dates).sort_index()
+    return dates if not field.validators else values.iloc[:0]
+
+
+def parse_choice_column(field: forms.ChoiceField, values: pd.Series) -> pd.Series:
+    choices = set()
+    for key, label in field.choices:
+        if isinstance(label, (list, tuple)):
+            choices.update(str(option) for option, _ in label)
+        else:
+            choices.add(str(key))
+
+    text = values[get_value_types(values).isin([str])]
+    valid = text.isin(choices) & (text != "")
+    return text[valid] if not field.validators else values.iloc[:0]
+
+
+def parse_model_choice_column(field: forms.ModelChoiceField, values: pd.Series) -> pd.Series:
+    """Resolve all the foreign keys of the column with a single query"""
+    keys = values[get_value_types(values).isin([str, int])].astype(str)
+    keys = keys[keys != ""]
+    if keys.empty or field.validators:
+        return values.iloc[:0]
+
+    key = field.to_field_name or "pk"
+    try:
+        instances = field.queryset.filter(**{f"{key}__in": keys.unique().tolist()})
+        instance_by_key = {str(instance.serializable_value(key)): instance for instance in instances}
+    except (ValueError, TypeError, ValidationError):
+        # some keys are not valid values of the field, django will tell which ones
+        return values.iloc[:0]
+
+    instances = keys.map(instance_by_key)
+    return instances[instances.notna()]
+
+
+COLUMN_PARSERS = {
+    forms.CharField: parse_char_column,
+    forms.FloatField: parse_float_column,
+    forms.DecimalField: parse_decimal_column,
+    forms.DateField: parse_date_column,
+    forms.ChoiceField: parse_choice_column,
+    forms.ModelChoiceField: parse_model_choice_column,
+}
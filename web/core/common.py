@@ -3,7 +3,7 @@ import os
 import unicodedata
 from multiprocessing import Process
 from time import perf_counter
-from typing import List
+from typing import Iterator, List
 
 import numpy as np
 import openpyxl
@@ -167,17 +167,37 @@ def get_transaction_distance(tx):
         return res
 
 
+def iter_sheet_rows(sheet, convert_float: bool) -> Iterator[dict]:
+    """
+    Read the rows of a sheet opened in read-only mode one by one, as dicts indexed by the header of the sheet.
+    Empty and error cells are read as "".
+    """
+
+    rows = sheet.iter_rows()
+    column_names = [convert_cell(cell, convert_float) for cell in next(rows, [])]
+    for row in rows:
+        values = [convert_cell(cell, convert_float) for cell in row]
+        values += [""] * (len(column_names) - len(values))
+        yield {name: "" if pd.isna(value) else value for name, value in zip(column_names, values)}
+
+
 def convert_template_row_to_formdata(entity, prefetched_data, filepath):
-    wb = openpyxl.load_workbook(filepath, data_only=True)
+    """
+    Generate the lot data of each row of an excel template, streaming the file instead of loading it at once.
+    """
+
+    wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
     sheet = wb.worksheets[0]
-    data = get_sheet_data(sheet, convert_float=True)
-    column_names = data[0]
-    data = data[1:]
-    df = pd.DataFrame(data, columns=column_names)
-    df.fillna("", inplace=True)
-    lots_data = []
-    for row in df.iterrows():
-        lot_row = row[1]
+    # some tools write wrong dimensions in the file, which would cut the rows in read-only mode
+    sheet.reset_dimensions()
+    try:
+        yield from convert_template_rows(entity, prefetched_data, iter_sheet_rows(sheet, convert_float=True))
+    finally:
+        wb.close()
+
+
+def convert_template_rows(entity, prefetched_data, rows):
+    for lot_row in rows:
         lot = {}
         if lot_row.get("volume", "") == "" and (lot_row.get("unit", "") == "" or lot_row.get("quantity", "") == ""):
             # ignore rows with no volume or no unit+quantity
@@ -269,8 +289,7 @@ def convert_template_row_to_formdata(entity, prefetched_data, filepath):
             lot["carbure_client_id"] = prefetched_data["clientsbyname"][client].id
         else:
             lot["unknown_client"] = client
-        lots_data.append(lot)
-    return lots_data
+        yield lot
 
 
 def ErrorResponse(status_code, error=None, data=None, status=Carbure.ERROR, message=None):
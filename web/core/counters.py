@@ -0,0 +1,319 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+from core.models import CarbureLot, CarbureLotCounter, CarbureStock
+
+LOT_FIELDS = [
+    "year",
+    "lot_status",
+    "correction_status",
+    "added_by_id",
+    "carbure_client_id",
+    "carbure_supplier_id",
+    "parent_stock_id",
+]
+STOCK_FIELDS = ["carbure_client_id", "remaining_volume"]
+
+
+def is_sent(lot):
+    return lot["lot_status"] not in (CarbureLot.DRAFT, CarbureLot.DELETED)
+
+
+def is_tofix(lot):
+    return is_sent(lot) and lot["correction_status"] != CarbureLot.NO_PROBLEMO
+
+
+SENT = ~Q(lot_status__in=[CarbureLot.DRAFT, CarbureLot.DELETED])
+TOFIX = SENT & ~Q(correction_status=CarbureLot.NO_PROBLEMO)
+
+# bucket -> (entity field, filter used to rebuild the counters, same filter applied to a single lot)
+LOT_BUCKETS = {
+    CarbureLotCounter.DRAFT: (
+        "added_by_id",
+        Q(lot_status=CarbureLot.DRAFT),
+        lambda lot: lot["lot_status"] == CarbureLot.DRAFT,
+    ),
+    CarbureLotCounter.DRAFT_STOCKS: (
+        "added_by_id",
+        Q(lot_status=CarbureLot.DRAFT, parent_stock__isnull=False),
+        lambda lot: lot["lot_status"] == CarbureLot.DRAFT and lot["parent_stock_id"] is not None,
+    ),
+    CarbureLotCounter.IN_TOTAL: ("carbure_client_id", SENT, is_sent),
+    CarbureLotCounter.IN_PENDING: (
+        "carbure_client_id",
+        Q(lot_status=CarbureLot.PENDING),
+        lambda lot: lot["lot_status"] == CarbureLot.PENDING,
+    ),
+    CarbureLotCounter.IN_TOFIX: ("carbure_client_id", TOFIX, is_tofix),
+    CarbureLotCounter.OUT_TOTAL: ("carbure_supplier_id", SENT, is_sent),
+    CarbureLotCounter.OUT_PENDING: (
+        "carbure_supplier_id",
+        Q(lot_status=CarbureLot.PENDING),
+        lambda lot: lot["lot_status"] == CarbureLot.PENDING,
+    ),
+    CarbureLotCounter.OUT_TOFIX: ("carbure_supplier_id", TOFIX, is_tofix),
+}
+
+STOCK_BUCKETS = {
+    CarbureLotCounter.STOCK_TOTAL: ("carbure_client_id", Q(), lambda stock: True),
+    CarbureLotCounter.STOCK: (
+        "carbure_client_id",
+        Q(remaining_volume__gt=0),
+        lambda stock: (stock["remaining_volume"] or 0) > 0,
+    ),
+}
+
+
+def get_lot_keys(lot):
+    keys = []
+    for bucket, (entity_field, _, matches) in LOT_BUCKETS.items():
+        if lot[entity_field] is not None and matches(lot):
+            keys.append((lot[entity_field], lot["year"], bucket))
+    return keys
+
+
+def get_stock_keys(stock):
+    keys = []
+    for bucket, (entity_field, _, matches) in STOCK_BUCKETS.items():
+        if stock[entity_field] is not None and matches(stock):
+            keys.append((stock[entity_field], CarbureLotCounter.NO_YEAR, bucket))
+    return keys
+
+
+def apply_counter_changes(changes):
+    """
+    Add the given deltas, a Counter of (entity_id, year, bucket) -> delta, to the counter table.
+    """
+
+    changes = {key: delta for key, delta in changes.items() if delta != 0}
+    if not changes:
+        return
+
+    CarbureLotCounter.objects.bulk_create(
+        [CarbureLotCounter(entity_id=entity_id, year=year, bucket=bucket) for entity_id, year, bucket in changes],
+        ignore_conflicts=True,
+    )
+
+    # counters moving by the same amount are updated together
+    keys_by_delta = {}
+    for key, delta in changes.items():
+        keys_by_delta.setdefault(delta, []).append(key)
+
+    for delta, keys in keys_by_delta.items():
+        condition = Q()
+        for entity_id, year, bucket in keys:
+            condition |= Q(entity_id=entity_id, year=year, bucket=bucket)
+        CarbureLotCounter.objects.filter(condition).update(count=F("count") + delta)
+
+
+class CountersTracker:
+    """
+    Collect the state of lots and stocks before a bulk change, and update the counters with the difference once it's done.
+    """
+
+    def __init__(self):
+        self.lots_before = {}
+        self.stocks_before = {}
+        self.changes = Counter()
+
+    def track_lots(self, lot_ids):
+        lot_ids = [lot_id for lot_id in lot_ids if lot_id not in self.lots_before]
+        for lot_id in lot_ids:
+            self.lots_before[lot_id] = []
+        for lot in CarbureLot.objects.filter(id__in=lot_ids).values("id", *LOT_FIELDS):
+            self.lots_before[lot["id"]] = get_lot_keys(lot)
+
+    def track_stocks(self, stock_ids):
+        stock_ids = [stock_id for stock_id in stock_ids if stock_id not in self.stocks_before]
+        for stock_id in stock_ids:
+            self.stocks_before[stock_id] = []
+        for stock in CarbureStock.objects.filter(id__in=stock_ids).values("id", *STOCK_FIELDS):
+            self.stocks_before[stock["id"]] = get_stock_keys(stock)
+
+    # for objects created with bulk_create, which don't always get their id back
+    def add_created_lots(self, lots):
+        for lot in lots:
+            self.changes.update(get_lot_keys(get_state(lot, LOT_FIELDS)))
+
+    def add_created_stocks(self, stocks):
+        for stock in stocks:
+            self.changes.update(get_stock_keys(get_state(stock, STOCK_FIELDS)))
+
+    def apply(self):
+        changes = Counter(self.changes)
+
+        for keys in self.lots_before.values():
+            changes.subtract(keys)
+        for lot in CarbureLot.objects.filter(id__in=list(self.lots_before)).values(*LOT_FIELDS):
+            changes.update(get_lot_keys(lot))
+
+        for keys in self.stocks_before.values():
+            changes.subtract(keys)
+        for stock in CarbureStock.objects.filter(id__in=list(self.stocks_before)).values(*STOCK_FIELDS):
+            changes.update(get_stock_keys(stock))
+
+        apply_counter_changes(changes)
+
+
+local = threading.local()
+
+
+@contextmanager
+def track_counters(lots=(), stocks=()):
+    """
+    Keep the lot counters in sync with changes made by bulk operations (update, bulk_update, bulk_create),
+    which don't send model signals. Changes made with save() and delete() inside the block are tracked as well.
+    Lots and stocks can be given as ids or querysets.
+    """
+
+    lot_ids = get_ids(lots)
+    stock_ids = get_ids(stocks)
+
+    tracker = getattr(local, "tracker", None)
+    if tracker is not None:
+        # nested blocks are merged into the outermost one
+        tracker.track_lots(lot_ids)
+        tracker.track_stocks(stock_ids)
+        yield tracker
+        return
+
+    with transaction.atomic():
+        tracker = CountersTracker()
+        tracker.track_lots(lot_ids)
+        tracker.track_stocks(stock_ids)
+        local.tracker = tracker
+        try:
+            yield tracker
+        finally:
+            local.tracker = None
+        tracker.apply()
+
+
+def get_ids(objects):
+    if hasattr(objects, "values_list"):
+        return list(objects.values_list("id", flat=True))
+    return [getattr(obj, "id", obj) for obj in objects]
+
+
+def get_state(instance, fields):
+    state = {}
+    for field in fields:
+        if field not in instance.__dict__:
+            return None
+        state[field] = instance.__dict__[field]
+    return state
+
+
+def read_state(model, pk):
+    return model.objects.filter(pk=pk).values(*(LOT_FIELDS if model is CarbureLot else STOCK_FIELDS)).first()
+
+
+def on_init(sender, instance, **kwargs):
+    fields = LOT_FIELDS if sender is CarbureLot else STOCK_FIELDS
+    instance._counter_state = get_state(instance, fields) if instance.pk else None
+
+
+def on_pre_save(sender, instance, **kwargs):
+    # instances loaded with deferred fields have no known state, read it before it's overwritten
+    if instance.pk and getattr(instance, "_counter_state", None) is None:
+        instance._counter_state = read_state(sender, instance.pk)
+
+
+def on_save(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, "_counter_state", None)
+    current = get_state(instance, LOT_FIELDS if sender is CarbureLot else STOCK_FIELDS)
+    if current is None:
+        current = read_state(sender, instance.pk)
+    update_instance_counters(sender, instance, previous, current)
+
+
+def on_delete(sender, instance, **kwargs):
+    update_instance_counters(sender, instance, getattr(instance, "_counter_state", None), None)
+
+
+def update_instance_counters(sender, instance, previous, current):
+    is_lot = sender is CarbureLot
+    get_keys = get_lot_keys if is_lot else get_stock_keys
+
+    tracker = getattr(local, "tracker", None)
+    if tracker is not None:
+        # the tracker will read the final state of the object from the database
+        before = tracker.lots_before if is_lot else tracker.stocks_before
+        if instance.pk not in before:
+            before[instance.pk] = get_keys(previous) if previous else []
+    else:
+        changes = Counter(get_keys(current) if current else [])
+        changes.subtract(get_keys(previous) if previous else [])
+        apply_counter_changes(changes)
+
+    instance._counter_state = current
+
+
+def connect_signals():
+    for model in (CarbureLot, CarbureStock):
+        post_init.connect(on_init, sender=model, dispatch_uid=f"counters_init_{model.__name__}")
+        pre_save.connect(on_pre_save, sender=model, dispatch_uid=f"counters_pre_save_{model.__name__}")
+        post_save.connect(on_save, sender=model, dispatch_uid=f"counters_save_{model.__name__}")
+        post_delete.connect(on_delete, sender=model, dispatch_uid=f"counters_delete_{model.__name__}")
+
+
+def rebuild_counters(entity_ids=None, apps=None):
+    """
+    Recompute every counter from the lots and stocks tables, optionally only for some entities.
+    The models are read from `apps` when given, so migrations can fill the table with their historical models.
+    """
+
+    if apps is None:
+        lot_model, stock_model, counter_model = CarbureLot, CarbureStock, CarbureLotCounter
+    else:
+        lot_model = apps.get_model("core", "CarbureLot")
+        stock_model = apps.get_model("core", "CarbureStock")
+        counter_model = apps.get_model("core", "CarbureLotCounter")
+
+    counts = Counter()
+    for model, buckets, yearly in ((lot_model, LOT_BUCKETS, True), (stock_model, STOCK_BUCKETS, False)):
+        for bucket, (entity_field, condition, _) in buckets.items():
+            rows = model.objects.filter(condition).exclude(**{entity_field: None})
+            if entity_ids is not None:
+                rows = rows.filter(**{f"{entity_field}__in": entity_ids})
+            group_by = [entity_field, "year"] if yearly else [entity_field]
+            for row in rows.values(*group_by).annotate(total=Count("id")).order_by():
+                year = row["year"] if yearly else CarbureLotCounter.NO_YEAR
+                counts[(row[entity_field], year, bucket)] = row["total"]
+
+    with transaction.atomic():
+        existing = counter_model.objects.all()
+        if entity_ids is not None:
+            existing = existing.filter(entity_id__in=entity_ids)
+
+        previous = {(c.entity_id, c.year, c.bucket): c.count for c in existing}
+        existing.delete()
+        counter_model.objects.bulk_create(
+            [
+                counter_model(entity_id=entity_id, year=year, bucket=bucket, count=count)
+                for (entity_id, year, bucket), count in counts.items()
+            ],
+            batch_size=1000,
+        )
+
+    # number of counters that were wrong
+    return sum(1 for key in set(previous) | set(counts) if previous.get(key, 0) != counts.get(key, 0))
+
+
+def get_entity_counters(entity_id, year=None):
+    """
+    Return the counters of an entity, for the given year or summed over all years.
+    Stock buckets are never split by year.
+    """
+
+    counters = CarbureLotCounter.objects.filter(entity_id=entity_id)
+    if year is not None:
+        counters = counters.filter(year__in=[year, CarbureLotCounter.NO_YEAR])
+
+    totals = dict(counters.values_list("bucket").annotate(total=Sum("count")).order_by())
+    return {bucket: totals.get(bucket, 0) for bucket, _ in CarbureLotCounter.BUCKETS}
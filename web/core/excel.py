@@ -1,3 +1,5 @@
+import os
+import tempfile
 from datetime import date, datetime
 from io import BufferedReader
 from typing import Any, Callable, Iterable, TypedDict
@@ -57,6 +59,33 @@ def export_to_excel(
     return open(location, "rb")
 
 
+# unique file per export so concurrent exports never overwrite each other
+def make_export_location(name):
+    today = date.today()
+    fd, location = tempfile.mkstemp(prefix="%s_%s_" % (name, today.strftime("%Y%m%d")), suffix=".xlsx")
+    os.close(fd)
+    return location
+
+
+# serialize a queryset by chunks so a large export never holds all the serialized rows at once
+def serialize_by_chunks(queryset, serializer_class, on_progress: Callable[[int], None] = None, chunk_size: int = 1000):
+    chunk = []
+    count = 0
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield from serializer_class(chunk, many=True).data
+            count += len(chunk)
+            chunk = []
+            if on_progress:
+                on_progress(count)
+
+    if chunk:
+        yield from serializer_class(chunk, many=True).data
+        if on_progress:
+            on_progress(count + len(chunk))
+
+
 def ExcelResponse(file: BufferedReader):
     data = file.read()
     ctype = "application/vnd.ms-excel"
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import private_storage
+from core.models import Entity, ExportJob
+from core.serializers import ExportJobSerializer
+from core.xlsx_v3 import export_carbure_lots
+
+# number of exports an entity can have waiting or running at the same time
+MAX_ACTIVE_JOBS_PER_ENTITY = 2
+
+# a finished export is returned again for identical requests made during this delay
+REUSE_FINISHED_JOB_DELAY = timedelta(minutes=5)
+
+# jobs still active after this delay are considered lost (ex: worker restart) and stop counting toward the limit
+ACTIVE_JOB_TIMEOUT = timedelta(hours=1)
+
+# functions building the excel file of each export type: (queryset, entity, on_progress) -> file location
+EXPORTERS = {
+    ExportJob.LOTS: "core.exports.export_lots",
+    ExportJob.SAF_TICKETS: "saf.views.ticket.mixins.export.export_tickets_job",
+    ExportJob.SAF_TICKET_SOURCES: "saf.views.ticket_source.mixins.export.export_ticket_sources_job",
+    ExportJob.TIRUERT_OPERATIONS: "tiruert.views.operation.mixins.excel_export.export_operations_job",
+    ExportJob.ELEC_TRANSFER_CERTIFICATES: "elec.views.transfer_certificates.mixins.excel_export.export_certificates_job",
+}
+
+
+class ExportLimitReached(Exception):
+    pass
+
+
+def get_query_hash(export_type, entity, query):
+    # query is a QueryDict, every value of multi-valued params is kept and the order of params doesn't matter
+    params = {key: sorted(query.getlist(key)) for key in sorted(query.keys()) if key != "entity_id"}
+    payload = json.dumps({"type": export_type, "entity": entity.id, "query": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest(), params
+
+
+def get_active_jobs(entity):
+    return ExportJob.objects.filter(
+        entity=entity,
+        status__in=[ExportJob.PENDING, ExportJob.RUNNING],
+        created_at__gte=timezone.now() - ACTIVE_JOB_TIMEOUT,
+    )
+
+
+def request_export(export_type, entity, user, query, queryset):
+    """
+    Create an export job for the given filtered queryset and queue it in the background,
+    unless an identical export is already running or was just finished.
+    Raises ExportLimitReached if the entity already has too many exports in progress.
+    """
+
+    query_hash, params = get_query_hash(export_type, entity, query)
+
+    same_jobs = ExportJob.objects.filter(entity=entity, type=export_type, query_hash=query_hash)
+    existing_job = (
+        get_active_jobs(entity).filter(type=export_type, query_hash=query_hash).first()
+        or same_jobs.filter(status=ExportJob.DONE, finished_at__gte=timezone.now() - REUSE_FINISHED_JOB_DELAY)
+        .order_by("-finished_at")
+        .first()
+    )
+    if existing_job:
+        return existing_job
+
+    with transaction.atomic():
+        # lock the entity row so concurrent requests can't both pass the limit
+        Entity.objects.select_for_update().filter(id=entity.id).first()
+
+        if get_active_jobs(entity).count() >= MAX_ACTIVE_JOBS_PER_ENTITY:
+            raise ExportLimitReached
+
+        job = ExportJob.objects.create(
+            entity=entity,
+            user=user,
+            type=export_type,
+            query=params,
+            query_hash=query_hash,
+        )
+
+    from carbure.tasks import background_export
+
+    query = freeze_queryset(queryset)
+    transaction.on_commit(lambda: background_export(job.id, query))
+    return job
+
+
+def freeze_queryset(queryset):
+    # pickling a queryset evaluates it, so only its sql query is sent to the task queue
+    return queryset.model, queryset.query, queryset._prefetch_related_lookups
+
+
+def thaw_queryset(frozen):
+    model, query, prefetch_lookups = frozen
+    queryset = model._default_manager.all()
+    queryset.query = query
+    return queryset.prefetch_related(*prefetch_lookups)
+
+
+def run_export_job(job_id, query):
+    job = ExportJob.objects.select_related("entity").get(id=job_id)
+    queryset = thaw_queryset(query)
+
+    job.status = ExportJob.RUNNING
+    job.total_rows = queryset.count()
+    job.save(update_fields=["status", "total_rows"])
+
+    def on_progress(processed_rows):
+        ExportJob.objects.filter(id=job.id).update(processed_rows=processed_rows)
+
+    location = None
+    try:
+        export = import_string(EXPORTERS[job.type])
+        location = export(queryset, job.entity, on_progress)
+
+        file_path = "exports/%d/%d_%s.xlsx" % (job.entity_id, job.id, job.type.lower())
+        with open(location, "rb") as file:
+            job.file_path = private_storage.save(file_path, file)
+
+        job.status = ExportJob.DONE
+        job.processed_rows = job.total_rows
+    except Exception:
+        traceback.print_exc()
+        job.status = ExportJob.FAILED
+        job.error = "Could not generate the export"
+    finally:
+        if location and os.path.exists(location):
+            os.remove(location)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "processed_rows", "file_path", "error", "finished_at"])
+    return job
+
+
+def export_job_response(export_type, request, queryset):
+    try:
+        job = request_export(export_type, request.entity, request.user, request.query_params, queryset)
+    except ExportLimitReached:
+        return Response(
+            {"message": "Too many exports in progress, please wait for them to finish"},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+    return Response(ExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+def export_lots(lots, entity, on_progress):
+    return export_carbure_lots(entity, lots, on_progress)
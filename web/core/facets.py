@@ -0,0 +1,254 @@
+import hashlib
+import json
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+
+from core.helpers import CONTROL_ENTITIES, UNKNOWN_VALUE, filter_lots, filter_stock
+from core.models import CarbureLot, CarbureStock, Entity
+
+VERSION_KEY = "filters:version:{scope}"
+FACETS_KEY = "filters:facets:{scope}:{version}:{hash}"
+
+# admins and auditors see every lot so they share a version bumped by any change
+CONTROL_SCOPE = "control"
+
+
+def none_if_empty(value):
+    return value if value not in ("", None) else None
+
+
+def name_or_unknown(key):
+    return lambda row: row[key] or UNKNOWN_VALUE
+
+
+# facet name -> (columns read from the filtered lots, function giving the facet value of a row)
+LOT_FACETS = {
+    "feedstocks": (
+        {"f_feedstock": F("feedstock__code"), "f_feedstock_is_biofuel": F("feedstock__is_biofuel_feedstock")},
+        lambda row: row["f_feedstock"] if row["f_feedstock_is_biofuel"] else None,
+    ),
+    "biofuels": ({"f_biofuel": F("biofuel__code")}, lambda row: row["f_biofuel"]),
+    "countries_of_origin": ({"f_country": F("country_of_origin__code_pays")}, lambda row: row["f_country"]),
+    "periods": ({"f_period": F("period")}, lambda row: row["f_period"]),
+    "added_by": ({"f_added_by": F("added_by__name")}, lambda row: row["f_added_by"]),
+    "delivery_types": ({"f_delivery_type": F("delivery_type")}, lambda row: row["f_delivery_type"]),
+    "lot_status": ({"f_lot_status": F("lot_status")}, lambda row: row["f_lot_status"]),
+    "production_sites": (
+        {"f_production_site": Coalesce("carbure_production_site__name", "unknown_production_site")},
+        name_or_unknown("f_production_site"),
+    ),
+    "delivery_sites": (
+        {"f_delivery_site": Coalesce("carbure_delivery_site__name", "unknown_delivery_site")},
+        name_or_unknown("f_delivery_site"),
+    ),
+    "suppliers": (
+        {"f_supplier": Coalesce("carbure_supplier__name", "unknown_supplier")},
+        name_or_unknown("f_supplier"),
+    ),
+    "clients": (
+        {"f_client": Coalesce("carbure_client__name", "unknown_client")},
+        name_or_unknown("f_client"),
+    ),
+    "client_types": (
+        {"f_client_type": F("carbure_client__entity_type")},
+        lambda row: row["f_client_type"] or Entity.UNKNOWN,
+    ),
+    "scores": ({"f_score": F("data_reliability_score")}, lambda row: row["f_score"]),
+    "correction_status": ({"f_correction_status": F("correction_status")}, lambda row: row["f_correction_status"]),
+    "conformity": ({"f_audit_status": F("audit_status")}, lambda row: row["f_audit_status"]),
+    "ml_scoring": ({"f_ml": F("ml_control_requested")}, lambda row: "KO" if row["f_ml"] else "OK"),
+    "certificate_id": (
+        {"f_dc_certificate": F("production_site_double_counting_certificate")},
+        lambda row: none_if_empty(row["f_dc_certificate"]),
+    ),
+    "supplier_certificate": (
+        {"f_supplier_certificate": F("supplier_certificate")},
+        lambda row: none_if_empty(row["f_supplier_certificate"]),
+    ),
+}
+
+# errors are read from another table so they are counted separately
+LOT_FILTERS = [*LOT_FACETS, "errors"]
+
+# values always listed for these facets, even if no lot has them
+LOT_FIXED_VALUES = {"ml_scoring": ["KO", "OK"]}
+
+STOCK_FACETS = {
+    "feedstocks": LOT_FACETS["feedstocks"],
+    "biofuels": LOT_FACETS["biofuels"],
+    "countries_of_origin": LOT_FACETS["countries_of_origin"],
+    "periods": (
+        {"f_period": Coalesce("parent_lot__period", "parent_transformation__source_stock__parent_lot__period")},
+        lambda row: row["f_period"],
+    ),
+    "depots": ({"f_depot": F("depot__name")}, lambda row: row["f_depot"]),
+    "clients": ({"f_client": F("carbure_client__name")}, lambda row: row["f_client"]),
+    "suppliers": (
+        {"f_carbure_supplier": F("carbure_supplier__name"), "f_unknown_supplier": F("unknown_supplier")},
+        lambda row: none_if_empty(row["f_carbure_supplier"]) or none_if_empty(row["f_unknown_supplier"]),
+    ),
+    "production_sites": (
+        {"f_carbure_site": F("carbure_production_site__name"), "f_unknown_site": F("unknown_production_site")},
+        lambda row: none_if_empty(row["f_carbure_site"]) or none_if_empty(row["f_unknown_site"]),
+    ),
+}
+
+
+def get_lots_facets(lots, query, entity, fields, scope=None):
+    """
+    Compute the values available for each of the given lot filters, with the number of lots having them.
+    Each filter is computed on the lots matching every other active filter, so the values don't disappear once selected.
+    """
+
+    def compute():
+        def filter_without(blacklist):
+            return filter_lots(lots, query, entity, blacklist=blacklist)
+
+        facets = compute_facets(filter_without, query, [f for f in fields if f != "errors"], LOT_FACETS)
+        if "errors" in fields:
+            facets["errors"] = count_lot_errors(filter_without(["errors"]))
+        for field, values in LOT_FIXED_VALUES.items():
+            if field in facets:
+                facets[field] = [(value, dict(facets[field]).get(value, 0)) for value in values]
+        return facets
+
+    if scope is None:
+        return compute()
+    version_scope = CONTROL_SCOPE if entity.entity_type in CONTROL_ENTITIES else entity.id
+    return get_cached_facets(f"lots:{scope}", version_scope, query, fields, compute)
+
+
+def get_stock_facets(stock, query, fields, entity=None, scope=None):
+    """
+    Same as get_lots_facets for the stock filters.
+    """
+
+    def compute():
+        def filter_without(blacklist):
+            return filter_stock(stock, query, blacklist=blacklist)
+
+        return compute_facets(filter_without, query, fields, STOCK_FACETS)
+
+    if scope is None:
+        return compute()
+    version_scope = CONTROL_SCOPE if entity is None or entity.entity_type in CONTROL_ENTITIES else entity.id
+    return get_cached_facets(f"stocks:{scope}", version_scope, query, fields, compute)
+
+
+def compute_facets(filter_without, query, fields, definitions):
+    # filters that are not active all read the same rows, so they are computed together with a single group by
+    shared_fields = [field for field in fields if not query.getlist(field)]
+    active_fields = [field for field in fields if query.getlist(field)]
+
+    facets = {}
+    if shared_fields:
+        facets.update(group_facets(filter_without([]), shared_fields, definitions))
+    for field in active_fields:
+        facets.update(group_facets(filter_without([field]), [field], definitions))
+    return facets
+
+
+def group_facets(queryset, fields, definitions):
+    queryset = queryset.order_by()
+    # rows filtered on an aggregate have to be selected again before being grouped
+    if queryset.query.group_by is not None:
+        queryset = queryset.model.objects.filter(id__in=queryset.values("id"))
+
+    columns = {}
+    for field in fields:
+        columns.update(definitions[field][0])
+
+    counts = {field: defaultdict(int) for field in fields}
+    rows = queryset.annotate(**columns).values(*columns).annotate(f_count=Count("id", distinct=True))
+    for row in rows.iterator(chunk_size=2000):
+        for field in fields:
+            value = definitions[field][1](row)
+            if value is not None:
+                counts[field][value] += row["f_count"]
+
+    return {field: sorted(counts[field].items()) for field in fields}
+
+
+def count_lot_errors(lots):
+    lots = lots.order_by()
+    if lots.query.group_by is not None:
+        lots = CarbureLot.objects.filter(id__in=lots.values("id"))
+    errors = (
+        lots.exclude(genericerror__error=None).values_list("genericerror__error").annotate(count=Count("id", distinct=True))
+    )
+    return sorted(errors)
+
+
+def get_lots_filters_data(lots, query, entity, field, scope=None):
+    if field not in LOT_FILTERS:
+        return None
+    return [value for value, _ in get_lots_facets(lots, query, entity, [field], scope)[field]]
+
+
+def get_stock_filters_data(stock, query, field, entity=None, scope=None):
+    if field not in STOCK_FACETS:
+        return None
+    return [value for value, _ in get_stock_facets(stock, query, [field], entity, scope)[field]]
+
+
+def serialize_facets(facets):
+    return {field: [{"value": value, "count": count} for value, count in values] for field, values in facets.items()}
+
+
+def get_cached_facets(scope, version_scope, query, fields, compute):
+    timeout = settings.FILTERS_CACHE_TIMEOUT
+    if not timeout:
+        return compute()
+
+    params = {key: sorted(query.getlist(key)) for key in sorted(query.keys())}
+    payload = json.dumps({"query": params, "fields": sorted(fields)}, sort_keys=True)
+    query_hash = hashlib.sha256(payload.encode()).hexdigest()
+
+    key = FACETS_KEY.format(scope=scope, version=get_version(version_scope), hash=query_hash)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute()
+        cache.set(key, facets, timeout)
+    return facets
+
+
+def get_version(scope):
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_filters(entity_ids):
+    """
+    Outdate the cached filters of the given entities and of the control entities,
+    to be called after changes that don't trigger model signals (bulk operations).
+    """
+
+    version = time.time_ns()
+    scopes = {CONTROL_SCOPE, *(entity_id for entity_id in entity_ids if entity_id)}
+    cache.set_many({VERSION_KEY.format(scope=scope): version for scope in scopes}, None)
+
+
+def on_lot_change(sender, instance, **kwargs):
+    entity_ids = [instance.added_by_id, instance.carbure_supplier_id, instance.carbure_client_id, instance.carbure_vendor_id]
+    transaction.on_commit(lambda: invalidate_filters(entity_ids))
+
+
+def on_stock_change(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_filters([instance.carbure_client_id]))
+
+
+def connect_signals():
+    for signal in (post_save, post_delete):
+        signal.connect(on_lot_change, sender=CarbureLot, dispatch_uid=f"filters_lot_{signal is post_save}")
+        signal.connect(on_stock_change, sender=CarbureStock, dispatch_uid=f"filters_stock_{signal is post_save}")
@@ -1,15 +1,19 @@
 import calendar
 import datetime
+import os
+from decimal import Decimal
 from multiprocessing.context import Process
 
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
+from django.core import signing
 from django.core.mail import EmailMultiAlternatives
-from django.db.models.aggregates import Count, Sum
-from django.db.models.expressions import F, OuterRef, Subquery
+from django.db.models.aggregates import Count, Max, Sum
+from django.db.models.expressions import Exists, F, OuterRef, Subquery
 from django.db.models.functions.comparison import Coalesce
 from django.db.models.query_utils import Q
-from django.http.response import HttpResponse, JsonResponse
+from django.http import QueryDict
+from django.http.response import FileResponse, JsonResponse
 
 from core.common import try_get_certificate, try_get_double_counting_certificate
 from core.ign_distance import get_distance
@@ -22,11 +26,10 @@ from core.models import (
     CarbureStockTransformation,
     Entity,
     GenericError,
-    MatierePremiere,
-    Pays,
     TransactionDistance,
     UserRights,
 )
+from core.search import Matches
 from core.serializers import (
     CarbureLotAdminEventSerializer,
     CarbureLotAdminSerializer,
@@ -39,7 +42,6 @@ from core.serializers import (
     GenericErrorSerializer,
 )
 from core.xlsx_v3 import export_carbure_lots, export_carbure_stock
-from transactions.models import Depot
 
 sort_key_to_django_field = {
     "period": "delivery_date",
@@ -60,6 +62,13 @@ stock_sort_key_to_django_field = {
 ADMIN_ENTITIES = [Entity.ADMIN, Entity.EXTERNAL_ADMIN]
 CONTROL_ENTITIES = [*ADMIN_ENTITIES, Entity.AUDITOR]
 
+LOTS_CURSOR_SALT = "core.lots.cursor"
+SELECTION_TOKEN_SALT = "core.lots.selection"
+SELECTION_TOKEN_MAX_AGE = 24 * 3600
+
+# query params that change how the list is displayed but not which lots are selected
+NOT_SELECTION_PARAMS = ["entity_id", "from_idx", "limit", "cursor", "sort_by", "order", "export", "selection_token"]
+
 
 def get_entity_stock(entity_id):
     return CarbureStock.objects.filter(carbure_client_id=entity_id).select_related(
@@ -162,10 +171,21 @@ def get_entity_lots_by_status(entity, status=None, export=False):
     return lots
 
 
+# send an excel file by chunks instead of loading it in memory, the file is removed once opened
+def stream_excel_file(file_location, name):
+    excel = open(file_location, "rb")
+    os.remove(file_location)
+    filename = "%s_%s.xlsx" % (name, datetime.date.today().strftime("%Y%m%d"))
+    ctype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return FileResponse(excel, as_attachment=True, filename=filename, content_type=ctype)
+
+
 def get_lots_with_metadata(lots, entity, query):
     export = query.get("export", False)
     limit = query.get("limit", None)
     from_idx = query.get("from_idx", "0")
+    # keyset pagination is used as soon as a cursor param is given, even an empty one for the first page
+    cursor = query.get("cursor", None)
 
     # filtering
     lots = filter_lots(lots, query, entity)
@@ -174,21 +194,26 @@ def get_lots_with_metadata(lots, entity, query):
 
     if export:
         file_location = export_carbure_lots(entity, lots)
-        with open(file_location, "rb") as excel:
-            data = excel.read()
-            ctype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            response = HttpResponse(content=data, content_type=ctype)
-            response["Content-Disposition"] = 'attachment; filename="%s"' % (file_location)
-        return response
+        return stream_excel_file(file_location, "carbure_lots")
+
+    limit = int(limit) if limit is not None else None
 
     # pagination
-    from_idx = int(from_idx)
-    returned = lots[from_idx:]
-    if limit is not None:
-        limit = int(limit)
-        returned = returned[:limit]
+    data = {}
+    if cursor is not None:
+        try:
+            returned, data["next_cursor"] = paginate_lots_by_cursor(lots, cursor, limit)
+        except CursorError:
+            return JsonResponse({"status": "error", "message": "Invalid cursor"}, status=400)
+    else:
+        from_idx = int(from_idx)
+        returned = lots[from_idx:]
+        if limit is not None:
+            returned = returned[:limit]
+        returned = list(returned)
+        data["from"] = from_idx
 
-    total_errors, total_deadline = count_lots_of_interest(lots, entity)
+    counters = get_lots_counters(lots, entity)
 
     # enrich dataset with additional metadata
     if entity.entity_type in CONTROL_ENTITIES:
@@ -196,18 +221,161 @@ def get_lots_with_metadata(lots, entity, query):
     else:
         serializer = CarbureLotPublicSerializer(returned, many=True)
 
-    data = {}
     data["lots"] = serializer.data
-    data["from"] = from_idx
-    data["returned"] = returned.count()
-    data["total"] = lots.count()
-    data["total_errors"] = total_errors
-    data["total_deadline"] = total_deadline
-    data["errors"] = get_lots_errors(returned, entity)
-    data["ids"] = list(lots.values_list("id", flat=True))
+    data["returned"] = len(returned)
+    data["total"] = counters["total"]
+    data["total_errors"] = counters["total_errors"]
+    data["total_deadline"] = counters["total_deadline"]
+    data["errors"] = get_lots_errors([lot.id for lot in returned], entity)
+    data["selection_token"] = make_selection_token(entity, query, counters["max_id"])
+    # the full id list is only kept for clients still using offset pagination
+    if cursor is None:
+        data["ids"] = list(lots.values_list("id", flat=True))
     return JsonResponse({"status": "success", "data": data})
 
 
+class CursorError(Exception):
+    pass
+
+
+def get_keyset_ordering(lots):
+    ordering = list(lots.query.order_by) or ["-id"]
+    # the id is added as last key so every row has a distinct position
+    if ordering[-1].lstrip("-") not in ("id", "pk"):
+        ordering.append("-id" if ordering[-1].startswith("-") else "id")
+    return ordering
+
+
+def get_keyset_filter(ordering, values):
+    # nulls are considered smaller than any other value, as mysql does when sorting
+    after_cursor = []
+    same_as_cursor = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        descending = field.startswith("-")
+        if value is None:
+            after = Q(pk__in=[]) if descending else Q(**{f"{name}__isnull": False})
+            same = Q(**{f"{name}__isnull": True})
+        elif descending:
+            after = Q(**{f"{name}__lt": value}) | Q(**{f"{name}__isnull": True})
+            same = Q(**{name: value})
+        else:
+            after = Q(**{f"{name}__gt": value})
+            same = Q(**{name: value})
+        after_cursor.append(same_as_cursor & after)
+        same_as_cursor &= same
+
+    condition = after_cursor[0]
+    for other in after_cursor[1:]:
+        condition |= other
+    return condition
+
+
+def paginate_lots_by_cursor(lots, cursor, limit=None):
+    """
+    Return the page of lots following the given cursor, and the cursor of the next page (None on the last page).
+    Pages are selected with a where clause on the sort keys instead of an offset, so deep pages are as fast as the first.
+    """
+
+    ordering = get_keyset_ordering(lots)
+    order_by = []
+    for field in ordering:
+        name = field.lstrip("-")
+        order_by.append(F(name).desc(nulls_last=True) if field.startswith("-") else F(name).asc(nulls_first=True))
+
+    cursor_fields = {f"cursor_{i}": F(field.lstrip("-")) for i, field in enumerate(ordering)}
+    lots = lots.annotate(**cursor_fields).order_by(*order_by)
+
+    if cursor:
+        try:
+            values = signing.loads(cursor, salt=LOTS_CURSOR_SALT)
+        except signing.BadSignature:
+            raise CursorError
+        if len(values) != len(ordering):
+            raise CursorError
+        lots = lots.filter(get_keyset_filter(ordering, values))
+
+    if limit is None:
+        return list(lots), None
+
+    page = list(lots[: limit + 1])
+    if len(page) <= limit:
+        return page, None
+
+    page = page[:limit]
+    last = page[-1]
+    values = [to_cursor_value(getattr(last, name)) for name in cursor_fields]
+    return page, signing.dumps(values, salt=LOTS_CURSOR_SALT)
+
+
+def to_cursor_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def get_lots_counters(lots, entity):
+    """
+    Compute every counter shown with the lots list in a single query.
+    """
+
+    lots = lots.order_by()
+    # lots filtered on an aggregate (ex: error count) can't be aggregated again with correlated subqueries
+    if lots.query.group_by is not None:
+        lots = CarbureLot.objects.filter(id__in=lots.values("id"))
+
+    errors = GenericError.objects.filter(lot=OuterRef("pk")).filter(get_lot_errors_filter(entity))
+    return lots.aggregate(
+        total=Count("id"),
+        total_errors=Count("id", filter=Q(Exists(errors))),
+        total_deadline=Count("id", filter=get_deadline_filter()),
+        max_id=Max("id"),
+    )
+
+
+def make_selection_token(entity, query, max_id):
+    """
+    Sign the filters of the current list so actions can be applied to "all the selected lots"
+    without the client having to send back every lot id.
+    Lots created after the token are not part of the selection.
+    """
+
+    params = {key: query.getlist(key) for key in query.keys() if key not in NOT_SELECTION_PARAMS}
+    return signing.dumps({"entity": entity.id, "query": params, "max_id": max_id}, salt=SELECTION_TOKEN_SALT, compress=True)
+
+
+def load_selection_token(token, entity):
+    """
+    Returns the filters and the highest lot id signed in the token, or None if the token is invalid,
+    expired or was made for another entity.
+    """
+
+    try:
+        selection = signing.loads(token, salt=SELECTION_TOKEN_SALT, max_age=SELECTION_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+    if selection["entity"] != entity.id or selection["max_id"] is None:
+        return None
+
+    query = QueryDict(mutable=True)
+    for key, values in selection["query"].items():
+        query.setlist(key, values)
+
+    return query, selection["max_id"]
+
+
+def filter_lots_by_selection_token(lots, token, entity, will_aggregate=False):
+    selection = load_selection_token(token, entity)
+    if selection is None:
+        return lots.none()
+
+    query, max_id = selection
+    return filter_lots(lots, query, entity, will_aggregate).filter(id__lte=max_id)
+
+
 def get_current_deadline():
     now = datetime.datetime.now()
     (_, last_day) = calendar.monthrange(now.year, now.month)
@@ -227,21 +395,24 @@ def get_stock_with_errors(stock, entity_id=None):
     return stock.annotate(errors=Subquery(tx_errors)).filter(errors__gt=0)
 
 
+# errors that the entity still has to look at
+def get_lot_errors_filter(entity):
+    if entity.entity_type in ADMIN_ENTITIES:
+        return Q(display_to_admin=True, acked_by_admin=False)
+    elif entity.entity_type == Entity.AUDITOR:
+        return Q(display_to_auditor=True, acked_by_auditor=False)
+    else:
+        return Q(lot__added_by=entity, display_to_creator=True, acked_by_creator=False) | Q(
+            lot__carbure_client=entity,
+            display_to_recipient=True,
+            acked_by_recipient=False,
+        )
+
+
 def get_lots_with_errors(lots, entity, will_aggregate=False):
     if will_aggregate:
         # use a subquery so we can later do aggregations on this queryset without wrecking the results
-        tx_errors = GenericError.objects.filter(lot=OuterRef("pk"))
-        if entity.entity_type in ADMIN_ENTITIES:
-            filter = Q(display_to_admin=True, acked_by_admin=False)
-        elif entity.entity_type == Entity.AUDITOR:
-            filter = Q(display_to_auditor=True, acked_by_auditor=False)
-        else:
-            filter = Q(lot__added_by=entity, display_to_creator=True, acked_by_creator=False) | Q(
-                lot__carbure_client=entity,
-                display_to_recipient=True,
-                acked_by_recipient=False,
-            )
-        tx_errors = tx_errors.filter(filter)
+        tx_errors = GenericError.objects.filter(lot=OuterRef("pk")).filter(get_lot_errors_filter(entity))
         tx_errors = tx_errors.values("lot").annotate(errors=Count("id")).values("errors")
         return lots.annotate(errors=Subquery(tx_errors)).filter(errors__gt=0)
     else:
@@ -268,13 +439,15 @@ def get_lots_with_errors(lots, entity, will_aggregate=False):
         return lots.annotate(errors=counter).filter(errors__gt=0)
 
 
-def get_lots_with_deadline(lots, deadline=get_current_deadline()):
+def get_deadline_filter(deadline=None):
+    deadline = deadline or get_current_deadline()
     affected_date = deadline - relativedelta(months=1)
     period = affected_date.year * 100 + affected_date.month
-    return lots.filter(
-        period=period,
-        lot_status__in=[CarbureLot.DRAFT, CarbureLot.REJECTED, CarbureLot.PENDING],
-    )
+    return Q(period=period, lot_status__in=[CarbureLot.DRAFT, CarbureLot.REJECTED, CarbureLot.PENDING])
+
+
+def get_lots_with_deadline(lots, deadline=None):
+    return lots.filter(get_deadline_filter(deadline))
 
 
 def filter_lots(lots, query, entity=None, will_aggregate=False, blacklist=None):
@@ -310,6 +483,10 @@ def filter_lots(lots, query, entity=None, will_aggregate=False, blacklist=None):
     if len(selection) > 0:
         return lots.filter(pk__in=selection)
 
+    selection_token = query.get("selection_token", False)
+    if selection_token:
+        return filter_lots_by_selection_token(lots, selection_token, entity, will_aggregate)
+
     if correction == "true":
         lots = lots.filter(
             Q(correction_status__in=[CarbureLot.IN_CORRECTION, CarbureLot.FIXED]) | Q(lot_status=CarbureLot.REJECTED)
@@ -409,21 +586,7 @@ def filter_lots(lots, query, entity=None, will_aggregate=False, blacklist=None):
         lots = lots.filter(supplier_certificate__in=supplier_certificate)
 
     if search and "query" not in blacklist:
-        lots = lots.filter(
-            Q(feedstock__name__icontains=search)
-            | Q(biofuel__name__icontains=search)
-            | Q(carbure_producer__name__icontains=search)
-            | Q(unknown_producer__icontains=search)
-            | Q(carbure_id__icontains=search)
-            | Q(country_of_origin__name__icontains=search)
-            | Q(carbure_client__name__icontains=search)
-            | Q(unknown_client__icontains=search)
-            | Q(carbure_delivery_site__name__icontains=search)
-            | Q(unknown_delivery_site__icontains=search)
-            | Q(free_field__icontains=search)
-            | Q(transport_document_reference__icontains=search)
-            | Q(production_site_double_counting_certificate__icontains=search)
-        )
+        lots = lots.filter(Matches("search__content", search))
 
     invalid = query.get("invalid", False)
     deadline = query.get("deadline", False)
@@ -435,12 +598,6 @@ def filter_lots(lots, query, entity=None, will_aggregate=False, blacklist=None):
     return lots
 
 
-def count_lots_of_interest(lots, entity):
-    error_lots = get_lots_with_errors(lots, entity)
-    deadline_lots = get_lots_with_deadline(lots)
-    return error_lots.count(), deadline_lots.count()
-
-
 def sort_lots(lots, query):
     sort_by = query.get("sort_by", False)
     order = query.get("order", False)
@@ -473,179 +630,9 @@ def sort_lots(lots, query):
     return lots
 
 
-def prepare_filters(filter_list):
-    return sorted({i for i in filter_list if i is not None})
-
-
 UNKNOWN_VALUE = "UNKNOWN"
 
 
-def get_lots_filters_data(lots, query, entity, field):
-    lots = filter_lots(lots, query, entity, blacklist=[field])
-
-    if field == "feedstocks":
-        lot_feedstocks = lots.values("feedstock__id").distinct()
-        feedstocks = MatierePremiere.biofuel.filter(id__in=lot_feedstocks)
-        return prepare_filters(feedstocks.values_list("code", flat=True))
-
-    if field == "biofuels":
-        lot_biofuels = lots.values("biofuel__id").distinct()
-        biofuels = Biocarburant.objects.filter(id__in=lot_biofuels).values_list("code", flat=True)
-        return prepare_filters(biofuels)
-
-    if field == "countries_of_origin":
-        lot_countries = lots.values("country_of_origin").distinct()
-        countries = Pays.objects.filter(id__in=lot_countries).values_list("code_pays", flat=True)
-        return prepare_filters(countries)
-
-    if field == "periods":
-        periods = lots.values_list("period", flat=True).distinct()
-        return prepare_filters(periods)
-
-    if field == "errors":
-        generic_errors = lots.values_list("genericerror__error", flat=True).exclude(genericerror__error=None).distinct()
-        return prepare_filters(generic_errors)
-
-    if field == "added_by":
-        added_by = lots.values_list("added_by__name", flat=True).distinct()
-        return prepare_filters(added_by)
-
-    if field == "delivery_types":
-        delivery_types = lots.values_list("delivery_type", flat=True).distinct()
-        return prepare_filters(delivery_types)
-
-    if field == "lot_status":
-        lot_status = lots.values_list("lot_status", flat=True).distinct()
-        return prepare_filters(lot_status)
-
-    if field == "production_sites":
-        production_sites = []
-        for item in (
-            lots.annotate(production_site=Coalesce("carbure_production_site__name", "unknown_production_site"))
-            .values("production_site")
-            .distinct()
-        ):
-            production_sites.append(item["production_site"] or UNKNOWN_VALUE)
-        return prepare_filters(production_sites)
-
-    if field == "delivery_sites":
-        delivery_sites = []
-        for item in (
-            lots.annotate(delivery_site=Coalesce("carbure_delivery_site__name", "unknown_delivery_site"))
-            .values("delivery_site")
-            .distinct()
-        ):
-            delivery_sites.append(item["delivery_site"] or UNKNOWN_VALUE)
-        return prepare_filters(delivery_sites)
-
-    if field == "suppliers":
-        suppliers = []
-        for item in (
-            lots.annotate(supplier=Coalesce("carbure_supplier__name", "unknown_supplier")).values("supplier").distinct()
-        ):
-            suppliers.append(item["supplier"] or UNKNOWN_VALUE)
-        return prepare_filters(suppliers)
-
-    if field == "clients":
-        clients = []
-        for item in lots.annotate(client=Coalesce("carbure_client__name", "unknown_client")).values("client").distinct():
-            clients.append(item["client"] or UNKNOWN_VALUE)
-        return prepare_filters(clients)
-
-    if field == "client_types":
-        client_types = []
-        for item in lots.values("carbure_client__entity_type").distinct():
-            client_types.append(item["carbure_client__entity_type"] or Entity.UNKNOWN)
-        return prepare_filters(client_types)
-
-    if field == "scores":
-        scores = lots.values_list("data_reliability_score", flat=True).distinct()
-        return prepare_filters(scores)
-
-    if field == "correction_status":
-        corrections = lots.values_list("correction_status", flat=True).distinct()
-        return prepare_filters(corrections)
-
-    if field == "conformity":
-        conformities = lots.values_list("audit_status", flat=True).distinct()
-        return prepare_filters(conformities)
-
-    if field == "ml_scoring":
-        return prepare_filters(["KO", "OK"])
-
-    if field == "certificate_id":
-        certificate_ids = (
-            lots.exclude(production_site_double_counting_certificate="")
-            .values_list("production_site_double_counting_certificate", flat=True)
-            .distinct()
-        )
-        return prepare_filters(certificate_ids)
-
-    if field == "supplier_certificate":
-        supplier_certificates = (
-            lots.exclude(supplier_certificate="").values_list("supplier_certificate", flat=True).distinct()
-        )
-        return prepare_filters(supplier_certificates)
-
-
-def get_stock_filters_data(stock, query, field):
-    stock = filter_stock(stock, query, blacklist=[field])
-
-    if field == "feedstocks":
-        stock_feedstocks = stock.values("feedstock__id").distinct()
-        feedstocks = MatierePremiere.biofuel.filter(id__in=stock_feedstocks).values_list("code", flat=True)
-        return prepare_filters(feedstocks)
-
-    if field == "biofuels":
-        stock_biofuels = stock.values("biofuel__id").distinct()
-        biofuels = Biocarburant.objects.filter(id__in=stock_biofuels).values_list("code")
-        return prepare_filters(biofuels)
-
-    if field == "countries_of_origin":
-        stock_countries = stock.values("country_of_origin").distinct()
-        countries = Pays.objects.filter(id__in=stock_countries).values_list("code_pays", flat=True)
-        return prepare_filters(countries)
-
-    if field == "periods":
-        set1 = stock.filter(parent_lot__isnull=False).values("parent_lot__period").distinct()
-        set2 = (
-            stock.filter(parent_transformation__isnull=False)
-            .values("parent_transformation__source_stock__parent_lot__period")
-            .distinct()
-        )
-        periods = [s["parent_lot__period"] for s in set1] + [
-            s["parent_transformation__source_stock__parent_lot__period"] for s in set2
-        ]
-        return prepare_filters(periods)
-
-    if field == "depots":
-        stock_depots = stock.values("depot__id").distinct()
-        depots = Depot.objects.filter(id__in=stock_depots).values_list("name", flat=True)
-        return prepare_filters(depots)
-
-    if field == "clients":
-        clients = stock.filter(carbure_client__isnull=False).values_list("carbure_client__name", flat=True).distinct()
-        return prepare_filters(clients)
-
-    if field == "suppliers":
-        suppliers = []
-        for item in stock.values("carbure_supplier__name", "unknown_supplier").distinct():
-            if item["carbure_supplier__name"] not in ("", None):
-                suppliers.append(item["carbure_supplier__name"])
-            elif item["unknown_supplier"] not in ("", None):
-                suppliers.append(item["unknown_supplier"])
-        return prepare_filters(suppliers)
-
-    if field == "production_sites":
-        production_sites = []
-        for item in stock.values("carbure_production_site__name", "unknown_production_site").distinct():
-            if item["carbure_production_site__name"] not in ("", None):
-                production_sites.append(item["carbure_production_site__name"])
-            elif item["unknown_production_site"] not in ("", None):
-                production_sites.append(item["unknown_production_site"])
-        return prepare_filters(production_sites)
-
-
 def get_stock_with_metadata(stock, query):
     export = query.get("export", False)
     limit = query.get("limit", None)
@@ -676,12 +663,7 @@ def get_stock_with_metadata(stock, query):
         return JsonResponse({"status": "success", "data": data})
     else:
         file_location = export_carbure_stock(returned)
-        with open(file_location, "rb") as excel:
-            data = excel.read()
-            ctype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            response = HttpResponse(content=data, content_type=ctype)
-            response["Content-Disposition"] = 'attachment; filename="%s"' % (file_location)
-        return response
+        return stream_excel_file(file_location, "carbure_stock")
 
 
 def filter_stock(stock, query, blacklist=None):
@@ -724,15 +706,7 @@ def filter_stock(stock, query, blacklist=None):
     if len(clients):
         stock = stock.filter(carbure_client__name__in=clients)
     if search and "query" not in blacklist:
-        stock = stock.filter(
-            Q(feedstock__name__icontains=search)
-            | Q(biofuel__name__icontains=search)
-            | Q(carbure_id__icontains=search)
-            | Q(country_of_origin__name__icontains=search)
-            | Q(depot__name__icontains=search)
-            | Q(parent_lot__free_field__icontains=search)
-            | Q(parent_lot__transport_document_reference__icontains=search)
-        )
+        stock = stock.filter(Matches("search__content", search))
     return stock
 
 
@@ -778,22 +752,8 @@ def get_lot_errors(lot, entity=None):
         return GenericErrorSerializer(errors, many=True, read_only=True).data
 
 
-def get_lots_errors(lots, entity):
-    lot_ids = list(lots.values_list("id", flat=True))
-    errors = GenericError.objects.filter(lot_id__in=lot_ids)
-    if entity.entity_type in ADMIN_ENTITIES:
-        errors = errors.filter(display_to_admin=True, acked_by_admin=False)
-    elif entity.entity_type == Entity.AUDITOR:
-        errors = errors.filter(display_to_auditor=True, acked_by_auditor=False)
-    else:
-        errors = errors.filter(
-            Q(lot__added_by=entity, display_to_creator=True, acked_by_creator=False)
-            | Q(
-                lot__carbure_client=entity,
-                display_to_recipient=True,
-                acked_by_recipient=False,
-            )
-        )
+def get_lots_errors(lot_ids, entity):
+    errors = GenericError.objects.filter(lot_id__in=lot_ids).filter(get_lot_errors_filter(entity))
     data = {}
     for error in errors.values("lot_id", "error", "is_blocking", "field", "value", "extra", "fields"):
         if error["lot_id"] not in data:
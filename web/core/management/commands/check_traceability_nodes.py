@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.traceability.closure import check_nodes
+
+
+class Command(BaseCommand):
+    help = "Check that the traceability nodes table matches the parents of lots, stocks, transformations and SAF tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Repair the rows that are missing, wrong or stale")
+
+    def handle(self, *args, **options):
+        missing, wrong, stale = check_nodes(fix=options["fix"])
+        self.stdout.write(f"Traceability nodes: {missing} missing, {wrong} wrong, {stale} stale")
+        if options["fix"] and missing + wrong + stale > 0:
+            self.stdout.write("All rows were repaired")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-entity lot counters from the lots and stocks tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entity", type=int, action="append", help="Only rebuild the counters of this entity")
+
+    def handle(self, *args, **options):
+        wrong_counters = rebuild_counters(options["entity"])
+        self.stdout.write(f"Lot counters rebuilt, {wrong_counters} were out of sync")
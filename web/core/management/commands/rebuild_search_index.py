@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.search import rebuild_search
+
+
+class Command(BaseCommand):
+    help = "Recompute the text searched by the lots and stocks query filter"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Number of rows indexed per transaction")
+
+    def handle(self, *args, **options):
+        lots, stocks = rebuild_search(options["batch_size"])
+        self.stdout.write(f"Search index rebuilt for {lots} lots and {stocks} stocks")
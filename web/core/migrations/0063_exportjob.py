@@ -0,0 +1,66 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0062_remove_entitydepot_depot_remove_entitydepot_blender_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportJob",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("LOTS", "LOTS"),
+                            ("SAF_TICKETS", "SAF_TICKETS"),
+                            ("SAF_TICKET_SOURCES", "SAF_TICKET_SOURCES"),
+                            ("TIRUERT_OPERATIONS", "TIRUERT_OPERATIONS"),
+                            ("ELEC_TRANSFER_CERTIFICATES", "ELEC_TRANSFER_CERTIFICATES"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PENDING", "PENDING"), ("RUNNING", "RUNNING"), ("DONE", "DONE"), ("FAILED", "FAILED")],
+                        default="PENDING",
+                        max_length=16,
+                    ),
+                ),
+                ("query", models.JSONField(default=dict)),
+                ("query_hash", models.CharField(max_length=64)),
+                ("total_rows", models.IntegerField(default=0)),
+                ("processed_rows", models.IntegerField(default=0)),
+                ("file_path", models.CharField(blank=True, default="", max_length=255)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                ("entity", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.entity")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Export Job",
+                "verbose_name_plural": "Export Jobs",
+                "db_table": "carbure_export_jobs",
+                "indexes": [
+                    models.Index(fields=["entity", "status"], name="carbure_exp_entity__98e9f2_idx"),
+                    models.Index(fields=["entity", "query_hash"], name="carbure_exp_entity__eefd1e_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0063_exportjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CarbureLotCounter",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("year", models.IntegerField()),
+                (
+                    "bucket",
+                    models.CharField(
+                        choices=[
+                            ("draft", "draft"),
+                            ("draft_stocks", "draft_stocks"),
+                            ("in_total", "in_total"),
+                            ("in_pending", "in_pending"),
+                            ("in_tofix", "in_tofix"),
+                            ("out_total", "out_total"),
+                            ("out_pending", "out_pending"),
+                            ("out_tofix", "out_tofix"),
+                            ("stock", "stock"),
+                            ("stock_total", "stock_total"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                ("entity", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.entity")),
+            ],
+            options={
+                "verbose_name": "Lot Counter",
+                "verbose_name_plural": "Lot Counters",
+                "db_table": "carbure_lot_counters",
+                "unique_together": {("entity", "year", "bucket")},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0064_carburelotcounter"),
+        ("transactions", "0018_alter_site_site_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="carburelot",
+            name="import_batch",
+            field=models.CharField(blank=True, default=None, max_length=32, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="carburelot",
+            index=models.Index(fields=["import_batch"], name="carbure_lot_import__d642ad_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0065_carburelot_import_batch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CarbureLotSearch",
+            fields=[
+                (
+                    "lot",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="core.carburelot",
+                    ),
+                ),
+                ("content", models.TextField(default="")),
+            ],
+            options={
+                "verbose_name": "Lot Search",
+                "verbose_name_plural": "Lots Search",
+                "db_table": "carbure_lots_search",
+            },
+        ),
+        migrations.CreateModel(
+            name="CarbureStockSearch",
+            fields=[
+                (
+                    "stock",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="core.carburestock",
+                    ),
+                ),
+                ("content", models.TextField(default="")),
+            ],
+            options={
+                "verbose_name": "Stock Search",
+                "verbose_name_plural": "Stocks Search",
+                "db_table": "carbure_stock_search",
+            },
+        ),
+        migrations.RunSQL(
+            sql=[
+                # stopwords would drop every n-gram containing one of them, so the indexes are created without any
+                "SET SESSION innodb_ft_enable_stopword = OFF;",
+                "CREATE FULLTEXT INDEX carbure_lots_search_content ON carbure_lots_search (content) WITH PARSER ngram;",
+                "CREATE FULLTEXT INDEX carbure_stock_search_content ON carbure_stock_search (content) WITH PARSER ngram;",
+            ],
+            reverse_sql=[
+                "DROP INDEX carbure_lots_search_content ON carbure_lots_search;",
+                "DROP INDEX carbure_stock_search_content ON carbure_stock_search;",
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0066_search_tables"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CarbureTraceabilityNode",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "node_type",
+                    models.CharField(
+                        choices=[
+                            ("LOT", "LOT"),
+                            ("STOCK", "STOCK"),
+                            ("STOCK_TRANSFORM", "STOCK_TRANSFORM"),
+                            ("TICKET_SOURCE", "TICKET_SOURCE"),
+                            ("TICKET", "TICKET"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("node_id", models.IntegerField()),
+                (
+                    "parent_type",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("LOT", "LOT"),
+                            ("STOCK", "STOCK"),
+                            ("STOCK_TRANSFORM", "STOCK_TRANSFORM"),
+                            ("TICKET_SOURCE", "TICKET_SOURCE"),
+                            ("TICKET", "TICKET"),
+                        ],
+                        default=None,
+                        max_length=16,
+                        null=True,
+                    ),
+                ),
+                ("parent_id", models.IntegerField(blank=True, default=None, null=True)),
+                ("family", models.BigIntegerField(db_index=True)),
+                ("depth", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Traceability Node",
+                "verbose_name_plural": "Traceability Nodes",
+                "db_table": "carbure_traceability_nodes",
+                "indexes": [models.Index(fields=["parent_type", "parent_id"], name="carbure_tra_parent__c54ab1_idx")],
+                "unique_together": {("node_type", "node_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+from core.traceability.closure import check_nodes
+
+
+def fill_traceability_nodes(apps, schema_editor):
+    check_nodes(fix=True, apps=apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0067_carburetraceabilitynode"),
+        ("saf", "0032_alter_saflogistics_shipping_method_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_traceability_nodes, reverse_code=migrations.RunPython.noop),
+    ]
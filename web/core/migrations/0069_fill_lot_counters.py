@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core.counters import rebuild_counters
+
+
+def fill_lot_counters(apps, schema_editor):
+    rebuild_counters(apps=apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0068_fill_traceability_nodes"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_lot_counters, reverse_code=migrations.RunPython.noop),
+    ]
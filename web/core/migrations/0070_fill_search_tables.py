@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core.search import rebuild_search
+
+
+def fill_search_tables(apps, schema_editor):
+    rebuild_search(apps=apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0069_fill_lot_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_tables, reverse_code=migrations.RunPython.noop),
+    ]
@@ -592,6 +592,9 @@ class CarbureLot(models.Model):
     carbure_id = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    # lots created by the same import share this id, so they can be read again after a bulk insert
+    import_batch = models.CharField(max_length=32, null=True, blank=True, default=None)
+
     # UDB
     udb_transaction_id = models.CharField(max_length=64, blank=True)
 
@@ -783,6 +786,7 @@ class CarbureLot(models.Model):
             models.Index(fields=["year", "period", "carbure_supplier"]),
             models.Index(fields=["parent_lot"]),
             models.Index(fields=["parent_stock"]),
+            models.Index(fields=["import_batch"]),
         ]
         verbose_name = "CarbureLot"
         verbose_name_plural = "CarbureLots"
@@ -1399,3 +1403,163 @@ class CarbureNotification(models.Model):
         ]
         verbose_name = "CarbureNotification"
         verbose_name_plural = "CarbureNotifications"
+
+
+class ExportJob(models.Model):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+    EXPORT_STATUSES = [
+        (PENDING, PENDING),
+        (RUNNING, RUNNING),
+        (DONE, DONE),
+        (FAILED, FAILED),
+    ]
+
+    LOTS = "LOTS"
+    SAF_TICKETS = "SAF_TICKETS"
+    SAF_TICKET_SOURCES = "SAF_TICKET_SOURCES"
+    TIRUERT_OPERATIONS = "TIRUERT_OPERATIONS"
+    ELEC_TRANSFER_CERTIFICATES = "ELEC_TRANSFER_CERTIFICATES"
+
+    EXPORT_TYPES = [
+        (LOTS, LOTS),
+        (SAF_TICKETS, SAF_TICKETS),
+        (SAF_TICKET_SOURCES, SAF_TICKET_SOURCES),
+        (TIRUERT_OPERATIONS, TIRUERT_OPERATIONS),
+        (ELEC_TRANSFER_CERTIFICATES, ELEC_TRANSFER_CERTIFICATES),
+    ]
+
+    entity = models.ForeignKey(Entity, on_delete=models.CASCADE)
+    user = models.ForeignKey(usermodel, null=True, blank=True, on_delete=models.SET_NULL)
+    type = models.CharField(max_length=32, choices=EXPORT_TYPES)
+    status = models.CharField(max_length=16, choices=EXPORT_STATUSES, default=PENDING)
+    query = models.JSONField(default=dict)
+    query_hash = models.CharField(max_length=64)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "carbure_export_jobs"
+        indexes = [
+            models.Index(fields=["entity", "status"]),
+            models.Index(fields=["entity", "query_hash"]),
+        ]
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+
+
+class CarbureLotCounter(models.Model):
+    """
+    Number of lots and stocks of an entity in each listing bucket, kept up to date by core.counters
+    so the snapshot and navigation endpoints don't have to count them on every page load.
+    """
+
+    DRAFT = "draft"
+    DRAFT_STOCKS = "draft_stocks"
+    IN_TOTAL = "in_total"
+    IN_PENDING = "in_pending"
+    IN_TOFIX = "in_tofix"
+    OUT_TOTAL = "out_total"
+    OUT_PENDING = "out_pending"
+    OUT_TOFIX = "out_tofix"
+    STOCK = "stock"
+    STOCK_TOTAL = "stock_total"
+
+    BUCKETS = [
+        (DRAFT, DRAFT),
+        (DRAFT_STOCKS, DRAFT_STOCKS),
+        (IN_TOTAL, IN_TOTAL),
+        (IN_PENDING, IN_PENDING),
+        (IN_TOFIX, IN_TOFIX),
+        (OUT_TOTAL, OUT_TOTAL),
+        (OUT_PENDING, OUT_PENDING),
+        (OUT_TOFIX, OUT_TOFIX),
+        (STOCK, STOCK),
+        (STOCK_TOTAL, STOCK_TOTAL),
+    ]
+
+    # stocks don't belong to a year, their buckets are stored with this one
+    NO_YEAR = 0
+
+    entity = models.ForeignKey(Entity, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    bucket = models.CharField(max_length=32, choices=BUCKETS)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "carbure_lot_counters"
+        unique_together = ("entity", "year", "bucket")
+        verbose_name = "Lot Counter"
+        verbose_name_plural = "Lot Counters"
+
+
+class CarbureLotSearch(models.Model):
+    """
+    Lowercased text matched by the "query" filter of the lots list, kept up to date by core.search
+    and covered by a fulltext index on mysql.
+    """
+
+    lot = models.OneToOneField(CarbureLot, primary_key=True, on_delete=models.CASCADE, related_name="search")
+    content = models.TextField(default="")
+
+    class Meta:
+        db_table = "carbure_lots_search"
+        verbose_name = "Lot Search"
+        verbose_name_plural = "Lots Search"
+
+
+class CarbureStockSearch(models.Model):
+    """
+    Same as CarbureLotSearch for the stocks list.
+    """
+
+    stock = models.OneToOneField(CarbureStock, primary_key=True, on_delete=models.CASCADE, related_name="search")
+    content = models.TextField(default="")
+
+    class Meta:
+        db_table = "carbure_stock_search"
+        verbose_name = "Stock Search"
+        verbose_name_plural = "Stocks Search"
+
+
+class CarbureTraceabilityNode(models.Model):
+    """
+    Position of a lot, stock, stock transformation, SAF ticket source or SAF ticket in its traceability tree,
+    kept up to date by core.traceability.closure so a whole family can be read with a single indexed lookup.
+    """
+
+    LOT = "LOT"
+    STOCK = "STOCK"
+    STOCK_TRANSFORM = "STOCK_TRANSFORM"
+    TICKET_SOURCE = "TICKET_SOURCE"
+    TICKET = "TICKET"
+
+    NODE_TYPES = [
+        (LOT, LOT),
+        (STOCK, STOCK),
+        (STOCK_TRANSFORM, STOCK_TRANSFORM),
+        (TICKET_SOURCE, TICKET_SOURCE),
+        (TICKET, TICKET),
+    ]
+
+    node_type = models.CharField(max_length=16, choices=NODE_TYPES)
+    node_id = models.IntegerField()
+    parent_type = models.CharField(max_length=16, choices=NODE_TYPES, null=True, blank=True, default=None)
+    parent_id = models.IntegerField(null=True, blank=True, default=None)
+    # key of the root node of the tree, shared by all the nodes of the family
+    family = models.BigIntegerField(db_index=True)
+    depth = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "carbure_traceability_nodes"
+        unique_together = ("node_type", "node_id")
+        indexes = [models.Index(fields=["parent_type", "parent_id"])]
+        verbose_name = "Traceability Node"
+        verbose_name_plural = "Traceability Nodes"
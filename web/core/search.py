@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models import BooleanField, Func
+from django.db.models.signals import post_save
+
+from core.models import CarbureLot, CarbureLotSearch, CarbureStock, CarbureStockSearch
+
+# columns whose values can be found with the "query" filter
+LOT_SEARCH_FIELDS = [
+    "carbure_id",
+    "transport_document_reference",
+    "free_field",
+    "production_site_double_counting_certificate",
+    "feedstock__name",
+    "biofuel__name",
+    "country_of_origin__name",
+    "carbure_producer__name",
+    "unknown_producer",
+    "carbure_supplier__name",
+    "unknown_supplier",
+    "carbure_client__name",
+    "unknown_client",
+    "carbure_delivery_site__name",
+    "unknown_delivery_site",
+]
+
+STOCK_SEARCH_FIELDS = [
+    "carbure_id",
+    "feedstock__name",
+    "biofuel__name",
+    "country_of_origin__name",
+    "depot__name",
+    "parent_lot__free_field",
+    "parent_lot__transport_document_reference",
+]
+
+# size of the tokens of the mysql ngram parser (ngram_token_size server option)
+NGRAM_TOKEN_SIZE = 2
+
+BATCH_SIZE = 1000
+
+
+def make_content(row, fields):
+    # one value per line so a search never matches across two columns
+    return "\n".join(str(row[field]).lower() for field in fields if row[field])
+
+
+def refresh_search(model, search_model, key, fields, ids):
+    ids = [id for id in ids if id is not None]
+    for i in range(0, len(ids), BATCH_SIZE):
+        rows = model.objects.filter(id__in=ids[i : i + BATCH_SIZE]).values("id", *fields)
+        entries = [search_model(**{key: row["id"], "content": make_content(row, fields)}) for row in rows]
+        search_model.objects.bulk_create(entries, update_conflicts=True, unique_fields=[key], update_fields=["content"])
+
+
+def refresh_lot_search(lot_ids):
+    """
+    Recompute the searched text of the given lots, and of the stocks created from them.
+    Must be called after lots are written with bulk_create, update or bulk_update, which don't send signals.
+    """
+
+    lot_ids = list(lot_ids)
+    refresh_search(CarbureLot, CarbureLotSearch, "lot_id", LOT_SEARCH_FIELDS, lot_ids)
+    stock_ids = CarbureStock.objects.filter(parent_lot_id__in=lot_ids).values_list("id", flat=True)
+    refresh_search(CarbureStock, CarbureStockSearch, "stock_id", STOCK_SEARCH_FIELDS, list(stock_ids))
+
+
+def refresh_stock_search(stock_ids):
+    """
+    Recompute the searched text of the given stocks.
+    """
+
+    refresh_search(CarbureStock, CarbureStockSearch, "stock_id", STOCK_SEARCH_FIELDS, list(stock_ids))
+
+
+def on_lot_save(sender, instance, **kwargs):
+    refresh_lot_search([instance.pk])
+
+
+def on_stock_save(sender, instance, **kwargs):
+    refresh_stock_search([instance.pk])
+
+
+def connect_signals():
+    post_save.connect(on_lot_save, sender=CarbureLot, dispatch_uid="search_lot_save")
+    post_save.connect(on_stock_save, sender=CarbureStock, dispatch_uid="search_stock_save")
+
+
+def rebuild_search(batch_size=10000, apps=None):
+    """
+    Recompute the searched text of every lot and stock, for example after entities or depots were renamed.
+    The models are read from `apps` when given, so migrations can fill the tables with their historical models.
+    Returns the number of lots and stocks indexed.
+    """
+
+    if apps is None:
+        lot_model, lot_search_model = CarbureLot, CarbureLotSearch
+        stock_model, stock_search_model = CarbureStock, CarbureStockSearch
+    else:
+        lot_model, lot_search_model = apps.get_model("core", "CarbureLot"), apps.get_model("core", "CarbureLotSearch")
+        stock_model = apps.get_model("core", "CarbureStock")
+        stock_search_model = apps.get_model("core", "CarbureStockSearch")
+
+    counts = []
+    for model, search_model, key, fields in (
+        (lot_model, lot_search_model, "lot_id", LOT_SEARCH_FIELDS),
+        (stock_model, stock_search_model, "stock_id", STOCK_SEARCH_FIELDS),
+    ):
+        ids = list(model.objects.order_by("id").values_list("id", flat=True))
+        for i in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                refresh_search(model, search_model, key, fields, ids[i : i + batch_size])
+        counts.append(len(ids))
+    return tuple(counts)
+
+
+class Matches(Func):
+    """
+    Condition true when the searched text of a lot or stock contains the given string.
+    On mysql, it goes through the fulltext index by searching the string as a phrase of n-grams.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, expression, search):
+        super().__init__(expression)
+        self.search = search.lower()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.get_source_expressions()[0])
+        pattern = "%%%s%%" % connection.ops.prep_for_like_query(self.search)
+        return f"{sql} LIKE %s ESCAPE '\\'", [*params, pattern]
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.get_source_expressions()[0])
+        # strings shorter than a token can't be looked up in the index
+        if len(self.search) < NGRAM_TOKEN_SIZE:
+            pattern = "%%%s%%" % connection.ops.prep_for_like_query(self.search)
+            return f"{sql} LIKE %s", [*params, pattern]
+        phrase = '"%s"' % self.search.replace('"', " ")
+        return f"MATCH ({sql}) AGAINST (%s IN BOOLEAN MODE)", [*params, phrase]
@@ -2,6 +2,7 @@ from django.utils.translation import gettext_lazy as _
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from core import private_storage
 from core.models import (
     Biocarburant,
     CarbureLot,
@@ -13,6 +14,7 @@ from core.models import (
     CarbureStockTransformation,
     Entity,
     EntityCertificate,
+    ExportJob,
     ExternalAdminRights,
     GenericCertificate,
     GenericError,
@@ -820,3 +822,18 @@ def check_fields_required(attrs, fields, _error_message=None):
             errors[field] = error_message
     if errors:
         raise serializers.ValidationError(errors)
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ["id", "type", "status", "total_rows", "processed_rows", "created_at", "finished_at", "download_url"]
+
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_download_url(self, obj):
+        # the private storage gives signed urls with a limited lifetime, so a new one is generated at each call
+        if obj.status == ExportJob.DONE and obj.file_path:
+            return private_storage.url(obj.file_path)
+        return None
@@ -0,0 +1,20 @@
+from django.db.models import Q
+
+
+# copy of the query filter used before the search index, kept as a reference point
+def search_lots_legacy(lots, search):
+    return lots.filter(
+        Q(feedstock__name__icontains=search)
+        | Q(biofuel__name__icontains=search)
+        | Q(carbure_producer__name__icontains=search)
+        | Q(unknown_producer__icontains=search)
+        | Q(carbure_id__icontains=search)
+        | Q(country_of_origin__name__icontains=search)
+        | Q(carbure_client__name__icontains=search)
+        | Q(unknown_client__icontains=search)
+        | Q(carbure_delivery_site__name__icontains=search)
+        | Q(unknown_delivery_site__icontains=search)
+        | Q(free_field__icontains=search)
+        | Q(transport_document_reference__icontains=search)
+        | Q(production_site_double_counting_certificate__icontains=search)
+    )
@@ -0,0 +1,79 @@
+from datetime import date
+from decimal import Decimal
+
+from django import forms
+from django.test import TestCase
+
+from core.columnar_validator import ColumnarValidator
+from core.models import Entity
+from core.utils import Validator
+
+
+class SampleValidator(ColumnarValidator):
+    name = forms.CharField(max_length=8)
+    quantity = forms.FloatField(required=False, min_value=0)
+    ratio = forms.DecimalField(required=False)
+    day = forms.DateField(required=False, input_formats=Validator.DATE_FORMATS)
+    kind = forms.ChoiceField(required=False, choices=[("A", "a"), ("B", "b")])
+    entity = forms.ModelChoiceField(queryset=Entity.objects.all(), required=False)
+    enabled = forms.BooleanField(required=False)
+
+    def validate_frame(self, data):
+        self.add_error(data["kind"] == "B", "kind", "B is not allowed")
+
+
+class SampleFormValidator(Validator):
+    name = forms.CharField(max_length=8)
+    quantity = forms.FloatField(required=False, min_value=0)
+    ratio = forms.DecimalField(required=False)
+    day = forms.DateField(required=False, input_formats=Validator.DATE_FORMATS)
+    kind = forms.ChoiceField(required=False, choices=[("A", "a"), ("B", "b")])
+    entity = forms.ModelChoiceField(queryset=Entity.objects.all(), required=False)
+    enabled = forms.BooleanField(required=False)
+
+    def validate(self, data):
+        if data.get("kind") == "B":
+            self.add_error("kind", "B is not allowed")
+
+
+class ColumnarValidatorTest(TestCase):
+    def setUp(self):
+        self.entity = Entity.objects.create(name="Entity", entity_type=Entity.OPERATOR)
+        self.items = [
+            {
+                "name": " ok ",
+                "quantity": "1.5",
+                "ratio": "0.1",
+                "day": "2024-01-31",
+                "kind": "A",
+                "entity": str(self.entity.id),
+            },
+            {"name": "too long name", "quantity": "-1", "ratio": "x", "day": "31/02/2024", "kind": "C", "entity": "0"},
+            {"name": "", "quantity": None, "ratio": None, "day": None, "kind": "", "entity": None, "enabled": "0"},
+            {"name": "b", "quantity": 2, "ratio": 0.5, "day": "31/01/2024", "kind": "B", "entity": self.entity.id},
+            {"name": "nan", "quantity": float("nan"), "ratio": "inf", "day": "2024-01-31 10:00:00", "kind": None},
+        ]
+        for line, item in enumerate(self.items):
+            item["line"] = line + 1
+
+    def test_same_results_as_one_form_per_row(self):
+        valid_items, errors = SampleValidator.bulk_validate([dict(item) for item in self.items])
+        expected_items, expected_errors = SampleFormValidator.bulk_validate([dict(item) for item in self.items])
+
+        self.assertEqual(valid_items, expected_items)
+        self.assertEqual(
+            [(error["line"], error["meta"].get_json_data()) for error in errors],
+            [(error["line"], error["meta"].get_json_data()) for error in expected_errors],
+        )
+        self.assertEqual(valid_items[0]["name"], "ok")
+        self.assertEqual(valid_items[0]["ratio"], Decimal("0.1"))
+        self.assertEqual(valid_items[0]["day"], date(2024, 1, 31))
+        self.assertEqual(valid_items[0]["entity"], self.entity)
+        self.assertEqual([error["line"] for error in errors], [2, 3, 4, 5])
+
+    def test_foreign_keys_are_resolved_with_one_query(self):
+        items = [{"name": "a", "entity": str(self.entity.id), "line": i} for i in range(100)]
+        with self.assertNumQueries(1):
+            valid_items, errors = SampleValidator.bulk_validate(items)
+        self.assertEqual(errors, [])
+        self.assertTrue(all(item["entity"] == self.entity for item in valid_items))
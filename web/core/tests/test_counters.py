@@ -0,0 +1,150 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.counters import get_entity_counters, rebuild_counters, track_counters
+from core.models import CarbureLot, CarbureLotCounter, CarbureStock, Entity, UserRights
+from core.tests_utils import setup_current_user
+from transactions.factories import CarbureLotFactory, CarbureStockFactory
+
+
+class CarbureLotCountersTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.other = Entity.objects.filter(entity_type=Entity.OPERATOR).last()
+
+        for status in [CarbureLot.DRAFT, CarbureLot.PENDING, CarbureLot.ACCEPTED, CarbureLot.DELETED]:
+            CarbureLotFactory.create_batch(5, lot_status=status, added_by=self.entity, carbure_supplier=self.entity)
+            CarbureLotFactory.create_batch(5, lot_status=status, added_by=self.other, carbure_client=self.entity)
+        CarbureLotFactory.create_batch(3, lot_status=CarbureLot.REJECTED, correction_status=CarbureLot.IN_CORRECTION)
+        CarbureStockFactory.create_batch(4, carbure_client=self.entity)
+        CarbureStockFactory.create_batch(2, carbure_client=self.entity, remaining_volume=0)
+
+    def assert_counters_in_sync(self):
+        # rebuilding returns the number of counters that had drifted
+        self.assertEqual(rebuild_counters(), 0)
+
+    def test_created_objects_are_counted(self):
+        self.assert_counters_in_sync()
+
+        counters = get_entity_counters(self.entity.id)
+        self.assertEqual(counters[CarbureLotCounter.DRAFT], 5)
+        self.assertEqual(counters[CarbureLotCounter.IN_PENDING], 5)
+        self.assertGreaterEqual(counters[CarbureLotCounter.STOCK], 4)
+        self.assertGreaterEqual(counters[CarbureLotCounter.STOCK_TOTAL], 6)
+
+    def test_save_and_delete(self):
+        lot = CarbureLot.objects.filter(added_by=self.entity, lot_status=CarbureLot.DRAFT).first()
+        lot.lot_status = CarbureLot.PENDING
+        lot.save()
+
+        lot = CarbureLot.objects.filter(carbure_client=self.entity, lot_status=CarbureLot.PENDING).first()
+        lot.correction_status = CarbureLot.IN_CORRECTION
+        lot.save(update_fields=["correction_status"])
+
+        # instances loaded with deferred fields read their previous state before being saved
+        lot = CarbureLot.objects.only("id").filter(carbure_client=self.entity, lot_status=CarbureLot.ACCEPTED).first()
+        lot.carbure_client = self.other
+        lot.save()
+
+        stock = CarbureStock.objects.filter(carbure_client=self.entity, remaining_volume__gt=0).first()
+        stock.remaining_volume = 0
+        stock.save()
+
+        CarbureLot.objects.filter(lot_status=CarbureLot.DRAFT).first().delete()
+        CarbureStock.objects.filter(carbure_client=self.entity).last().delete()
+
+        self.assert_counters_in_sync()
+
+    def test_bulk_changes_are_tracked(self):
+        lots = CarbureLot.objects.filter(carbure_client=self.entity, lot_status=CarbureLot.PENDING)
+        stocks = CarbureStock.objects.filter(carbure_client=self.entity)
+
+        with track_counters(lots=lots, stocks=stocks):
+            lots.update(lot_status=CarbureLot.ACCEPTED, correction_status=CarbureLot.IN_CORRECTION)
+            stocks.update(remaining_volume=0)
+
+        self.assert_counters_in_sync()
+        self.assertEqual(get_entity_counters(self.entity.id)[CarbureLotCounter.IN_PENDING], 0)
+        self.assertEqual(get_entity_counters(self.entity.id)[CarbureLotCounter.STOCK], 0)
+
+    def test_bulk_create_and_nested_blocks(self):
+        new_lots = CarbureLotFactory.build_batch(4, lot_status=CarbureLot.DRAFT, added_by=self.entity)
+        drafts = CarbureLot.objects.filter(added_by=self.entity, lot_status=CarbureLot.DRAFT)
+
+        with track_counters() as counters:
+            CarbureLot.objects.bulk_create(new_lots)
+            counters.add_created_lots(new_lots)
+
+            with track_counters(lots=drafts):
+                drafts.update(lot_status=CarbureLot.PENDING)
+
+            lot = CarbureLot.objects.filter(carbure_supplier=self.entity, lot_status=CarbureLot.PENDING).first()
+            lot.delete()
+
+        self.assert_counters_in_sync()
+
+    def test_untracked_changes_are_fixed_by_the_command(self):
+        CarbureLot.objects.filter(added_by=self.entity, lot_status=CarbureLot.DRAFT).update(lot_status=CarbureLot.PENDING)
+        self.assertEqual(get_entity_counters(self.entity.id)[CarbureLotCounter.DRAFT], 5)
+
+        out = StringIO()
+        call_command("rebuild_lot_counters", entity=[self.entity.id], stdout=out)
+        self.assertNotIn(" 0 were out of sync", out.getvalue())
+
+        self.assertEqual(get_entity_counters(self.entity.id)[CarbureLotCounter.DRAFT], 0)
+        self.assertEqual(rebuild_counters([self.entity.id]), 0)
+
+    def test_migration_fills_the_counters(self):
+        CarbureLotCounter.objects.all().delete()
+
+        migration = import_module("core.migrations.0069_fill_lot_counters")
+        migration.fill_lot_counters(apps, None)
+        self.assertEqual(get_entity_counters(self.entity.id)[CarbureLotCounter.DRAFT], 5)
+        self.assert_counters_in_sync()
+
+    def test_snapshot(self):
+        setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.entity, UserRights.RW)])
+        lot = CarbureLot.objects.filter(added_by=self.entity, lot_status=CarbureLot.DRAFT).first()
+        CarbureStockFactory.create(parent_lot=lot, carbure_client=self.entity)
+        lot.parent_stock = CarbureStock.objects.filter(parent_lot=lot).first()
+        lot.save()
+        year = lot.year
+
+        response = self.client.get(reverse("transactions-snapshot"), {"entity_id": self.entity.id, "year": year})
+        self.assertEqual(response.status_code, 200)
+
+        lots = CarbureLot.objects.filter(year=year)
+        sent = lots.exclude(lot_status__in=[CarbureLot.DRAFT, CarbureLot.DELETED])
+        lots_in = sent.filter(carbure_client=self.entity)
+        lots_out = sent.filter(carbure_supplier=self.entity)
+        drafts = lots.filter(added_by=self.entity, lot_status=CarbureLot.DRAFT)
+        stock = CarbureStock.objects.filter(carbure_client=self.entity)
+
+        expected = {
+            "draft": drafts.count(),
+            "in_total": lots_in.count(),
+            "in_pending": lots_in.filter(lot_status=CarbureLot.PENDING).count(),
+            "in_tofix": lots_in.exclude(correction_status=CarbureLot.NO_PROBLEMO).count(),
+            "stock": stock.filter(remaining_volume__gt=0).count(),
+            "stock_total": stock.count(),
+            "out_total": lots_out.count(),
+            "out_pending": lots_out.filter(lot_status=CarbureLot.PENDING).count(),
+            "out_tofix": lots_out.exclude(correction_status=CarbureLot.NO_PROBLEMO).count(),
+            "draft_imported": drafts.filter(parent_stock=None).count(),
+            "draft_stocks": drafts.exclude(parent_stock=None).count(),
+        }
+        self.assertEqual(response.json()["data"]["lots"], expected)
+        self.assertEqual(expected["draft_stocks"], 1)
@@ -0,0 +1,85 @@
+import openpyxl
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+
+from core import private_storage
+from core.exports import ExportLimitReached, freeze_queryset, request_export, run_export_job
+from core.models import CarbureLot, Entity, ExportJob, UserRights
+from core.tests_utils import setup_current_user
+from transactions.factories import CarbureLotFactory
+
+
+class ExportJobTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.user = setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.entity, UserRights.RW)])
+        CarbureLotFactory.create_batch(10, carbure_client=self.entity, lot_status=CarbureLot.PENDING)
+
+    def export(self, query=None):
+        query = {"entity_id": self.entity.id, "status": "IN", **(query or {})}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse("transactions-lots-export"), query)
+        return response
+
+    def test_lots_export_job(self):
+        response = self.export()
+        assert response.status_code == 200
+
+        job = ExportJob.objects.get(id=response.json()["data"]["id"])
+        assert job.status == ExportJob.DONE
+        assert job.total_rows == 10
+        assert job.processed_rows == 10
+
+        with private_storage.open(job.file_path) as file:
+            workbook = openpyxl.load_workbook(file, read_only=True)
+            assert workbook["lots"].max_row == 11
+
+        response = self.client.get(reverse("carbure-exports-status"), {"entity_id": self.entity.id, "job_id": job.id})
+        data = response.json()
+        assert data["status"] == ExportJob.DONE
+        assert data["download_url"] is not None
+
+    def test_identical_exports_are_reused(self):
+        first = self.export().json()["data"]
+        second = self.export().json()["data"]
+        other = self.export({"biofuels": "ETH"}).json()["data"]
+
+        assert first["id"] == second["id"]
+        assert first["id"] != other["id"]
+        assert ExportJob.objects.count() == 2
+
+    def test_active_exports_are_limited(self):
+        lots = CarbureLot.objects.all()
+        for i in range(2):
+            request_export(ExportJob.LOTS, self.entity, self.user, QueryDict(f"year={2020 + i}"), lots)
+
+        with self.assertRaises(ExportLimitReached):
+            request_export(ExportJob.LOTS, self.entity, self.user, QueryDict("year=2023"), lots)
+
+        response = self.export()
+        assert response.status_code == 429
+
+    def test_failed_export(self):
+        job = ExportJob.objects.create(entity=self.entity, user=self.user, type="UNKNOWN", query={}, query_hash="")
+
+        job = run_export_job(job.id, freeze_queryset(CarbureLot.objects.all()))
+
+        assert job.status == ExportJob.FAILED
+        assert not job.file_path
+
+    def test_status_of_other_entity_job(self):
+        other = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        job = ExportJob.objects.create(entity=other, user=self.user, type=ExportJob.LOTS, query={}, query_hash="")
+
+        response = self.client.get(reverse("carbure-exports-status"), {"entity_id": self.entity.id, "job_id": job.id})
+
+        assert response.status_code == 404
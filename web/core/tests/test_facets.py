@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from core.facets import LOT_FACETS, STOCK_FACETS, get_lots_facets, get_lots_filters_data, get_stock_facets
+from core.helpers import filter_lots, get_entity_lots_by_status
+from core.models import CarbureLot, CarbureStock, Entity, GenericError
+from transactions.factories import CarbureLotFactory, CarbureStockFactory
+
+
+class FacetsTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.producer = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        self.admin = Entity.objects.filter(entity_type=Entity.ADMIN).first()
+        self.lots = CarbureLotFactory.create_batch(30, added_by=self.producer, lot_status=CarbureLot.DRAFT)
+        for lot in self.lots[:4]:
+            GenericError.objects.create(lot=lot, error="MISSING_VOLUME", display_to_creator=True)
+            GenericError.objects.create(lot=lot, error="DEPRECATED_FEEDSTOCK", display_to_creator=True)
+
+    def get_facets(self, fields, query="", scope=None):
+        lots = get_entity_lots_by_status(self.producer, "DRAFTS")
+        return get_lots_facets(lots, QueryDict(query), self.producer, fields, scope)
+
+    def test_values_and_counts(self):
+        facets = self.get_facets(["biofuels", "periods", "errors"])
+
+        biofuels = CarbureLot.objects.values_list("biofuel__code").annotate(count=Count("id"))
+        periods = CarbureLot.objects.values_list("period").annotate(count=Count("id"))
+        assert facets["biofuels"] == sorted(biofuels)
+        assert facets["periods"] == sorted(periods)
+        assert facets["errors"] == [("DEPRECATED_FEEDSTOCK", 4), ("MISSING_VOLUME", 4)]
+
+    def test_inactive_filters_are_computed_together(self):
+        fields = list(LOT_FACETS)
+
+        with self.assertNumQueries(1):
+            facets = self.get_facets(fields)
+
+        assert sum(count for _, count in facets["lot_status"]) == 30
+        assert facets["ml_scoring"][0][0] == "KO"
+
+    def test_active_filter_keeps_its_other_values(self):
+        biofuel = self.lots[0].biofuel.code
+        query = f"biofuels={biofuel}"
+        filtered = filter_lots(get_entity_lots_by_status(self.producer, "DRAFTS"), QueryDict(query), self.producer)
+
+        facets = self.get_facets(["biofuels", "periods"], query)
+
+        assert len(facets["biofuels"]) == CarbureLot.objects.values("biofuel").distinct().count()
+        assert sum(count for _, count in facets["periods"]) == filtered.count()
+
+    def test_single_filter_data(self):
+        lots = get_entity_lots_by_status(self.producer, "DRAFTS")
+
+        data = get_lots_filters_data(lots, QueryDict(""), self.producer, "feedstocks")
+
+        codes = CarbureLot.objects.filter(feedstock__is_biofuel_feedstock=True).values_list("feedstock__code", flat=True)
+        assert data == sorted(set(codes))
+        assert get_lots_filters_data(lots, QueryDict(""), self.producer, "unknown") is None
+
+    def test_stock_facets(self):
+        for lot in self.lots[:5]:
+            CarbureStockFactory.create(parent_lot=lot, carbure_client=self.producer, remaining_volume=100)
+        stock = CarbureStock.objects.filter(carbure_client=self.producer)
+
+        facets = get_stock_facets(stock, QueryDict(""), list(STOCK_FACETS))
+
+        periods = sorted(stock.values_list("parent_lot__period").annotate(count=Count("id")))
+        assert facets["periods"] == periods
+        assert all(isinstance(code, str) for code, _ in facets["biofuels"])
+
+    @override_settings(FILTERS_CACHE_TIMEOUT=60)
+    def test_cache_is_invalidated_by_lot_changes(self):
+        self.get_facets(["lot_status"], scope="test")
+        with self.assertNumQueries(0):
+            facets = self.get_facets(["lot_status"], scope="test")
+        assert facets["lot_status"] == [(CarbureLot.DRAFT, 30)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lot = self.lots[0]
+            lot.lot_status = CarbureLot.PENDING
+            lot.save()
+
+        facets = self.get_facets(["lot_status"], scope="test")
+        assert facets["lot_status"] == [(CarbureLot.DRAFT, 29)]
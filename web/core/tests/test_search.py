@@ -0,0 +1,102 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import TransactionTestCase
+
+from core.helpers import filter_lots, filter_stock
+from core.models import CarbureLot, CarbureLotSearch, CarbureStock, CarbureStockSearch, Entity
+from core.tests.legacy_search import search_lots_legacy
+from transactions.factories import CarbureLotFactory, CarbureStockFactory
+
+
+def search_query(search):
+    query = QueryDict(mutable=True)
+    query["query"] = search
+    # the factories give random statuses, accepted and frozen lots are only listed in the history
+    query["history"] = "true"
+    return query
+
+
+class SearchIndexTest(TransactionTestCase):
+    # the fulltext index of mysql only sees committed rows
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        CarbureLotFactory.create_batch(10, carbure_client=self.entity)
+        self.lot = CarbureLotFactory.create(
+            carbure_client=self.entity,
+            transport_document_reference="DAE-2024-0042",
+            free_field="Livraison 100% zqxw",
+            unknown_supplier="Trader Mac",
+        )
+
+    def search_lots(self, search):
+        return set(filter_lots(CarbureLot.objects.all(), search_query(search), self.entity).values_list("id", flat=True))
+
+    def test_lots_are_found_by_their_columns_and_related_names(self):
+        assert self.search_lots("dae-2024-0042") == {self.lot.id}
+        assert self.search_lots("ZQXW") == {self.lot.id}
+        assert self.search_lots("100%") == {self.lot.id}
+        assert self.search_lots("mac") >= {self.lot.id}
+        assert self.lot.id in self.search_lots(self.lot.feedstock.name[1:5])
+        assert self.lot.id in self.search_lots(self.lot.carbure_client.name)
+        assert self.search_lots("nothing like this") == set()
+
+    def test_same_results_as_the_previous_filter(self):
+        lots = CarbureLot.objects.all()
+        for lot in lots[:5]:
+            for search in [lot.carbure_id[2:8], lot.unknown_client, lot.biofuel.name, lot.country_of_origin.name]:
+                legacy = set(search_lots_legacy(lots, search).values_list("id", flat=True))
+                # supplier names are searched as well now
+                assert legacy <= self.search_lots(search), search
+
+    def test_index_follows_lot_changes(self):
+        self.lot.free_field = "wqzx"
+        self.lot.save()
+        assert self.search_lots("zqxw") == set()
+        assert self.search_lots("wqzx") == {self.lot.id}
+
+        self.lot.delete()
+        assert not CarbureLotSearch.objects.filter(lot_id=self.lot.id).exists()
+
+    def test_stocks_are_found_by_their_parent_lot(self):
+        stock = CarbureStockFactory.create(parent_lot=self.lot, carbure_client=self.entity)
+
+        def search_stocks(search):
+            return set(filter_stock(CarbureStock.objects.all(), search_query(search)).values_list("id", flat=True))
+
+        assert search_stocks("dae-2024-0042") == {stock.id}
+
+        self.lot.transport_document_reference = "DAE-2024-0043"
+        self.lot.save()
+        assert search_stocks("dae-2024-0042") == set()
+        assert search_stocks("dae-2024-0043") == {stock.id}
+
+    def test_rebuild_command(self):
+        CarbureLotSearch.objects.all().delete()
+        CarbureStockSearch.objects.all().delete()
+        assert self.search_lots("zqxw") == set()
+
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=4, stdout=out)
+        assert f"for {CarbureLot.objects.count()} lots" in out.getvalue()
+        assert self.search_lots("zqxw") == {self.lot.id}
+
+    def test_migration_fills_the_tables(self):
+        CarbureLotSearch.objects.all().delete()
+        CarbureStockSearch.objects.all().delete()
+
+        migration = import_module("core.migrations.0070_fill_search_tables")
+        migration.fill_search_tables(apps, None)
+        assert CarbureLotSearch.objects.count() == CarbureLot.objects.count()
+        assert self.search_lots("zqxw") == {self.lot.id}
@@ -0,0 +1,86 @@
+import datetime
+import os
+
+import openpyxl
+from django.test import TestCase
+
+from core.models import CarbureLot, CarbureStock, Entity
+from core.serializers import CarbureLotCSVSerializer, CarbureStockCSVSerializer
+from core.xlsx_v3 import export_carbure_lots, export_carbure_stock
+from transactions.factories import CarbureLotFactory, CarbureStockFactory
+from transactions.models import Depot
+from transactions.serializers.power_heat_lot_serializer import CarbureLotPowerOrHeatProducerCSVSerializer
+
+
+def normalize(value):
+    if value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.strptime(value, "%d/%m/%Y")
+        except ValueError:
+            return value
+    return value
+
+
+class XlsxExportTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        Depot.objects.update(electrical_efficiency=0.3, thermal_efficiency=0.5, useful_temperature=120)
+        CarbureLotFactory.create_batch(20)
+        self.operator = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.admin = Entity.objects.filter(entity_type=Entity.ADMIN).first()
+
+    def read_lots_sheet(self, location):
+        workbook = openpyxl.load_workbook(location, read_only=True)
+        rows = [list(row) for row in workbook["lots"].iter_rows(values_only=True)]
+        workbook.close()
+        os.remove(location)
+        return rows[0], rows[1:]
+
+    def assert_same_sheet(self, location, serializer_data, rename=None):
+        header, rows = self.read_lots_sheet(location)
+
+        expected_header = [rename.get(c, c) if rename else c for c in serializer_data[0].keys()]
+        self.assertEqual(header, expected_header)
+
+        expected_rows = [[normalize(value) for value in lot.values()] for lot in serializer_data]
+        self.assertEqual([[normalize(value) for value in row] for row in rows], expected_rows)
+
+    def test_lots_export_matches_serializer(self):
+        lots = CarbureLot.objects.all().order_by("-id")
+
+        location = export_carbure_lots(self.operator, lots)
+
+        self.assert_same_sheet(location, CarbureLotCSVSerializer(lots, many=True).data)
+
+    def test_lots_export_for_power_or_heat_columns(self):
+        lots = CarbureLot.objects.all().order_by("id")
+
+        location = export_carbure_lots(self.admin, lots)
+
+        self.assert_same_sheet(location, CarbureLotPowerOrHeatProducerCSVSerializer(lots, many=True).data)
+
+    def test_lots_export_from_list(self):
+        lots = list(CarbureLot.objects.all().order_by("delivery_date", "id"))
+
+        location = export_carbure_lots(self.operator, lots)
+
+        self.assert_same_sheet(location, CarbureLotCSVSerializer(lots, many=True).data)
+
+    def test_stock_export_matches_serializer(self):
+        for lot in CarbureLot.objects.all()[:5]:
+            CarbureStockFactory.create(parent_lot=lot)
+        stocks = CarbureStock.objects.all().order_by("id")
+
+        location = export_carbure_stock(stocks)
+
+        data = CarbureStockCSVSerializer(stocks, many=True).data
+        self.assert_same_sheet(location, data, rename={"carbure_id": "carbure_stock_id"})
@@ -10,3 +10,5 @@ from .bulk_delete_traceability_nodes import bulk_delete_traceability_nodes
 
 # export tests so they are found by the runner
 from .tests_traceability import *
+from .tests_closure import *
+from .tests_propagation import *
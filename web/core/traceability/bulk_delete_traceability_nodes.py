@@ -1,5 +1,6 @@
 from django.db import transaction
 
+from core.counters import track_counters
 from core.models import CarbureLot, CarbureStock, CarbureStockTransformation
 from saf.models import SafTicket, SafTicketSource
 
@@ -14,7 +15,8 @@ def bulk_delete_traceability_nodes(nodes):
     if len(nodes_by_type[Node.LOT]) > 0:
         lot_ids = [lot.id for lot in nodes_by_type[Node.LOT]]
         lots = CarbureLot.objects.filter(id__in=lot_ids)
-        lots.exclude(lot_status=CarbureLot.DRAFT).update(lot_status=CarbureLot.DELETED)
+        with track_counters(lots=lots):
+            lots.exclude(lot_status=CarbureLot.DRAFT).update(lot_status=CarbureLot.DELETED)
         lots.filter(lot_status=CarbureLot.DRAFT).delete()
 
     if len(nodes_by_type[Node.STOCK]) > 0:
@@ -1,60 +1,101 @@
+from collections import defaultdict
+
 from django.db import transaction
 
+from core.counters import track_counters
 from core.models import CarbureLot, CarbureStock, CarbureStockTransformation
+from core.search import refresh_lot_search, refresh_stock_search
 from core.traceability import Node
 from saf.models import SafTicket, SafTicketSource
 from transactions.services.carbure_id import bulk_generate_lot_carbure_id, bulk_generate_stock_carbure_id
 
 from .group_nodes_by_type import group_nodes_by_type
 
+MODELS = {
+    Node.LOT: CarbureLot,
+    Node.STOCK: CarbureStock,
+    Node.STOCK_TRANSFORM: CarbureStockTransformation,
+    Node.TICKET_SOURCE: SafTicketSource,
+    Node.TICKET: SafTicket,
+}
+
+# fields used to build the carbure_id of lots and stocks
+LOT_ID_FIELDS = {
+    "period",
+    "production_country",
+    "production_country_id",
+    "carbure_delivery_site",
+    "carbure_delivery_site_id",
+}
+STOCK_ID_FIELDS = {"production_country", "production_country_id", "depot", "depot_id"}
+
 
 @transaction.atomic
 def bulk_update_traceability_nodes(nodes):
+    nodes = get_unique_nodes(nodes)
     nodes_by_type = group_nodes_by_type(nodes)
-    fields = get_updated_fields(nodes)
-
-    if len(fields[Node.LOT]) > 0:
-        lots = nodes_by_type[Node.LOT]
-        lot_fields = fields[Node.LOT]
-        CarbureLot.objects.bulk_update(lots, lot_fields)
-        bulk_generate_lot_carbure_id(CarbureLot.objects.filter(pk__in=[lot.pk for lot in lots]), save=True)
-
-    if len(fields[Node.STOCK]) > 0:
-        stocks = nodes_by_type[Node.STOCK]
-        stock_fields = fields[Node.STOCK]
-        CarbureStock.objects.bulk_update(stocks, stock_fields)
-        bulk_generate_stock_carbure_id(CarbureStock.objects.filter(pk__in=[stock.pk for stock in stocks]), save=True)
-
-    if len(fields[Node.STOCK_TRANSFORM]) > 0:
-        stock_transforms = nodes_by_type[Node.STOCK_TRANSFORM]
-        stock_transform_fields = fields[Node.STOCK_TRANSFORM]
-        CarbureStockTransformation.objects.bulk_update(stock_transforms, stock_transform_fields)
-
-    if len(fields[Node.TICKET_SOURCE]) > 0:
-        ticket_sources = nodes_by_type[Node.TICKET_SOURCE]
-        ticket_source_fields = fields[Node.TICKET_SOURCE]
-        SafTicketSource.objects.bulk_update(ticket_sources, ticket_source_fields)
-
-    if len(fields[Node.TICKET]) > 0:
-        tickets = nodes_by_type[Node.TICKET]
-        ticket_fields = fields[Node.TICKET]
-        SafTicket.objects.bulk_update(tickets, ticket_fields)
+    changed_nodes = get_changed_nodes(nodes)
+    period_lot_ids = set()
+
+    changed_lots = changed_nodes[Node.LOT]
+    if len(changed_lots) > 0:
+        with track_counters(lots=[node.data for node in changed_lots]):
+            bulk_update_changed_fields(Node.LOT, changed_lots)
+
+        period_lot_ids = {node.data.pk for node in changed_lots if "period" in node.diff}
+        id_lot_ids = [node.data.pk for node in changed_lots if LOT_ID_FIELDS & node.diff.keys()]
+        if id_lot_ids:
+            bulk_generate_lot_carbure_id(CarbureLot.objects.filter(pk__in=id_lot_ids), save=True)
+        refresh_lot_search([node.data.pk for node in changed_lots])
+
+    changed_stocks = changed_nodes[Node.STOCK]
+    if len(changed_stocks) > 0:
+        with track_counters(stocks=[node.data for node in changed_stocks]):
+            bulk_update_changed_fields(Node.STOCK, changed_stocks)
+
+        # the period of a stock comes from the closest lot above it
+        id_stock_ids = [
+            node.data.pk
+            for node in changed_stocks
+            if STOCK_ID_FIELDS & node.diff.keys() or has_changed_period(node, period_lot_ids)
+        ]
+        if id_stock_ids:
+            bulk_generate_stock_carbure_id(CarbureStock.objects.filter(pk__in=id_stock_ids), save=True)
+        refresh_stock_search([node.data.pk for node in changed_stocks])
+
+    for node_type in (Node.STOCK_TRANSFORM, Node.TICKET_SOURCE, Node.TICKET):
+        if len(changed_nodes[node_type]) > 0:
+            bulk_update_changed_fields(node_type, changed_nodes[node_type])
 
     return nodes_by_type
 
 
-def get_updated_fields(nodes: list[Node]):
-    diffs = {
-        Node.LOT: {},
-        Node.STOCK: {},
-        Node.STOCK_TRANSFORM: {},
-        Node.TICKET_SOURCE: {},
-        Node.TICKET: {},
-    }
+# nodes reached from several sources are listed several times, only keep the first occurrence
+def get_unique_nodes(nodes: list[Node]):
+    unique = {}
+    for node in nodes:
+        unique.setdefault(id(node), node)
+    return list(unique.values())
+
 
-    # merge all the diffs per type of node
+def get_changed_nodes(nodes: list[Node]):
+    changed = {node_type: [] for node_type in MODELS}
     for node in nodes:
-        diffs[node.type].update(node.diff)
+        if len(node.diff) > 0:
+            changed[node.type].append(node)
+    return changed
+
+
+# rows are grouped by the set of fields they changed, so each UPDATE only writes the columns that actually moved
+def bulk_update_changed_fields(node_type, nodes: list[Node]):
+    groups = defaultdict(list)
+    for node in nodes:
+        groups[tuple(sorted(node.diff))].append(node.data)
+
+    for fields, objects in groups.items():
+        MODELS[node_type].objects.bulk_update(objects, fields, batch_size=1000)
+
 
-    # extract the keys from the merged diffs
-    return {type: list(diff.keys()) for type, diff in diffs.items()}
+def has_changed_period(node: Node, period_lot_ids: set):
+    lot = node.get_closest(Node.LOT)
+    return lot is not None and lot.data.pk in period_lot_ids
@@ -0,0 +1,368 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_delete, post_init, post_save
+
+from core.models import CarbureLot, CarbureStock, CarbureStockTransformation, CarbureTraceabilityNode
+from saf.models import SafTicket, SafTicketSource
+
+LOT = CarbureTraceabilityNode.LOT
+STOCK = CarbureTraceabilityNode.STOCK
+STOCK_TRANSFORM = CarbureTraceabilityNode.STOCK_TRANSFORM
+TICKET_SOURCE = CarbureTraceabilityNode.TICKET_SOURCE
+TICKET = CarbureTraceabilityNode.TICKET
+
+MODELS = {
+    LOT: CarbureLot,
+    STOCK: CarbureStock,
+    STOCK_TRANSFORM: CarbureStockTransformation,
+    TICKET_SOURCE: SafTicketSource,
+    TICKET: SafTicket,
+}
+
+MODEL_NAMES = {
+    LOT: ("core", "CarbureLot"),
+    STOCK: ("core", "CarbureStock"),
+    STOCK_TRANSFORM: ("core", "CarbureStockTransformation"),
+    TICKET_SOURCE: ("saf", "SafTicketSource"),
+    TICKET: ("saf", "SafTicket"),
+}
+
+# node type -> fields pointing to the parent node, in the same order as the get_parent() of the nodes
+PARENT_FIELDS = {
+    LOT: [("parent_lot_id", LOT), ("parent_stock_id", STOCK)],
+    STOCK: [("parent_lot_id", LOT), ("parent_transformation_id", STOCK_TRANSFORM)],
+    STOCK_TRANSFORM: [("source_stock_id", STOCK)],
+    TICKET_SOURCE: [("parent_lot_id", LOT), ("parent_ticket_id", TICKET)],
+    TICKET: [("parent_ticket_source_id", TICKET_SOURCE)],
+}
+
+# position of each node type in the rows returned by get_family_rows, parents are 5 columns further
+ROW_COLUMNS = {LOT: 0, STOCK: 1, STOCK_TRANSFORM: 2, TICKET_SOURCE: 3, TICKET: 4}
+
+TYPE_CODES = {LOT: 1, STOCK: 2, STOCK_TRANSFORM: 3, TICKET_SOURCE: 4, TICKET: 5}
+
+
+# a single integer identifying a node, used as the family of all the nodes under it
+def get_family_key(node_type, node_id):
+    return node_id * 10 + TYPE_CODES[node_type]
+
+
+def get_parent_key(node_type, values):
+    for field, parent_type in PARENT_FIELDS[node_type]:
+        if values.get(field) is not None:
+            return parent_type, values[field]
+    return None
+
+
+def filter_keys(keys):
+    ids_by_type = defaultdict(set)
+    for node_type, node_id in keys:
+        ids_by_type[node_type].add(node_id)
+    condition = Q()
+    for node_type, node_ids in ids_by_type.items():
+        condition |= Q(node_type=node_type, node_id__in=node_ids)
+    return condition
+
+
+def get_rows(keys):
+    rows = CarbureTraceabilityNode.objects.filter(filter_keys(keys)) if keys else []
+    return {(row.node_type, row.node_id): row for row in rows}
+
+
+def read_parent_keys(node_type, node_ids):
+    fields = [field for field, _ in PARENT_FIELDS[node_type]]
+    rows = MODELS[node_type].objects.filter(id__in=node_ids).values("id", *fields)
+    return {row["id"]: get_parent_key(node_type, row) for row in rows}
+
+
+def index_nodes(node_type, node_ids):
+    """
+    Place the given nodes in the traceability table according to their parent fields, and move their subtrees along
+    if they changed family. Parents that were never indexed are indexed first, and nodes that don't exist anymore
+    are removed from the table.
+    """
+
+    node_ids = list(set(node_ids))
+    if not node_ids:
+        return
+
+    parent_keys = read_parent_keys(node_type, node_ids)
+
+    deleted_ids = [node_id for node_id in node_ids if node_id not in parent_keys]
+    if deleted_ids:
+        CarbureTraceabilityNode.objects.filter(node_type=node_type, node_id__in=deleted_ids).delete()
+
+    parent_rows = get_rows({key for key in parent_keys.values() if key})
+
+    # index the parents that are missing from the table, climbing up one level at a time
+    missing_parents = defaultdict(list)
+    for key in set(parent_keys.values()):
+        if key and key not in parent_rows:
+            missing_parents[key[0]].append(key[1])
+    if missing_parents:
+        for parent_type, parent_ids in missing_parents.items():
+            index_nodes(parent_type, parent_ids)
+        parent_rows = get_rows({key for key in parent_keys.values() if key})
+
+    existing_rows = get_rows({(node_type, node_id) for node_id in parent_keys})
+    created = []
+    updated = []
+
+    for node_id, parent_key in parent_keys.items():
+        parent = parent_rows.get(parent_key) if parent_key else None
+        if parent is None:
+            # roots, and nodes whose parent was deleted, start their own family
+            parent_key = None
+            family, depth = get_family_key(node_type, node_id), 0
+        else:
+            family, depth = parent.family, parent.depth + 1
+
+        row = existing_rows.get((node_type, node_id))
+        if row is None:
+            created.append(
+                CarbureTraceabilityNode(
+                    node_type=node_type,
+                    node_id=node_id,
+                    parent_type=parent_key[0] if parent_key else None,
+                    parent_id=parent_key[1] if parent_key else None,
+                    family=family,
+                    depth=depth,
+                )
+            )
+            continue
+
+        if (row.parent_type, row.parent_id, row.family, row.depth) == (*(parent_key or (None, None)), family, depth):
+            continue
+
+        if (row.family, row.depth) != (family, depth):
+            updated += move_subtree(row, family, depth)
+        row.parent_type, row.parent_id = parent_key or (None, None)
+        row.family, row.depth = family, depth
+        updated.append(row)
+
+    CarbureTraceabilityNode.objects.bulk_create(created, batch_size=1000)
+    CarbureTraceabilityNode.objects.bulk_update(updated, ["parent_type", "parent_id", "family", "depth"], batch_size=1000)
+
+
+def index_descendants(node_type, node_ids):
+    """
+    Index all the nodes under the given ones, one level at a time, for subtrees that were created without
+    going through the signals.
+    """
+
+    seen = {(node_type, node_id) for node_id in node_ids}
+    level = {node_type: set(node_ids)}
+    while level:
+        children = defaultdict(set)
+        for child_type, fields in PARENT_FIELDS.items():
+            for field, parent_type in fields:
+                if level.get(parent_type):
+                    child_ids = MODELS[child_type].objects.filter(**{f"{field}__in": level[parent_type]})
+                    children[child_type].update(child_ids.values_list("id", flat=True))
+
+        level = {}
+        for child_type, child_ids in children.items():
+            child_ids = {child_id for child_id in child_ids if (child_type, child_id) not in seen}
+            if child_ids:
+                seen.update((child_type, child_id) for child_id in child_ids)
+                index_nodes(child_type, child_ids)
+                level[child_type] = child_ids
+
+
+def move_subtree(row, family, depth):
+    # the descendants of the node are read from its current family and follow it in the new one
+    children = defaultdict(list)
+    for member in CarbureTraceabilityNode.objects.filter(family=row.family):
+        children[(member.parent_type, member.parent_id)].append(member)
+
+    moved = []
+    stack = list(children[(row.node_type, row.node_id)])
+    while stack:
+        member = stack.pop()
+        member.family = family
+        member.depth = member.depth - row.depth + depth
+        moved.append(member)
+        stack += children[(member.node_type, member.node_id)]
+    return moved
+
+
+def remove_nodes(node_type, node_ids):
+    """
+    Remove deleted nodes from the traceability table. Their remaining children are indexed again,
+    as they either became roots or were deleted as well.
+    """
+
+    CarbureTraceabilityNode.objects.filter(node_type=node_type, node_id__in=node_ids).delete()
+    orphans = CarbureTraceabilityNode.objects.filter(parent_type=node_type, parent_id__in=node_ids)
+    orphan_ids = defaultdict(list)
+    for orphan_type, orphan_id in orphans.values_list("node_type", "node_id"):
+        orphan_ids[orphan_type].append(orphan_id)
+    for orphan_type, ids in orphan_ids.items():
+        index_nodes(orphan_type, ids)
+
+
+def get_family_rows(lot_ids):
+    """
+    List all the nodes of the families of the given lots, as tuples of 5 node ids (lot, stock, stock transform,
+    ticket source, ticket) followed by 5 parent ids, only one of each group being set.
+    Like the traceability trees, deleted lots and everything under them are left out.
+    """
+
+    nodes = read_families(lot_ids)
+
+    # lots created without save() or the bulk helpers are indexed on the fly, along with everything under them
+    found = {node_id for node_type, node_id, _, _ in nodes if node_type == LOT}
+    missing = {lot_id for lot_id in lot_ids if lot_id not in found}
+    if missing:
+        # deleted lots are left out of the results but already have their row
+        indexed = CarbureTraceabilityNode.objects.filter(node_type=LOT, node_id__in=missing)
+        missing -= set(indexed.values_list("node_id", flat=True))
+    if missing:
+        with transaction.atomic():
+            index_nodes(LOT, missing)
+            index_descendants(LOT, missing)
+        nodes = read_families(lot_ids)
+
+    children = defaultdict(list)
+    for node_type, node_id, parent_type, parent_id in nodes:
+        children[(parent_type, parent_id)].append((node_type, node_id))
+
+    rows = []
+    stack = [(None, key) for key in children[(None, None)]]
+    while stack:
+        parent_key, key = stack.pop()
+        row = [None] * 10
+        row[ROW_COLUMNS[key[0]]] = key[1]
+        if parent_key:
+            row[5 + ROW_COLUMNS[parent_key[0]]] = parent_key[1]
+        rows.append(tuple(row))
+        stack += [(key, child) for child in children[key]]
+    return rows
+
+
+def read_families(lot_ids):
+    families = CarbureTraceabilityNode.objects.filter(node_type=LOT, node_id__in=lot_ids).values("family")
+    deleted_lots = CarbureLot.objects.filter(id=OuterRef("node_id"), lot_status=CarbureLot.DELETED)
+    return list(
+        CarbureTraceabilityNode.objects.filter(family__in=families)
+        .exclude(Q(node_type=LOT) & Exists(deleted_lots))
+        .values_list("node_type", "node_id", "parent_type", "parent_id")
+    )
+
+
+def check_nodes(fix=False, apps=None):
+    """
+    Compare the traceability table with the parent fields of all the lots, stocks, transformations and tickets.
+    Returns the number of missing, wrong and stale rows, and repairs them if fix is True.
+    The models are read from `apps` when given, so migrations can fill the table with their historical models.
+    """
+
+    if apps is None:
+        models, node_model = MODELS, CarbureTraceabilityNode
+    else:
+        models = {node_type: apps.get_model(*name) for node_type, name in MODEL_NAMES.items()}
+        node_model = apps.get_model("core", "CarbureTraceabilityNode")
+
+    # node key -> parent key, for every object in the database
+    parents = {}
+    for node_type, model in models.items():
+        fields = [field for field, _ in PARENT_FIELDS[node_type]]
+        for row in model.objects.values("id", *fields).iterator(chunk_size=10000):
+            parents[(node_type, row["id"])] = get_parent_key(node_type, row)
+
+    positions = {}
+
+    def get_position(key):
+        # walk up to the first ancestor with a known position, then fill the positions on the way down
+        path = []
+        seen = set()
+        while key not in positions:
+            path.append(key)
+            seen.add(key)
+            parent = parents.get(key)
+            if parent is None or parent not in parents or parent in seen:
+                positions[key] = (get_family_key(*key), 0, None)
+                path.pop()
+                break
+            key = parent
+        for node in reversed(path):
+            parent = parents[node]
+            family, depth, _ = positions[parent]
+            positions[node] = (family, depth + 1, parent)
+
+    for key in parents:
+        get_position(key)
+
+    stale = []
+    wrong = []
+    for row in node_model.objects.all().iterator(chunk_size=10000):
+        key = (row.node_type, row.node_id)
+        expected = positions.pop(key, None)
+        if expected is None:
+            stale.append(row.id)
+            continue
+        family, depth, parent = expected
+        if (row.family, row.depth, row.parent_type, row.parent_id) != (family, depth, *(parent or (None, None))):
+            row.family, row.depth = family, depth
+            row.parent_type, row.parent_id = parent or (None, None)
+            wrong.append(row)
+
+    # positions left are the nodes without any row
+    missing = [
+        node_model(
+            node_type=node_type,
+            node_id=node_id,
+            family=family,
+            depth=depth,
+            parent_type=parent[0] if parent else None,
+            parent_id=parent[1] if parent else None,
+        )
+        for (node_type, node_id), (family, depth, parent) in positions.items()
+    ]
+
+    if fix:
+        with transaction.atomic():
+            for i in range(0, len(stale), 1000):
+                node_model.objects.filter(id__in=stale[i : i + 1000]).delete()
+            node_model.objects.bulk_update(wrong, ["family", "depth", "parent_type", "parent_id"], batch_size=1000)
+            node_model.objects.bulk_create(missing, batch_size=1000)
+
+    return len(missing), len(wrong), len(stale)
+
+
+def get_node_type(model):
+    for node_type, node_model in MODELS.items():
+        if node_model is model:
+            return node_type
+
+
+def on_init(sender, instance, **kwargs):
+    fields = [field for field, _ in PARENT_FIELDS[get_node_type(sender)]]
+    if instance.pk and all(field in instance.__dict__ for field in fields):
+        instance._traceability_parent = get_parent_key(get_node_type(sender), instance.__dict__)
+    else:
+        instance._traceability_parent = False
+
+
+def on_save(sender, instance, created, **kwargs):
+    node_type = get_node_type(sender)
+    fields = [field for field, _ in PARENT_FIELDS[node_type]]
+    if all(field in instance.__dict__ for field in fields):
+        parent = get_parent_key(node_type, instance.__dict__)
+        if not created and parent == getattr(instance, "_traceability_parent", False):
+            return
+        instance._traceability_parent = parent
+    index_nodes(node_type, [instance.pk])
+
+
+def on_delete(sender, instance, **kwargs):
+    remove_nodes(get_node_type(sender), [instance.pk])
+
+
+def connect_signals():
+    for model in MODELS.values():
+        post_init.connect(on_init, sender=model, dispatch_uid=f"traceability_init_{model.__name__}")
+        post_save.connect(on_save, sender=model, dispatch_uid=f"traceability_save_{model.__name__}")
+        post_delete.connect(on_delete, sender=model, dispatch_uid=f"traceability_delete_{model.__name__}")
@@ -2,11 +2,11 @@ from typing import Iterable
 
 from core.models import CarbureLot, CarbureStock, CarbureStockTransformation
 from core.traceability import LotNode, StockNode, StockTransformNode, TicketNode, TicketSourceNode
-from core.utils import run_query
+from core.traceability.closure import get_family_rows
 from saf.models import SafTicket, SafTicketSource
 
 
-# use a recursive query to quickly fetch the whole families of the given lots
+# read the whole families of the given lots from the traceability nodes table
 # and build the traceability nodes and their relations based on the results
 def get_traceability_nodes(lots: Iterable):
     if len(lots) == 0:
@@ -16,7 +16,7 @@ def get_traceability_nodes(lots: Iterable):
     original_lot_ids = [lot.id for lot in lots]
 
     # query the database for all the nodes related to these lots
-    rows = run_query("core/traceability/get_traceability_nodes.sql", original_lot_ids)
+    rows = get_family_rows(original_lot_ids)
 
     # fetch all the models for the listed ids
     models_by_type = query_models_by_type(rows)
@@ -1,5 +1,6 @@
 import datetime
 import json
+from collections import deque
 from numbers import Number
 
 from core.models import GenericError
@@ -134,21 +135,22 @@ class Node:
 
     # find the root of the tree of this node
     def get_root(self) -> "Node":
-        if self.parent is None:
-            return self
-
-        return self.parent.get_root()
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
 
     # find the closest ancestor of this node matching the given query
     def get_closest(self, node_type) -> "Node":
-        if self.type == node_type:
-            return self
+        node = self
+        while node is not None:
+            if node.type == node_type:
+                return node
 
-        if callable(node_type) and node_type(self):
-            return self
+            if callable(node_type) and node_type(node):
+                return node
 
-        if self.parent is not None:
-            return self.parent.get_closest(node_type)
+            node = node.parent
 
     # find the first child of this node matching the given query
     def get_first(self, node_type) -> "Node":
@@ -166,16 +168,20 @@ class Node:
 
     # get the list of all the ancestors of this node, starting with its root
     def get_ancestors(self) -> list["Node"]:
-        if self.parent is None:
-            return []
-
-        return self.parent.get_ancestors() + [self.parent]
+        ancestors = []
+        node = self.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        return ancestors[::-1]
 
     # get the list of all the descendants of this node
     def get_descendants(self) -> list["Node"]:
         descendants = self.children.copy()
-        for child in self.children:
-            descendants += child.get_descendants()
+        i = 0
+        while i < len(descendants):
+            descendants += descendants[i].children
+            i += 1
         return descendants
 
     # get all the nodes connected directly and indirectly to this one
@@ -257,33 +263,33 @@ class Node:
         return changed
 
     # propagate the data of this node to its ancestors
-    # and repercute it to their own descendants (except this node)
+    # and repercute it to their own descendants (except the branch it comes from)
     def propagate_up(self) -> list["Node"]:
-        if not self.parent:
-            return []
-
-        self.parent.changed_only = self.changed_only
-        diff = self.parent.diff_with_child(self)
-
         changed_nodes = []
 
-        if len(diff) > 0:
-            self.parent.apply_diff(diff)
-            changed_nodes += [self.parent]
+        node = self
+        while node.parent:
+            parent = node.parent
+            parent.changed_only = self.changed_only
+            diff = parent.diff_with_child(node)
 
-        changed_nodes += self.parent.propagate_down(skip=self)
-        changed_nodes += self.parent.propagate_up()
+            if len(diff) > 0:
+                parent.apply_diff(diff)
+                changed_nodes += [parent]
+
+            changed_nodes += parent.propagate_down(skip=node)
+            node = parent
 
         return changed_nodes
 
-    # propagate the data of this node to all its descendants
+    # propagate the data of this node to all its descendants, level by level, so long chains don't hit the recursion limit
     # you can skip a child in the loop by specifying it in the params
     def propagate_down(self, skip: "Node" = None) -> list["Node"]:
         changed = []
 
-        for child in self.children:
-            if child == skip:
-                continue
+        queue = deque(child for child in self.children if child != skip)
+        while queue:
+            child = queue.popleft()
 
             child.changed_only = self.changed_only
             diff = child.diff_with_parent()
@@ -292,7 +298,7 @@ class Node:
                 child.apply_diff(diff)
                 changed += [child]
 
-            changed += child.propagate_down()
+            queue.extend(child.children)
 
         return changed
 
@@ -0,0 +1,124 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import CarbureLot, CarbureStock, CarbureTraceabilityNode, Entity
+from core.tests_utils import setup_current_user
+from core.traceability.closure import LOT, check_nodes, get_family_rows, index_nodes
+from core.traceability.get_traceability_nodes import get_traceability_nodes
+from saf.factories import SafTicketFactory, SafTicketSourceFactory
+from transactions.factories import CarbureLotFactory, CarbureStockFactory, CarbureStockTransformFactory
+
+
+class TraceabilityClosureTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+        "json/entities_sites.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.entity, "ADMIN")])
+
+        # root lot -> stock -> transformation -> stock -> lot, and root lot -> ticket source -> ticket
+        self.root = CarbureLotFactory.create(lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=None)
+        self.stock = CarbureStockFactory.create(parent_lot=self.root, carbure_client=self.entity)
+        self.etbe_stock = CarbureStockFactory.create(parent_lot=None, carbure_client=self.entity)
+        self.transform = CarbureStockTransformFactory.create(
+            source_stock=self.stock, dest_stock=self.etbe_stock, entity=self.entity
+        )
+        self.etbe_stock.parent_transformation = self.transform
+        self.etbe_stock.save()
+        self.leaf = CarbureLotFactory.create(lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=self.etbe_stock)
+        self.ticket_source = SafTicketSourceFactory.create(parent_lot=self.root, parent_ticket=None)
+        self.ticket = SafTicketFactory.create(parent_ticket_source=self.ticket_source)
+
+    def assert_table_in_sync(self):
+        self.assertEqual(check_nodes(), (0, 0, 0))
+
+    def test_family_is_read_in_one_query(self):
+        self.assert_table_in_sync()
+
+        with self.assertNumQueries(1):
+            rows = get_family_rows([self.leaf.id])
+        self.assertEqual(len(rows), 7)
+
+        node = get_traceability_nodes([CarbureLot.objects.get(id=self.leaf.id)])[0]
+        # the whole tree is already connected, walking it doesn't hit the database
+        with self.assertNumQueries(0):
+            family = node.get_family()
+            root = node.get_root()
+        self.assertEqual(len(family), 7)
+        self.assertEqual(root.data.id, self.root.id)
+        self.assertEqual(node.get_depth(), 4)
+
+    def test_moved_subtree_follows_its_new_parent(self):
+        other_root = CarbureLotFactory.create(lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=None)
+        self.stock.parent_lot = other_root
+        self.stock.save()
+
+        self.assert_table_in_sync()
+        self.assertEqual(len(get_family_rows([other_root.id])), 5)
+        self.assertEqual(len(get_family_rows([self.root.id])), 3)
+
+    def test_deleted_nodes(self):
+        # lots under a deleted stock become roots
+        CarbureStock.objects.filter(id=self.etbe_stock.id).delete()
+        self.assert_table_in_sync()
+        self.assertEqual(len(get_family_rows([self.leaf.id])), 1)
+
+        # deleted lots and their descendants are left out of the families
+        CarbureLot.objects.filter(id=self.root.id).update(lot_status=CarbureLot.DELETED)
+        self.assertEqual(get_family_rows([self.root.id]), [])
+        self.assertEqual(get_traceability_nodes([self.root]), [])
+
+    def test_bulk_created_lots(self):
+        lots = CarbureLotFactory.build_batch(3, lot_status=CarbureLot.DRAFT, parent_lot=None, parent_stock=self.stock)
+        CarbureLot.objects.bulk_create(lots)
+        lot_ids = list(CarbureLot.objects.filter(parent_stock=self.stock).values_list("id", flat=True))
+
+        self.assertEqual(check_nodes(), (3, 0, 0))
+        index_nodes(LOT, lot_ids)
+        self.assert_table_in_sync()
+
+        # lots that were never indexed are placed in their family when it's first read
+        CarbureTraceabilityNode.objects.filter(node_type=LOT, node_id__in=lot_ids).delete()
+        self.assertEqual(len(get_family_rows(lot_ids[:1])), 8)
+        self.assertEqual(check_nodes(), (2, 0, 0))
+
+    def test_bulk_created_subtree(self):
+        root = CarbureLotFactory.build(lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=None)
+        CarbureLot.objects.bulk_create([root])
+        root = CarbureLot.objects.order_by("id").last()
+        stock = CarbureStockFactory.build(parent_lot=root, parent_transformation=None, carbure_client=self.entity)
+        CarbureStock.objects.bulk_create([stock])
+        self.assertEqual(check_nodes(), (2, 0, 0))
+
+        # the descendants of a lot indexed on the fly are indexed along with it
+        self.assertEqual(len(get_family_rows([root.id])), 2)
+        self.assert_table_in_sync()
+
+    def test_migration_fills_the_table(self):
+        CarbureTraceabilityNode.objects.all().delete()
+
+        migration = import_module("core.migrations.0068_fill_traceability_nodes")
+        migration.fill_traceability_nodes(apps, None)
+        self.assert_table_in_sync()
+
+    def test_check_command(self):
+        CarbureTraceabilityNode.objects.filter(node_type=LOT, node_id=self.leaf.id).update(family=0, depth=0)
+        CarbureTraceabilityNode.objects.create(node_type=LOT, node_id=999999, family=9999991)
+
+        out = StringIO()
+        call_command("check_traceability_nodes", stdout=out)
+        self.assertIn("0 missing, 1 wrong, 1 stale", out.getvalue())
+
+        call_command("check_traceability_nodes", fix=True, stdout=out)
+        self.assert_table_in_sync()
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import CarbureLot, Entity
+from core.traceability import bulk_update_traceability_nodes, get_traceability_nodes
+from transactions.factories import CarbureLotFactory, CarbureStockFactory
+
+
+class TraceabilityPropagationTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.root = CarbureLotFactory.create(lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=None)
+        self.stock = CarbureStockFactory.create(parent_lot=self.root, carbure_client=self.entity)
+        self.lots = CarbureLotFactory.create_batch(
+            3, lot_status=CarbureLot.ACCEPTED, parent_lot=None, parent_stock=self.stock, unknown_production_site="OLD"
+        )
+
+    def get_root_node(self):
+        return get_traceability_nodes([CarbureLot.objects.get(id=self.root.id)])[0]
+
+    def test_long_chain_is_propagated(self):
+        # a chain of lots traded one after the other, deeper than the python recursion limit
+        parent = self.lots[0]
+        for _ in range(1200):
+            parent = CarbureLot.objects.create(
+                lot_status=CarbureLot.ACCEPTED, parent_lot=parent, period=parent.period, year=parent.year
+            )
+
+        node = get_traceability_nodes([parent])[0]
+        self.assertEqual(node.get_depth(), 1202)
+        self.assertEqual(node.get_root().data.id, self.root.id)
+
+        root = node.get_root()
+        root.update({"unknown_production_site": "NEW"})
+        changed = root.propagate(changed_only=True)
+        bulk_update_traceability_nodes(changed)
+
+        self.assertEqual(CarbureLot.objects.get(id=parent.id).unknown_production_site, "NEW")
+        self.assertEqual(len([node for node in changed if node.diff]), 1 + 1 + 3 + 1200)
+
+    def test_only_changed_columns_are_written(self):
+        node = self.get_root_node()
+        node.update({"unknown_production_site": "NEW", "free_field": "root only"})
+        changed = node.propagate(changed_only=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            bulk_update_traceability_nodes(changed)
+
+        quote_name = connection.ops.quote_name
+        updates = [query["sql"] for query in queries if query["sql"].startswith(f"UPDATE {quote_name('carbure_lots')}")]
+        # the root is written with its two fields, the children of the stock with only the propagated one
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(any(quote_name("free_field") in sql for sql in updates))
+        self.assertTrue(all(quote_name("volume") not in sql for sql in updates))
+
+        for lot in self.lots:
+            lot.refresh_from_db()
+            self.assertEqual(lot.unknown_production_site, "NEW")
+            self.assertNotEqual(lot.free_field, "root only")
+
+    def test_diffs_are_kept_per_node(self):
+        node = self.get_root_node()
+        node.update({"unknown_production_site": "NEW"})
+        changed = node.propagate(changed_only=True)
+
+        child = next(node for node in changed if node.data.id == self.lots[0].id)
+        self.assertEqual(child.diff, {"unknown_production_site": ("NEW", "OLD")})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_traceability_propagation", entity=self.entity.id, lots=20, stocks=2, stdout=out)
+        self.assertEqual(CarbureLot.objects.count(), 4)
@@ -1,14 +1,18 @@
 import datetime
 import random
-import traceback
 
-import pandas as pd
 import xlsxwriter
+from django.db.models import QuerySet
 
-from core.models import Biocarburant, CarbureStock, Entity, GenericCertificate, MatierePremiere, Pays
-from core.serializers import CarbureLotCSVSerializer, CarbureStockCSVSerializer
+from core.excel import make_export_location
+from core.models import Biocarburant, CarbureLot, CarbureStock, Entity, GenericCertificate, MatierePremiere, Pays
 from transactions.models import Depot, ProductionSite
-from transactions.serializers.power_heat_lot_serializer import CarbureLotPowerOrHeatProducerCSVSerializer
+from transactions.serializers.power_heat_lot_serializer import (
+    REF_ELECTRICITY,
+    REF_HEAT,
+    get_emission_reduction,
+    get_power_or_heat_emissions,
+)
 
 UNKNOWN_PRODUCERS = [
     {
@@ -964,55 +968,270 @@ def make_dc_mps_sheet(workbook):
         row += 1
 
 
-def make_carbure_lots_sheet(workbook, entity, lots):
-    worksheet_lots = workbook.add_worksheet("lots")
-    if entity.entity_type in [Entity.ADMIN, Entity.POWER_OR_HEAT_PRODUCER]:
-        serializer = CarbureLotPowerOrHeatProducerCSVSerializer(lots, many=True)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def related_or_unknown(lookup, unknown):
+    return lambda row: row[lookup] if row[lookup] is not None else row[unknown]
+
+
+def related_or_empty(lookup):
+    return lambda row: row[lookup] if row[lookup] is not None else ""
+
+
+def format_date(lookup):
+    return lambda row: row[lookup].strftime("%d/%m/%Y") if row[lookup] else ""
+
+
+def field(lookup):
+    return lambda row: row[lookup]
+
+
+# each exported column is described by its header, the values needed to compute it, how to compute it and its cell type
+LOT_EXPORT_COLUMNS = [
+    ("year", ["year"], field("year"), "number"),
+    ("period", ["period"], field("period"), "number"),
+    ("carbure_id", ["carbure_id"], field("carbure_id"), "string"),
+    (
+        "producer",
+        ["carbure_producer__name", "unknown_producer"],
+        related_or_unknown("carbure_producer__name", "unknown_producer"),
+        "string",
+    ),
+    (
+        "production_site",
+        ["carbure_production_site__name", "unknown_production_site"],
+        related_or_unknown("carbure_production_site__name", "unknown_production_site"),
+        "string",
+    ),
+    ("production_country", ["production_country__code_pays"], related_or_empty("production_country__code_pays"), "string"),
+    (
+        "production_site_commissioning_date",
+        ["production_site_commissioning_date"],
+        lambda row: row["production_site_commissioning_date"] and row["production_site_commissioning_date"].isoformat(),
+        "string",
+    ),
+    ("production_site_certificate", ["production_site_certificate"], field("production_site_certificate"), "string"),
+    (
+        "production_site_double_counting_certificate",
+        ["production_site_double_counting_certificate", "feedstock__is_double_compte"],
+        lambda row: row["production_site_double_counting_certificate"] if row["feedstock__is_double_compte"] else "",
+        "string",
+    ),
+    (
+        "supplier",
+        ["carbure_supplier__name", "unknown_supplier"],
+        related_or_unknown("carbure_supplier__name", "unknown_supplier"),
+        "string",
+    ),
+    ("supplier_certificate", ["supplier_certificate"], field("supplier_certificate"), "string"),
+    ("transport_document_reference", ["transport_document_reference"], field("transport_document_reference"), "string"),
+    (
+        "client",
+        ["carbure_client__name", "unknown_client"],
+        related_or_unknown("carbure_client__name", "unknown_client"),
+        "string",
+    ),
+    ("delivery_date", ["delivery_date"], field("delivery_date"), "date"),
+    (
+        "delivery_site",
+        ["carbure_delivery_site__customs_id", "unknown_delivery_site"],
+        related_or_unknown("carbure_delivery_site__customs_id", "unknown_delivery_site"),
+        "string",
+    ),
+    (
+        "delivery_site_country",
+        ["delivery_site_country__code_pays"],
+        related_or_empty("delivery_site_country__code_pays"),
+        "string",
+    ),
+    ("delivery_type", ["delivery_type"], field("delivery_type"), "string"),
+    ("volume", ["volume"], field("volume"), "number"),
+    ("weight", ["weight"], field("weight"), "number"),
+    ("lhv_amount", ["lhv_amount"], field("lhv_amount"), "number"),
+    ("feedstock", ["feedstock__code"], related_or_empty("feedstock__code"), "string"),
+    ("feedstock_category", ["feedstock__category"], related_or_empty("feedstock__category"), "string"),
+    ("biofuel", ["biofuel__code"], related_or_empty("biofuel__code"), "string"),
+    ("country_of_origin", ["country_of_origin__code_pays"], related_or_empty("country_of_origin__code_pays"), "string"),
+    *[
+        (name, [name], field(name), "number")
+        for name in [
+            "eec",
+            "el",
+            "ep",
+            "etd",
+            "eu",
+            "esca",
+            "eccs",
+            "eccr",
+            "eee",
+            "ghg_total",
+            "ghg_reference",
+            "ghg_reduction",
+            "ghg_reference_red_ii",
+            "ghg_reduction_red_ii",
+        ]
+    ],
+    ("free_field", ["free_field"], field("free_field"), "string"),
+    ("data_reliability_score", ["data_reliability_score"], field("data_reliability_score"), "string"),
+    (
+        "delivery_site_name",
+        ["carbure_delivery_site__name", "unknown_delivery_site"],
+        related_or_unknown("carbure_delivery_site__name", "unknown_delivery_site"),
+        "string",
+    ),
+]
+
+
+def get_power_or_heat_values(row):
+    if row["carbure_delivery_site_id"] is None:
+        return None, None
+    if "power_or_heat_emissions" not in row:
+        row["power_or_heat_emissions"] = get_power_or_heat_emissions(
+            row["carbure_delivery_site__site_type"],
+            row["ghg_total"],
+            row["carbure_delivery_site__electrical_efficiency"],
+            row["carbure_delivery_site__thermal_efficiency"],
+            row["carbure_delivery_site__useful_temperature"],
+        )
+    return row["power_or_heat_emissions"]
+
+
+POWER_OR_HEAT_LOOKUPS = [
+    "carbure_delivery_site_id",
+    "carbure_delivery_site__site_type",
+    "carbure_delivery_site__electrical_efficiency",
+    "carbure_delivery_site__thermal_efficiency",
+    "carbure_delivery_site__useful_temperature",
+    "ghg_total",
+]
+
+POWER_OR_HEAT_EXPORT_COLUMNS = [
+    ("emission_electricity", POWER_OR_HEAT_LOOKUPS, lambda row: get_power_or_heat_values(row)[0], "number"),
+    (
+        "total_reduction_electricity",
+        POWER_OR_HEAT_LOOKUPS,
+        lambda row: get_emission_reduction(REF_ELECTRICITY, get_power_or_heat_values(row)[0]),
+        "number",
+    ),
+    ("emission_heat", POWER_OR_HEAT_LOOKUPS, lambda row: get_power_or_heat_values(row)[1], "number"),
+    (
+        "total_reduction_heat",
+        POWER_OR_HEAT_LOOKUPS,
+        lambda row: get_emission_reduction(REF_HEAT, get_power_or_heat_values(row)[1]),
+        "number",
+    ),
+]
+
+
+def get_stock_delivery_date(row):
+    if row["parent_lot_id"]:
+        date = row["parent_lot__delivery_date"]
+    elif row["parent_transformation_id"]:
+        date = row["parent_transformation__transformation_dt"].date()
     else:
-        serializer = CarbureLotCSVSerializer(lots, many=True)
-    df = pd.DataFrame(serializer.data)
-    # header
+        date = datetime.date.today()
+    return date.strftime("%d/%m/%Y") if date else ""
+
+
+STOCK_EXPORT_COLUMNS = [
+    ("carbure_stock_id", ["carbure_id"], field("carbure_id"), "string"),
+    (
+        "production_site",
+        ["carbure_production_site__name", "unknown_production_site"],
+        related_or_unknown("carbure_production_site__name", "unknown_production_site"),
+        "string",
+    ),
+    ("production_country", ["production_country__code_pays"], related_or_empty("production_country__code_pays"), "string"),
+    (
+        "supplier",
+        ["carbure_supplier__name", "unknown_supplier"],
+        related_or_unknown("carbure_supplier__name", "unknown_supplier"),
+        "string",
+    ),
+    (
+        "delivery_date",
+        [
+            "parent_lot_id",
+            "parent_lot__delivery_date",
+            "parent_transformation_id",
+            "parent_transformation__transformation_dt",
+        ],
+        get_stock_delivery_date,
+        "string",
+    ),
+    ("depot", ["depot__customs_id"], related_or_empty("depot__customs_id"), "string"),
+    ("depot_name", ["depot__name"], related_or_empty("depot__name"), "string"),
+    ("remaining_volume", ["remaining_volume"], field("remaining_volume"), "number"),
+    ("remaining_weight", ["remaining_weight"], field("remaining_weight"), "number"),
+    ("feedstock", ["feedstock__code"], related_or_empty("feedstock__code"), "string"),
+    ("biofuel", ["biofuel__code"], related_or_empty("biofuel__code"), "string"),
+    ("country_of_origin", ["country_of_origin__code_pays"], related_or_empty("country_of_origin__code_pays"), "string"),
+    ("ghg_reduction_red_ii", ["ghg_reduction_red_ii"], field("ghg_reduction_red_ii"), "number"),
+]
+
+
+# iterate over the raw values of the given objects by chunks, without loading model instances
+def iter_export_values(model, objects, lookups, chunk_size=EXPORT_CHUNK_SIZE):
+    if isinstance(objects, QuerySet):
+        yield from objects.values(*lookups).iterator(chunk_size=chunk_size)
+        return
+
+    # plain lists of objects are fetched again by chunks of ids, keeping their order
+    ids = [obj.id for obj in objects]
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i : i + chunk_size]
+        rows = {row["id"]: row for row in model.objects.filter(id__in=chunk).values("id", *lookups)}
+        for id in chunk:
+            if id in rows:
+                yield rows[id]
+
+
+# write the rows of a sheet in order, which allows the workbook to be created in constant_memory mode
+def write_export_sheet(workbook, name, columns, model, objects, on_progress=None):
+    worksheet = workbook.add_worksheet(name)
     bold = workbook.add_format({"bold": True})
-    for i, c in enumerate(df.columns):
-        worksheet_lots.write(0, i, c, bold)
-    # content
-    for index, row in df.iterrows():
-        colid = 0
-        date_format = workbook.add_format({"num_format": "dd/mm/yyyy"})
-        for elem in row:
-            try:
-                try:
-                    date = datetime.datetime.strptime(elem, "%d/%m/%Y").date()
-                    worksheet_lots.write_datetime(index + 1, colid, date, date_format)
-                except Exception:
-                    worksheet_lots.write(index + 1, colid, elem)
-            except Exception:
-                traceback.print_exc()
-            colid += 1
+    date_format = workbook.add_format({"num_format": "dd/mm/yyyy"})
+
+    lookups = list(dict.fromkeys(lookup for _, column_lookups, _, _ in columns for lookup in column_lookups))
+
+    for col, (header, _, _, _) in enumerate(columns):
+        worksheet.write_string(0, col, header, bold)
+
+    row_index = 0
+    for row_index, row in enumerate(iter_export_values(model, objects, lookups), start=1):
+        for col, (_, _, get_value, cell_type) in enumerate(columns):
+            value = get_value(row)
+            if value is None or value == "":
+                continue
+            if cell_type == "date":
+                worksheet.write_datetime(row_index, col, value, date_format)
+            elif cell_type == "number":
+                worksheet.write_number(row_index, col, value)
+            else:
+                worksheet.write_string(row_index, col, str(value))
+
+        if on_progress and row_index % EXPORT_CHUNK_SIZE == 0:
+            on_progress(row_index)
+
+    return row_index
+
+
+def make_carbure_lots_sheet(workbook, entity, lots, on_progress=None):
+    columns = LOT_EXPORT_COLUMNS
+    if entity.entity_type in [Entity.ADMIN, Entity.POWER_OR_HEAT_PRODUCER]:
+        columns = LOT_EXPORT_COLUMNS + POWER_OR_HEAT_EXPORT_COLUMNS
+    return write_export_sheet(workbook, "lots", columns, CarbureLot, lots, on_progress)
 
 
 def make_carbure_stock_sheet(workbook, lots):
-    worksheet_lots = workbook.add_worksheet("lots")
-    serializer = CarbureStockCSVSerializer(lots, many=True)
-    df = pd.DataFrame(serializer.data)
-    df.rename(columns={"carbure_id": "carbure_stock_id"}, inplace=True)
-    # header
-    bold = workbook.add_format({"bold": True})
-    for i, c in enumerate(df.columns):
-        worksheet_lots.write(0, i, c, bold)
-    # content
-    for index, row in df.iterrows():
-        colid = 0
-        for elem in row:
-            worksheet_lots.write(index + 1, colid, elem)
-            colid += 1
+    return write_export_sheet(workbook, "lots", STOCK_EXPORT_COLUMNS, CarbureStock, lots)
 
 
-def export_carbure_lots(entity, transactions):
-    today = datetime.date.today()
-    location = "/tmp/carbure_lots_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
-    workbook = xlsxwriter.Workbook(location)
-    make_carbure_lots_sheet(workbook, entity, transactions)
+def export_carbure_lots(entity, transactions, on_progress=None):
+    location = make_export_location("carbure_lots")
+    workbook = xlsxwriter.Workbook(location, {"constant_memory": True})
+    make_carbure_lots_sheet(workbook, entity, transactions, on_progress)
     make_countries_sheet(workbook)
     make_mps_sheet(workbook)
     make_biofuels_sheet(workbook)
@@ -1023,9 +1242,8 @@ def export_carbure_lots(entity, transactions):
 
 
 def export_carbure_stock(stocks):
-    today = datetime.date.today()
-    location = "/tmp/carbure_stock_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
-    workbook = xlsxwriter.Workbook(location)
+    location = make_export_location("carbure_stock")
+    workbook = xlsxwriter.Workbook(location, {"constant_memory": True})
     make_carbure_stock_sheet(workbook, stocks)
     make_countries_sheet(workbook)
     make_mps_sheet(workbook)
@@ -1,6 +1,5 @@
 from os import environ
 
-import pandas as pd
 from django import forms
 from django.conf import settings
 from django.http import HttpRequest
@@ -16,6 +15,7 @@ from elec.models.elec_charge_point_application import ElecChargePointApplication
 from elec.models.elec_meter_reading_application import ElecMeterReadingApplication
 from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
 from elec.models.elec_provision_certificate import ElecProvisionCertificate
+from elec.services.meter_reading_energy import get_meter_readings_energy
 
 
 class AcceptApplicationForm(forms.Form):
@@ -50,17 +50,10 @@ def accept_application(request: HttpRequest):
     # creer un ElecProvisionCertificate groupant tous les meter readings par charge_poing.operating_unit
 
     ## recuperer tous les MeterReadings de la demande, sauf ceux liés à des PDC de stations DC (gérés par qualicharge)
-    meter_readings = ElecMeterReadingVirtual.objects.filter(application=application).select_related("charge_point")
-    data = [
-        {
-            "renewable_energy": meter_reading.renewable_energy,
-            "operating_unit": meter_reading.charge_point.charge_point_id[:5],  # Inclure le charge_point_id
-        }
-        for meter_reading in meter_readings
-    ]
+    meter_readings = ElecMeterReadingVirtual.objects.filter(application=application)
+    meter_readings_df = get_meter_readings_energy(meter_readings)
 
-    ## convertir en dataframe et grouper par operating_unit et sommer les extracted_energy
-    meter_readings_df = pd.DataFrame(data)
+    ## grouper par operating_unit et sommer les extracted_energy
     meter_readings_df_grouped = meter_readings_df.groupby("operating_unit").agg({"renewable_energy": "sum"}).reset_index()
 
     ## créer les ElecProvisionCertificate à partir des groupes
@@ -94,7 +87,7 @@ def accept_application(request: HttpRequest):
 def send_email_to_cpo(application: ElecMeterReadingApplication, request: HttpRequest):
     quarter = f"T{application.quarter} {application.year}"
     meter_readings = ElecMeterReadingVirtual.objects.filter(application=application)
-    total_energy = round(sum(mr.renewable_energy or 0 for mr in meter_readings), 2)
+    total_energy = round(sum(get_meter_readings_energy(meter_readings)["renewable_energy"].tolist()), 2)
     meter_reading_count = application.elec_meter_readings.count()
     meter_reading_link = (
         f"{environ.get('BASE_URL')}/org/{application.cpo.pk}/elec-v2/certificates/{application.year}/provision"
@@ -1,6 +1,7 @@
-from django.db.models import Count, F, OuterRef, Q, QuerySet, Subquery, Sum
-from django.db.models.fields import FloatField
-from django.db.models.functions import Coalesce
+from datetime import date
+
+from django.db.models import Count, F, Q, QuerySet, Sum, Window
+from django.db.models.functions import RowNumber
 
 from core.models import Entity
 from elec.models import ElecMeterReadingApplication
@@ -95,22 +96,45 @@ class MeterReadingRepository:
         ).filter(app_count=0, meter_readings_charge_points_count__gt=0, entity_type=Entity.CPO)
 
     @staticmethod
-    def annotate_charge_points_with_latest_index(charge_points: QuerySet[ElecChargePoint]):
-        """Annotate charge points with their latest meter reading index and date from ElecMeterReadingVirtual.
+    def get_latest_readings(charge_points: QuerySet[ElecChargePoint]) -> dict[int, tuple[float, date]]:
+        """Returns the index and date of the latest meter reading of each charge point, found with a single window query.
 
-        Falls back to current_meter.initial_index/initial_index_date if no reading exists.
+        Like ElecMeterReadingVirtual, only the readings of charge points that are not deleted nor article 2 are used.
         """
-        latest_reading_subquery = ElecMeterReadingVirtual.objects.filter(charge_point_id=OuterRef("pk")).order_by(
-            "-current_index_date"
-        )
-        return charge_points.select_related("current_meter").annotate(
-            latest_reading_index=Coalesce(
-                Subquery(latest_reading_subquery.values("current_index")[:1]),
-                F("current_meter__initial_index"),
-                output_field=FloatField(),
-            ),
-            latest_reading_date=Coalesce(
-                Subquery(latest_reading_subquery.values("current_index_date")[:1]),
-                F("current_meter__initial_index_date"),
-            ),
+        latest_readings = (
+            ElecMeterReading.objects.filter(
+                meter__charge_point__in=charge_points,
+                meter__charge_point__is_deleted=False,
+                meter__charge_point__is_article_2=False,
+            )
+            .annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("meter__charge_point_id"),
+                    order_by=[F("reading_date").desc(), F("id").desc()],
+                )
+            )
+            .filter(row_number=1)
+            .values_list("meter__charge_point_id", "extracted_energy", "reading_date")
         )
+        return {charge_point_id: (index, reading_date) for charge_point_id, index, reading_date in latest_readings}
+
+    @staticmethod
+    def annotate_charge_points_with_latest_index(charge_points: QuerySet[ElecChargePoint]) -> list[ElecChargePoint]:
+        """Annotate charge points with their latest meter reading index and date.
+
+        Falls back to current_meter.initial_index/initial_index_date if no reading exists.
+        """
+        latest_readings = MeterReadingRepository.get_latest_readings(charge_points)
+
+        charge_points = list(charge_points.select_related("current_meter"))
+        for charge_point in charge_points:
+            latest_index, latest_date = latest_readings.get(charge_point.pk, (None, None))
+            meter = charge_point.current_meter
+            if latest_index is None and meter:
+                latest_index = meter.initial_index
+            if latest_date is None and meter:
+                latest_date = meter.initial_index_date
+            charge_point.latest_reading_index = latest_index
+            charge_point.latest_reading_date = latest_date
+        return charge_points
@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS = 6371.0008  # kilometers
+
+
+class ChargePointSpatialIndex:
+    """
+    k-d tree over latitude/longitude positions, to find the nearest charge points or stations of a position.
+
+    The positions are placed on a unit sphere, so the straight distance in the tree grows like the great circle
+    distance and the nearest points are the same as with the haversine formula.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        self.positions = to_unit_vectors(latitudes, longitudes)
+        self.tree = cKDTree(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indexes of the k nearest positions and their distance in kilometers, closest first"""
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=int), np.empty(0)
+        chords, indexes = self.tree.query(to_unit_vectors([latitude], [longitude])[0], k=[*range(1, k + 1)])
+        return indexes, to_kilometers(chords)
+
+    def within(self, latitude: float, longitude: float, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indexes of the positions less than `radius` kilometers away and their distance, closest first"""
+        center = to_unit_vectors([latitude], [longitude])[0]
+        indexes = np.array(self.tree.query_ball_point(center, to_chord(radius)), dtype=int)
+        distances = to_kilometers(np.linalg.norm(self.positions[indexes] - center, axis=1))
+        order = np.lexsort((indexes, distances))
+        return indexes[order], distances[order]
+
+
+def to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    latitudes = np.radians(np.asarray(latitudes, dtype=float))
+    longitudes = np.radians(np.asarray(longitudes, dtype=float))
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack((cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes)))
+
+
+def to_kilometers(chords) -> np.ndarray:
+    return EARTH_RADIUS * 2 * np.arcsin(np.minimum(np.asarray(chords, dtype=float) / 2, 1))
+
+
+def to_chord(kilometers: float) -> float:
+    return 2 * np.sin(min(kilometers / EARTH_RADIUS, np.pi) / 2)
@@ -1,63 +1,121 @@
+import math
 import random
-from collections import defaultdict
 
+import numpy as np
+import pandas as pd
 from django.db.models import QuerySet
 
 from elec.models import ElecChargePoint
-
-
-def extract_audit_sample(charge_points: QuerySet[ElecChargePoint], percentage: float):
-    charge_point_sample: list[ElecChargePoint] = []
+from elec.services.charge_point_spatial_index import ChargePointSpatialIndex
+
+# the cosine formula of distance() is only precise to about 100m, so the stations are compared with a margin
+DISTANCE_PRECISION = 1  # kilometers
+# the total power is not summed in the order of the sample, so it is only reached up to the rounding errors
+POWER_PRECISION = 1e-9
+
+
+def extract_audit_sample(
+    charge_points: QuerySet[ElecChargePoint],
+    percentage: float,
+    seed: int = None,
+    power_classes: list[float] = None,
+):
+    """
+    Pick a random charge point and sample the stations closest to it, until they hold the wanted share of the power.
+    With `power_classes` (limits in kW), each power class is sampled on its own around the same charge point.
+    """
     charge_points = charge_points.exclude(latitude=None, longitude=None)
 
-    total_power = 0
-    stations = defaultdict(list)
-
-    # group charge points by station
-    for charge_point in charge_points:
-        total_power += charge_point.nominal_power
-        stations[charge_point.station_id].append(charge_point)
-
-    stations_list = list[list[ElecChargePoint]](stations.values())
+    columns = ["pk", "station_id", "nominal_power", "latitude", "longitude"]
+    positions = pd.DataFrame(list(charge_points.values_list(*columns)), columns=columns)
+    if positions.empty:
+        return []
 
     # pick a random charge point
-    ref = random.choice(charge_points)
-
-    # measure the distance between each station and this charge point
-    station_distances = [(station, distance(ref, station[0])) for station in stations_list]
-
-    # sort stations by their distance to this charge point
-    sorted_stations = sorted(station_distances, key=lambda x: x[1])
-
-    # compute how much power is needed
-    remaining_power = total_power * percentage
-
-    # iterate over the stations and add charge points to the sample until the wanted power is reached
-    for station_charge_points, _ in sorted_stations:
-        for charge_point in station_charge_points:
-            charge_point_sample.append(charge_point)
-            remaining_power -= charge_point.nominal_power
-
-            if remaining_power <= 0:
-                return charge_point_sample
-
-    # in case of error
-    return []
-
-
-# copypasta https://stackoverflow.com/a/72621718
-def distance(a: ElecChargePoint, b: ElecChargePoint):
-    import math  # noqa: E402
-
+    rng = random.Random(seed)
+    ref = positions.iloc[rng.randrange(len(positions))]
+
+    if power_classes:
+        power_class = np.digitize(positions["nominal_power"].fillna(0).astype(float), power_classes)
+        groups = [positions[power_class == i] for i in np.unique(power_class)]
+    else:
+        groups = [positions]
+
+    sample_ids = []
+    for group in groups:
+        group_sample_ids = sample_nearest_stations(group, ref, percentage)
+        # a class that can't reach its share of the power fails the whole sample
+        if not group_sample_ids:
+            return []
+        sample_ids += group_sample_ids
+
+    charge_point_by_id = charge_points.in_bulk(sample_ids)
+    return [charge_point_by_id[charge_point_id] for charge_point_id in sample_ids]
+
+
+def sample_nearest_stations(positions: pd.DataFrame, ref: pd.Series, percentage: float) -> list[int]:
+    """Returns the ids of the charge points of the stations closest to the reference, until the power is reached"""
+    nominal_powers = positions["nominal_power"].fillna(0).tolist()
+    total_power = positions["nominal_power"].fillna(0).sum()
+
+    # group charge points by station, the stations being located at their first charge point
+    station_codes, _ = pd.factorize(positions["station_id"], use_na_sentinel=False)
+    charge_points_by_station = np.split(np.argsort(station_codes, kind="stable"), np.cumsum(np.bincount(station_codes))[:-1])
+    first_charge_points = [station[0] for station in charge_points_by_station]
+    latitudes = [float(latitude or 0) for latitude in positions["latitude"].tolist()]
+    longitudes = [float(longitude or 0) for longitude in positions["longitude"].tolist()]
+    index = ChargePointSpatialIndex(
+        [latitudes[i] for i in first_charge_points], [longitudes[i] for i in first_charge_points]
+    )
+
+    ref_latitude, ref_longitude = float(ref["latitude"] or 0), float(ref["longitude"] or 0)
+    charge_point_ids = positions["pk"].tolist()
+
+    # look for the nearest stations first, and further ones only if they don't hold enough power
+    k = 64
+    while True:
+        stations, _ = index.nearest(ref_latitude, ref_longitude, k)
+        # the exact distances sort the candidates, ties being kept in the order of the stations
+        station_distances = [
+            distance(ref_latitude, ref_longitude, latitudes[i], longitudes[i])
+            for i in (first_charge_points[station] for station in stations)
+        ]
+        is_complete = len(stations) == len(index)
+        farthest_distance = max(station_distances)
+
+        # compute how much power is needed
+        remaining_power = total_power * percentage
+        charge_point_sample = []
+
+        # iterate over the stations and add charge points to the sample until the wanted power is reached
+        for station_distance, station in sorted(zip(station_distances, stations.tolist())):
+            # a station out of the candidates could be as close as the farthest ones
+            if not is_complete and station_distance > farthest_distance - DISTANCE_PRECISION:
+                break
+
+            for charge_point in charge_points_by_station[station].tolist():
+                charge_point_sample.append(charge_point_ids[charge_point])
+                remaining_power -= nominal_powers[charge_point]
+
+                if remaining_power <= total_power * POWER_PRECISION:
+                    return charge_point_sample
+
+        if is_complete:
+            # in case of error
+            return []
+        k *= 4
+
+
+def distance(latitude_a: float, longitude_a: float, latitude_b: float, longitude_b: float):
     # Convert all angles to radians
-    lat1_r = math.radians(a.latitude or 0)
-    lon1_r = math.radians(a.longitude or 0)
-    lat2_r = math.radians(b.latitude or 0)
-    lon2_r = math.radians(b.longitude or 0)
+    lat1_r = math.radians(latitude_a)
+    lon1_r = math.radians(longitude_a)
+    lat2_r = math.radians(latitude_b)
+    lon2_r = math.radians(longitude_b)
 
     # Calculate the distance
     dp = math.cos(lat1_r) * math.cos(lat2_r) * math.cos(lon1_r - lon2_r) + math.sin(lat1_r) * math.sin(lat2_r)
-    angle = math.acos(dp)
+    angle = math.acos(min(dp, 1))
 
     earth_radius = 6371.0008  # kilometers
 
@@ -5,6 +5,7 @@ from django import forms
 from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from core.columnar_validator import ColumnarValidator
 from core.utils import Validator
 from elec.models.elec_charge_point import ElecChargePoint
 from elec.services.transport_data_gouv import TransportDataGouv
@@ -107,10 +108,24 @@ class ExcelChargePoints:
                 charge_point_data = charge_point_data.reset_index(drop=True)
 
         # strip whitespaces around cell data for better matching later
-        charge_point_data = charge_point_data.map(lambda x: x.strip() if isinstance(x, str) else x)
+        charge_point_data = ExcelChargePoints.strip_cells(charge_point_data)
 
         return charge_point_data.drop_duplicates("charge_point_id")
 
+    @staticmethod
+    def strip_cells(data: pd.DataFrame):
+        """Strip the string cells column by column, other cells are kept as is"""
+        data = data.copy()
+        for column in data.select_dtypes(include="object").columns:
+            values = data[column]
+            try:
+                stripped = values.str.strip()
+            except AttributeError:
+                # no string in this column
+                continue
+            data[column] = stripped.where(stripped.notna(), values)
+        return data.infer_objects()
+
     def validate_charge_points(
         charge_point_data: pd.DataFrame,
     ):
@@ -118,7 +133,7 @@ class ExcelChargePoints:
         return ExcelChargePointValidator.bulk_validate(charge_points)
 
 
-class ExcelChargePointValidator(Validator):
+class ExcelChargePointValidator(ColumnarValidator):
     # fields from charge point excel template
     charge_point_id = forms.CharField(max_length=64)
     installation_date = forms.DateField(input_formats=Validator.DATE_FORMATS)
@@ -140,32 +155,46 @@ class ExcelChargePointValidator(Validator):
 
     # check if the different possible charge point configurations are respected
     # and if the new data doesn't conflict with TDG or our own DB
-    def validate(self, charge_point):
-        charge_point_id = charge_point.get("charge_point_id")
-
-        if not self.data.get("is_in_tdg"):
-            self.add_error(
-                "charge_point_id",
-                _(
+    def validate_frame(self, charge_points):
+        charge_point_ids = charge_points["charge_point_id"]
+        is_in_tdg = self.data.get("is_in_tdg", pd.Series(None, index=self.data.index, dtype=object)).astype(bool)
+        is_article_2 = is_in_tdg & charge_points["is_article_2"].astype(bool)
+        is_not_article_2 = is_in_tdg & ~charge_points["is_article_2"].astype(bool)
+
+        self.add_error(
+            ~is_in_tdg,
+            "charge_point_id",
+            charge_point_ids[~is_in_tdg].map(
+                lambda charge_point_id: _(
                     "Le point de recharge %(charge_point_id)s n'est pas listé dans les données consolidées de transport.data.gouv.fr"  # noqa: E501
                 )
                 % {"charge_point_id": charge_point_id},
-            )
-        else:
-            if not charge_point.get("nominal_power"):
-                self.add_error("nominal_power", _("La puissance nominale est obligatoire"))
-            if charge_point.get("is_article_2"):
-                if not charge_point.get("measure_reference_point_id"):
-                    self.add_error(
-                        "measure_reference_point_id",
-                        _(
-                            "L'identifiant du point de mesure est obligatoire pour les stations ayant au moins un point de recharge en courant continu."  # noqa: E501
-                        ),
-                    )
-            else:
-                if not charge_point.get("mid_id"):
-                    self.add_error("mid_id", _("Le numéro MID est obligatoire."))
-                if not charge_point.get("measure_date"):
-                    self.add_error("measure_date", _("La date du dernier relevé est obligatoire."))
-                if not isinstance(charge_point.get("measure_energy"), float):
-                    self.add_error("measure_energy", _("L'énergie mesurée lors du dernier relevé est obligatoire."))
+            ),
+        )
+        self.add_error(
+            is_in_tdg & ~charge_points["nominal_power"].astype(bool),
+            "nominal_power",
+            _("La puissance nominale est obligatoire"),
+        )
+        self.add_error(
+            is_article_2 & ~charge_points["measure_reference_point_id"].astype(bool),
+            "measure_reference_point_id",
+            _(
+                "L'identifiant du point de mesure est obligatoire pour les stations ayant au moins un point de recharge en courant continu."  # noqa: E501
+            ),
+        )
+        self.add_error(
+            is_not_article_2 & ~charge_points["mid_id"].astype(bool),
+            "mid_id",
+            _("Le numéro MID est obligatoire."),
+        )
+        self.add_error(
+            is_not_article_2 & ~charge_points["measure_date"].astype(bool),
+            "measure_date",
+            _("La date du dernier relevé est obligatoire."),
+        )
+        self.add_error(
+            is_not_article_2 & charge_points["measure_energy"].isna(),
+            "measure_energy",
+            _("L'énergie mesurée lors du dernier relevé est obligatoire."),
+        )
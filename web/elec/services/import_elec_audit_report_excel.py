@@ -5,6 +5,7 @@ from django.core.files.uploadedfile import UploadedFile
 from django.db.models import QuerySet
 from django.utils.translation import gettext_lazy as _
 
+from core.columnar_validator import ColumnarValidator
 from core.utils import Validator, is_bool_or_none
 from elec.models.elec_audit_charge_point import ElecAuditChargePoint
 from elec.models.elec_charge_point import ElecChargePoint
@@ -59,7 +60,7 @@ class ExcelElecAuditReport:
         return meter_readings_data.to_dict(orient="records")
 
 
-class ExcelElecAuditReportValidator(Validator):
+class ExcelElecAuditReportValidator(ColumnarValidator):
     charge_point_id = forms.CharField()
     observed_mid_or_prm_id = forms.CharField(required=False, max_length=128)
     is_auditable = forms.BooleanField(required=False)
@@ -69,51 +70,53 @@ class ExcelElecAuditReportValidator(Validator):
     observed_energy_reading = forms.FloatField(required=False, min_value=0)
     comment = forms.CharField(required=False, max_length=512)
 
-    def extend(self, report):
-        current_type = report.get("current_type")
-        if current_type in ["AC", "CA"]:
-            report["current_type"] = ElecChargePoint.AC
-        elif current_type in ["DC", "CC"]:
-            report["current_type"] = ElecChargePoint.DC
-        else:
-            report["current_type"] = None
-
-        audit_date = report.get("audit_date")
-        if audit_date is pd.NaT:
-            report["audit_date"] = None
-
-        observed_energy_reading = report.get("observed_energy_reading")
-        if not observed_energy_reading:
-            report["observed_energy_reading"] = None
-
-        return report
-
-    def validate(self, audited_charge_point):
-        charge_point_id = audited_charge_point.get("charge_point_id")
-        expected_ids = self.context.get("audited_charge_point_ids")
-
-        if charge_point_id not in expected_ids:
-            self.add_error(
-                "charge_point_id",
-                _("Le point de charge %(charge_point_id)s ne fait pas partie de l'échantillon sélectionné pour cet audit.")
+    def extend_frame(self, reports):
+        current_types = reports.get("current_type", pd.Series(None, index=reports.index, dtype=object)).copy()
+        reports["current_type"] = None
+        reports.loc[current_types.isin(["AC", "CA"]), "current_type"] = ElecChargePoint.AC
+        reports.loc[current_types.isin(["DC", "CC"]), "current_type"] = ElecChargePoint.DC
+
+        if "audit_date" in reports:
+            reports.loc[reports["audit_date"].map(lambda audit_date: audit_date is pd.NaT), "audit_date"] = None
+
+        observed_energy_readings = reports.get("observed_energy_reading", pd.Series(None, index=reports.index, dtype=object))
+        reports["observed_energy_reading"] = observed_energy_readings.where(observed_energy_readings.astype(bool), None)
+
+        return reports
+
+    def validate_frame(self, audited_charge_points):
+        charge_point_ids = audited_charge_points["charge_point_id"]
+        expected_ids = set(self.context.get("audited_charge_point_ids"))
+
+        is_unexpected = ~charge_point_ids.isin(expected_ids)
+        self.add_error(
+            is_unexpected,
+            "charge_point_id",
+            charge_point_ids[is_unexpected].map(
+                lambda charge_point_id: _(
+                    "Le point de charge %(charge_point_id)s ne fait pas partie de l'échantillon sélectionné pour cet audit."
+                )
                 % {"charge_point_id": charge_point_id},
-            )
+            ),
+        )
 
         # Check if at least one audit field is filled
-        has_audit_data = all(
-            [
-                audited_charge_point.get("observed_mid_or_prm_id"),
-                audited_charge_point.get("current_type"),
-                audited_charge_point.get("audit_date") is not None,
-                audited_charge_point.get("observed_energy_reading") is not None,
-                audited_charge_point.get("is_auditable") is not None,
-                audited_charge_point.get("has_dedicated_pdl") is not None,
-            ]
+        has_audit_data = (
+            audited_charge_points["observed_mid_or_prm_id"].astype(bool)
+            & audited_charge_points["current_type"].astype(bool)
+            & audited_charge_points["audit_date"].notna()
+            & audited_charge_points["observed_energy_reading"].notna()
+            & audited_charge_points["is_auditable"].notna()
+            & audited_charge_points["has_dedicated_pdl"].notna()
         )
 
-        if not has_audit_data:
-            self.add_error(
-                "charge_point_id",
-                _("Les informations relatives au point de charge %(charge_point_id)s sont incomplètes ou absentes.")
+        self.add_error(
+            ~has_audit_data,
+            "charge_point_id",
+            charge_point_ids[~has_audit_data].map(
+                lambda charge_point_id: _(
+                    "Les informations relatives au point de charge %(charge_point_id)s sont incomplètes ou absentes."
+                )
                 % {"charge_point_id": charge_point_id},
-            )
+            ),
+        )
@@ -1,4 +1,3 @@
-from collections import defaultdict
 from datetime import date
 from typing import Iterable
 
@@ -7,10 +6,12 @@ from django import forms
 from django.core.files.uploadedfile import UploadedFile
 from django.utils.translation import gettext_lazy as _
 
+from core.columnar_validator import ColumnarValidator
 from core.utils import Validator
 from elec.models.elec_charge_point import ElecChargePoint
 from elec.models.elec_meter import ElecMeter
 from elec.repositories.meter_reading_repository import MeterReadingRepository
+from elec.services.meter_reading_energy import get_load_factor
 
 
 def import_meter_reading_excel(
@@ -64,14 +65,9 @@ class ExcelMeterReadings:
         charge_points = MeterReadingRepository.annotate_charge_points_with_latest_index(charge_points)
         charge_point_by_id = {cp.charge_point_id: cp for cp in charge_points}
 
-        lines_by_charge_point = defaultdict(list)
-        for reading in meter_readings:
-            lines_by_charge_point[reading.get("charge_point_id")].append(reading.get("line"))
-
         context = {
             "renewable_share": renewable_share,
             "charge_point_by_id": charge_point_by_id,
-            "lines_by_charge_point": lines_by_charge_point,
             "beginning_of_quarter": beginning_of_quarter,
             "end_of_quarter": end_of_quarter,
         }
@@ -79,7 +75,7 @@ class ExcelMeterReadings:
         return ExcelMeterReadingValidator.bulk_validate(meter_readings, context)
 
 
-class ExcelMeterReadingValidator(Validator):
+class ExcelMeterReadingValidator(ColumnarValidator):
     meter = forms.ModelChoiceField(queryset=ElecMeter.objects.all(), required=False)
     extracted_energy = forms.FloatField(min_value=0)
     reading_date = forms.DateField(input_formats=Validator.DATE_FORMATS)
@@ -87,97 +83,155 @@ class ExcelMeterReadingValidator(Validator):
     # renewable_energy = forms.FloatField()
     charge_point_id = forms.CharField()
 
-    def extend(self, meter_reading):
-        meter_reading["meter"] = None
-        meter_reading["operating_unit"] = None
-        return meter_reading
-
-    def validate(self, meter_reading):
-        charge_point_id = meter_reading.get("charge_point_id")
-
-        charge_point = self.context.get("charge_point_by_id").get(charge_point_id)
-
-        lines = self.context.get("lines_by_charge_point").get(charge_point_id)
+    def extend_frame(self, meter_readings):
+        meter_readings["meter"] = None
+        meter_readings["operating_unit"] = None
+        return meter_readings
 
-        meter = charge_point.current_meter if charge_point else None
-        charge_point_power = charge_point.nominal_power if charge_point else 0
+    def validate_frame(self, meter_readings):
+        charge_point_ids = meter_readings["charge_point_id"]
+        charge_points = self.get_previous_readings(charge_point_ids)
 
-        previous_extracted_energy = 0
-        if charge_point and charge_point.latest_reading_index is not None:
-            previous_extracted_energy = charge_point.latest_reading_index
-        elif meter:
-            previous_extracted_energy = meter.initial_index or 0
+        charge_point = charge_points["charge_point"]
+        meter = charge_points["meter"]
+        previous_extracted_energy = charge_points["previous_extracted_energy"]
+        previous_reading_day = charge_points["previous_reading_day"]
 
-        previous_extracted_energy = round(previous_extracted_energy, 3)
-        new_extracted_energy = round(meter_reading.get("extracted_energy", 0), 3)
-        energy_used_since_last_reading = round(new_extracted_energy - previous_extracted_energy, 3)
+        new_extracted_energy = round_energy(meter_readings["extracted_energy"].astype(float).fillna(0))
+        energy_used_since_last_reading = round_energy(new_extracted_energy - previous_extracted_energy)
 
-        previous_reading_date = date.min
-        operating_unit = None
-        if charge_point and charge_point.latest_reading_date is not None:
-            previous_reading_date = charge_point.latest_reading_date
-            operating_unit = charge_point.charge_point_id[:5]
-        elif meter:
-            previous_reading_date = meter.initial_index_date or date.min
-            operating_unit = meter.charge_point.charge_point_id[:5] if meter.charge_point else None
+        # a reading without a valid date already has an error, the checks on its date are skipped
+        reading_date = meter_readings["reading_date"]
+        reading_day = reading_date.map(date.toordinal, na_action="ignore").astype(float)
+        days_since_last_reading = (reading_day - previous_reading_day).fillna(0)
 
-        meter_reading["operating_unit"] = operating_unit
+        facteur_de_charge = get_load_factor(
+            energy_used_since_last_reading, charge_points["nominal_power"], days_since_last_reading
+        )
 
-        new_reading_date = meter_reading["reading_date"]
-        days_since_last_reading = (new_reading_date - previous_reading_date).days
+        meter_readings["meter"] = meter
+        meter_readings["operating_unit"] = charge_points["operating_unit"]
 
-        facteur_de_charge = 0
-        if charge_point_power and days_since_last_reading:
-            facteur_de_charge = energy_used_since_last_reading / (charge_point_power * days_since_last_reading * 24)
+        is_registered = charge_point.notna()
+        self.add_error(
+            ~is_registered,
+            "charge_point_id",
+            _("Le point de recharge n'a pas encore été inscrit sur la plateforme."),
+        )
+        self.add_error(
+            is_registered & meter.isna(),
+            "charge_point_id",
+            _(
+                "Ce point de recharge n'a pas de compteur associé, veuillez en ajouter un depuis la page dédiée."  # noqa
+            ),
+        )
+        self.add_error(
+            is_registered & meter.notna() & (new_extracted_energy < previous_extracted_energy),
+            "extracted_energy",
+            _("La quantité d'énergie soutirée est inférieure au précédent relevé."),
+        )
 
-        meter_reading["meter"] = meter
+        is_duplicate = charge_point_ids.notna() & charge_point_ids.duplicated(keep=False)
+        lines = self.data["line"][is_duplicate].groupby(charge_point_ids[is_duplicate], sort=False).agg(list)
+        self.add_error(
+            is_duplicate,
+            "charge_point_id",
+            charge_point_ids[is_duplicate].map(
+                lambda charge_point_id: _("Ce point de recharge a été défini %(count)d fois (lignes %(lines)s)")
+                % {
+                    "count": len(lines[charge_point_id]),
+                    "lines": ", ".join(str(num) for num in lines[charge_point_id]),
+                }
+            ),
+        )
 
-        reading_date = meter_reading.get("reading_date")
+        is_outdated = reading_day < previous_reading_day
+        self.add_error(
+            is_outdated,
+            "reading_date",
+            charge_points[is_outdated].apply(
+                lambda previous: _(
+                    "Un relevé plus récent est déjà enregistré pour ce point de recharge: %(energy)gkWh, %(date)s"
+                )
+                % {
+                    "energy": previous["previous_extracted_energy"],
+                    "date": previous["previous_reading_date"].strftime("%d/%m/%Y"),
+                },
+                axis=1,
+            ),
+        )
 
-        if charge_point is None:
-            self.add_error(
-                "charge_point_id",
-                _("Le point de recharge n'a pas encore été inscrit sur la plateforme."),
-            )
-        elif meter is None:
-            self.add_error(
-                "charge_point_id",
-                _(
-                    "Ce point de recharge n'a pas de compteur associé, veuillez en ajouter un depuis la page dédiée."  # noqa
-                ),
-            )
-        elif new_extracted_energy < previous_extracted_energy:
-            self.add_error("extracted_energy", _("La quantité d'énergie soutirée est inférieure au précédent relevé."))
+        self.add_error(
+            facteur_de_charge > 1,
+            "extracted_energy",
+            _(
+                "Le facteur de charge estimé depuis le dernier relevé enregistré est supérieur à 100%. Veuillez vérifier les valeurs du relevé ainsi que la puissance de votre point de recharge, renseignée sur TDG."  # noqa: E501
+            ),
+        )
 
-        if len(lines) > 1:
-            self.add_error(
-                "charge_point_id",
-                _("Ce point de recharge a été défini %(count)d fois (lignes %(lines)s)")
-                % {"count": len(lines), "lines": ", ".join(str(num) for num in lines)},
-            )
+        self.add_error(
+            is_registered & charge_points["is_article_2"],
+            "charge_point_id",
+            _("Ce point de recharge n'est pas soumis aux relevés trimestriels, veuillez le supprimer du fichier."),
+        )
 
-        if reading_date < previous_reading_date:
+        beginning_of_quarter = self.context.get("beginning_of_quarter")
+        end_of_quarter = self.context.get("end_of_quarter")
+        if beginning_of_quarter:
+            is_out_of_quarter = (reading_day < beginning_of_quarter.toordinal()) | (reading_day > end_of_quarter.toordinal())
             self.add_error(
+                is_out_of_quarter,
                 "reading_date",
-                _("Un relevé plus récent est déjà enregistré pour ce point de recharge: %(energy)gkWh, %(date)s")
-                % {"energy": previous_extracted_energy, "date": previous_reading_date.strftime("%d/%m/%Y")},
+                _("La date du relevé ne correspond pas au trimestre traité actuellement."),
             )
 
-        if facteur_de_charge > 1:
-            self.add_error(
-                "extracted_energy",
-                _(
-                    "Le facteur de charge estimé depuis le dernier relevé enregistré est supérieur à 100%. Veuillez vérifier les valeurs du relevé ainsi que la puissance de votre point de recharge, renseignée sur TDG."  # noqa: E501
-                ),
+    def get_previous_readings(self, charge_point_ids: pd.Series) -> pd.DataFrame:
+        """Returns the charge point of each reading, with its meter and its latest reading"""
+        charge_point_by_id = self.context.get("charge_point_by_id")
+        codes, unique_ids = pd.factorize(charge_point_ids, use_na_sentinel=False)
+
+        previous_readings = []
+        for charge_point_id in unique_ids:
+            charge_point = charge_point_by_id.get(charge_point_id) if isinstance(charge_point_id, str) else None
+            meter = charge_point.current_meter if charge_point else None
+
+            previous_extracted_energy = 0
+            if charge_point and charge_point.latest_reading_index is not None:
+                previous_extracted_energy = charge_point.latest_reading_index
+            elif meter:
+                previous_extracted_energy = meter.initial_index or 0
+
+            previous_reading_date = date.min
+            operating_unit = None
+            if charge_point and charge_point.latest_reading_date is not None:
+                previous_reading_date = charge_point.latest_reading_date
+                operating_unit = charge_point.charge_point_id[:5]
+            elif meter:
+                previous_reading_date = meter.initial_index_date or date.min
+                operating_unit = meter.charge_point.charge_point_id[:5] if meter.charge_point else None
+
+            previous_readings.append(
+                {
+                    "charge_point": charge_point,
+                    "meter": meter,
+                    "nominal_power": (charge_point.nominal_power if charge_point else 0) or 0,
+                    "is_article_2": bool(charge_point and charge_point.is_article_2),
+                    "previous_extracted_energy": round(previous_extracted_energy, 3),
+                    "previous_reading_date": previous_reading_date,
+                    "previous_reading_day": previous_reading_date.toordinal(),
+                    "operating_unit": operating_unit,
+                }
             )
 
-        if charge_point is not None and charge_point.is_article_2:
-            self.add_error(
-                "charge_point_id",
-                _("Ce point de recharge n'est pas soumis aux relevés trimestriels, veuillez le supprimer du fichier."),
-            )
+        columns = ["charge_point", "meter", "nominal_power", "is_article_2"]
+        columns += ["previous_extracted_energy", "previous_reading_date", "previous_reading_day", "operating_unit"]
+        previous_readings = pd.DataFrame(previous_readings, columns=columns, dtype=object)
+        previous_readings = previous_readings.iloc[codes].set_index(charge_point_ids.index)
+        return previous_readings.astype(
+            {"nominal_power": float, "is_article_2": bool, "previous_extracted_energy": float, "previous_reading_day": float}
+        )
 
-        beginning_of_quarter = self.context.get("beginning_of_quarter")
-        end_of_quarter = self.context.get("end_of_quarter")
-        if reading_date and beginning_of_quarter and (reading_date < beginning_of_quarter or reading_date > end_of_quarter):
-            self.add_error("reading_date", _("La date du relevé ne correspond pas au trimestre traité actuellement."))
+
+def round_energy(energy: pd.Series) -> pd.Series:
+    # python's round() rather than numpy's, which can differ on the last digit
+    return energy.map(lambda value: round(float(value), 3)).astype(float)
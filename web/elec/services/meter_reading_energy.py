@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from django.db.models import QuerySet
+
+from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
+
+
+def get_renewable_energy(current_index: pd.Series, previous_index: pd.Series, enr_ratio: pd.Series) -> pd.Series:
+    """Renewable energy in kWh of each reading, 0 when a value is missing like ElecMeterReadingVirtual.renewable_energy"""
+    current_index = current_index.astype(float)
+    previous_index = previous_index.astype(float)
+    enr_ratio = enr_ratio.astype(float)
+    return ((current_index - previous_index) * enr_ratio).fillna(0)
+
+
+def get_load_factor(energy: pd.Series, nominal_power: pd.Series, days: pd.Series) -> pd.Series:
+    """Share of the time a charge point was used at full power between two readings, 0 if it can't be computed"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        load_factor = energy / (nominal_power * days * 24)
+    return load_factor.where((nominal_power != 0) & (days != 0), 0)
+
+
+def get_meter_readings_energy(meter_readings: QuerySet[ElecMeterReadingVirtual]) -> pd.DataFrame:
+    """Returns the operating unit and renewable energy of each meter reading, read with a single query"""
+    columns = ["charge_point__charge_point_id", "current_index", "prev_index", "enr_ratio"]
+    meter_readings = pd.DataFrame(list(meter_readings.values_list(*columns)), columns=columns)
+
+    return pd.DataFrame(
+        {
+            "renewable_energy": get_renewable_energy(
+                meter_readings["current_index"], meter_readings["prev_index"], meter_readings["enr_ratio"]
+            ),
+            "operating_unit": meter_readings["charge_point__charge_point_id"].str[:5],
+        }
+    )
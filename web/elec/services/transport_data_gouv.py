@@ -1,6 +1,11 @@
 import os
+import sqlite3
+import tempfile
+import traceback
+from contextlib import closing
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
 import requests
 from dateutil.parser import isoparse
@@ -25,6 +30,8 @@ class TransportDataGouv:
         "siren_amenageur",
     ]
 
+    CSV_DATE_COLUMNS = ["last_modified", "date_maj"]
+
     CSV_COLUMNS_ALIAS = {
         "id_pdc_itinerance": "charge_point_id",
         "id_station_itinerance": "station_id",
@@ -48,6 +55,10 @@ class TransportDataGouv:
         "siren_amenageur": "first",
     }
 
+    # local sqlite copy of the csv, to find charge points without reading the whole file
+    INDEX_TABLE = "charge_points"
+    INDEX_CHUNKSIZE = 50000
+
     DB_COLUMNS = [
         "line",
         "charge_point_id",
@@ -80,35 +91,143 @@ class TransportDataGouv:
         # list the different charge point ids from the application
         wanted_ids = charge_point_data["charge_point_id"].unique().tolist()
 
-        # find all the different stations for the application's charge points
+        # find all the charge points of the stations of the application's charge points
+        index_path = TransportDataGouv.get_csv_index(file_path)
+        if index_path:
+            transport_data = TransportDataGouv.find_station_charge_points(index_path, wanted_ids)
+        else:
+            transport_data = TransportDataGouv.scan_station_charge_points(file_path, wanted_ids, chunksize)
+
+        # instead of droping duplicate rows, merge their values so we get as much data as possible
+        transport_data = TransportDataGouv.merge_duplicates(transport_data).reset_index()
+
+        transport_data = transport_data.rename(columns=TransportDataGouv.CSV_COLUMNS_ALIAS)
+        transport_data = transport_data.sort_values("date_maj", ascending=False)
+
+        transport_data = transport_data.fillna("")
+
+        # mark the charge points as coming from TDG
+        transport_data["is_in_tdg"] = True
+
+        return transport_data
+
+    @staticmethod
+    def merge_duplicates(transport_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Same as `groupby("id_pdc_itinerance").agg(CSV_COLUMNS_MERGE)`, but the max of the text columns is the last
+        value of the group once sorted, as pandas would compute it in python for each group
+        """
+        merge = TransportDataGouv.CSV_COLUMNS_MERGE
+        text_columns = [col for col, how in merge.items() if how == "max" and transport_data[col].dtype == object]
+
+        groups = transport_data.groupby("id_pdc_itinerance", as_index=False)
+        merged_data = groups.agg({col: how for col, how in merge.items() if col not in text_columns})
+        for col in text_columns:
+            sorted_data = transport_data.sort_values(col, kind="stable")
+            merged_data[col] = sorted_data.groupby("id_pdc_itinerance")[col].last().to_numpy()
+
+        return merged_data[list(merge)]
+
+    @staticmethod
+    def scan_station_charge_points(file_path: str, wanted_ids: list, chunksize=1000) -> pd.DataFrame:
+        """Read the whole csv twice to find the stations of the wanted charge points, then all their charge points"""
         wanted_stations = set()
         for chunk in TransportDataGouv.read_transport_data_chunks(file_path, chunksize):
             wanted_chunk = chunk[chunk["id_pdc_itinerance"].isin(wanted_ids)]
             wanted_stations.update(wanted_chunk["id_station_itinerance"].unique())
 
-        # find all the charge points for all these stations
         chunk_dfs = []
         for chunk in TransportDataGouv.read_transport_data_chunks(file_path, chunksize):
             station_charge_points = chunk[chunk["id_station_itinerance"].isin(wanted_stations)]
             chunk_dfs.append(station_charge_points)
 
-        transport_data = pd.concat(chunk_dfs, ignore_index=True)
+        return pd.concat(chunk_dfs, ignore_index=True)
 
-        # instead of droping duplicate rows, merge their values so we get as much data as possible
-        transport_data = (
-            transport_data.groupby("id_pdc_itinerance", as_index=False)
-            .agg(TransportDataGouv.CSV_COLUMNS_MERGE)
-            .reset_index()
-        )
+    @staticmethod
+    def find_station_charge_points(index_path: str, wanted_ids: list) -> pd.DataFrame:
+        """Same as scan_station_charge_points, with the sqlite index of the csv"""
+        with closing(sqlite3.connect(index_path)) as connection:
+            connection.execute("CREATE TEMP TABLE wanted_charge_points (id TEXT PRIMARY KEY)")
+            connection.executemany(
+                "INSERT OR IGNORE INTO wanted_charge_points VALUES (?)",
+                [(charge_point_id,) for charge_point_id in wanted_ids if isinstance(charge_point_id, str)],
+            )
+            # rows are kept in the order of the csv, so the merge of duplicates picks the same values
+            transport_data = pd.read_sql(
+                f"""
+                SELECT {", ".join(TransportDataGouv.CSV_COLUMNS)} FROM {TransportDataGouv.INDEX_TABLE}
+                WHERE id_station_itinerance IN (
+                    SELECT id_station_itinerance FROM {TransportDataGouv.INDEX_TABLE}
+                    WHERE id_pdc_itinerance IN (SELECT id FROM wanted_charge_points)
+                )
+                ORDER BY rowid
+                """,
+                connection,
+            )
 
-        transport_data = transport_data.rename(columns=TransportDataGouv.CSV_COLUMNS_ALIAS)
-        transport_data = transport_data.sort_values("date_maj", ascending=False)
+        return TransportDataGouv.parse_index_rows(transport_data)
 
-        transport_data = transport_data.fillna("")
+    @staticmethod
+    def get_csv_index(file_path: str) -> str | None:
+        """
+        Returns the path of a sqlite copy of the csv indexed by charge point and station ids, built on first use.
+        The index is named after the size and modification date of the csv, so a new version of the dataset
+        gets a new index. Returns None if the index can't be built.
+        """
+        stat = os.stat(file_path)
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        index_path = os.path.join(tempfile.gettempdir(), f"{name}_{stat.st_size}_{stat.st_mtime_ns}.sqlite3")
+
+        if not os.path.exists(index_path):
+            try:
+                TransportDataGouv.build_csv_index(file_path, index_path)
+            except Exception:
+                traceback.print_exc()
+                return None
+
+        return index_path
 
-        # mark the charge points as coming from TDG
-        transport_data["is_in_tdg"] = True
+    @staticmethod
+    def build_csv_index(file_path: str, index_path: str):
+        # write to a temporary file first, so a concurrent lookup never sees a partial index
+        file, build_path = tempfile.mkstemp(suffix=".sqlite3", dir=os.path.dirname(index_path))
+        os.close(file)
+
+        try:
+            with closing(sqlite3.connect(build_path)) as connection:
+                # untyped columns keep the values as parsed by pandas
+                connection.execute(
+                    f"CREATE TABLE {TransportDataGouv.INDEX_TABLE} ({', '.join(TransportDataGouv.CSV_COLUMNS)})"
+                )
+                for chunk in TransportDataGouv.read_transport_data_chunks(
+                    file_path,
+                    TransportDataGouv.INDEX_CHUNKSIZE,
+                    engine="c",
+                    parse_dates=False,
+                ):
+                    chunk.to_sql(TransportDataGouv.INDEX_TABLE, connection, if_exists="append", index=False)
+
+                connection.execute(
+                    f"CREATE INDEX charge_point_id_index ON {TransportDataGouv.INDEX_TABLE} (id_pdc_itinerance)"
+                )
+                connection.execute(
+                    f"CREATE INDEX station_id_index ON {TransportDataGouv.INDEX_TABLE} (id_station_itinerance)"
+                )
+                connection.commit()
+            os.replace(build_path, index_path)
+        except Exception:
+            os.remove(build_path)
+            raise
 
+    @staticmethod
+    def parse_index_rows(transport_data: pd.DataFrame) -> pd.DataFrame:
+        # same types as the ones read from the csv
+        transport_data = transport_data.where(transport_data.notna(), np.nan)
+        for column in TransportDataGouv.CSV_DATE_COLUMNS:
+            try:
+                transport_data[column] = pd.to_datetime(transport_data[column], dayfirst=False)
+            except (ValueError, TypeError):
+                pass
         return transport_data
 
     @staticmethod
@@ -134,16 +253,20 @@ class TransportDataGouv:
         return file_path
 
     @staticmethod
-    def read_transport_data_chunks(file_path: str, chunksize=1000) -> Iterable[pd.DataFrame]:
+    def read_transport_data_chunks(
+        file_path: str, chunksize=1000, engine="python", parse_dates=True
+    ) -> Iterable[pd.DataFrame]:
         transport_data = pd.read_csv(
             file_path,
             sep=",",
             header=0,
             usecols=TransportDataGouv.CSV_COLUMNS,
-            parse_dates=["last_modified", "date_maj"],
+            parse_dates=TransportDataGouv.CSV_DATE_COLUMNS if parse_dates else False,
             dayfirst=False,
             encoding="utf-8",
-            engine="python",
+            engine=engine,
+            # the c engine rounds floats like python does
+            float_precision="round_trip" if engine == "c" else None,
             dtype={"prise_type_combo_ccs": "str", "prise_type_chademo": "str", "siren_amenageur": "str"},
             skip_blank_lines=True,
             chunksize=chunksize,
@@ -153,17 +276,11 @@ class TransportDataGouv:
 
     @staticmethod
     def enrich_charge_point_data(charge_point_data: pd.DataFrame, transport_data: pd.DataFrame):
-        longitude = [
-            coord.replace("[", "").replace("]", "").replace("\xa0", "").split(",")[0]
-            for coord in transport_data.coordonneesXY
-        ]
-        latitude = [
-            coord.replace("[", "").replace("]", "").replace("\xa0", "").split(",")[1]
-            for coord in transport_data.coordonneesXY
-        ]
-
-        transport_data["latitude"] = latitude
-        transport_data["longitude"] = longitude
+        # coordinates are written "[longitude, latitude]"
+        coordinates = transport_data["coordonneesXY"].astype(str).str.replace(r"[\[\]\xa0]", "", regex=True)
+        coordinates = coordinates.str.split(",", n=2, expand=True).reindex(columns=[0, 1])
+        transport_data["latitude"] = coordinates[1]
+        transport_data["longitude"] = coordinates[0]
 
         transport_data["operating_unit"] = transport_data["charge_point_id"].str[:5]
 
@@ -176,14 +293,14 @@ class TransportDataGouv:
         transport_data["prise_type_combo_ccs"] = is_true(transport_data, "prise_type_combo_ccs")
         transport_data["prise_type_chademo"] = is_true(transport_data, "prise_type_chademo")
         transport_data.insert(0, "DC", transport_data["prise_type_combo_ccs"] | transport_data["prise_type_chademo"])
-        transport_data["guessed_current_type"] = transport_data["DC"].apply(lambda is_dc: "DC" if is_dc else "AC")
+        transport_data["guessed_current_type"] = np.where(transport_data["DC"], "DC", "AC").astype(object)
 
-        # find all stations that contain at least one DC point
-        stations_art2 = transport_data[["station_id", "DC"]].groupby("station_id").max()
-        stations_art2 = stations_art2.rename(columns={"DC": "guessed_is_article_2"})
+        # charge points without a station can't be matched to one, they are left out
+        transport_data = transport_data[transport_data["station_id"].notna()]
 
-        # mark all the charge points of these stations as eligible to article 2
-        transport_data = transport_data.merge(stations_art2, on="station_id")
+        # mark all the charge points of the stations that contain at least one DC point as eligible to article 2
+        transport_data["guessed_is_article_2"] = transport_data.groupby("station_id")["DC"].transform("max").astype(bool)
+        transport_data = transport_data.reset_index(drop=True)
 
         # merge the imported excel data with transport.data.gouv data to have all info in one place
         merged_data = charge_point_data.merge(transport_data, on="charge_point_id", how="outer", suffixes=("_old", "_new"))
@@ -229,11 +346,7 @@ class TransportDataGouv:
 
         # check if all the charge points of a same station all have readings defined
         # in that case, they won't be considered for article 2, even if there are DC charge points
-        merged_data["whole_station_has_readings"] = (
-            merged_data.groupby("station_id")["has_reading"]
-            .transform(lambda x: all(x != False))  # noqa: E712
-            .reset_index()["has_reading"]
-        )
+        merged_data["whole_station_has_readings"] = merged_data.groupby("station_id")["has_reading"].transform("all")
 
         # for article 2, use the data filled by the user or combine the info we get from TDG with the computations above
         merged_data["guessed_is_article_2"] = (
@@ -250,6 +363,13 @@ class TransportDataGouv:
     @staticmethod
     def is_check_point_in_tdg(charge_point_id: str) -> bool:
         file_path = TransportDataGouv.download_csv()
+
+        index_path = TransportDataGouv.get_csv_index(file_path)
+        if index_path:
+            with closing(sqlite3.connect(index_path)) as connection:
+                query = f"SELECT 1 FROM {TransportDataGouv.INDEX_TABLE} WHERE id_pdc_itinerance = ? LIMIT 1"
+                return connection.execute(query, (charge_point_id,)).fetchone() is not None
+
         for chunk in TransportDataGouv.read_transport_data_chunks(file_path):
             if charge_point_id in chunk["id_pdc_itinerance"].values:
                 return True
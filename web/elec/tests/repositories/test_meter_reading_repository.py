@@ -88,7 +88,7 @@ class TestAnnotateChargePointsWithLatestIndex(TestCase):
         annotated = MeterReadingRepository.annotate_charge_points_with_latest_index(charge_points)
 
         # Verify results
-        cp = annotated.first()
+        cp = annotated[0]
 
         # Verify latest_reading_index: should be the extracted_energy value
         self.assertEqual(cp.latest_reading_index, 1500.0)
@@ -104,7 +104,7 @@ class TestAnnotateChargePointsWithLatestIndex(TestCase):
         annotated = MeterReadingRepository.annotate_charge_points_with_latest_index(charge_points)
 
         # Verify results
-        cp = annotated.first()
+        cp = annotated[0]
 
         # Verify latest_reading_index: should fallback to meter's initial_index
         self.assertEqual(cp.latest_reading_index, 1000.0)
@@ -147,7 +147,7 @@ class TestAnnotateChargePointsWithLatestIndex(TestCase):
         annotated = MeterReadingRepository.annotate_charge_points_with_latest_index(charge_points)
 
         # Verify results
-        cp = annotated.first()
+        cp = annotated[0]
 
         # latest_reading should be the last reading (highest date)
         self.assertEqual(cp.latest_reading_index, 1800.0)
@@ -0,0 +1,176 @@
+from collections import defaultdict
+from datetime import date
+
+from django import forms
+from django.utils.translation import gettext_lazy as _
+
+from core.utils import Validator
+from elec.models.elec_charge_point import ElecChargePoint
+from elec.models.elec_meter import ElecMeter
+
+
+# legacy copy of the validations with one django form per row, kept as a reference point
+def validate_meter_readings_legacy(meter_readings, context):
+    lines_by_charge_point = defaultdict(list)
+    for reading in meter_readings:
+        lines_by_charge_point[reading.get("charge_point_id").strip()].append(reading.get("line"))
+    context = {**context, "lines_by_charge_point": lines_by_charge_point}
+    return ExcelMeterReadingValidatorLegacy.bulk_validate([dict(reading) for reading in meter_readings], context)
+
+
+class ExcelMeterReadingValidatorLegacy(Validator):
+    meter = forms.ModelChoiceField(queryset=ElecMeter.objects.all(), required=False)
+    extracted_energy = forms.FloatField(min_value=0)
+    reading_date = forms.DateField(input_formats=Validator.DATE_FORMATS)
+    charge_point_id = forms.CharField()
+
+    def extend(self, meter_reading):
+        meter_reading["meter"] = None
+        meter_reading["operating_unit"] = None
+        return meter_reading
+
+    def validate(self, meter_reading):
+        charge_point_id = meter_reading.get("charge_point_id")
+
+        charge_point = self.context.get("charge_point_by_id").get(charge_point_id)
+
+        # the lines are grouped by stripped id, a raw id with spaces could not be found
+        lines = self.context.get("lines_by_charge_point").get(charge_point_id)
+
+        meter = charge_point.current_meter if charge_point else None
+        charge_point_power = charge_point.nominal_power if charge_point else 0
+
+        previous_extracted_energy = 0
+        if charge_point and charge_point.latest_reading_index is not None:
+            previous_extracted_energy = charge_point.latest_reading_index
+        elif meter:
+            previous_extracted_energy = meter.initial_index or 0
+
+        previous_extracted_energy = round(previous_extracted_energy, 3)
+        new_extracted_energy = round(meter_reading.get("extracted_energy", 0), 3)
+        energy_used_since_last_reading = round(new_extracted_energy - previous_extracted_energy, 3)
+
+        previous_reading_date = date.min
+        operating_unit = None
+        if charge_point and charge_point.latest_reading_date is not None:
+            previous_reading_date = charge_point.latest_reading_date
+            operating_unit = charge_point.charge_point_id[:5]
+        elif meter:
+            previous_reading_date = meter.initial_index_date or date.min
+            operating_unit = meter.charge_point.charge_point_id[:5] if meter.charge_point else None
+
+        meter_reading["operating_unit"] = operating_unit
+
+        # an invalid date failed with a TypeError
+        new_reading_date = meter_reading.get("reading_date")
+        days_since_last_reading = (new_reading_date - previous_reading_date).days if new_reading_date else 0
+
+        facteur_de_charge = 0
+        if charge_point_power and days_since_last_reading:
+            facteur_de_charge = energy_used_since_last_reading / (charge_point_power * days_since_last_reading * 24)
+
+        meter_reading["meter"] = meter
+
+        reading_date = meter_reading.get("reading_date")
+
+        if charge_point is None:
+            self.add_error(
+                "charge_point_id",
+                _("Le point de recharge n'a pas encore été inscrit sur la plateforme."),
+            )
+        elif meter is None:
+            self.add_error(
+                "charge_point_id",
+                _(
+                    "Ce point de recharge n'a pas de compteur associé, veuillez en ajouter un depuis la page dédiée."  # noqa
+                ),
+            )
+        elif new_extracted_energy < previous_extracted_energy:
+            self.add_error("extracted_energy", _("La quantité d'énergie soutirée est inférieure au précédent relevé."))
+
+        if lines and len(lines) > 1:
+            self.add_error(
+                "charge_point_id",
+                _("Ce point de recharge a été défini %(count)d fois (lignes %(lines)s)")
+                % {"count": len(lines), "lines": ", ".join(str(num) for num in lines)},
+            )
+
+        if reading_date and reading_date < previous_reading_date:
+            self.add_error(
+                "reading_date",
+                _("Un relevé plus récent est déjà enregistré pour ce point de recharge: %(energy)gkWh, %(date)s")
+                % {"energy": previous_extracted_energy, "date": previous_reading_date.strftime("%d/%m/%Y")},
+            )
+
+        if facteur_de_charge > 1:
+            self.add_error(
+                "extracted_energy",
+                _(
+                    "Le facteur de charge estimé depuis le dernier relevé enregistré est supérieur à 100%. Veuillez vérifier les valeurs du relevé ainsi que la puissance de votre point de recharge, renseignée sur TDG."  # noqa: E501
+                ),
+            )
+
+        if charge_point is not None and charge_point.is_article_2:
+            self.add_error(
+                "charge_point_id",
+                _("Ce point de recharge n'est pas soumis aux relevés trimestriels, veuillez le supprimer du fichier."),
+            )
+
+        beginning_of_quarter = self.context.get("beginning_of_quarter")
+        end_of_quarter = self.context.get("end_of_quarter")
+        if reading_date and beginning_of_quarter and (reading_date < beginning_of_quarter or reading_date > end_of_quarter):
+            self.add_error("reading_date", _("La date du relevé ne correspond pas au trimestre traité actuellement."))
+
+
+class ExcelChargePointValidatorLegacy(Validator):
+    charge_point_id = forms.CharField(max_length=64)
+    installation_date = forms.DateField(input_formats=Validator.DATE_FORMATS)
+    mid_id = forms.CharField(required=False, max_length=128)
+    measure_date = forms.DateField(required=False, input_formats=Validator.DATE_FORMATS)
+    measure_energy = forms.FloatField(required=False, min_value=0)
+    measure_reference_point_id = forms.CharField(required=False, max_length=64)
+    is_article_2 = forms.BooleanField(required=False)
+    station_id = forms.CharField(required=False)
+    station_name = forms.CharField(required=False)
+    nominal_power = forms.FloatField(required=False)
+    current_type = forms.ChoiceField(required=False, choices=ElecChargePoint.CURRENT_TYPES)
+    cpo_name = forms.CharField(required=False)
+    cpo_siren = forms.CharField(required=False)
+    latitude = forms.DecimalField(required=False)
+    longitude = forms.DecimalField(required=False)
+
+    def validate(self, charge_point):
+        charge_point_id = charge_point.get("charge_point_id")
+
+        if not self.data.get("is_in_tdg"):
+            self.add_error(
+                "charge_point_id",
+                _(
+                    "Le point de recharge %(charge_point_id)s n'est pas listé dans les données consolidées de transport.data.gouv.fr"  # noqa: E501
+                )
+                % {"charge_point_id": charge_point_id},
+            )
+        else:
+            if not charge_point.get("nominal_power"):
+                self.add_error("nominal_power", _("La puissance nominale est obligatoire"))
+            if charge_point.get("is_article_2"):
+                if not charge_point.get("measure_reference_point_id"):
+                    self.add_error(
+                        "measure_reference_point_id",
+                        _(
+                            "L'identifiant du point de mesure est obligatoire pour les stations ayant au moins un point de recharge en courant continu."  # noqa: E501
+                        ),
+                    )
+            else:
+                if not charge_point.get("mid_id"):
+                    self.add_error("mid_id", _("Le numéro MID est obligatoire."))
+                if not charge_point.get("measure_date"):
+                    self.add_error("measure_date", _("La date du dernier relevé est obligatoire."))
+                if not isinstance(charge_point.get("measure_energy"), float):
+                    self.add_error("measure_energy", _("L'énergie mesurée lors du dernier relevé est obligatoire."))
+
+
+def to_comparable(result):
+    valid_items, errors = result
+    errors = [(error["line"], error["meta"].get_json_data()) for error in errors]
+    return valid_items, errors
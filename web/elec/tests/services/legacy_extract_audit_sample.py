@@ -0,0 +1,55 @@
+import math
+import random
+from collections import defaultdict
+
+from django.db.models import QuerySet
+
+from elec.models.elec_charge_point import ElecChargePoint
+
+
+# legacy copy of the sampling measuring the distance to every station in python, kept as a reference point
+def extract_audit_sample_legacy(charge_points: QuerySet[ElecChargePoint], percentage: float, rng: random.Random):
+    charge_point_sample: list[ElecChargePoint] = []
+    charge_points = charge_points.exclude(latitude=None, longitude=None)
+
+    total_power = 0
+    stations = defaultdict(list)
+
+    for charge_point in charge_points:
+        total_power += charge_point.nominal_power
+        stations[charge_point.station_id].append(charge_point)
+
+    stations_list = list[list[ElecChargePoint]](stations.values())
+
+    ref = rng.choice(charge_points)
+
+    station_distances = [(station, distance_legacy(ref, station[0])) for station in stations_list]
+
+    sorted_stations = sorted(station_distances, key=lambda x: x[1])
+
+    remaining_power = total_power * percentage
+
+    for station_charge_points, _ in sorted_stations:
+        for charge_point in station_charge_points:
+            charge_point_sample.append(charge_point)
+            remaining_power -= charge_point.nominal_power
+
+            if remaining_power <= 0:
+                return charge_point_sample
+
+    return []
+
+
+def distance_legacy(a: ElecChargePoint, b: ElecChargePoint):
+    lat1_r = math.radians(a.latitude or 0)
+    lon1_r = math.radians(a.longitude or 0)
+    lat2_r = math.radians(b.latitude or 0)
+    lon2_r = math.radians(b.longitude or 0)
+
+    dp = math.cos(lat1_r) * math.cos(lat2_r) * math.cos(lon1_r - lon2_r) + math.sin(lat1_r) * math.sin(lat2_r)
+    # guarded, the original raised a math domain error when rounding put two identical positions at dp > 1
+    angle = math.acos(min(dp, 1))
+
+    earth_radius = 6371.0008
+
+    return earth_radius * angle
@@ -0,0 +1,37 @@
+from django.db.models import F, FloatField, OuterRef, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+
+from elec.models.elec_charge_point import ElecChargePoint
+from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
+
+
+def get_latest_indexes(charge_points):
+    return [(cp.charge_point_id, cp.latest_reading_index, cp.latest_reading_date) for cp in charge_points]
+
+
+# legacy copies of the computations with a query or an object per charge point, kept as a reference point
+def annotate_charge_points_with_latest_index_legacy(charge_points: QuerySet[ElecChargePoint]):
+    latest_reading_subquery = ElecMeterReadingVirtual.objects.filter(charge_point_id=OuterRef("pk")).order_by(
+        "-current_index_date"
+    )
+    return charge_points.select_related("current_meter").annotate(
+        latest_reading_index=Coalesce(
+            Subquery(latest_reading_subquery.values("current_index")[:1]),
+            F("current_meter__initial_index"),
+            output_field=FloatField(),
+        ),
+        latest_reading_date=Coalesce(
+            Subquery(latest_reading_subquery.values("current_index_date")[:1]),
+            F("current_meter__initial_index_date"),
+        ),
+    )
+
+
+def get_renewable_energy_legacy(meter_readings: QuerySet[ElecMeterReadingVirtual]):
+    return [
+        {
+            "renewable_energy": meter_reading.renewable_energy,
+            "operating_unit": meter_reading.charge_point.charge_point_id[:5],
+        }
+        for meter_reading in meter_readings.select_related("charge_point")
+    ]
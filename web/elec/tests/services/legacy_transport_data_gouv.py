@@ -0,0 +1,113 @@
+import pandas as pd
+
+from core.utils import is_true
+from elec.services.transport_data_gouv import TransportDataGouv
+
+
+# legacy copy of the lookups reading the whole csv, kept as a reference point
+def get_transport_data_legacy(charge_point_data: pd.DataFrame, file_path: str, chunksize=1000) -> pd.DataFrame:
+    wanted_ids = charge_point_data["charge_point_id"].unique().tolist()
+
+    wanted_stations = set()
+    for chunk in TransportDataGouv.read_transport_data_chunks(file_path, chunksize):
+        wanted_chunk = chunk[chunk["id_pdc_itinerance"].isin(wanted_ids)]
+        wanted_stations.update(wanted_chunk["id_station_itinerance"].unique())
+
+    chunk_dfs = []
+    for chunk in TransportDataGouv.read_transport_data_chunks(file_path, chunksize):
+        station_charge_points = chunk[chunk["id_station_itinerance"].isin(wanted_stations)]
+        chunk_dfs.append(station_charge_points)
+
+    transport_data = pd.concat(chunk_dfs, ignore_index=True)
+
+    transport_data = (
+        transport_data.groupby("id_pdc_itinerance", as_index=False).agg(TransportDataGouv.CSV_COLUMNS_MERGE).reset_index()
+    )
+
+    transport_data = transport_data.rename(columns=TransportDataGouv.CSV_COLUMNS_ALIAS)
+    transport_data = transport_data.sort_values("date_maj", ascending=False)
+    transport_data = transport_data.fillna("")
+    transport_data["is_in_tdg"] = True
+    return transport_data
+
+
+def is_check_point_in_tdg_legacy(charge_point_id: str, file_path: str) -> bool:
+    for chunk in TransportDataGouv.read_transport_data_chunks(file_path):
+        if charge_point_id in chunk["id_pdc_itinerance"].values:
+            return True
+    return False
+
+
+# legacy copies of the enrichment working cell by cell, kept as a reference point
+def strip_cells_legacy(data: pd.DataFrame) -> pd.DataFrame:
+    return data.map(lambda x: x.strip() if isinstance(x, str) else x)
+
+
+def enrich_charge_point_data_legacy(charge_point_data: pd.DataFrame, transport_data: pd.DataFrame):
+    longitude = [
+        coord.replace("[", "").replace("]", "").replace("\xa0", "").split(",")[0] for coord in transport_data.coordonneesXY
+    ]
+    latitude = [
+        coord.replace("[", "").replace("]", "").replace("\xa0", "").split(",")[1] for coord in transport_data.coordonneesXY
+    ]
+
+    transport_data["latitude"] = latitude
+    transport_data["longitude"] = longitude
+
+    transport_data["operating_unit"] = transport_data["charge_point_id"].str[:5]
+
+    transport_data.loc[transport_data.nominal_power > 1000, "nominal_power"] = (
+        transport_data.loc[transport_data.nominal_power > 1000, "nominal_power"] / 1000
+    )
+
+    transport_data["prise_type_combo_ccs"] = is_true(transport_data, "prise_type_combo_ccs")
+    transport_data["prise_type_chademo"] = is_true(transport_data, "prise_type_chademo")
+    transport_data.insert(0, "DC", transport_data["prise_type_combo_ccs"] | transport_data["prise_type_chademo"])
+    transport_data["guessed_current_type"] = transport_data["DC"].apply(lambda is_dc: "DC" if is_dc else "AC")
+
+    stations_art2 = transport_data[["station_id", "DC"]].groupby("station_id").max()
+    stations_art2 = stations_art2.rename(columns={"DC": "guessed_is_article_2"})
+
+    transport_data = transport_data.merge(stations_art2, on="station_id")
+
+    merged_data = charge_point_data.merge(transport_data, on="charge_point_id", how="outer", suffixes=("_old", "_new"))
+
+    shared_columns = charge_point_data.columns.intersection(transport_data.columns).difference(["charge_point_id"])
+    for col in shared_columns:
+        merged_data[col] = merged_data[col + "_new"].combine_first(merged_data[col + "_old"])
+
+    merged_data = merged_data.drop(
+        columns=[col + "_old" for col in shared_columns] + [col + "_new" for col in shared_columns]
+    )
+
+    merged_data["current_type"] = merged_data["current_type"].replace("CC", "DC").replace("CA", "AC")
+    merged_data["current_type"] = merged_data["current_type"].replace("", pd.NA)
+    merged_data["current_type"] = merged_data["current_type"].fillna(merged_data["guessed_current_type"])
+
+    if "guessed_is_article_2" in merged_data.columns:
+        merged_data["guessed_is_article_2"] = merged_data["guessed_is_article_2"].fillna(merged_data["current_type"] != "AC")
+    else:
+        merged_data["guessed_is_article_2"] = merged_data["current_type"] != "AC"
+
+    merged_data["is_in_tdg"] = merged_data["is_in_tdg"] == True  # noqa: E712
+    merged_data["is_in_application"] = merged_data["is_in_application"] == True  # noqa: E712
+
+    merged_data["has_reading"] = (merged_data["current_type"] == "AC") | (
+        (merged_data["mid_id"] != "") & merged_data["measure_date"].notna() & merged_data["measure_energy"].notna()
+    )
+
+    merged_data = merged_data.fillna("")
+
+    merged_data["whole_station_has_readings"] = (
+        merged_data.groupby("station_id")["has_reading"]
+        .transform(lambda x: all(x != False))  # noqa: E712
+        .reset_index()["has_reading"]
+    )
+
+    merged_data["guessed_is_article_2"] = ~merged_data["whole_station_has_readings"] & merged_data["guessed_is_article_2"]
+
+    merged_data["is_article_2"] = merged_data["is_article_2"].replace("", pd.NA).astype("boolean")
+    merged_data["is_article_2"] = merged_data["is_article_2"].fillna(merged_data["guessed_is_article_2"])
+    merged_data["is_article_2"] = is_true(merged_data, "is_article_2")
+
+    return merged_data[merged_data["is_in_application"] == True][TransportDataGouv.DB_COLUMNS]  # noqa: E712
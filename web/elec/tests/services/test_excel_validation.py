@@ -0,0 +1,114 @@
+from datetime import date
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from elec.models.elec_charge_point import ElecChargePoint
+from elec.services.import_charge_point_excel import ExcelChargePointValidator
+from elec.services.import_elec_audit_report_excel import ExcelElecAuditReportValidator
+from elec.services.import_meter_reading_excel import ExcelMeterReadingValidator
+from elec.tests.services.legacy_excel_validation import (
+    ExcelChargePointValidatorLegacy,
+    to_comparable,
+    validate_meter_readings_legacy,
+)
+from elec.tests.utils import BEGINNING_OF_QUARTER, END_OF_QUARTER, create_charge_points, create_meter_readings
+
+
+class ExcelValidationTest(TestCase):
+    """Compare the columnar validations with the ones of one django form per row"""
+
+    def test_meter_readings(self):
+        meter_readings, charge_point_by_id = create_meter_readings(3000, seed=1)
+        context = {
+            "charge_point_by_id": charge_point_by_id,
+            "beginning_of_quarter": BEGINNING_OF_QUARTER,
+            "end_of_quarter": END_OF_QUARTER,
+        }
+
+        result = ExcelMeterReadingValidator.bulk_validate(meter_readings, context)
+        expected = validate_meter_readings_legacy(meter_readings, context)
+
+        self.assertEqual(to_comparable(result), to_comparable(expected))
+        valid_items, errors = result
+        self.assertTrue(valid_items and errors)
+        self.assertEqual(
+            set(valid_items[0]), {"meter", "extracted_energy", "reading_date", "charge_point_id", "operating_unit"}
+        )
+
+    def test_duplicated_meter_readings(self):
+        charge_point = ElecChargePoint(charge_point_id="FRABCP1", nominal_power=0, is_article_2=False)
+        charge_point.latest_reading_index = 10
+        charge_point.latest_reading_date = date(2024, 1, 1)
+        charge_point.current_meter = None
+        meter_readings = [
+            {"charge_point_id": "FRABCP1", "extracted_energy": "20", "reading_date": "2024-02-01", "line": 2},
+            {"charge_point_id": "FRABCP1 ", "extracted_energy": "5", "reading_date": "2023-12-01", "line": 3},
+        ]
+
+        valid_items, errors = ExcelMeterReadingValidator.bulk_validate(
+            meter_readings, {"charge_point_by_id": {"FRABCP1": charge_point}}
+        )
+
+        self.assertEqual(valid_items, [])
+        self.assertEqual(
+            [error["meta"]["charge_point_id"][-1] for error in errors],
+            ["Ce point de recharge a été défini 2 fois (lignes 2, 3)"] * 2,
+        )
+        self.assertEqual(
+            errors[1]["meta"]["reading_date"],
+            ["Un relevé plus récent est déjà enregistré pour ce point de recharge: 10kWh, 01/01/2024"],
+        )
+
+    def test_charge_points(self):
+        charge_points = create_charge_points(3000, seed=1)
+
+        result = ExcelChargePointValidator.bulk_validate(charge_points)
+        expected = ExcelChargePointValidatorLegacy.bulk_validate([dict(charge_point) for charge_point in charge_points])
+
+        self.assertEqual(to_comparable(result), to_comparable(expected))
+        self.assertTrue(result[0] and result[1])
+
+    def test_audit_report(self):
+        reports = [
+            {
+                "charge_point_id": "FRABCP1",
+                "observed_mid_or_prm_id": "MID1",
+                "is_auditable": True,
+                "has_dedicated_pdl": False,
+                "current_type": "CC",
+                "audit_date": "2024-06-01",
+                "observed_energy_reading": 12.5,
+                "comment": None,
+                "line": 2,
+            },
+            {
+                "charge_point_id": "FRABCP2",
+                "observed_mid_or_prm_id": "MID2",
+                "is_auditable": None,
+                "has_dedicated_pdl": None,
+                "current_type": "XX",
+                "audit_date": None,
+                "observed_energy_reading": 0,
+                "comment": None,
+                "line": 3,
+            },
+            {"charge_point_id": "FRABCP3", "current_type": "AC", "line": 4},
+        ]
+
+        valid_items, errors = ExcelElecAuditReportValidator.bulk_validate(
+            reports, {"audited_charge_point_ids": ["FRABCP1", "FRABCP2"]}
+        )
+
+        self.assertEqual(len(valid_items), 1)
+        self.assertEqual(valid_items[0]["current_type"], ElecChargePoint.DC)
+        self.assertEqual(valid_items[0]["audit_date"], date(2024, 6, 1))
+        self.assertEqual([error["line"] for error in errors], [3, 4])
+        self.assertEqual(
+            errors[0]["meta"]["charge_point_id"],
+            ["Les informations relatives au point de charge FRABCP2 sont incomplètes ou absentes."],
+        )
+        self.assertEqual(len(errors[1]["meta"]["charge_point_id"]), 2)
+
+    def test_benchmark_command(self):
+        call_command("benchmark_excel_validation", rows=200)
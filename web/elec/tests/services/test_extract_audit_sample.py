@@ -0,0 +1,90 @@
+import random
+from unittest.mock import patch
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from elec.repositories.charge_point_repository import ChargePointRepository
+from elec.services.charge_point_spatial_index import ChargePointSpatialIndex
+from elec.services.extract_audit_sample import distance, extract_audit_sample, sample_nearest_stations
+from elec.tests.services.legacy_extract_audit_sample import extract_audit_sample_legacy
+from elec.tests.utils import create_charge_points_with_positions
+
+
+class ExtractAuditSampleTest(TestCase):
+    def setUp(self):
+        application = create_charge_points_with_positions(600, seed=4)
+        self.charge_points = ChargePointRepository.get_application_charge_points(application.cpo, application)
+
+    def test_same_sample_as_the_distance_to_every_station(self):
+        # the larger samples need more stations than the first nearest ones
+        for percentage in (0.1, 0.5, 0.9):
+            for seed in range(5):
+                sample = extract_audit_sample(self.charge_points, percentage, seed=seed)
+                expected = extract_audit_sample_legacy(self.charge_points, percentage, random.Random(seed))
+                self.assertEqual([cp.pk for cp in sample], [cp.pk for cp in expected])
+
+    def test_whole_power(self):
+        # the rounding errors of the total power don't fail the sample of all the charge points
+        for seed in range(5):
+            sample = extract_audit_sample(self.charge_points, 1, seed=seed)
+            self.assertEqual(sorted(cp.pk for cp in sample), sorted(self.charge_points.values_list("pk", flat=True)))
+
+    def test_seeded_samples_are_reproducible(self):
+        sample = extract_audit_sample(self.charge_points, 0.2, seed=1)
+
+        self.assertEqual(extract_audit_sample(self.charge_points, 0.2, seed=1), sample)
+        self.assertNotEqual(extract_audit_sample(self.charge_points, 0.2, seed=2), sample)
+        self.assertGreaterEqual(
+            sum(cp.nominal_power for cp in sample), 0.2 * sum(self.charge_points.values_list("nominal_power", flat=True))
+        )
+
+    def test_sample_stratified_by_power(self):
+        sample = extract_audit_sample(self.charge_points, 0.1, seed=1, power_classes=[50])
+
+        for is_fast in (False, True):
+            class_power = sum(cp.nominal_power for cp in self.charge_points if (cp.nominal_power >= 50) == is_fast)
+            sample_power = sum(cp.nominal_power for cp in sample if (cp.nominal_power >= 50) == is_fast)
+            self.assertGreaterEqual(sample_power, 0.1 * class_power)
+
+    def test_no_partial_stratified_sample(self):
+        # the fast charge points can't be sampled, so the slow ones are not returned alone
+        def sample_slow_charge_points(positions, ref, percentage):
+            if (positions["nominal_power"] >= 50).any():
+                return []
+            return sample_nearest_stations(positions, ref, percentage)
+
+        with patch("elec.services.extract_audit_sample.sample_nearest_stations", side_effect=sample_slow_charge_points):
+            self.assertEqual(extract_audit_sample(self.charge_points, 0.1, seed=1, power_classes=[50]), [])
+
+    def test_no_charge_points(self):
+        self.assertEqual(extract_audit_sample(self.charge_points.none(), 0.1), [])
+
+    def test_benchmark_command(self):
+        call_command("benchmark_audit_sample", charge_points=100, samples=2)
+
+
+class ChargePointSpatialIndexTest(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.latitudes = rng.uniform(42, 51, 500)
+        self.longitudes = rng.uniform(-5, 8, 500)
+        self.index = ChargePointSpatialIndex(self.latitudes, self.longitudes)
+        self.distances = np.array(
+            [distance(48.85, 2.35, latitude, longitude) for latitude, longitude in zip(self.latitudes, self.longitudes)]
+        )
+
+    def test_nearest(self):
+        indexes, distances = self.index.nearest(48.85, 2.35, 10)
+
+        self.assertEqual(indexes.tolist(), np.argsort(self.distances)[:10].tolist())
+        np.testing.assert_allclose(distances, np.sort(self.distances)[:10], rtol=1e-6)
+        self.assertEqual(len(self.index.nearest(48.85, 2.35, 1000)[0]), 500)
+
+    def test_within(self):
+        indexes, distances = self.index.within(48.85, 2.35, 100)
+
+        self.assertEqual(indexes.tolist(), [i for i in np.argsort(self.distances) if self.distances[i] <= 100])
+        self.assertTrue((distances <= 100).all())
+        self.assertEqual(len(self.index.within(0, 0, 100)[0]), 0)
@@ -0,0 +1,63 @@
+from datetime import date
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from elec.models.elec_charge_point import ElecChargePoint
+from elec.models.elec_meter_reading import ElecMeterReading
+from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
+from elec.repositories.meter_reading_repository import MeterReadingRepository
+from elec.services.meter_reading_energy import get_load_factor, get_meter_readings_energy
+from elec.tests.services.legacy_meter_reading_energy import (
+    annotate_charge_points_with_latest_index_legacy,
+    get_latest_indexes,
+    get_renewable_energy_legacy,
+)
+from elec.tests.utils import create_meter_reading_view, create_meter_readings_history
+
+
+class MeterReadingEnergyTest(TestCase):
+    def setUp(self):
+        create_meter_reading_view()
+        self.cpo = create_meter_readings_history(200, 4, seed=2)
+        self.charge_points = ElecChargePoint.objects.filter(cpo=self.cpo).order_by("charge_point_id")
+
+    def test_same_latest_readings_as_the_subqueries(self):
+        with self.assertNumQueries(2):
+            charge_points = MeterReadingRepository.annotate_charge_points_with_latest_index(self.charge_points)
+
+        expected = annotate_charge_points_with_latest_index_legacy(self.charge_points)
+        self.assertEqual(get_latest_indexes(charge_points), get_latest_indexes(expected))
+
+    def test_latest_reading_of_the_charge_point(self):
+        charge_point = self.charge_points.exclude(current_meter=None).filter(is_deleted=False, is_article_2=False)[0]
+        reading = ElecMeterReading.objects.filter(meter__charge_point=charge_point).order_by("reading_date").last()
+        reading.extracted_energy = 123456.0
+        reading.reading_date = date(2030, 1, 1)
+        reading.save()
+
+        charge_point = MeterReadingRepository.annotate_charge_points_with_latest_index(
+            self.charge_points.filter(pk=charge_point.pk)
+        )[0]
+        self.assertEqual((charge_point.latest_reading_index, charge_point.latest_reading_date), (123456.0, date(2030, 1, 1)))
+
+    def test_same_renewable_energy_as_the_meter_readings(self):
+        meter_readings = ElecMeterReadingVirtual.objects.filter(cpo=self.cpo).order_by("reading_id")
+
+        energy = get_meter_readings_energy(meter_readings)
+
+        self.assertEqual(energy.to_dict(orient="records"), get_renewable_energy_legacy(meter_readings))
+        self.assertTrue(get_meter_readings_energy(meter_readings.none()).empty)
+
+    def test_benchmark_command(self):
+        call_command("benchmark_meter_reading_energy", charge_points=50, quarters=2)
+
+
+class LoadFactorTest(SimpleTestCase):
+    def test_load_factor(self):
+        energy = pd.Series([240.0, 240.0, 240.0, 0.0])
+        nominal_power = pd.Series([10.0, 0.0, 10.0, 10.0])
+        days = pd.Series([1.0, 1.0, 0.0, 2.0])
+
+        self.assertEqual(get_load_factor(energy, nominal_power, days).tolist(), [1.0, 0.0, 0.0, 0.0])
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from elec.services.import_charge_point_excel import ExcelChargePoints
+from elec.services.transport_data_gouv import TransportDataGouv
+from elec.tests.services.legacy_transport_data_gouv import (
+    enrich_charge_point_data_legacy,
+    get_transport_data_legacy,
+    strip_cells_legacy,
+)
+from elec.tests.utils import TRANSPORT_DATA_FIXTURE_PATH, create_charge_point_excel_data, write_transport_data_csv
+
+
+class TransportDataGouvIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.dir, "transport_data_gouv.csv")
+        shutil.copy(TRANSPORT_DATA_FIXTURE_PATH, self.file_path)
+
+        download_csv = patch.object(TransportDataGouv, "download_csv", return_value=self.file_path)
+        download_csv.start()
+        self.addCleanup(download_csv.stop)
+        gettempdir = patch("elec.services.transport_data_gouv.tempfile.gettempdir", return_value=self.dir)
+        gettempdir.start()
+        self.addCleanup(gettempdir.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_same_charge_points_as_the_csv_scan(self):
+        charge_point_data = pd.DataFrame({"charge_point_id": ["FRAAAA111101", "FRBBBB222201", "FRUNKNOWN"]})
+
+        transport_data = TransportDataGouv.get_transport_data(charge_point_data)
+
+        pd.testing.assert_frame_equal(transport_data, get_transport_data_legacy(charge_point_data, self.file_path))
+        self.assertEqual(set(transport_data["station_id"]), {"FRAAAA1111", "FRBBBB2222"})
+        self.assertTrue(os.path.exists(TransportDataGouv.get_csv_index(self.file_path)))
+
+    def test_duplicated_points_are_merged_like_the_csv_scan(self):
+        os.remove(self.file_path)
+        # written in the temporary directory of the test
+        self.file_path = write_transport_data_csv(2000, seed=3)
+        charge_point_data = pd.DataFrame({"charge_point_id": [f"FRBEN{i:07d}" for i in range(300)]})
+
+        with patch.object(TransportDataGouv, "download_csv", return_value=self.file_path):
+            transport_data = TransportDataGouv.get_transport_data(charge_point_data)
+
+        pd.testing.assert_frame_equal(transport_data, get_transport_data_legacy(charge_point_data, self.file_path))
+
+    def test_single_charge_point_lookup(self):
+        self.assertTrue(TransportDataGouv.is_check_point_in_tdg("FRAAAA111101"))
+        self.assertFalse(TransportDataGouv.is_check_point_in_tdg("FRUNKNOWN"))
+
+    def test_new_index_when_the_dataset_changes(self):
+        index_path = TransportDataGouv.get_csv_index(self.file_path)
+
+        with open(self.file_path, "a") as file:
+            file.write("\n" + open(TRANSPORT_DATA_FIXTURE_PATH).read().splitlines()[1].replace("FRAAAA111101", "FRNEW"))
+
+        self.assertNotEqual(TransportDataGouv.get_csv_index(self.file_path), index_path)
+        self.assertTrue(TransportDataGouv.is_check_point_in_tdg("FRNEW"))
+
+    def test_csv_scan_when_the_index_cannot_be_built(self):
+        with patch.object(TransportDataGouv, "build_csv_index", side_effect=ValueError):
+            self.assertIsNone(TransportDataGouv.get_csv_index(self.file_path))
+            self.assertTrue(TransportDataGouv.is_check_point_in_tdg("FRAAAA111101"))
+            charge_point_data = pd.DataFrame({"charge_point_id": ["FRAAAA111101"]})
+            self.assertEqual(len(TransportDataGouv.get_transport_data(charge_point_data)), 3)
+        self.assertEqual(os.listdir(self.dir), ["transport_data_gouv.csv"])
+
+    def test_benchmark_command(self):
+        call_command("benchmark_transport_data_gouv", points=200, application=20)
+
+
+class ChargePointEnrichmentTest(SimpleTestCase):
+    def setUp(self):
+        self.file_path = write_transport_data_csv(2000, seed=5)
+        self.addCleanup(os.remove, self.file_path)
+        self.excel_data = create_charge_point_excel_data(600, 2000, seed=5)
+        self.charge_point_data = ExcelChargePoints.strip_cells(self.excel_data)
+
+    def get_transport_data(self, charge_point_data):
+        with patch.object(TransportDataGouv, "download_csv", return_value=self.file_path):
+            transport_data = TransportDataGouv.get_transport_data(charge_point_data)
+        self.addCleanup(os.remove, TransportDataGouv.get_csv_index(self.file_path))
+        return transport_data
+
+    def assert_same_enrichment(self, charge_point_data, transport_data):
+        merged_data = TransportDataGouv.enrich_charge_point_data(charge_point_data.copy(), transport_data.copy())
+        expected = enrich_charge_point_data_legacy(charge_point_data.copy(), transport_data.copy())
+        pd.testing.assert_frame_equal(merged_data, expected)
+        return merged_data
+
+    def test_cells_are_stripped_like_the_cell_by_cell_map(self):
+        pd.testing.assert_frame_equal(self.charge_point_data, strip_cells_legacy(self.excel_data))
+        self.assertEqual(self.charge_point_data["measure_energy"].dtype, object)
+
+        no_energy = self.excel_data.assign(measure_energy=0)
+        pd.testing.assert_frame_equal(ExcelChargePoints.strip_cells(no_energy), strip_cells_legacy(no_energy))
+
+    def test_same_charge_points_as_the_row_by_row_enrichment(self):
+        transport_data = self.get_transport_data(self.charge_point_data)
+
+        merged_data = self.assert_same_enrichment(self.charge_point_data, transport_data)
+        self.assertEqual(len(merged_data), len(self.charge_point_data))
+        self.assertTrue(merged_data["is_article_2"].any())
+        self.assertFalse(merged_data["is_article_2"].all())
+
+    def test_charge_points_without_station(self):
+        transport_data = self.get_transport_data(self.charge_point_data)
+        without_station = transport_data["charge_point_id"][:10]
+        transport_data.loc[transport_data.index[:10], "station_id"] = None
+
+        # they are not guessed as article 2 like the stations with a DC point
+        merged_data = self.assert_same_enrichment(self.charge_point_data, transport_data)
+        merged_data = merged_data[merged_data["charge_point_id"].isin(without_station)]
+        self.assertEqual(len(merged_data), 10)
+        self.assertFalse(merged_data["is_in_tdg"].any())
+
+    def test_charge_points_unknown_to_transport_data_gouv(self):
+        charge_point_data = self.charge_point_data[self.charge_point_data["charge_point_id"].str.startswith("FRUNKNOWN")]
+        transport_data = self.get_transport_data(charge_point_data)
+
+        self.assertTrue(transport_data.empty)
+        merged_data = self.assert_same_enrichment(charge_point_data, transport_data)
+        self.assertFalse(merged_data["is_in_tdg"].any())
+
+    def test_benchmark_command(self):
+        call_command("benchmark_charge_point_enrichment", points=200, application=50)
@@ -1,16 +1,29 @@
-from datetime import date
+import importlib
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
+import pandas as pd
+from django.db import connection
+
+from core.models import Entity
 from elec.models.elec_charge_point import ElecChargePoint
 from elec.models.elec_charge_point_application import ElecChargePointApplication
 from elec.models.elec_meter import ElecMeter
 from elec.models.elec_meter_reading import ElecMeterReading
 from elec.models.elec_meter_reading_application import ElecMeterReadingApplication
+from elec.models.elec_meter_reading_virtual import ElecMeterReadingVirtual
 
 CHARGE_POINTS_COUNT = 3
 DEFAULT_YEARS = [2025]
 DEFAULT_QUARTERS = [1, 2]
 INITIAL_INDEX_METER = 1000
 ENR_RATIO = 0.25
+BEGINNING_OF_QUARTER = date(2024, 7, 1)
+END_OF_QUARTER = date(2024, 9, 30)
+TRANSPORT_DATA_FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "../fixtures/transport_data_gouv.csv")
 
 
 """
@@ -88,3 +101,268 @@ def setup_cpo_with_meter_readings(
             meter_reading_applications.append(application)
 
     return charge_points, meters, meter_readings, meter_reading_applications
+
+
+def create_meter_readings(nb_rows, seed=0):
+    """Returns meter readings like the ones of a parsed excel file, with the charge points they refer to"""
+    rng = random.Random(seed)
+
+    charge_point_by_id = {}
+    for i in range(nb_rows):
+        charge_point = ElecChargePoint(
+            charge_point_id=f"FRBEN{i:08d}",
+            nominal_power=rng.choice([0, 7.4, 22, 150]),
+            is_article_2=rng.random() < 0.02,
+        )
+        charge_point.latest_reading_index = round(rng.uniform(0, 10000), 4) if rng.random() < 0.9 else None
+        charge_point.latest_reading_date = date(2024, 3, 31) - timedelta(days=rng.randint(0, 180))
+        if charge_point.latest_reading_index is None and rng.random() < 0.5:
+            charge_point.latest_reading_date = None
+        if rng.random() < 0.97:
+            charge_point.current_meter = ElecMeter(
+                mid_certificate=f"MID{i}",
+                initial_index=rng.choice([None, 100.0]),
+                initial_index_date=rng.choice([None, date(2023, 1, 1)]),
+                charge_point=charge_point,
+            )
+        charge_point_by_id[charge_point.charge_point_id] = charge_point
+
+    meter_readings = []
+    for i in range(nb_rows):
+        charge_point = charge_point_by_id[f"FRBEN{i:08d}"]
+        charge_point_id = charge_point.charge_point_id
+        if rng.random() < 0.01:
+            charge_point_id = f"FRUNKNOWN{i}"
+        elif rng.random() < 0.01:
+            charge_point_id = f"FRBEN{rng.randrange(nb_rows):08d}"
+
+        previous_index = charge_point.latest_reading_index or 0
+        extracted_energy = str(round(previous_index + rng.uniform(-50, 2000), 3))
+        if rng.random() < 0.01:
+            extracted_energy = rng.choice(["abc", "-5", "", " 12.5 ", "1e3", "nan"])
+
+        reading_date = date(2024, 9, 30) - timedelta(days=rng.randint(0, 120))
+        reading_date = rng.choice([f"{reading_date} 00:00:00", reading_date.isoformat(), reading_date.strftime("%d/%m/%Y")])
+        if rng.random() < 0.005:
+            reading_date = rng.choice(["31/02/2024", "2024-13-01", "hier"])
+
+        meter_readings.append(
+            {
+                "charge_point_id": rng.choice([charge_point_id, f" {charge_point_id} "]),
+                "previous_extracted_energy": str(previous_index),
+                "extracted_energy": extracted_energy,
+                "reading_date": reading_date,
+                "line": i + 2,
+            }
+        )
+
+    return meter_readings, charge_point_by_id
+
+
+def create_charge_points(nb_rows, seed=0):
+    """Returns charge points like the ones of an excel file merged with the TDG data"""
+    rng = random.Random(seed)
+
+    charge_points = []
+    for i in range(nb_rows):
+        is_in_tdg = rng.random() < 0.95
+        is_article_2 = rng.random() < 0.3
+        charge_points.append(
+            {
+                "charge_point_id": f"FRBEN{i:08d}" if rng.random() < 0.99 else "",
+                "installation_date": rng.choice(["2023-01-01", "01/06/2022", "2022-03-04 00:00:00", "demain"]),
+                "mid_id": rng.choice(["", f"MID{i}", f"MID{i}"]),
+                "measure_date": rng.choice(["", "2024-01-01", "15/01/2024"]),
+                "measure_energy": rng.choice([0, "", "1234.5", "-1", "x"]),
+                "measure_reference_point_id": rng.choice(["", f"PRM{i}"]),
+                "current_type": rng.choice(["AC", "DC", "", "XX"]),
+                "is_article_2": is_article_2 if is_in_tdg else None,
+                "station_id": f"FRBENP{i // 4}" if is_in_tdg else None,
+                "station_name": f"Station {i // 4}" if is_in_tdg else None,
+                "nominal_power": rng.choice([22.0, 150.0, 0.0, None]),
+                "cpo_name": "Benchmark CPO" if is_in_tdg else None,
+                "cpo_siren": "123456789" if is_in_tdg else None,
+                "latitude": rng.uniform(42, 51) if is_in_tdg else None,
+                "longitude": rng.uniform(-5, 8) if is_in_tdg else None,
+                "is_in_tdg": is_in_tdg,
+                "line": i + 1,
+            }
+        )
+    return charge_points
+
+
+def write_transport_data_csv(nb_points, seed=0):
+    """Write a csv with the columns of the transport.data.gouv dataset, 4 charge points per station"""
+    rng = random.Random(seed)
+    template = pd.read_csv(TRANSPORT_DATA_FIXTURE_PATH, dtype=str, nrows=1)
+
+    rows = template.loc[[0] * nb_points].reset_index(drop=True)
+    station_ids = [f"FRBENP{i // 4:06d}" for i in range(nb_points)]
+    rows["id_station_itinerance"] = station_ids
+    rows["nom_station"] = [f"Station {station_id}" for station_id in station_ids]
+    # the ids of the application are spread over the whole file
+    rows["id_pdc_itinerance"] = [f"FRBEN{i:07d}" for i in rng.sample(range(nb_points), nb_points)]
+    rows["coordonneesXY"] = [f"[{rng.uniform(-5, 8)}, {rng.uniform(42, 51)}]" for _ in range(nb_points)]
+    rows["puissance_nominale"] = [rng.choice(["7.4", "22", "150", "22000"]) for _ in range(nb_points)]
+    rows["prise_type_combo_ccs"] = [rng.choice(["TRUE", "FALSE"]) for _ in range(nb_points)]
+    # a few points are listed twice
+    rows = pd.concat([rows, rows.sample(frac=0.01, random_state=seed)])
+
+    file, path = tempfile.mkstemp(suffix=".csv")
+    os.close(file)
+    rows.to_csv(path, index=False)
+    return path
+
+
+def create_charge_point_excel_data(nb_points, nb_tdg_points, seed=0):
+    """Returns the parsed cells of a charge point excel file, before they are stripped"""
+    rng = random.Random(seed)
+
+    def pad(value):
+        return rng.choice(["", " ", "  "]) + value + rng.choice(["", " ", "\xa0"])
+
+    # a few charge points are not listed on transport.data.gouv
+    nb_known_points = min(nb_points - nb_points // 50, nb_tdg_points)
+    ids = [f"FRBEN{i:07d}" for i in rng.sample(range(nb_tdg_points), nb_known_points)]
+    ids += [f"FRUNKNOWN{i:06d}" for i in range(nb_points - nb_known_points)]
+    rows = []
+    for line, charge_point_id in enumerate(ids, start=1):
+        has_reading = rng.random() < 0.5
+        rows.append(
+            {
+                "charge_point_id": pad(charge_point_id),
+                "installation_date": pad(f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"),
+                "mid_id": pad(f"MID{line}") if has_reading else "",
+                "measure_date": pad("2024-01-15") if has_reading else "",
+                "measure_energy": pad(str(round(rng.uniform(0, 100000), 3))) if has_reading else 0,
+                "measure_reference_point_id": pad(f"PRM{line // 4}") if rng.random() < 0.5 else "",
+                "_": "",
+                "current_type": pad(rng.choice(["AC", "DC", "CA", "CC"])) if rng.random() < 0.3 else "",
+                "is_article_2": "",
+                "manual_nominal_power": pad(rng.choice(["7.4", "22", "150"])),
+                "line": line + 34,
+                "is_in_application": True,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def create_meter_reading_view():
+    """The view of ElecMeterReadingVirtual is created by a migration, which doesn't run on the test databases"""
+    if ElecMeterReadingVirtual._meta.db_table in connection.introspection.table_names(include_views=True):
+        return
+    migration = importlib.import_module("elec.migrations.0062_elec_meter_reading_virtual").Migration
+    sql = migration.operations[0].sql.replace("CREATE OR REPLACE VIEW", "CREATE VIEW")
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+
+
+def create_meter_readings_history(nb_charge_points, nb_quarters, seed=0) -> Entity:
+    """Create a CPO with its charge points, their meters and a few quarters of meter readings"""
+    rng = random.Random(seed)
+    cpo = Entity.objects.create(name=f"Benchmark CPO {seed}", entity_type=Entity.CPO, has_elec=True)
+    charge_point_application = ElecChargePointApplication.objects.create(cpo=cpo)
+
+    ElecChargePoint.objects.bulk_create(
+        [
+            ElecChargePoint(
+                application=charge_point_application,
+                cpo=cpo,
+                charge_point_id=f"FRBEN{i:07d}",
+                current_type="AC",
+                installation_date=date(2023, 1, 1),
+                station_name=f"Station {i // 4}",
+                station_id=f"FRBENP{i // 4}",
+                nominal_power=rng.choice([7.4, 22, 150]),
+                is_deleted=rng.random() < 0.01,
+                is_article_2=rng.random() < 0.02,
+            )
+            for i in range(nb_charge_points)
+        ],
+        batch_size=1000,
+    )
+    charge_points = list(ElecChargePoint.objects.filter(cpo=cpo).order_by("charge_point_id"))
+
+    # a few charge points have no meter, a few others had their meter replaced
+    ElecMeter.objects.bulk_create(
+        [
+            ElecMeter(
+                mid_certificate=f"MID{charge_point.charge_point_id}-{version}",
+                initial_index=rng.choice([None, 0.0, 100.0]),
+                initial_index_date=rng.choice([None, date(2023, 1, 1)]),
+                charge_point=charge_point,
+            )
+            for charge_point in charge_points
+            if rng.random() < 0.98
+            for version in range(2 if rng.random() < 0.05 else 1)
+        ],
+        batch_size=1000,
+    )
+    meters = list(ElecMeter.objects.filter(charge_point__cpo=cpo).select_related("charge_point").order_by("id"))
+    meter_by_charge_point = {meter.charge_point_id: meter for meter in meters}
+    replaced_charge_points = {
+        meter.charge_point_id for meter in meters if meter_by_charge_point[meter.charge_point_id] != meter
+    }
+    for charge_point in charge_points:
+        charge_point.current_meter = meter_by_charge_point.get(charge_point.pk)
+    ElecChargePoint.objects.bulk_update(charge_points, ["current_meter"], batch_size=1000)
+
+    readings = []
+    for quarter in range(nb_quarters):
+        year, quarter_of_year = 2023 + quarter // 4, quarter % 4 + 1
+        application = ElecMeterReadingApplication.objects.create(cpo=cpo, year=year, quarter=quarter_of_year)
+        end_of_quarter = date(year + (quarter_of_year == 4), quarter_of_year % 4 * 3 + 1, 1) - timedelta(days=1)
+        for meter in meters:
+            # the replaced meters only have the readings of the first quarters
+            is_current_meter = meter_by_charge_point[meter.charge_point_id] == meter
+            if meter.charge_point_id in replaced_charge_points and is_current_meter != (quarter >= nb_quarters // 2):
+                continue
+            if rng.random() < 0.1:
+                continue
+            readings.append(
+                ElecMeterReading(
+                    # the readings of a meter are increasing, with a few missing values
+                    extracted_energy=None if rng.random() < 0.01 else round((quarter + 1) * rng.uniform(1000, 2000), 3),
+                    reading_date=end_of_quarter - timedelta(days=rng.randint(0, 30)),
+                    cpo=cpo,
+                    application=application,
+                    meter=meter,
+                    enr_ratio=rng.choice([None, 0.25, 0.3]),
+                    operating_unit=meter.charge_point.charge_point_id[:5],
+                )
+            )
+    ElecMeterReading.objects.bulk_create(readings, batch_size=1000)
+    return cpo
+
+
+def create_charge_points_with_positions(nb_charge_points, seed=0) -> ElecChargePointApplication:
+    """Create the charge points of an application, in stations of up to 4 points spread around a few cities"""
+    rng = random.Random(seed)
+    cpo = Entity.objects.create(name=f"Benchmark CPO {seed}", entity_type=Entity.CPO, has_elec=True)
+    application = ElecChargePointApplication.objects.create(cpo=cpo)
+
+    cities = [(rng.uniform(43, 50), rng.uniform(-1, 7)) for _ in range(30)]
+    charge_points = []
+    station = 0
+    while len(charge_points) < nb_charge_points:
+        city_latitude, city_longitude = rng.choice(cities)
+        latitude, longitude = rng.gauss(city_latitude, 0.1), rng.gauss(city_longitude, 0.1)
+        for i in range(rng.randint(1, 4)):
+            charge_points.append(
+                ElecChargePoint(
+                    application=application,
+                    cpo=cpo,
+                    charge_point_id=f"FRBEN{station:06d}P{i}",
+                    current_type="AC",
+                    installation_date=date(2023, 1, 1),
+                    station_name=f"Station {station}",
+                    station_id=f"FRBEN{station:06d}",
+                    nominal_power=rng.choice([7.4, 22, 50, 150]),
+                    # most points of a station share its position
+                    latitude=Decimal(f"{latitude + (rng.uniform(-1e-4, 1e-4) if rng.random() < 0.3 else 0):.12f}"),
+                    longitude=Decimal(f"{longitude + (rng.uniform(-1e-4, 1e-4) if rng.random() < 0.3 else 0):.12f}"),
+                )
+            )
+        station += 1
+    ElecChargePoint.objects.bulk_create(charge_points[:nb_charge_points], batch_size=1000)
+    return application
@@ -3,8 +3,10 @@ from datetime import date
 from drf_spectacular.utils import extend_schema
 from rest_framework.decorators import action
 
-from core.excel import ExcelResponse, export_to_excel
-from core.models import Entity
+from core.excel import ExcelResponse, export_to_excel, make_export_location, serialize_by_chunks
+from core.exports import export_job_response
+from core.models import Entity, ExportJob
+from core.serializers import ExportJobSerializer
 from elec.serializers.elec_transfer_certificate import ElecTransferCertificateSerializer
 
 
@@ -21,27 +23,50 @@ class ExcelExportActionMixin:
         today = date.today()
         file = "carbure_elec_transfer_certificate_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
 
-        columns = [
-            {"label": "certificate_id", "value": "certificate_id"},
-            {"label": "status", "value": "status"},
-            {"label": "supplier", "value": "supplier.name"},
-            {"label": "client", "value": "client.name"},
-            {"label": "transfer_date", "value": "transfer_date"},
-            {"label": "energy_amount", "value": "energy_amount"},
-        ]
-
-        if request.entity.entity_type != Entity.CPO:
-            columns.insert(5, {"label": "consumption_date", "value": "consumption_date"})
-
-        excel_file = export_to_excel(
-            file,
-            [
-                {
-                    "label": "tickets",
-                    "rows": ElecTransferCertificateSerializer(transfers, many=True).data,
-                    "columns": columns,
-                }
-            ],
-        )
+        excel_file = export_transfer_certificates_to_excel(transfers, request.entity, location=file)
 
         return ExcelResponse(excel_file)
+
+    @extend_schema(
+        request=None,
+        responses={202: ExportJobSerializer},
+        operation_id="export_transfer_certificates_excel_async",
+    )
+    @action(detail=False, methods=["GET"], url_path="export-async")
+    def export_to_excel_async(self, request, *args, **kwargs):
+        transfers = self.filter_queryset(self.get_queryset())
+        return export_job_response(ExportJob.ELEC_TRANSFER_CERTIFICATES, request, transfers)
+
+
+def export_transfer_certificates_to_excel(transfers, entity, on_progress=None, location=None):
+    columns = [
+        {"label": "certificate_id", "value": "certificate_id"},
+        {"label": "status", "value": "status"},
+        {"label": "supplier", "value": "supplier.name"},
+        {"label": "client", "value": "client.name"},
+        {"label": "transfer_date", "value": "transfer_date"},
+        {"label": "energy_amount", "value": "energy_amount"},
+    ]
+
+    if entity.entity_type != Entity.CPO:
+        columns.insert(5, {"label": "consumption_date", "value": "consumption_date"})
+
+    return export_to_excel(
+        location,
+        [
+            {
+                "label": "tickets",
+                "rows": serialize_by_chunks(transfers, ElecTransferCertificateSerializer, on_progress),
+                "columns": columns,
+            }
+        ],
+    )
+
+
+# used by background export jobs
+def export_certificates_job(transfers, entity, on_progress):
+    file = export_transfer_certificates_to_excel(
+        transfers, entity, on_progress, make_export_location("carbure_elec_transfer_certificate")
+    )
+    file.close()
+    return file.name
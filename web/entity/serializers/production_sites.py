@@ -11,6 +11,7 @@ from producers.models import ProductionSiteInput, ProductionSiteOutput
 from transactions.models import ProductionSite
 from transactions.models.entity_site import EntitySite
 from transactions.models.site import Site
+from transactions.sanity_checks.reference_cache import invalidate_reference_data
 
 
 class EntityProductionSiteSerializer(serializers.ModelSerializer):
@@ -177,6 +178,9 @@ class EntityProductionSiteWriteSerializer(serializers.ModelSerializer):
             ]
             ProductionSiteCertificate.objects.bulk_create(production_certificates)
 
+        # bulk_create doesn't send the signals that keep the sanity checks reference data up to date
+        transaction.on_commit(invalidate_reference_data)
+
         # Find related biofuel transactions and trigger background checks
 
         filter = Q()
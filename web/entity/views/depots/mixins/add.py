@@ -11,7 +11,7 @@ from rest_framework import serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from carbure.tasks import background_bulk_sanity_checks, background_bulk_scoring
+from carbure.tasks import background_bulk_scoring, background_recheck_lots_for_data
 from core.carburetypes import CarbureSanityCheckErrors
 from core.models import CarbureLot, Entity, GenericError
 from transactions.models import Depot, EntitySite
@@ -107,7 +107,7 @@ class AddDepotActionMixin:
             )
             lots = CarbureLot.objects.filter(carbure_client=entity, carbure_delivery_site=ds)
             background_bulk_scoring(lots)
-            background_bulk_sanity_checks(lots)
+            background_recheck_lots_for_data(lots, ["depotsbyentity"])
             GenericError.objects.filter(lot__in=lots, error=CarbureSanityCheckErrors.DEPOT_NOT_CONFIGURED).delete()
         except Exception:
             traceback.print_exc()
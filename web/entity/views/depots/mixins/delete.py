@@ -9,7 +9,7 @@ from rest_framework import serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from carbure.tasks import background_bulk_sanity_checks, background_bulk_scoring
+from carbure.tasks import background_bulk_scoring, background_recheck_lots_for_data
 from core.models import CarbureLot, Entity
 from transactions.models import EntitySite
 
@@ -70,7 +70,7 @@ class DeleteDepotActionMixin:
                 carbure_delivery_site__customs_id=delivery_site_id,
             )
             background_bulk_scoring(lots)
-            background_bulk_sanity_checks(lots)
+            background_recheck_lots_for_data(lots, ["depotsbyentity"])
         except Exception:
             return Response(
                 {"message": "Could not delete entity's delivery site"},
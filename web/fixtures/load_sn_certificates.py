@@ -13,6 +13,7 @@ django.setup()
 
 from core.models import GenericCertificate  # noqa: E402
 from core.utils import bulk_update_or_create  # noqa: E402
+from transactions.sanity_checks.reference_cache import invalidate_reference_data  # noqa: E402
 
 today = datetime.date.today()
 CSV_FOLDER = os.environ["CARBURE_HOME"] + "/web/fixtures/csv/"
@@ -88,6 +89,8 @@ def load_certificates():
         )
     try:
         existing, new = bulk_update_or_create(GenericCertificate, "certificate_id", certificates)
+        # bulk operations send no signals, the cached certificates are outdated by hand
+        invalidate_reference_data()
         print("[SN Certificates]: %d updated, %d created" % (len(existing), len(new)))
     except Exception as e:
         print("failed", e)
@@ -3,27 +3,41 @@ import datetime
 import os
 
 import django
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "carbure.settings")
 django.setup()
 
 from core.models import CarbureLot  # noqa: E402
-from transactions.sanity_checks.helpers import get_prefetched_data  # noqa: E402
+from ml.models import EECStats, EPStats  # noqa: E402
 
 DATE_BEGIN = datetime.date.today() - datetime.timedelta(days=540)  # approx 18 months
+BATCH_SIZE = 1000
 
+LOT_FIELDS = [
+    "id",
+    "period",
+    "eec",
+    "ep",
+    "feedstock_id",
+    "biofuel_id",
+    "country_of_origin_id",
+    "ml_scoring",
+    "ml_control_requested",
+]
 
-def calc_ml_score(year=None, period=None):
-    data = get_prefetched_data()
-    # {s.feedstock: s.default_value for s in ETDStats.objects.select_related('feedstock').all()}
-    data["etd"]
-    # {s.feedstock.code + s.origin.code_pays: s for s in EECStats.objects.select_related('feedstock', 'origin').all()}
-    eec = data["eec"]
-    # {s.feedstock.code + s.biofuel.code: s for s in EPStats.objects.select_related('feedstock', 'biofuel').all()}
-    ep = data["ep"]
 
-    lots = CarbureLot.objects.select_related("feedstock", "country_of_origin").filter(
+def calc_ml_score(year=None, period=None, from_period=None):
+    """
+    Score the accepted lots of the last 18 months, one period at a time.
+    Each period is saved in its own transaction, so an interrupted run can be resumed with 'from_period'.
+    Only the lots whose score changed are written.
+    """
+    eec, ep = get_stats()
+
+    lots = CarbureLot.objects.filter(
         created_at__gt=DATE_BEGIN,
         lot_status__in=[CarbureLot.ACCEPTED, CarbureLot.FROZEN],
     )
@@ -31,54 +45,101 @@ def calc_ml_score(year=None, period=None):
         lots = lots.filter(year=year)
     if period:
         lots = lots.filter(period=period)
+    if from_period:
+        lots = lots.filter(period__gte=from_period)
+
+    periods = lots.order_by("period").values_list("period", flat=True).distinct()
+
+    for lot_period in tqdm(list(periods)):
+        frame = pd.DataFrame.from_records(lots.filter(period=lot_period).values_list(*LOT_FIELDS), columns=LOT_FIELDS)
+        frame["ml_scoring"] = frame["ml_scoring"].astype(float)
+        scores = score_lots(frame, eec, ep)
+
+        requested = frame["ml_control_requested"].to_numpy(dtype=bool) | (scores > 0)
+        changed = (scores != frame["ml_scoring"].to_numpy()) | (requested != frame["ml_control_requested"].to_numpy())
+
+        updated_lots = [
+            CarbureLot(id=lot_id, ml_scoring=score, ml_control_requested=control_requested)
+            for lot_id, score, control_requested in zip(
+                frame["id"].to_numpy()[changed].tolist(),
+                scores[changed].tolist(),
+                requested[changed].tolist(),
+            )
+        ]
+        # bulk_update saves all the batches of the period in a single transaction
+        CarbureLot.objects.bulk_update(updated_lots, ["ml_scoring", "ml_control_requested"], batch_size=BATCH_SIZE)
+        print(f"> Period {lot_period}: {len(frame)} lots scored, {len(updated_lots)} updated")
+
 
-    for lot in tqdm(lots.iterator()):
-        score = 0
+def get_stats():
+    # when a stat is duplicated, the last one wins, like in the prefetched data dicts
+    eec = pd.DataFrame.from_records(
+        EECStats.objects.order_by("id").values_list("feedstock_id", "origin_id", "default_value", "average"),
+        columns=["feedstock_id", "country_of_origin_id", "eec_default_value", "eec_average"],
+    ).drop_duplicates(["feedstock_id", "country_of_origin_id"], keep="last")
+    ep = pd.DataFrame.from_records(
+        EPStats.objects.order_by("id").values_list("feedstock_id", "biofuel_id", "default_value_max_ep", "average"),
+        columns=["feedstock_id", "biofuel_id", "ep_default_value_max", "ep_average"],
+    ).drop_duplicates(["feedstock_id", "biofuel_id"], keep="last")
+    return eec, ep
+
+
+def score_lots(frame, eec, ep):
+    """
+    Returns the ml score of each lot of the frame: the squared relative distance of its eec and ep
+    to the stats of its feedstock / origin and feedstock / biofuel, when they are far from them
+    """
+    # nullable foreign keys are read as floats, the stats keys are aligned on them
+    keys = ["feedstock_id", "biofuel_id", "country_of_origin_id"]
+    frame = frame.astype({key: float for key in keys})
+    eec = eec.astype({key: float for key in ["feedstock_id", "country_of_origin_id"]})
+    ep = ep.astype({key: float for key in ["feedstock_id", "biofuel_id"]})
+
+    frame = frame.merge(eec, how="left", on=["feedstock_id", "country_of_origin_id"])
+    frame = frame.merge(ep, how="left", on=["feedstock_id", "biofuel_id"])
+    score = np.zeros(len(frame))
+
+    # lots without stats have NaN stats, for which every comparison is False
+    with np.errstate(divide="ignore", invalid="ignore"):
         # eec penalisation
-        if lot.feedstock and lot.country_of_origin:
-            key = lot.feedstock.code + lot.country_of_origin.code_pays
-            if key in eec:
-                entry = eec[key]
-                if lot.eec < 0.8 * min(entry.default_value, entry.average):
-                    score += (
-                        (min(entry.default_value, entry.average) - lot.eec) / min(entry.default_value, entry.average)
-                    ) ** 2
-                if lot.eec > 1.2 * max(entry.default_value, entry.average):
-                    score += (
-                        (lot.eec - max(entry.default_value, entry.average)) / max(entry.default_value, entry.average)
-                    ) ** 2
+        eec_values = frame["eec"].to_numpy(dtype=float)
+        eec_min = np.fmin(frame["eec_default_value"], frame["eec_average"]).to_numpy(dtype=float)
+        eec_max = np.fmax(frame["eec_default_value"], frame["eec_average"]).to_numpy(dtype=float)
+        too_low = (eec_values < 0.8 * eec_min) & (eec_min > 0)
+        score += np.where(too_low, ((eec_min - eec_values) / eec_min) ** 2, 0)
+        too_high = (eec_values > 1.2 * eec_max) & (eec_max > 0)
+        score += np.where(too_high, ((eec_values - eec_max) / eec_max) ** 2, 0)
+
         # ep penalisation
-        key = lot.feedstock.code + lot.biofuel.code
-        if key in ep:
-            entry = ep[key]
-            if lot.ep < 0.8 * entry.average:
-                score += ((entry.average - lot.ep) / entry.average) ** 2
-            if entry.default_value_max_ep > 0 and lot.ep > 1.2 * entry.default_value_max_ep:
-                score += ((lot.ep - entry.default_value_max_ep) / entry.default_value_max_ep) ** 2
-
-        # etd penalisation ###### NOT INCLUDED FOR NOW - fausse les resultats - trop de faux positifs, trop different du premier check  # noqa: E501
-        # if lot.feedstock in etd:
-        #    default_value = etd[lot.feedstock]
-        #    if lot.etd > 2 * default_value and lot.etd > 5:
-        #        score += 1 # louche - ETD trop gros
-        #    if lot.country_of_origin:
-        #        if not lot.country_of_origin.is_in_europe and lot.etd <= default_value:
-        #            score += 1 # valeur ETD par defaut sur un lot qui vient de loin
-        #        if lot.country_of_origin.is_in_europe and lot.etd == default_value:
-        #            score += 0.5 # lot ne vient pas de loin, pas d'effort de calcul
-        lot.ml_scoring = score
-        if score > 0:
-            lot.ml_control_requested = True
-        lot.save()
+        ep_values = frame["ep"].to_numpy(dtype=float)
+        ep_average = frame["ep_average"].to_numpy(dtype=float)
+        ep_max = frame["ep_default_value_max"].to_numpy(dtype=float)
+        too_low = (ep_values < 0.8 * ep_average) & (ep_average > 0)
+        score += np.where(too_low, ((ep_average - ep_values) / ep_average) ** 2, 0)
+        too_high = (ep_max > 0) & (ep_values > 1.2 * ep_max)
+        score += np.where(too_high, ((ep_values - ep_max) / ep_max) ** 2, 0)
+
+    # etd penalisation ###### NOT INCLUDED FOR NOW - fausse les resultats - trop de faux positifs, trop different du premier check  # noqa: E501
+    # if lot.feedstock in etd:
+    #    default_value = etd[lot.feedstock]
+    #    if lot.etd > 2 * default_value and lot.etd > 5:
+    #        score += 1 # louche - ETD trop gros
+    #    if lot.country_of_origin:
+    #        if not lot.country_of_origin.is_in_europe and lot.etd <= default_value:
+    #            score += 1 # valeur ETD par defaut sur un lot qui vient de loin
+    #        if lot.country_of_origin.is_in_europe and lot.etd == default_value:
+    #            score += 0.5 # lot ne vient pas de loin, pas d'effort de calcul
+    return score
 
 
 def main():
     parser = argparse.ArgumentParser(description="Calculate machine learning score")
     parser.add_argument("--year", dest="year", action="store", help="year")
     parser.add_argument("--period", dest="period", action="store", help="period")
+    parser.add_argument("--from-period", dest="from_period", action="store", help="resume from this period")
     args = parser.parse_args()
 
-    calc_ml_score(args.year, args.period)
+    calc_ml_score(args.year, args.period, args.from_period)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+from core.models import CarbureLot
+from ml.scripts.calc_ml_score import DATE_BEGIN
+from transactions.sanity_checks.helpers import get_prefetched_data
+
+
+# copy of the lot by lot scoring, used before the set-based one, kept as a reference point
+def calc_ml_score_legacy(year=None, period=None):
+    data = get_prefetched_data()
+    eec = data["eec"]
+    ep = data["ep"]
+
+    lots = CarbureLot.objects.select_related("feedstock", "country_of_origin").filter(
+        created_at__gt=DATE_BEGIN,
+        lot_status__in=[CarbureLot.ACCEPTED, CarbureLot.FROZEN],
+    )
+    if year:
+        lots = lots.filter(year=year)
+    if period:
+        lots = lots.filter(period=period)
+
+    for lot in lots.iterator():
+        score = 0
+        # eec penalisation
+        if lot.feedstock and lot.country_of_origin:
+            key = lot.feedstock.code + lot.country_of_origin.code_pays
+            if key in eec:
+                entry = eec[key]
+                if lot.eec < 0.8 * min(entry.default_value, entry.average):
+                    score += (
+                        (min(entry.default_value, entry.average) - lot.eec) / min(entry.default_value, entry.average)
+                    ) ** 2
+                if lot.eec > 1.2 * max(entry.default_value, entry.average):
+                    score += (
+                        (lot.eec - max(entry.default_value, entry.average)) / max(entry.default_value, entry.average)
+                    ) ** 2
+        # ep penalisation
+        key = lot.feedstock.code + lot.biofuel.code
+        if key in ep:
+            entry = ep[key]
+            if lot.ep < 0.8 * entry.average:
+                score += ((entry.average - lot.ep) / entry.average) ** 2
+            if entry.default_value_max_ep > 0 and lot.ep > 1.2 * entry.default_value_max_ep:
+                score += ((lot.ep - entry.default_value_max_ep) / entry.default_value_max_ep) ** 2
+
+        lot.ml_scoring = score
+        if score > 0:
+            lot.ml_control_requested = True
+        lot.save()
@@ -0,0 +1,100 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Biocarburant, CarbureLot, MatierePremiere, Pays
+from ml.models import EECStats, EPStats
+from ml.scripts.calc_ml_score import calc_ml_score
+from ml.tests.legacy_ml_score import calc_ml_score_legacy
+from transactions.factories import CarbureLotFactory
+
+
+class CalcMlScoreTest(TestCase):
+    """Compare the scores computed period by period with the ones computed lot by lot."""
+
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.colza = MatierePremiere.objects.get(code="COLZA")
+        self.ble = MatierePremiere.objects.get(code="BLE")
+        self.emhv = Biocarburant.objects.get(code="EMHV")
+        self.eth = Biocarburant.objects.get(code="ETH")
+        self.france = Pays.objects.get(code_pays="FR")
+        self.other_country = Pays.objects.exclude(code_pays="FR").first()
+
+        EECStats.objects.create(feedstock=self.colza, origin=self.france, nb_lots=10, default_value=30, stddev=1, average=20)
+        EPStats.objects.create(
+            feedstock=self.colza, biofuel=self.emhv, nb_lots=10, default_value_max_ep=16, stddev=1, average=10
+        )
+        # no maximum ep: only too low values are penalised
+        EPStats.objects.create(feedstock=self.ble, biofuel=self.eth, nb_lots=10, stddev=1, average=20)
+
+        self.lots = []
+        for period in [202401, 202402]:
+            for feedstock, biofuel, country in [
+                (self.colza, self.emhv, self.france),
+                (self.colza, self.emhv, self.other_country),
+                (self.ble, self.eth, self.france),
+            ]:
+                for eec, ep in [(20, 10), (5, 5), (40, 25), (0, 100)]:
+                    self.lots.append(
+                        CarbureLotFactory.create(
+                            year=2024,
+                            period=period,
+                            feedstock=feedstock,
+                            biofuel=biofuel,
+                            country_of_origin=country,
+                            eec=eec,
+                            ep=ep,
+                            lot_status=CarbureLot.ACCEPTED,
+                            ml_scoring=0,
+                            ml_control_requested=False,
+                        )
+                    )
+        self.rejected = CarbureLotFactory.create(lot_status=CarbureLot.REJECTED, eec=0, ep=0, ml_scoring=0)
+
+    def get_scores(self):
+        return {lot.id: (lot.ml_scoring, lot.ml_control_requested) for lot in CarbureLot.objects.all()}
+
+    def test_same_scores_as_the_lot_loop(self):
+        CarbureLot.objects.update(ml_scoring=0, ml_control_requested=False)
+        calc_ml_score_legacy()
+        expected = self.get_scores()
+        CarbureLot.objects.update(ml_scoring=0, ml_control_requested=False)
+
+        calc_ml_score()
+        scores = self.get_scores()
+
+        self.assertEqual(scores.keys(), expected.keys())
+        for lot_id, (score, control_requested) in expected.items():
+            self.assertAlmostEqual(scores[lot_id][0], score, 9, lot_id)
+            self.assertEqual(scores[lot_id][1], control_requested, lot_id)
+        self.assertTrue(any(score > 0 for score, _ in scores.values()))
+        self.assertEqual(scores[self.rejected.id], (0, False))
+
+    def test_partition_by_period(self):
+        calc_ml_score(period=202402)
+        scored = CarbureLot.objects.filter(ml_scoring__gt=0)
+        self.assertTrue(scored.exists())
+        self.assertEqual(set(scored.values_list("period", flat=True)), {202402})
+
+        # resuming after the first period
+        CarbureLot.objects.update(ml_scoring=0)
+        calc_ml_score(from_period=202402)
+        self.assertEqual(set(scored.values_list("period", flat=True)), {202402})
+
+    def test_unchanged_scores_are_not_written(self):
+        calc_ml_score()
+        with self.assertNumQueries(5):
+            # stats, periods, then the lots of each period, without any update
+            calc_ml_score()
+
+    def test_benchmark_command(self):
+        call_command("benchmark_ml_score", year=2024)
+        # everything is rolled back
+        self.assertFalse(CarbureLot.objects.filter(ml_scoring__gt=0).exists())
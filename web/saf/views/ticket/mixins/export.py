@@ -4,9 +4,10 @@ from django.utils.translation import gettext as _
 from drf_spectacular.utils import OpenApiExample, OpenApiTypes, extend_schema
 from rest_framework.decorators import action
 
-from core.excel import ExcelResponse, export_to_excel
-from core.models import Entity
-from core.serializers import AirportSerializer
+from core.excel import ExcelResponse, export_to_excel, make_export_location, serialize_by_chunks
+from core.exports import export_job_response
+from core.models import Entity, ExportJob
+from core.serializers import AirportSerializer, ExportJobSerializer
 from saf.serializers.saf_ticket import SafTicketSerializer
 from transactions.models.airport import Airport
 
@@ -34,10 +35,17 @@ class ExportActionMixin:
         file = export_tickets_to_excel(tickets, entity)
         return ExcelResponse(file)
 
+    @extend_schema(filters=True, request=None, responses={202: ExportJobSerializer})
+    @action(methods=["get"], detail=False, url_path="export-async")
+    def export_async(self, request, *args, **kwargs):
+        tickets = self.filter_queryset(self.get_queryset())
+        return export_job_response(ExportJob.SAF_TICKETS, request, tickets)
+
 
-def export_tickets_to_excel(tickets, entity):
-    today = datetime.datetime.today()
-    location = "/tmp/carbure_saf_tickets_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
+def export_tickets_to_excel(tickets, entity, on_progress=None, location=None):
+    if location is None:
+        today = datetime.datetime.today()
+        location = "/tmp/carbure_saf_tickets_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
 
     is_airline = entity.entity_type == Entity.AIRLINE
 
@@ -46,7 +54,7 @@ def export_tickets_to_excel(tickets, entity):
         [
             {
                 "label": _("tickets"),
-                "rows": SafTicketSerializer(tickets, many=True).data,
+                "rows": serialize_by_chunks(tickets, SafTicketSerializer, on_progress),
                 "columns": [
                     {"label": "carbure_id", "value": "carbure_id"},
                     {"label": "year", "value": "year"},
@@ -96,6 +104,13 @@ def export_tickets_to_excel(tickets, entity):
     )
 
 
+# used by background export jobs
+def export_tickets_job(tickets, entity, on_progress):
+    file = export_tickets_to_excel(tickets, entity, on_progress, make_export_location("carbure_saf_tickets"))
+    file.close()
+    return file.name
+
+
 def get_producer(obj):
     if obj.get("carbure_producer"):
         return obj["carbure_producer"]["name"]
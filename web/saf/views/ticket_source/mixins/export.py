@@ -3,7 +3,10 @@ import datetime
 from drf_spectacular.utils import OpenApiExample, OpenApiTypes, extend_schema
 from rest_framework.decorators import action
 
-from core.excel import ExcelResponse, export_to_excel
+from core.excel import ExcelResponse, export_to_excel, make_export_location, serialize_by_chunks
+from core.exports import export_job_response
+from core.models import ExportJob
+from core.serializers import ExportJobSerializer
 from saf.serializers.saf_ticket_source import SafTicketSourceSerializer
 
 
@@ -29,17 +32,24 @@ class ExportActionMixin:
         file = export_ticket_sources_to_excel(tickets)
         return ExcelResponse(file)
 
+    @extend_schema(filters=True, request=None, responses={202: ExportJobSerializer})
+    @action(methods=["get"], detail=False, url_path="export-async")
+    def export_async(self, request, *args, **kwargs):
+        tickets = self.filter_queryset(self.get_queryset())
+        return export_job_response(ExportJob.SAF_TICKET_SOURCES, request, tickets)
+
 
-def export_ticket_sources_to_excel(tickets):
-    today = datetime.datetime.today()
-    location = "/tmp/carbure_saf_ticket_sources_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
+def export_ticket_sources_to_excel(tickets, on_progress=None, location=None):
+    if location is None:
+        today = datetime.datetime.today()
+        location = "/tmp/carbure_saf_ticket_sources_%s.xlsx" % (today.strftime("%Y%m%d_%H%M"))
 
     return export_to_excel(
         location,
         [
             {
                 "label": "tickets",
-                "rows": SafTicketSourceSerializer(tickets, many=True).data,
+                "rows": serialize_by_chunks(tickets, SafTicketSourceSerializer, on_progress),
                 "columns": [
                     {"label": "carbure_id", "value": "carbure_id"},
                     {"label": "year", "value": "year"},
@@ -72,6 +82,13 @@ def export_ticket_sources_to_excel(tickets):
     )
 
 
+# used by background export jobs
+def export_ticket_sources_job(tickets, entity, on_progress):
+    file = export_ticket_sources_to_excel(tickets, on_progress, make_export_location("carbure_saf_ticket_sources"))
+    file.close()
+    return file.name
+
+
 def get_producer(obj):
     if "carbure_producer" in obj and obj["carbure_producer"]:
         return obj["carbure_producer"]["name"]
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class TiruertConfig(AppConfig):
     name = "tiruert"
+
+    def ready(self):
+        from tiruert.services.balance_ledger import BalanceLedgerService
+
+        BalanceLedgerService.connect_signals()
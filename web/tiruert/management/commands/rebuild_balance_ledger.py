@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tiruert.services.balance_ledger import BalanceLedgerService
+
+
+class Command(BaseCommand):
+    help = "Recompute the TIRUERT balance ledger from the operations, needed once after the ledger table is created"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Number of lots processed per transaction")
+
+    def handle(self, *args, **options):
+        lots = BalanceLedgerService.rebuild(options["batch_size"])
+        self.stdout.write(f"Balance ledger rebuilt for {lots} lots")
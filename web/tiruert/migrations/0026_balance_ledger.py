@@ -0,0 +1,82 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0067_carburetraceabilitynode"),
+        ("tiruert", "0025_operation_export_recipient_alter_operation_type"),
+        ("transactions", "0018_alter_site_site_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BalanceLedger",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("sector", models.CharField(blank=True, max_length=20, null=True)),
+                (
+                    "customs_category",
+                    models.CharField(
+                        choices=[
+                            ("CONV", "Conventionnel"),
+                            ("ANN-IX-A", "ANNEXE IX-A"),
+                            ("ANN-IX-B", "ANNEXE IX-B"),
+                            ("TALLOL", "Tallol"),
+                            ("OTHER", "Autre"),
+                            ("EP2AM", "EP2AM"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("available_volume", models.FloatField(default=0)),
+                ("credit_volume", models.FloatField(default=0)),
+                ("debit_volume", models.FloatField(default=0)),
+                ("pending_teneur_volume", models.FloatField(default=0)),
+                ("declared_teneur_volume", models.FloatField(default=0)),
+                ("saved_emissions", models.FloatField(default=0)),
+                ("pending_operations", models.IntegerField(default=0)),
+                ("emission_rate_per_mj", models.FloatField(default=0)),
+                ("last_detail_id", models.IntegerField(null=True)),
+                (
+                    "biofuel",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tiruert_balance_ledger",
+                        to="core.biocarburant",
+                    ),
+                ),
+                (
+                    "depot",
+                    models.ForeignKey(
+                        null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="transactions.depot"
+                    ),
+                ),
+                (
+                    "entity",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="tiruert_balance_ledger", to="core.entity"
+                    ),
+                ),
+                (
+                    "lot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tiruert_balance_ledger",
+                        to="core.carburelot",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Solde TIRUERT",
+                "verbose_name_plural": "Soldes TIRUERT",
+                "db_table": "tiruert_balance_ledger",
+                "indexes": [
+                    models.Index(fields=["entity", "customs_category", "biofuel"], name="tiruert_bal_entity__4497aa_idx")
+                ],
+            },
+        ),
+    ]
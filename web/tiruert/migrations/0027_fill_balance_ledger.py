@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from tiruert.services.balance_ledger import BalanceLedgerService
+
+
+def fill_balance_ledger(apps, schema_editor):
+    BalanceLedgerService.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tiruert", "0026_balance_ledger"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_balance_ledger, reverse_code=migrations.RunPython.noop),
+    ]
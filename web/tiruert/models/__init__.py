@@ -5,4 +5,5 @@ from .fossil_fuel_category import FossilFuelCategory
 from .fossil_fuel_category_consideration_rate import FossilFuelCategoryConsiderationRate
 from .objective import Objective
 from .mac_fossil_fuel import MacFossilFuel
-from .elec_operation import ElecOperation
\ No newline at end of file
+from .elec_operation import ElecOperation
+from .balance_ledger import BalanceLedger
@@ -0,0 +1,40 @@
+from django.db import models
+
+from core.models import MatierePremiere
+
+
+class BalanceLedger(models.Model):
+    """
+    Running totals of the operations of an entity, per sector, customs category, biofuel, lot, depot and day.
+    Volumes are in liters and already multiplied by the renewable energy share of the operations.
+    Kept up to date by BalanceLedgerService, and rebuilt with the rebuild_balance_ledger command.
+    """
+
+    entity = models.ForeignKey("core.Entity", on_delete=models.CASCADE, related_name="tiruert_balance_ledger")
+    sector = models.CharField(max_length=20, null=True, blank=True)
+    customs_category = models.CharField(max_length=20, choices=MatierePremiere.MP_CATEGORIES)
+    biofuel = models.ForeignKey("core.Biocarburant", on_delete=models.CASCADE, related_name="tiruert_balance_ledger")
+    lot = models.ForeignKey("core.CarbureLot", on_delete=models.CASCADE, related_name="tiruert_balance_ledger")
+    # depot receiving the credits or sending the debits
+    depot = models.ForeignKey("transactions.Depot", null=True, on_delete=models.SET_NULL, related_name="+")
+    date = models.DateField()
+
+    available_volume = models.FloatField(default=0)
+    credit_volume = models.FloatField(default=0)
+    debit_volume = models.FloatField(default=0)
+    pending_teneur_volume = models.FloatField(default=0)
+    declared_teneur_volume = models.FloatField(default=0)
+    saved_emissions = models.FloatField(default=0)  # tCO2
+    pending_operations = models.IntegerField(default=0)
+
+    # emission rate of the latest operation detail counted in the available volume
+    emission_rate_per_mj = models.FloatField(default=0)
+    last_detail_id = models.IntegerField(null=True)
+
+    class Meta:
+        db_table = "tiruert_balance_ledger"
+        verbose_name = "Solde TIRUERT"
+        verbose_name_plural = "Soldes TIRUERT"
+        indexes = [
+            models.Index(fields=["entity", "customs_category", "biofuel"]),
+        ]
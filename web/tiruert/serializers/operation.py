@@ -7,6 +7,7 @@ from core.models import Pays
 from core.serializers import CountrySerializer
 from tiruert.models import Operation, OperationDetail
 from tiruert.serializers.operation_detail import OperationDetailSerializer
+from tiruert.services.balance_ledger import BalanceLedgerService
 from tiruert.services.operation import OperationService
 
 
@@ -184,6 +185,7 @@ class OperationInputSerializer(serializers.ModelSerializer):
             OperationDetail.objects.bulk_create(
                 [OperationDetail(**data) for data in detail_operations_data],
             )
+            BalanceLedgerService.refresh([lot["id"] for lot in selected_lots])
 
             return operation
 
@@ -1,7 +1,12 @@
 from collections import defaultdict
 from functools import partial
 
-from tiruert.models import Operation
+import numpy as np
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+
+from core.models import Biocarburant
+from tiruert.models import Operation, OperationDetail
+from transactions.models import Depot
 
 
 class BalanceService:
@@ -129,68 +134,244 @@ class BalanceService:
         )
 
     @staticmethod
-    def calculate_balance(operations, entity_id, group_by, unit, date_from=None, ges_bound_min=None, ges_bound_max=None):
+    def calculate_balance(
+        operations,
+        entity_id,
+        group_by,
+        unit,
+        date_from=None,
+        ges_bound_min=None,
+        ges_bound_max=None,
+        ledger_filters=None,
+    ):
         """
         Calculates balances based on the specified grouping
         'operations' is a queryset of already filtered operations
+        When 'ledger_filters' is given (see BalanceLedgerService.get_filters), the balance is read from the ledger instead
         """
-        # Use a defaultdict with a factory function that creates an appropriate balance entry
-        balance = defaultdict(partial(BalanceService._init_balance_entry, unit))
+        if ledger_filters is not None:
+            from tiruert.services.balance_ledger import BalanceLedgerService
+
+            return BalanceLedgerService.calculate_balance(
+                entity_id, group_by, unit, date_from, ges_bound_min, ges_bound_max, ledger_filters, operations
+            )
 
         operations = operations.filter(
             status__in=[Operation.PENDING, Operation.ACCEPTED, Operation.VALIDATED, Operation.DECLARED, Operation.DRAFT]
         )
 
-        for operation in operations:
-            credit_operation = operation.is_credit(entity_id)
+        balance = BalanceService._calculate_balance_vectorized(
+            operations, entity_id, group_by, unit, date_from, ges_bound_min, ges_bound_max
+        )
 
-            depot = None
-            if group_by == BalanceService.GROUP_BY_DEPOT:
-                depot = operation.to_depot if credit_operation else operation.from_depot
-                if depot is None:
-                    continue
+        if group_by == BalanceService.GROUP_BY_DEPOT:
+            balance = BalanceService._update_depot_debit_with_teneur_and_transfert(entity_id, balance, operations)
 
-            conversion_factor = BalanceService._get_conversion_factor(operation, unit)
+        return balance
 
-            for detail in operation.details.all():
-                # Keep only lots with requested GHG reduction
-                if ges_bound_min is not None and ges_bound_max is not None:
-                    if detail.lot.ghg_reduction_red_ii <= float(ges_bound_min) or detail.lot.ghg_reduction_red_ii >= float(
-                        ges_bound_max
-                    ):
-                        continue
-
-                key = BalanceService._get_key(operation, group_by, detail, depot)
-
-                if group_by != BalanceService.GROUP_BY_CATEGORY:
-                    balance[key]["sector"] = operation.sector
-
-                if group_by != BalanceService.GROUP_BY_SECTOR:
-                    balance[key]["customs_category"] = operation.customs_category
-                    if group_by != BalanceService.GROUP_BY_CATEGORY:
-                        balance[key]["biofuel"] = operation.biofuel
-
-                if not (credit_operation and (operation.status == Operation.PENDING or operation.status == Operation.DRAFT)):
-                    # Update available balance
-                    BalanceService._update_available_balance(
-                        balance, key, operation, detail, credit_operation, conversion_factor
-                    )
+    @staticmethod
+    def _calculate_balance_vectorized(
+        operations,
+        entity_id,
+        group_by,
+        unit,
+        date_from=None,
+        ges_bound_min=None,
+        ges_bound_max=None,
+    ):
+        """
+        Same result as iterating over the operations and their details one by one, but the details are read
+        in a single query and aggregated per group with numpy
+        """
+        from tiruert.services.teneur import GHG_REFERENCE_RED_II
 
-                    # Update quantity and teneur only if the operation date is after the date_from
-                    if date_from is None or operation.created_at >= date_from:
-                        BalanceService._update_quantity_and_teneur(
-                            balance, key, operation, detail, credit_operation, conversion_factor
-                        )
+        balance = defaultdict(partial(BalanceService._init_balance_entry, unit))
+        entity_id = int(entity_id)
+
+        if date_from is not None:
+            recent = ExpressionWrapper(Q(operation__created_at__gte=date_from), output_field=BooleanField())
+        else:
+            recent = Value(True, output_field=BooleanField())
+
+        details = list(
+            OperationDetail.objects.filter(operation__in=operations, operation__biofuel__isnull=False)
+            .annotate(recent=recent)
+            .order_by("operation_id", "id")
+            .values_list(
+                "operation_id",
+                "lot_id",
+                "volume",
+                "emission_rate_per_mj",
+                "lot__ghg_reduction_red_ii",
+                "recent",
+            )
+        )
+        if not details:
+            return balance
+
+        operation_rows = (
+            Operation.objects.filter(id__in={detail[0] for detail in details})
+            .order_by()
+            .values_list(
+                "id",
+                "type",
+                "status",
+                "customs_category",
+                "biofuel_id",
+                "credited_entity_id",
+                "from_depot_id",
+                "to_depot_id",
+                "renewable_energy_share",
+            )
+        )
 
-                # Update GHG reduction min and max values
-                if group_by not in BalanceService.GROUP_BY_ALL:
-                    BalanceService._update_ghg_min_max(balance, key, detail)
+        biofuels = Biocarburant.objects.in_bulk({row[4] for row in operation_rows})
+        sectors = {biofuel.id: Operation(biofuel=biofuel).sector for biofuel in biofuels.values()}
+        conversion_factor_name = BalanceService._define_conversion_factor(unit)
 
-            if "key" in locals() is not None and operation.status in [Operation.PENDING, Operation.DRAFT]:
-                balance[key]["pending_operations"] += 1
+        # one line per operation, with the index of its group: sector, customs category or both with the biofuel
+        operation_index = {}
+        groups = {}
+        columns = {name: [] for name in ["group", "credit", "pending", "teneur", "pending_teneur", "depot", "share"]}
+        columns.update(factor=[], pci=[])
+        for operation_id, type, status, customs_category, biofuel_id, credited_entity_id, *others in operation_rows:
+            from_depot_id, to_depot_id, share = others
+            biofuel = biofuels[biofuel_id]
+            credit = credited_entity_id == entity_id
+            if group_by == BalanceService.GROUP_BY_SECTOR:
+                group = (sectors[biofuel.id],)
+            elif group_by == BalanceService.GROUP_BY_CATEGORY:
+                group = (customs_category,)
+            else:
+                group = (sectors[biofuel.id], customs_category, biofuel.id)
+
+            operation_index[operation_id] = len(operation_index)
+            columns["group"].append(groups.setdefault(group, len(groups)))
+            columns["credit"].append(credit)
+            columns["pending"].append(status in [Operation.PENDING, Operation.DRAFT])
+            columns["teneur"].append(type == Operation.TENEUR)
+            columns["pending_teneur"].append(status == Operation.PENDING)
+            columns["depot"].append((to_depot_id if credit else from_depot_id) or 0)
+            columns["share"].append(share)
+            columns["factor"].append(getattr(biofuel, conversion_factor_name, 1) if conversion_factor_name else 1)
+            columns["pci"].append(biofuel.pci_litre)
+        columns = {name: np.array(values) for name, values in columns.items()}
+
+        operation_ids, lot_ids, volumes, emission_rates, ghg_reductions, recent = (
+            np.array(column) for column in zip(*details)
+        )
+        rows = np.fromiter((operation_index[operation_id] for operation_id in operation_ids), dtype=int, count=len(details))
+        ghg_reductions = ghg_reductions.astype(float)
+        recent = recent.astype(bool)
+
+        credit = columns["credit"][rows]
+        pending = columns["pending"][rows]
+        depots = columns["depot"][rows]
+
+        # keep only the lots with the requested GHG reduction, and the operations with a depot when grouping by depot
+        selected = np.ones(len(details), dtype=bool)
+        if ges_bound_min is not None and ges_bound_max is not None:
+            selected &= (ghg_reductions > float(ges_bound_min)) & (ghg_reductions < float(ges_bound_max))
+        if group_by == BalanceService.GROUP_BY_DEPOT:
+            selected &= depots != 0
 
+        # pending operations are counted on the group of the last detail seen, selected or not in the operation itself
+        last_selected = np.maximum.accumulate(np.where(selected, np.arange(len(details)), -1))
+        operation_ends = np.flatnonzero(np.append(rows[1:] != rows[:-1], True))
+        operation_ends = operation_ends[columns["pending"][rows[operation_ends]]]
         if group_by == BalanceService.GROUP_BY_DEPOT:
-            balance = BalanceService._update_depot_debit_with_teneur_and_transfert(entity_id, balance, operations)
+            operation_ends = operation_ends[depots[operation_ends] != 0]
+        pending_positions = last_selected[operation_ends]
+        pending_positions = pending_positions[pending_positions >= 0]
+
+        if not selected.any():
+            return balance
+
+        # group each detail by the columns of the requested key
+        group_ids = columns["group"][rows]
+        if group_by == BalanceService.GROUP_BY_LOT:
+            key_columns = [group_ids, lot_ids]
+        elif group_by == BalanceService.GROUP_BY_DEPOT:
+            key_columns = [group_ids, depots]
+        else:
+            key_columns = [group_ids]
+        key_rows, inverse = np.unique(np.stack(key_columns, axis=1)[selected], axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        size = len(key_rows)
+
+        def total(values, mask):
+            return np.bincount(inverse, weights=np.where(mask, values, 0)[selected], minlength=size)
+
+        quantities = volumes * columns["factor"][rows] * columns["share"][rows]
+        avoided_emissions = (GHG_REFERENCE_RED_II - emission_rates) * volumes * columns["pci"][rows] / 1000000
+        sign = np.where(credit, 1, -1)
+        counted = ~(credit & pending)
+        counted_recent = counted & recent
+        teneur = columns["teneur"][rows] & counted_recent
+        pending_teneur = columns["pending_teneur"][rows]
+
+        totals = {
+            "available_balance": total(quantities * sign, counted),
+            "saved_emissions": total(avoided_emissions * sign, counted),
+            "credit": total(quantities, counted_recent & credit),
+            "debit": total(quantities, counted_recent & ~credit),
+            "pending_teneur": total(quantities, teneur & pending_teneur),
+            "declared_teneur": total(quantities, teneur & ~pending_teneur),
+        }
+
+        group_index = np.full(len(details), -1)
+        group_index[selected] = inverse
+        pending_operations = np.bincount(group_index[pending_positions], minlength=size)
+
+        # the emission rate of a group is the one of its last counted detail
+        positions = np.arange(len(details))[selected]
+        last_counted = np.full(size, -1)
+        np.maximum.at(last_counted, inverse[counted[selected]], positions[counted[selected]])
+
+        # GHG reductions of 0 are ignored, like missing ones
+        ghg_min, ghg_max = np.full(size, np.inf), np.full(size, -np.inf)
+        if group_by not in BalanceService.GROUP_BY_ALL:
+            has_ghg = (ghg_reductions[selected] != 0) & ~np.isnan(ghg_reductions[selected])
+            np.minimum.at(ghg_min, inverse[has_ghg], ghg_reductions[selected][has_ghg])
+            np.maximum.at(ghg_max, inverse[has_ghg], ghg_reductions[selected][has_ghg])
+
+        group_keys = {index: group for group, index in groups.items()}
+        depots = (
+            Depot.objects.in_bulk(set(depots[selected].tolist()) - {0}) if group_by == BalanceService.GROUP_BY_DEPOT else {}
+        )
+
+        for i, key_row in enumerate(key_rows.tolist()):
+            group = group_keys[key_row[0]]
+
+            if group_by == BalanceService.GROUP_BY_SECTOR:
+                key = group[0]
+                balance[key]["sector"] = group[0]
+            elif group_by == BalanceService.GROUP_BY_CATEGORY:
+                key = group[0]
+                balance[key]["customs_category"] = group[0]
+            else:
+                sector, customs_category, biofuel_id = group
+                biofuel = biofuels[biofuel_id]
+                key = (sector, customs_category, biofuel.code)
+                if group_by == BalanceService.GROUP_BY_LOT:
+                    key += (key_row[1],)
+                elif group_by == BalanceService.GROUP_BY_DEPOT:
+                    key += (depots[key_row[1]],)
+                balance[key].update(sector=sector, customs_category=customs_category, biofuel=biofuel)
+
+            entry = balance[key]
+            entry["available_balance"] = round(float(totals["available_balance"][i]), 2)
+            entry["saved_emissions"] = round(float(totals["saved_emissions"][i]), 2)
+            entry["quantity"]["credit"] = round(float(totals["credit"][i]), 2)
+            entry["quantity"]["debit"] = round(float(totals["debit"][i]), 2)
+            entry["pending_teneur"] = round(float(totals["pending_teneur"][i]), 2)
+            entry["declared_teneur"] = round(float(totals["declared_teneur"][i]), 2)
+            entry["pending_operations"] = int(pending_operations[i])
+            if last_counted[i] >= 0:
+                entry["emission_rate_per_mj"] = float(emission_rates[last_counted[i]])
+            if np.isfinite(ghg_min[i]):
+                entry["ghg_reduction_min"] = float(ghg_min[i])
+                entry["ghg_reduction_max"] = float(ghg_max[i])
 
         return balance
 
@@ -0,0 +1,346 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Q, Sum, Value
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from core.models import Biocarburant, Entity
+from saf.models.constants import SAF_BIOFUEL_TYPES
+from tiruert.models import BalanceLedger, Operation, OperationDetail
+from tiruert.services.balance import BalanceService
+from transactions.models import Depot
+
+
+class BalanceLedgerService:
+    # operations taken into account in the balances
+    STATUSES = [Operation.PENDING, Operation.ACCEPTED, Operation.VALIDATED, Operation.DECLARED, Operation.DRAFT]
+
+    # operation filters that can be answered from the ledger, the other ones need the full computation
+    FILTERS = ["biofuel", "customs_category", "sector"]
+    UNSUPPORTED_FILTERS = ["from_to", "depot", "type", "operation", "status", "date_to", "period"]
+
+    # ledger columns grouped together for each balance grouping
+    GROUP_FIELDS = {
+        BalanceService.GROUP_BY_SECTOR: ["sector"],
+        BalanceService.GROUP_BY_CATEGORY: ["customs_category"],
+        BalanceService.GROUP_BY_LOT: ["sector", "customs_category", "biofuel_id", "lot_id"],
+        BalanceService.GROUP_BY_DEPOT: ["sector", "customs_category", "biofuel_id", "depot_id"],
+        None: ["sector", "customs_category", "biofuel_id"],
+    }
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def get_sector(biofuel):
+        """
+        Same as Operation.sector
+        """
+        if biofuel.compatible_essence:
+            return Operation.ESSENCE
+        elif biofuel.compatible_diesel:
+            return Operation.GAZOLE
+        elif biofuel.code in SAF_BIOFUEL_TYPES:
+            return Operation.CARBUREACTEUR
+
+    @staticmethod
+    def get_filters(query_params, entity):
+        """
+        Returns the filters of the request that can be applied on the ledger,
+        or None if the balance has to be computed from the operations
+        """
+        if entity.entity_type == Entity.EXTERNAL_ADMIN:
+            return None
+
+        for name in BalanceLedgerService.UNSUPPORTED_FILTERS:
+            if any(query_params.getlist(name)):
+                return None
+
+        return {name: [value for value in query_params.getlist(name) if value] for name in BalanceLedgerService.FILTERS}
+
+    @staticmethod
+    def _get_models(apps=None):
+        """
+        The models are read from `apps` when given, so migrations can fill the ledger with their historical models
+        """
+        if apps is None:
+            return OperationDetail, BalanceLedger, Biocarburant
+        return (
+            apps.get_model("tiruert", "OperationDetail"),
+            apps.get_model("tiruert", "BalanceLedger"),
+            apps.get_model("core", "Biocarburant"),
+        )
+
+    @staticmethod
+    def _get_entries(lot_ids, apps=None):
+        """
+        Computes the ledger entries of the given lots from their operation details
+        """
+        from tiruert.services.teneur import TeneurService
+
+        operation_detail_model, ledger_model, biofuel_model = BalanceLedgerService._get_models(apps)
+
+        details = list(
+            operation_detail_model.objects.filter(lot_id__in=lot_ids, operation__status__in=BalanceLedgerService.STATUSES)
+            .exclude(operation__biofuel=None)
+            .values(
+                "id",
+                "lot_id",
+                "volume",
+                "emission_rate_per_mj",
+                "operation_id",
+                "operation__type",
+                "operation__status",
+                "operation__customs_category",
+                "operation__biofuel_id",
+                "operation__credited_entity_id",
+                "operation__debited_entity_id",
+                "operation__from_depot_id",
+                "operation__to_depot_id",
+                "operation__created_at",
+                "operation__renewable_energy_share",
+            )
+        )
+
+        # pending operations are counted once, on the row of their last detail
+        operation_ids = {detail["operation_id"] for detail in details}
+        last_details = (
+            operation_detail_model.objects.filter(operation_id__in=operation_ids)
+            .values("operation_id")
+            .annotate(last_id=Max("id"))
+            .values_list("operation_id", "last_id")
+        )
+        last_detail_ids = {last_id for _, last_id in last_details}
+
+        biofuels = biofuel_model.objects.in_bulk({detail["operation__biofuel_id"] for detail in details})
+
+        entries = {}
+        for detail in sorted(details, key=lambda detail: detail["id"]):
+            biofuel = biofuels[detail["operation__biofuel_id"]]
+            status = detail["operation__status"]
+            credited_entity_id = detail["operation__credited_entity_id"]
+            debited_entity_id = detail["operation__debited_entity_id"]
+            quantity = detail["volume"] * detail["operation__renewable_energy_share"]
+            avoided_emissions = TeneurService.convert_producted_emissions_to_avoided_emissions(
+                detail["volume"], biofuel, detail["emission_rate_per_mj"]
+            )
+
+            for entity_id in {credited_entity_id, debited_entity_id} - {None}:
+                credit_operation = entity_id == credited_entity_id
+                pending_credit = credit_operation and status in [Operation.PENDING, Operation.DRAFT]
+
+                # credit drafts are hidden from the balances, like in the operations list
+                if credit_operation and status == Operation.DRAFT:
+                    continue
+
+                depot_id = detail["operation__to_depot_id"] if credit_operation else detail["operation__from_depot_id"]
+                sector = BalanceLedgerService.get_sector(biofuel)
+                key = (
+                    entity_id,
+                    sector,
+                    detail["operation__customs_category"],
+                    biofuel.id,
+                    detail["lot_id"],
+                    depot_id,
+                    timezone.localdate(detail["operation__created_at"]),
+                )
+
+                if key not in entries:
+                    entries[key] = ledger_model(
+                        entity_id=entity_id,
+                        sector=sector,
+                        customs_category=key[2],
+                        biofuel_id=key[3],
+                        lot_id=key[4],
+                        depot_id=depot_id,
+                        date=key[6],
+                    )
+                entry = entries[key]
+
+                if not pending_credit:
+                    sign = 1 if credit_operation else -1
+                    entry.available_volume += quantity * sign
+                    entry.saved_emissions += avoided_emissions * sign
+                    entry.emission_rate_per_mj = detail["emission_rate_per_mj"]
+                    entry.last_detail_id = detail["id"]
+
+                    if credit_operation:
+                        entry.credit_volume += quantity
+                    else:
+                        entry.debit_volume += quantity
+
+                    if detail["operation__type"] == Operation.TENEUR:
+                        if status == Operation.PENDING:
+                            entry.pending_teneur_volume += quantity
+                        else:
+                            entry.declared_teneur_volume += quantity
+
+                if status in [Operation.PENDING, Operation.DRAFT] and detail["id"] in last_detail_ids:
+                    entry.pending_operations += 1
+
+        return list(entries.values())
+
+    @staticmethod
+    @transaction.atomic
+    def refresh(lot_ids, apps=None):
+        """
+        Recomputes the ledger rows of the given lots
+        Must be called after operations or details are written without sending signals (bulk_create, update)
+        """
+        _, ledger_model, _ = BalanceLedgerService._get_models(apps)
+        lot_ids = list({lot_id for lot_id in lot_ids if lot_id is not None})
+
+        for i in range(0, len(lot_ids), BalanceLedgerService.BATCH_SIZE):
+            batch = lot_ids[i : i + BalanceLedgerService.BATCH_SIZE]
+            ledger_model.objects.filter(lot_id__in=batch).delete()
+            ledger_model.objects.bulk_create(BalanceLedgerService._get_entries(batch, apps))
+
+    @staticmethod
+    def refresh_operations(operations):
+        """
+        Recomputes the ledger rows of the lots of the given operations
+        """
+        lot_ids = OperationDetail.objects.filter(operation__in=operations).values_list("lot_id", flat=True)
+        BalanceLedgerService.refresh(lot_ids)
+
+    @staticmethod
+    def rebuild(batch_size=10000, apps=None):
+        """
+        Recomputes the whole ledger from the operations, returns the number of lots processed
+        """
+        operation_detail_model, ledger_model, _ = BalanceLedgerService._get_models(apps)
+        lot_ids = list(operation_detail_model.objects.order_by("lot_id").values_list("lot_id", flat=True).distinct())
+
+        with transaction.atomic():
+            ledger_model.objects.exclude(lot_id__in=lot_ids).delete()
+
+        for i in range(0, len(lot_ids), batch_size):
+            BalanceLedgerService.refresh(lot_ids[i : i + batch_size], apps)
+
+        return len(lot_ids)
+
+    @staticmethod
+    def calculate_balance(
+        entity_id,
+        group_by,
+        unit,
+        date_from=None,
+        ges_bound_min=None,
+        ges_bound_max=None,
+        filters=None,
+        operations=None,
+    ):
+        """
+        Same result as BalanceService.calculate_balance, aggregated from the ledger
+        'operations' is only needed to distribute the teneur and transfert debits when grouping by depot
+        """
+        balance = defaultdict(partial(BalanceService._init_balance_entry, unit))
+        filters = filters or {}
+
+        rows = BalanceLedger.objects.filter(entity_id=entity_id)
+        if filters.get("biofuel"):
+            rows = rows.filter(biofuel__code__in=filters["biofuel"])
+        if filters.get("customs_category"):
+            rows = rows.filter(customs_category__in=filters["customs_category"])
+        if filters.get("sector"):
+            rows = rows.filter(sector__in=filters["sector"])
+        if ges_bound_min is not None and ges_bound_max is not None:
+            rows = rows.filter(
+                lot__ghg_reduction_red_ii__gt=float(ges_bound_min), lot__ghg_reduction_red_ii__lt=float(ges_bound_max)
+            )
+        if group_by == BalanceService.GROUP_BY_DEPOT:
+            rows = rows.exclude(depot=None)
+
+        conversion_factor_name = BalanceService._define_conversion_factor(unit)
+        factor = F(f"biofuel__{conversion_factor_name}") if conversion_factor_name else Value(1.0)
+        since = Q(date__gte=timezone.localdate(date_from)) if date_from is not None else Q()
+
+        aggregates = {
+            "available": Sum(F("available_volume") * factor),
+            "credit": Sum(F("credit_volume") * factor, filter=since),
+            "debit": Sum(F("debit_volume") * factor, filter=since),
+            "pending_teneur": Sum(F("pending_teneur_volume") * factor, filter=since),
+            "declared_teneur": Sum(F("declared_teneur_volume") * factor, filter=since),
+            "saved_emissions": Sum("saved_emissions"),
+            "pending_operations": Sum("pending_operations"),
+        }
+        if group_by not in BalanceService.GROUP_BY_ALL:
+            has_ghg = ~Q(lot__ghg_reduction_red_ii=0)
+            aggregates["ghg_min"] = Min("lot__ghg_reduction_red_ii", filter=has_ghg)
+            aggregates["ghg_max"] = Max("lot__ghg_reduction_red_ii", filter=has_ghg)
+
+        group_fields = BalanceLedgerService.GROUP_FIELDS.get(group_by, BalanceLedgerService.GROUP_FIELDS[None])
+        totals = list(rows.values(*group_fields).annotate(**aggregates).order_by(*group_fields))
+
+        biofuels = Biocarburant.objects.in_bulk({total["biofuel_id"] for total in totals if "biofuel_id" in total})
+        depots = Depot.objects.in_bulk({total["depot_id"] for total in totals if "depot_id" in total})
+
+        def get_key(values):
+            # same keys as BalanceService._get_key
+            if group_by == BalanceService.GROUP_BY_SECTOR:
+                return values["sector"]
+            elif group_by == BalanceService.GROUP_BY_CATEGORY:
+                return values["customs_category"]
+
+            key = (values["sector"], values["customs_category"], biofuels[values["biofuel_id"]].code)
+            if group_by == BalanceService.GROUP_BY_LOT:
+                return key + (values["lot_id"],)
+            elif group_by == BalanceService.GROUP_BY_DEPOT:
+                return key + (depots[values["depot_id"]],)
+            return key
+
+        for total in totals:
+            biofuel = biofuels.get(total.get("biofuel_id"))
+            key = get_key(total)
+
+            entry = balance[key]
+            if group_by != BalanceService.GROUP_BY_CATEGORY:
+                entry["sector"] = total["sector"]
+            if group_by != BalanceService.GROUP_BY_SECTOR:
+                entry["customs_category"] = total["customs_category"]
+                if group_by != BalanceService.GROUP_BY_CATEGORY:
+                    entry["biofuel"] = biofuel
+
+            entry["available_balance"] = round(total["available"] or 0, 2)
+            entry["quantity"]["credit"] = round(total["credit"] or 0, 2)
+            entry["quantity"]["debit"] = round(total["debit"] or 0, 2)
+            entry["pending_teneur"] = round(total["pending_teneur"] or 0, 2)
+            entry["declared_teneur"] = round(total["declared_teneur"] or 0, 2)
+            entry["saved_emissions"] = round(total["saved_emissions"] or 0, 2)
+            entry["pending_operations"] = total["pending_operations"] or 0
+
+            if group_by not in BalanceService.GROUP_BY_ALL:
+                entry["ghg_reduction_min"] = total["ghg_min"]
+                entry["ghg_reduction_max"] = total["ghg_max"]
+
+        # the emission rate of an entry is the one of its latest operation detail, mostly used when displaying lots
+        rates = rows.exclude(last_detail_id=None).order_by("last_detail_id").values(*group_fields, "emission_rate_per_mj")
+        for rate in rates:
+            balance[get_key(rate)]["emission_rate_per_mj"] = rate["emission_rate_per_mj"]
+
+        if group_by == BalanceService.GROUP_BY_DEPOT and operations is not None:
+            operations = operations.filter(status__in=BalanceLedgerService.STATUSES)
+            balance = BalanceService._update_depot_debit_with_teneur_and_transfert(entity_id, balance, operations)
+
+        return balance
+
+    @staticmethod
+    def on_operation_save(sender, instance, **kwargs):
+        BalanceLedgerService.refresh_operations([instance.pk])
+
+    @staticmethod
+    def on_detail_change(sender, instance, **kwargs):
+        BalanceLedgerService.refresh([instance.lot_id])
+
+    @staticmethod
+    def connect_signals():
+        post_save.connect(
+            BalanceLedgerService.on_operation_save, sender=Operation, dispatch_uid="tiruert_ledger_operation_save"
+        )
+        post_save.connect(
+            BalanceLedgerService.on_detail_change, sender=OperationDetail, dispatch_uid="tiruert_ledger_detail_save"
+        )
+        post_delete.connect(
+            BalanceLedgerService.on_detail_change, sender=OperationDetail, dispatch_uid="tiruert_ledger_detail_delete"
+        )
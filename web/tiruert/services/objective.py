@@ -1,10 +1,11 @@
+from collections import defaultdict
 from datetime import datetime
 
 from django.db import models
 from django.utils import timezone
 from django.utils.timezone import make_aware
 
-from tiruert.models import MacFossilFuel, Objective
+from tiruert.models import FossilFuelCategoryConsiderationRate, MacFossilFuel, Objective
 from tiruert.models.elec_operation import ElecOperation
 from tiruert.services.balance import BalanceService
 from tiruert.services.elec_balance import ElecBalanceService
@@ -18,30 +19,76 @@ class ObjectiveService:
         Calculate the energy basis (from fossil fuels mac), used for all objectives calculations
         E_nt = ∑(Volume MaC x PCI relatif x Taux de prise en compte relatif)
         """
-        total_energy = mac_queryset.annotate(
-            energy=models.F("volume")
-            * models.F("fuel__fuel_category__pci_litre")
-            * models.Case(
-                models.When(
-                    fuel__fuel_category__consideration_rates__year=year,
-                    then=models.F("fuel__fuel_category__consideration_rates__consideration_rate"),
-                ),
-                default=1,
-                output_field=models.FloatField(),
-            )
-        ).aggregate(total=models.Sum("energy"))["total"]
+        energy_per_category = ObjectiveService.merge_energy_bases(ObjectiveService.get_energy_bases(mac_queryset, year))
+        if not energy_per_category:
+            return None
 
-        return total_energy  # (MJ)
+        return sum(energy_per_category.values())  # (MJ)
+
+    @staticmethod
+    def get_energy_bases(mac_queryset, year=None):
+        """
+        Calculate the energy basis per fuel category of every operator and year of the given macs,
+        with a single grouped query (the consideration rates are read separately, once)
+        If 'year' is given, its consideration rates are used for all the macs
+
+        Returns:
+            Dict of {(operator_id, year): {fuel category name: energy basis (MJ)}}
+        """
+        totals = (
+            mac_queryset.order_by()
+            .values("operator_id", "year", "fuel__fuel_category_id", "fuel__fuel_category__name")
+            .annotate(energy=models.Sum(models.F("volume") * models.F("fuel__fuel_category__pci_litre")))
+        )
+
+        rates = {
+            (rate["category_fuel_id"], rate["year"]): rate["consideration_rate"]
+            for rate in FossilFuelCategoryConsiderationRate.objects.values("category_fuel_id", "year", "consideration_rate")
+        }
+
+        energy_bases = defaultdict(lambda: defaultdict(float))
+        for total in totals:
+            categories = energy_bases[(total["operator_id"], total["year"])]
+
+            rate_year = int(year) if year is not None else total["year"]
+            rate = rates.get((total["fuel__fuel_category_id"], rate_year), 1)
+            # fuels without category and consideration rates left empty are not part of the energy basis
+            if total["energy"] is None or rate is None:
+                continue
+            categories[total["fuel__fuel_category__name"]] += total["energy"] * rate
+
+        return energy_bases
+
+    @staticmethod
+    def merge_energy_bases(energy_bases, entity_id=None):
+        """
+        Sum the energy bases per fuel category of all the operators and years, or of a single operator
+        Returns None if there is no mac at all
+        """
+        energy_per_category = None
+        for (operator_id, _), categories in energy_bases.items():
+            if entity_id is not None and operator_id != int(entity_id):
+                continue
+            energy_per_category = energy_per_category or defaultdict(float)
+            for category, energy in categories.items():
+                energy_per_category[category] += energy
+        return dict(energy_per_category) if energy_per_category is not None else None
 
     @staticmethod
     def calculate_objectives_and_penalties(
-        balance, objective_queryset, objective_type, energy_basis=None, mac_queryset=None, year=None
+        balance,
+        objective_queryset,
+        objective_type,
+        energy_basis=None,
+        mac_queryset=None,
+        year=None,
+        energy_per_category=None,
     ):
         """
         Calculate objectives per category or sector.
 
-        For SECTOR type: if mac_queryset is provided, calculates sector-specific energy basis
-        for each sector based on its fuel_category.
+        For SECTOR type: uses the energy basis of the fuel_category of each sector, taken from
+        energy_per_category or calculated once from mac_queryset.
 
         For BIOFUEL_CATEGORY type: uses the provided global energy_basis.
 
@@ -52,6 +99,7 @@ class ObjectiveService:
             energy_basis: Global energy basis (required for BIOFUEL_CATEGORY)
             mac_queryset: Queryset of MacFossilFuel (optional, for SECTOR with per-sector energy basis)
             year: Year for calculation (required if mac_queryset provided)
+            energy_per_category: Energy basis per fuel category name (optional, see get_energy_bases)
 
         Returns:
             List of objectives with balances and energy basis
@@ -69,10 +117,13 @@ class ObjectiveService:
             if objective_type == Objective.SECTOR:
                 balance[key]["energy_basis"] = 0
 
-        objectives = objective_queryset.filter(type=objective_type)
-        if not objectives.exists():
+        objectives = list(objective_queryset.filter(type=objective_type))
+        if not objectives:
             return list(balance.values())
 
+        if objective_type == Objective.SECTOR and energy_per_category is None and mac_queryset:
+            energy_per_category = ObjectiveService.merge_energy_bases(ObjectiveService.get_energy_bases(mac_queryset, year))
+
         # Calculate objectives
         for objective in objectives:
             # Determine balance key based on objective type
@@ -87,10 +138,9 @@ class ObjectiveService:
                 continue
 
             # Calculate energy basis for this objective
-            if objective_type == Objective.SECTOR and mac_queryset:
-                # Sector-specific energy basis: filter MAC by fuel_category
-                sector_macs = mac_queryset.filter(fuel__fuel_category__name=objective.fuel_category.name)
-                objective_energy_basis = ObjectiveService.calculate_energy_basis(sector_macs, year=year)
+            if objective_type == Objective.SECTOR and energy_per_category is not None:
+                # Sector-specific energy basis: MACs of the fuel_category
+                objective_energy_basis = energy_per_category.get(objective.fuel_category.name)
                 if objective_energy_basis:
                     balance[key]["energy_basis"] = objective_energy_basis
             else:
@@ -289,11 +339,15 @@ class ObjectiveService:
                             aggregated[code]["objective"][key] += item["objective"][key]
 
     @staticmethod
-    def get_balances_for_objectives_calculation(operations, entity_id, date_from):
+    def get_balances_for_objectives_calculation(operations, entity_id, date_from, ledger_filters=None):
         date_from = make_aware(datetime.strptime(date_from, "%Y-%m-%d"))
 
-        balance_per_category = BalanceService.calculate_balance(operations, entity_id, "customs_category", "mj", date_from)
-        balance_per_sector = BalanceService.calculate_balance(operations, entity_id, "sector", "mj", date_from)
+        balance_per_category = BalanceService.calculate_balance(
+            operations, entity_id, "customs_category", "mj", date_from, ledger_filters=ledger_filters
+        )
+        balance_per_sector = BalanceService.calculate_balance(
+            operations, entity_id, "sector", "mj", date_from, ledger_filters=ledger_filters
+        )
 
         return balance_per_category, balance_per_sector
 
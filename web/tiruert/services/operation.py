@@ -8,6 +8,7 @@ from core.models import CarbureLot, MatierePremiere
 from tiruert.filters import OperationFilterForBalance
 from tiruert.models import Operation, OperationDetail
 from tiruert.services.balance import BalanceService
+from tiruert.services.balance_ledger import BalanceLedgerService
 from tiruert.services.objective import ObjectiveService
 from tiruert.services.teneur import TeneurService
 
@@ -70,7 +71,8 @@ class OperationService:
             request.GET["customs_category"] = data["customs_category"]
             request.GET["biofuel"] = data["biofuel"].code
             operations = OperationFilterForBalance(request.GET, queryset=Operation.objects.all(), request=request).qs
-            balance = BalanceService.calculate_balance(operations, entity_id, None, "mj")
+            ledger_filters = {"biofuel": [data["biofuel"].code], "customs_category": [data["customs_category"]]}
+            balance = BalanceService.calculate_balance(operations, entity_id, None, "mj", ledger_filters=ledger_filters)
             balance = list(balance.values())[0]  # keep the first (and only one) element
 
             # 3. Convert the teneur to add from liters to MJ
@@ -163,6 +165,7 @@ class OperationService:
                 )
 
             OperationDetail.objects.bulk_create([OperationDetail(**data) for data in lots_bulk])
+            BalanceLedgerService.refresh([lot.id for lot in lots])
 
     @staticmethod
     def filter_valid_lots(lots):
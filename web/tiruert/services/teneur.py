@@ -1,8 +1,12 @@
+import hashlib
 from typing import Optional
 
 import numpy as np
 import numpy.typing as npt
 import scipy.optimize
+import scipy.sparse
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 
 from adapters.logger import log_warning
@@ -19,8 +23,15 @@ class TeneurServiceErrors:
 
 GHG_REFERENCE_RED_II = 94  # gCO2/MJ
 
+SIMULATION_KEY = "teneur:simulation:{entity}:{hash}"
+
 
 class TeneurService:
+    # seconds given to the MILP solver before falling back to the best solution found
+    MILP_TIME_LIMIT = 5
+    # number of lowest emission and of largest batches given to the solver again when it runs out of time
+    FALLBACK_POOL_SIZE = 20
+
     @staticmethod
     def optimize_biofuel_blending(
         batches_volumes: npt.NDArray[np.float64],
@@ -29,27 +40,16 @@ class TeneurService:
         target_emission: float,
         enforced_volumes: Optional[npt.NDArray[np.float64]] = None,
         max_n_batches: Optional[int] = None,
-    ) -> scipy.optimize.OptimizeResult:
-        r"""Compute optimal batches volumes using linear programming.
-
-        The coefficients of `c` define the objective. It contains, in order:
-        - The batches emissions levels, divided by the target volume.
-        - Zeroes, corresponding to the batch inclusion boolean flags.
-        - The emission per energy "target" as the last element.
+    ) -> tuple[dict, float]:
+        """Compute optimal batches volumes using linear programming.
 
-        We set the linear constraints accordingly to the following:
-        - `b_l <= A @ x <= b_u` constraints (in order of appearance inside the `A` matrix):
-        - Mix emissions should be less or equal than target.
-        - The sum of the extracted volumes should equal target volume.
-        - The number of batches with non-zero extracted volume is less or equal than
-            `max_batches_constraint`.
-        - `x_bounds`:
-        - `x`'s elements must lie between zero and available volume for each batch.
-        - The last coefficient is forced to 1 so that <c, x> defines the objective.
+        The extracted volumes must sum up to the target volume, with a mix emission rate as close
+        as possible to the target emission without exceeding it. The objective is the difference
+        between the target emission and the mix emissions.
 
-        By forcing the decision variables vector x last value to 1, the scalar product
-        :math:`c^T \dot x` is the difference between the "mix emissions" and the user-input
-        target emission. Minimizing this scalar product yields the intended volumes vector.
+        Without `max_n_batches` the problem is a continuous LP solved greedily (`_blend_continuous`).
+        With it, the MILP solver is only used when the continuous solution uses too many batches
+        (`_blend_milp`), with a heuristic fallback if it runs out of time (`_blend_with_few_batches`).
 
         Args:
             batches_volumes: The batches volumes (in L).
@@ -63,8 +63,7 @@ class TeneurService:
             to be less or equal than this value.
 
         Returns:
-            A scipy optimize result object. `res.x[:len(batches_volumes)]` contains the
-            computed volumes.
+            A dictionary of the selected batches indices and volumes, and the objective value.
 
         """
 
@@ -84,69 +83,34 @@ class TeneurService:
         else:
             max_n_batches = len(batches_volumes)
 
-        # Optimization objective
-        c = np.concat(
-            (
-                -1 / target_volume * batches_emissions,
-                [0.0 for _ in batches_volumes],
-                [target_emission],
-            )
-        )
-        # Linear inequality constraints
-        A = np.vstack(
-            (
-                c,
-                np.array(
-                    [1 for _ in batches_volumes] + [0 for _ in batches_volumes] + [0],
-                ),
-                np.array(
-                    [0 for _ in batches_volumes] + [1 for _ in batches_volumes] + [0],
-                ),
-                np.hstack(
-                    (
-                        np.diag(-1.0 * np.ones(len(batches_volumes))),
-                        batches_volumes.max() * np.identity(len(batches_volumes)),
-                        np.zeros((len(batches_volumes), 1)),
-                    )
-                ),
-            )
-        )
-        b_l = [0.0, target_volume, 0] + [0.0 for _ in batches_volumes]
-        b_u = [np.inf, target_volume, max_n_batches] + [np.inf for _ in batches_volumes]
-
         # Response vector constraints
         enforced_mask = enforced_volumes != 0
         vol_lb = np.where(enforced_mask, enforced_volumes, np.zeros_like(batches_volumes))
         vol_ub = np.where(enforced_mask, enforced_volumes, batches_volumes)
 
-        x_bounds = scipy.optimize.Bounds(
-            lb=np.concatenate((vol_lb, [0 for _ in batches_volumes], [1])),
-            ub=np.concatenate((vol_ub, [1 for _ in batches_volumes], [1])),
-        )
-
-        res = scipy.optimize.milp(
-            c,
-            # The volumes need not be integers, but the coefficient associated with the max
-            # number of batches are binary variables, so we set them to integers inside
-            # [0;1]
-            integrality=[0 for _ in batches_volumes] + [1 for _ in batches_volumes] + [0],
-            bounds=x_bounds,
-            constraints=(A, b_l, b_u),
-        )
+        # Without limit on the number of batches the problem is a continuous LP, solved greedily.
+        # Its solution is also the optimal one with a limit when it uses few enough batches.
+        volumes = TeneurService._blend_continuous(vol_lb, vol_ub, batches_emissions, target_volume, target_emission)
+        if volumes is None:
+            raise ValueError(TeneurServiceErrors.NO_SUITABLE_LOTS_FOUND)
 
-        result_array = res.x
+        if np.count_nonzero(volumes) > max_n_batches:
+            volumes = TeneurService._blend_milp(
+                vol_lb, vol_ub, batches_emissions, target_volume, target_emission, max_n_batches
+            )
+            if volumes is None:
+                raise ValueError(TeneurServiceErrors.NO_SUITABLE_LOTS_FOUND)
 
-        if not res.success:
-            raise ValueError(TeneurServiceErrors.NO_SUITABLE_LOTS_FOUND)
+        fun = float(target_emission - np.dot(batches_emissions, volumes) / target_volume)
 
         # Find the indices of the nonzero elements
-        nonzero_indices = np.nonzero(result_array[0 : len(batches_volumes)])[0]
+        nonzero_indices = np.nonzero(volumes)[0]
 
         # Create a dictionary of selected batches with their respective index and volume
         # Round all volumes to 2 decimals to match database precision
         selected_batches_volumes = {}
         for idx in nonzero_indices:
-            optimized_volume = result_array[idx]  # Volume suggested by optimization algorithm
+            optimized_volume = volumes[idx]  # Volume suggested by optimization algorithm
             available_volume = batches_volumes[idx]  # Available volume at the beginning of optimization
 
             # Clean available_volume to 2 decimals (database precision)
@@ -159,7 +123,211 @@ class TeneurService:
 
             selected_batches_volumes[idx] = selected_volume
 
-        return selected_batches_volumes, res.fun
+        return selected_batches_volumes, fun
+
+    @staticmethod
+    def _blend_continuous(
+        vol_lb: npt.NDArray[np.float64],
+        vol_ub: npt.NDArray[np.float64],
+        batches_emissions: npt.NDArray[np.float64],
+        target_volume: float,
+        target_emission: float,
+    ) -> Optional[npt.NDArray[np.float64]]:
+        """Greedy solution of the blending LP, without limit on the number of batches.
+
+        The mix emissions can take any value between the ones of the lowest and highest emission
+        fillings (see `emission_bounds`). Starting from the lowest one, volume is moved from the
+        lowest emission batches to the highest ones until the mix reaches the target emission,
+        which leaves at most two partially used batches.
+
+        Returns:
+            The volumes extracted from each batch, or None when no mix is below the target emission.
+
+        """
+        remaining_volume = target_volume - vol_lb.sum()
+        capacities = vol_ub - vol_lb
+        if remaining_volume < 0 or remaining_volume > capacities.sum() + 1e-9:
+            return None
+
+        def fill(order):
+            # volume taken from each batch when filling them in the given order
+            taken = np.clip(remaining_volume - (capacities[order].cumsum() - capacities[order]), 0, capacities[order])
+            volumes = vol_lb.copy()
+            volumes[order] += taken
+            return volumes
+
+        order = np.argsort(batches_emissions, kind="stable")
+        target_total = target_volume * target_emission
+        volumes = fill(order)
+        gap = target_total - np.dot(batches_emissions, volumes)
+        if gap < -1e-9 * max(abs(target_total), 1):
+            return None
+
+        highest_volumes = fill(order[::-1])
+        if np.dot(batches_emissions, highest_volumes) <= target_total:
+            return highest_volumes
+
+        low, high = 0, len(order) - 1
+        while gap > 0 and low < high:
+            i, j = order[low], order[high]
+            movable = volumes[i] - vol_lb[i]
+            if movable <= 0:
+                low += 1
+                continue
+            spare = vol_ub[j] - volumes[j]
+            if spare <= 0:
+                high -= 1
+                continue
+            gain = batches_emissions[j] - batches_emissions[i]
+            if gain <= 0:
+                break
+            moved = min(movable, spare, gap / gain)
+            volumes[i] -= moved
+            volumes[j] += moved
+            gap -= moved * gain
+
+        return volumes
+
+    @staticmethod
+    def _blend_milp(
+        vol_lb: npt.NDArray[np.float64],
+        vol_ub: npt.NDArray[np.float64],
+        batches_emissions: npt.NDArray[np.float64],
+        target_volume: float,
+        target_emission: float,
+        max_n_batches: int,
+        fallback: bool = True,
+    ) -> Optional[npt.NDArray[np.float64]]:
+        r"""Compute optimal batches volumes using mixed integer linear programming.
+
+        The coefficients of `c` define the objective. It contains, in order:
+        - The batches emissions levels, divided by the target volume.
+        - Zeroes, corresponding to the batch inclusion boolean flags.
+        - The emission per energy "target" as the last element.
+
+        We set the linear constraints accordingly to the following:
+        - `b_l <= A @ x <= b_u` constraints (in order of appearance inside the sparse `A` matrix):
+        - Mix emissions should be less or equal than target.
+        - The sum of the extracted volumes should equal target volume.
+        - The number of batches with non-zero extracted volume is less or equal than
+            `max_batches_constraint`.
+        - `x_bounds`:
+        - `x`'s elements must lie between `vol_lb` and `vol_ub` for each batch.
+        - The last coefficient is forced to 1 so that <c, x> defines the objective.
+
+        By forcing the decision variables vector x last value to 1, the scalar product
+        :math:`c^T \dot x` is the difference between the "mix emissions" and the user-input
+        target emission. Minimizing this scalar product yields the intended volumes vector.
+
+        The solver stops after `MILP_TIME_LIMIT` seconds, keeping the best solution found so far,
+        or using `_blend_with_few_batches` if it has none and `fallback` is set.
+
+        Returns:
+            The volumes extracted from each batch, or None when no solution was found.
+
+        """
+        n = len(vol_ub)
+
+        # Optimization objective
+        c = np.concatenate((-1 / target_volume * batches_emissions, np.zeros(n), [target_emission]))
+
+        # Linear inequality constraints
+        A = scipy.sparse.vstack(
+            (
+                scipy.sparse.csr_array(c.reshape(1, -1)),
+                scipy.sparse.hstack((np.ones((1, n)), scipy.sparse.csr_array((1, n + 1)))),
+                scipy.sparse.hstack((scipy.sparse.csr_array((1, n)), np.ones((1, n)), scipy.sparse.csr_array((1, 1)))),
+                scipy.sparse.hstack(
+                    (
+                        -scipy.sparse.eye_array(n),
+                        vol_ub.max() * scipy.sparse.eye_array(n),
+                        scipy.sparse.csr_array((n, 1)),
+                    )
+                ),
+            ),
+            format="csr",
+        )
+        b_l = np.concatenate(([0.0, target_volume, 0], np.zeros(n)))
+        b_u = np.concatenate(([np.inf, target_volume, max_n_batches], np.full(n, np.inf)))
+
+        x_bounds = scipy.optimize.Bounds(
+            lb=np.concatenate((vol_lb, np.zeros(n), [1])),
+            ub=np.concatenate((vol_ub, np.ones(n), [1])),
+        )
+
+        res = scipy.optimize.milp(
+            c,
+            # The volumes need not be integers, but the coefficient associated with the max
+            # number of batches are binary variables, so we set them to integers inside
+            # [0;1]
+            integrality=np.concatenate((np.zeros(n), np.ones(n), [0])),
+            bounds=x_bounds,
+            constraints=scipy.optimize.LinearConstraint(A, b_l, b_u),
+            options={"time_limit": TeneurService.MILP_TIME_LIMIT},
+        )
+
+        # when the time limit is reached, the best solution found so far is kept
+        if res.x is not None and (res.success or res.status == 1):
+            return res.x[:n]
+        if res.status == 1 and fallback:
+            return TeneurService._blend_with_few_batches(
+                vol_lb, vol_ub, batches_emissions, target_volume, target_emission, max_n_batches
+            )
+        return None
+
+    @staticmethod
+    def _blend_with_few_batches(
+        vol_lb: npt.NDArray[np.float64],
+        vol_ub: npt.NDArray[np.float64],
+        batches_emissions: npt.NDArray[np.float64],
+        target_volume: float,
+        target_emission: float,
+        max_n_batches: int,
+    ) -> Optional[npt.NDArray[np.float64]]:
+        """Fallback used when the MILP solver found no solution within its time budget.
+
+        The MILP is solved again on a pool of promising batches: the enforced ones, the ones used by
+        the continuous solution, and the lowest emission and largest ones. If that fails as well,
+        the continuous problem is solved on the batches contributing the most to its solution.
+        The result respects the constraints but is not guaranteed to be optimal.
+        """
+        volumes = TeneurService._blend_continuous(vol_lb, vol_ub, batches_emissions, target_volume, target_emission)
+        if volumes is None:
+            return None
+
+        pool_size = TeneurService.FALLBACK_POOL_SIZE
+        pool = np.unique(
+            np.concatenate(
+                (
+                    np.flatnonzero((vol_lb != 0) | (volumes != 0)),
+                    np.argsort(batches_emissions, kind="stable")[:pool_size],
+                    np.argsort(-vol_ub, kind="stable")[:pool_size],
+                )
+            )
+        )
+        pool_volumes = TeneurService._blend_milp(
+            vol_lb[pool],
+            vol_ub[pool],
+            batches_emissions[pool],
+            target_volume,
+            target_emission,
+            max_n_batches,
+            fallback=False,
+        )
+        if pool_volumes is not None:
+            volumes = np.zeros_like(vol_ub)
+            volumes[pool] = pool_volumes
+            return volumes
+
+        enforced_mask = vol_lb != 0
+        others = np.flatnonzero(~enforced_mask)
+        others = others[np.argsort(-volumes[others], kind="stable")][: max_n_batches - enforced_mask.sum()]
+        kept = enforced_mask.copy()
+        kept[others] = True
+
+        return TeneurService._blend_continuous(
+            vol_lb, np.where(kept, vol_ub, 0), batches_emissions, target_volume, target_emission
+        )
 
     @staticmethod
     def emission_bounds(
@@ -224,17 +392,46 @@ class TeneurService:
         volume_energy = target_volume * pci  # MJ
         target_emission = GHG_REFERENCE_RED_II - (data["target_emission"] * 1000000 / volume_energy)  # gCO2/MJ emis
 
-        selected_lots, fun = TeneurService.optimize_biofuel_blending(
-            volumes,
-            emissions,
-            target_volume,
-            target_emission,
-            enforced_volumes,
-            data.get("max_n_batches", None),
+        def optimize():
+            return TeneurService.optimize_biofuel_blending(
+                volumes,
+                emissions,
+                target_volume,
+                target_emission,
+                enforced_volumes,
+                data.get("max_n_batches", None),
+            )
+
+        selected_lots, fun = TeneurService.get_cached_blending(
+            data, [volumes, emissions, lot_ids, enforced_volumes], target_volume, target_emission, optimize
         )
 
         return selected_lots, lot_ids, emissions, fun
 
+    @staticmethod
+    def get_cached_blending(data, balance_arrays, target_volume, target_emission, optimize):
+        """
+        Memoize the blending of an entity for a while, as users try several targets in a row.
+        The balance arrays are part of the key, so any change of the balance gives a new solution.
+        """
+        timeout = settings.TENEUR_SIMULATION_CACHE_TIMEOUT
+        if not timeout:
+            return optimize()
+
+        digest = hashlib.sha256()
+        for array in balance_arrays:
+            digest.update(b"-" if array is None else np.ascontiguousarray(array, dtype=np.float64).tobytes())
+            digest.update(b"|")
+        params = (data["biofuel"].id, data["customs_category"], target_volume, target_emission, data.get("max_n_batches"))
+        digest.update(repr(params).encode())
+
+        key = SIMULATION_KEY.format(entity=data["debited_entity"].id, hash=digest.hexdigest())
+        result = cache.get(key)
+        if result is None:
+            result = optimize()
+            cache.set(key, result, timeout)
+        return result
+
     @staticmethod
     def get_min_and_max_emissions(data, unit):
         """
@@ -303,23 +500,24 @@ class TeneurService:
             None,
             ges_bound_min,
             ges_bound_max,
+            ledger_filters={"biofuel": [data["biofuel"].code], "customs_category": [data["customs_category"]]},
         )
 
         # Rearrange balance in an array of all volumes sums and an array of all ghg sums
         # For each we have something like:
         # array([30.52876597, 42.1162736 , 30.07384206, 25.05628985, 85.52717505])
-        volumes, emissions, lot_ids = np.array([]), np.array([]), np.array([])
-        enforced_volumes = np.array([]) if "enforced_volumes" in data else None
+        size = len(balance)
+        volumes, emissions, lot_ids = np.empty(size), np.empty(size), np.empty(size)
+        enforced_volumes = np.zeros(size) if "enforced_volumes" in data else None
 
-        for key, value in balance.items():
+        for i, (key, value) in enumerate(balance.items()):
             sector, customs_cat, biofuel, lot_id = key
-            volumes = np.append(volumes, value["available_balance"])
-            emissions = np.append(emissions, value["emission_rate_per_mj"])
-            lot_ids = np.append(lot_ids, lot_id)
+            volumes[i] = value["available_balance"]
+            emissions[i] = value["emission_rate_per_mj"]
+            lot_ids[i] = lot_id
 
-            if enforced_volumes is not None:
-                volume = value["available_balance"] if lot_id in data["enforced_volumes"] else 0
-                enforced_volumes = np.append(enforced_volumes, volume)
+            if enforced_volumes is not None and lot_id in data["enforced_volumes"]:
+                enforced_volumes[i] = value["available_balance"]
 
         # Check for negative volumes and report to Sentry
         if len(volumes) > 0:
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from functools import partial
+
+from tiruert.models import Operation
+from tiruert.services.balance import BalanceService
+
+
+# copy of the balance computed operation by operation, used before numpy, kept as a reference point
+def calculate_balance_legacy(operations, entity_id, group_by, unit, date_from=None, ges_bound_min=None, ges_bound_max=None):
+    balance = defaultdict(partial(BalanceService._init_balance_entry, unit))
+
+    operations = operations.filter(
+        status__in=[Operation.PENDING, Operation.ACCEPTED, Operation.VALIDATED, Operation.DECLARED, Operation.DRAFT]
+    )
+
+    for operation in operations:
+        credit_operation = operation.is_credit(entity_id)
+
+        depot = None
+        if group_by == BalanceService.GROUP_BY_DEPOT:
+            depot = operation.to_depot if credit_operation else operation.from_depot
+            if depot is None:
+                continue
+
+        conversion_factor = BalanceService._get_conversion_factor(operation, unit)
+
+        for detail in operation.details.all():
+            # Keep only lots with requested GHG reduction
+            if ges_bound_min is not None and ges_bound_max is not None:
+                if detail.lot.ghg_reduction_red_ii <= float(ges_bound_min) or detail.lot.ghg_reduction_red_ii >= float(
+                    ges_bound_max
+                ):
+                    continue
+
+            key = BalanceService._get_key(operation, group_by, detail, depot)
+
+            if group_by != BalanceService.GROUP_BY_CATEGORY:
+                balance[key]["sector"] = operation.sector
+
+            if group_by != BalanceService.GROUP_BY_SECTOR:
+                balance[key]["customs_category"] = operation.customs_category
+                if group_by != BalanceService.GROUP_BY_CATEGORY:
+                    balance[key]["biofuel"] = operation.biofuel
+
+            if not (credit_operation and (operation.status == Operation.PENDING or operation.status == Operation.DRAFT)):
+                # Update available balance
+                BalanceService._update_available_balance(
+                    balance, key, operation, detail, credit_operation, conversion_factor
+                )
+
+                # Update quantity and teneur only if the operation date is after the date_from
+                if date_from is None or operation.created_at >= date_from:
+                    BalanceService._update_quantity_and_teneur(
+                        balance, key, operation, detail, credit_operation, conversion_factor
+                    )
+
+            # Update GHG reduction min and max values
+            if group_by not in BalanceService.GROUP_BY_ALL:
+                BalanceService._update_ghg_min_max(balance, key, detail)
+
+        if "key" in locals() is not None and operation.status in [Operation.PENDING, Operation.DRAFT]:
+            balance[key]["pending_operations"] += 1
+
+    if group_by == BalanceService.GROUP_BY_DEPOT:
+        balance = BalanceService._update_depot_debit_with_teneur_and_transfert(entity_id, balance, operations)
+
+    return balance
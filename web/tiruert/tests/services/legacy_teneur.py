@@ -0,0 +1,88 @@
+import numpy as np
+import scipy.optimize
+
+from tiruert.services.teneur import TeneurServiceErrors
+
+
+# copy of the dense MILP solved on every simulation before the greedy fast path, kept as a reference point
+def optimize_biofuel_blending_legacy(
+    batches_volumes, batches_emissions, target_volume, target_emission, enforced_volumes=None, max_n_batches=None
+):
+    # Sanity checks on inputs
+    if batches_volumes.sum() < target_volume:
+        raise ValueError(TeneurServiceErrors.INSUFFICIENT_INPUT_VOLUME)
+
+    if enforced_volumes is not None:
+        if (enforced_volumes > batches_volumes).any():
+            raise ValueError(TeneurServiceErrors.ENFORCED_VOLUMES_TOO_HIGH)
+    else:
+        enforced_volumes = np.zeros_like(batches_volumes)
+
+    if max_n_batches is not None:
+        if max_n_batches < (enforced_volumes != 0).sum():
+            raise ValueError(TeneurServiceErrors.INCOHERENT_ENFORCED_VOLUMES_WITH_MAX_N_BATCHES)
+    else:
+        max_n_batches = len(batches_volumes)
+
+    # Optimization objective
+    c = np.concat(
+        (
+            -1 / target_volume * batches_emissions,
+            [0.0 for _ in batches_volumes],
+            [target_emission],
+        )
+    )
+    # Linear inequality constraints
+    A = np.vstack(
+        (
+            c,
+            np.array(
+                [1 for _ in batches_volumes] + [0 for _ in batches_volumes] + [0],
+            ),
+            np.array(
+                [0 for _ in batches_volumes] + [1 for _ in batches_volumes] + [0],
+            ),
+            np.hstack(
+                (
+                    np.diag(-1.0 * np.ones(len(batches_volumes))),
+                    batches_volumes.max() * np.identity(len(batches_volumes)),
+                    np.zeros((len(batches_volumes), 1)),
+                )
+            ),
+        )
+    )
+    b_l = [0.0, target_volume, 0] + [0.0 for _ in batches_volumes]
+    b_u = [np.inf, target_volume, max_n_batches] + [np.inf for _ in batches_volumes]
+
+    # Response vector constraints
+    enforced_mask = enforced_volumes != 0
+    vol_lb = np.where(enforced_mask, enforced_volumes, np.zeros_like(batches_volumes))
+    vol_ub = np.where(enforced_mask, enforced_volumes, batches_volumes)
+
+    x_bounds = scipy.optimize.Bounds(
+        lb=np.concatenate((vol_lb, [0 for _ in batches_volumes], [1])),
+        ub=np.concatenate((vol_ub, [1 for _ in batches_volumes], [1])),
+    )
+
+    res = scipy.optimize.milp(
+        c,
+        integrality=[0 for _ in batches_volumes] + [1 for _ in batches_volumes] + [0],
+        bounds=x_bounds,
+        constraints=(A, b_l, b_u),
+    )
+
+    result_array = res.x
+
+    if not res.success:
+        raise ValueError(TeneurServiceErrors.NO_SUITABLE_LOTS_FOUND)
+
+    nonzero_indices = np.nonzero(result_array[0 : len(batches_volumes)])[0]
+
+    selected_batches_volumes = {}
+    for idx in nonzero_indices:
+        optimized_volume = result_array[idx]
+        available_volume_clean = round(batches_volumes[idx], 2)
+        safe_volume = min(optimized_volume, available_volume_clean)
+        selected_batches_volumes[idx] = round(safe_volume, 2)
+
+    return selected_batches_volumes, res.fun
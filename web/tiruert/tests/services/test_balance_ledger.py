@@ -0,0 +1,167 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db.models import Q
+from django.http import QueryDict
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Biocarburant, Entity, MatierePremiere
+from tiruert.models import BalanceLedger, Operation, OperationDetail
+from tiruert.services.balance import BalanceService
+from tiruert.services.balance_ledger import BalanceLedgerService
+from transactions.factories import CarbureLotFactory
+from transactions.models import Depot
+
+
+class BalanceLedgerServiceTest(TestCase):
+    """Compare the balances read from the ledger with the ones computed from the operations."""
+
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.other_entity = Entity.objects.filter(entity_type=Entity.OPERATOR).exclude(id=self.entity.id).first()
+        self.depot, self.other_depot = Depot.objects.all()[:2]
+        self.eth = Biocarburant.objects.get(code="ETH")
+        self.emhv = Biocarburant.objects.get(code="EMHV")
+
+        self.lots = [CarbureLotFactory.create(ghg_reduction_red_ii=50 + i * 5) for i in range(4)]
+
+        self.create_operation(Operation.INCORPORATION, Operation.VALIDATED, [(0, 1000), (1, 2000)], credited=self.entity)
+        self.create_operation(
+            Operation.MAC_BIO, Operation.VALIDATED, [(2, 1500)], credited=self.entity, biofuel=self.emhv, share=0.5
+        )
+        self.create_operation(
+            Operation.INCORPORATION, Operation.VALIDATED, [(3, 800)], credited=self.entity, depot=self.other_depot
+        )
+        self.create_operation(Operation.CESSION, Operation.ACCEPTED, [(0, 300)], self.entity, self.other_entity)
+        self.cession = self.create_operation(
+            Operation.CESSION, Operation.PENDING, [(1, 400)], self.entity, self.other_entity
+        )
+        self.create_operation(Operation.CESSION, Operation.PENDING, [(3, 100)], self.other_entity, self.entity)
+        self.create_operation(Operation.TRANSFERT, Operation.DRAFT, [(1, 50)], self.other_entity, self.entity)
+        self.teneur = self.create_operation(Operation.TENEUR, Operation.PENDING, [(0, 200), (1, 100)], self.entity)
+        self.create_operation(Operation.TENEUR, Operation.DECLARED, [(2, 150)], self.entity, biofuel=self.emhv)
+        self.create_operation(Operation.EXPORTATION, Operation.REJECTED, [(0, 100)], self.entity)
+
+        # an operation from last year, only counted in the quantities when no date_from is given
+        old = self.create_operation(Operation.INCORPORATION, Operation.VALIDATED, [(1, 700)], credited=self.entity)
+        Operation.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=400))
+        BalanceLedgerService.refresh_operations([old.id])
+
+    def create_operation(self, type, status, details, debited=None, credited=None, biofuel=None, depot=None, share=1.0):
+        operation = Operation.objects.create(
+            type=type,
+            status=status,
+            customs_category=MatierePremiere.CONV,
+            biofuel=biofuel or self.eth,
+            debited_entity=debited,
+            credited_entity=credited,
+            from_depot=self.depot if debited else None,
+            to_depot=(depot or self.depot) if credited else None,
+            renewable_energy_share=share,
+        )
+        for lot_index, volume in details:
+            OperationDetail.objects.create(
+                operation=operation,
+                lot=self.lots[lot_index],
+                volume=volume,
+                emission_rate_per_mj=10 + lot_index,
+            )
+        return operation
+
+    def get_operations(self, entity):
+        # same as the balance endpoint: operations of the entity, without the credit drafts
+        operations = Operation.objects.filter(Q(credited_entity=entity) | Q(debited_entity=entity))
+        return operations.exclude(credited_entity=entity, status=Operation.DRAFT)
+
+    def assert_same_balances(self, entity, group_by, unit, date_from=None, ges_bound_min=None, ges_bound_max=None):
+        args = (entity.id, group_by, unit, date_from, ges_bound_min, ges_bound_max)
+        expected = BalanceService.calculate_balance(self.get_operations(entity), *args)
+        balance = BalanceService.calculate_balance(self.get_operations(entity), *args, ledger_filters={})
+
+        self.assertEqual(set(balance), set(expected), args)
+        for key, entry in expected.items():
+            ledger_entry = balance[key]
+            for field in [
+                "available_balance",
+                "pending_teneur",
+                "declared_teneur",
+                "saved_emissions",
+                "ghg_reduction_min",
+                "ghg_reduction_max",
+            ]:
+                self.assertAlmostEqual(ledger_entry[field], entry[field], 1, (args, key, field))
+            self.assertAlmostEqual(ledger_entry["quantity"]["credit"], entry["quantity"]["credit"], 1, (args, key))
+            self.assertAlmostEqual(ledger_entry["quantity"]["debit"], entry["quantity"]["debit"], 1, (args, key))
+            self.assertEqual(ledger_entry["pending_operations"], entry["pending_operations"], (args, key))
+            if group_by == BalanceService.GROUP_BY_LOT:
+                self.assertEqual(ledger_entry["emission_rate_per_mj"], entry["emission_rate_per_mj"], (args, key))
+            self.assertEqual(ledger_entry["sector"], entry["sector"], (args, key))
+            self.assertEqual(ledger_entry["customs_category"], entry["customs_category"], (args, key))
+            self.assertEqual(ledger_entry["biofuel"], entry["biofuel"], (args, key))
+
+    def assert_ledger_matches(self):
+        date_from = timezone.now() - timedelta(days=30)
+        for entity in [self.entity, self.other_entity]:
+            for group_by in [None, *BalanceService.GROUP_BY_ALL]:
+                for unit in ["l", "mj", "kg"]:
+                    self.assert_same_balances(entity, group_by, unit)
+                self.assert_same_balances(entity, group_by, "mj", date_from)
+                self.assert_same_balances(entity, group_by, "l", None, 52, 70)
+
+    def test_ledger_matches_the_operations(self):
+        self.assert_ledger_matches()
+
+    def test_ledger_follows_operation_changes(self):
+        # reject and accept
+        self.cession.status = Operation.REJECTED
+        self.cession.save()
+        self.assert_ledger_matches()
+
+        # teneur declaration
+        operations = Operation.objects.filter(id=self.teneur.id)
+        operations.update(status=Operation.DECLARED)
+        BalanceLedgerService.refresh_operations(operations)
+        self.assert_ledger_matches()
+
+        # cancellation
+        self.teneur.delete()
+        self.assert_ledger_matches()
+
+    def test_filters(self):
+        balance = BalanceService.calculate_balance(
+            None, self.entity.id, None, "l", ledger_filters={"biofuel": ["EMHV"], "customs_category": [], "sector": []}
+        )
+        self.assertEqual([key[2] for key in balance], ["EMHV"])
+
+        self.assertEqual(
+            BalanceLedgerService.get_filters(QueryDict("biofuel=ETH&order_by=-available_balance"), self.entity),
+            {"biofuel": ["ETH"], "customs_category": [], "sector": []},
+        )
+        self.assertIsNone(BalanceLedgerService.get_filters(QueryDict("period=202401"), self.entity))
+
+    def test_rebuild_command(self):
+        BalanceLedger.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_balance_ledger", batch_size=2, stdout=out)
+        self.assertIn("for 4 lots", out.getvalue())
+        self.assert_ledger_matches()
+
+    def test_migration_fills_the_ledger(self):
+        BalanceLedger.objects.all().delete()
+
+        migration = import_module("tiruert.migrations.0027_fill_balance_ledger")
+        migration.fill_balance_ledger(apps, None)
+        self.assert_ledger_matches()
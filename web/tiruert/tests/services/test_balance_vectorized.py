@@ -0,0 +1,150 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Biocarburant, Entity, MatierePremiere
+from tiruert.models import Operation, OperationDetail
+from tiruert.services.balance import BalanceService
+from tiruert.services.teneur import TeneurService
+from tiruert.tests.services.legacy_balance import calculate_balance_legacy
+from transactions.factories import CarbureLotFactory
+from transactions.models import Depot
+
+
+class VectorizedBalanceTest(TestCase):
+    """Compare the balances aggregated with numpy with the ones computed operation by operation."""
+
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.other_entity = Entity.objects.filter(entity_type=Entity.OPERATOR).exclude(id=self.entity.id).first()
+        self.depot, self.other_depot = Depot.objects.all()[:2]
+        self.eth = Biocarburant.objects.get(code="ETH")
+        self.emhv = Biocarburant.objects.get(code="EMHV")
+
+        self.lots = [CarbureLotFactory.create(ghg_reduction_red_ii=50 + i * 5) for i in range(4)]
+        self.lots.append(CarbureLotFactory.create(ghg_reduction_red_ii=0))
+
+        self.create_operation(Operation.INCORPORATION, Operation.VALIDATED, [(0, 1000), (1, 2000)], credited=self.entity)
+        self.create_operation(
+            Operation.MAC_BIO, Operation.VALIDATED, [(2, 1500)], credited=self.entity, biofuel=self.emhv, share=0.5
+        )
+        self.create_operation(
+            Operation.INCORPORATION, Operation.VALIDATED, [(3, 800), (4, 90)], credited=self.entity, depot=self.other_depot
+        )
+        self.create_operation(Operation.CESSION, Operation.ACCEPTED, [(0, 300)], self.entity, self.other_entity)
+        self.create_operation(Operation.CESSION, Operation.PENDING, [(1, 400)], self.entity, self.other_entity)
+        self.create_operation(Operation.CESSION, Operation.PENDING, [(3, 100)], self.other_entity, self.entity)
+        self.create_operation(Operation.TRANSFERT, Operation.DRAFT, [(1, 50)], self.other_entity, self.entity)
+        self.create_operation(Operation.TENEUR, Operation.PENDING, [(0, 200), (1, 100)], self.entity, depot=False)
+        self.create_operation(Operation.TENEUR, Operation.DECLARED, [(2, 150)], self.entity, biofuel=self.emhv)
+        self.create_operation(Operation.EXPORTATION, Operation.REJECTED, [(0, 100)], self.entity)
+        # a pending operation whose details are all filtered out by the GHG bounds
+        self.create_operation(Operation.EXPEDITION, Operation.PENDING, [(4, 10)], self.entity)
+
+        old = self.create_operation(Operation.INCORPORATION, Operation.VALIDATED, [(1, 700)], credited=self.entity)
+        Operation.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=400))
+
+    def create_operation(self, type, status, details, debited=None, credited=None, biofuel=None, depot=None, share=1.0):
+        operation = Operation.objects.create(
+            type=type,
+            status=status,
+            customs_category=MatierePremiere.CONV,
+            biofuel=biofuel or self.eth,
+            debited_entity=debited,
+            credited_entity=credited,
+            from_depot=self.depot if debited and depot is not False else None,
+            to_depot=(depot or self.depot) if credited else None,
+            renewable_energy_share=share,
+        )
+        for lot_index, volume in details:
+            OperationDetail.objects.create(
+                operation=operation,
+                lot=self.lots[lot_index],
+                volume=volume,
+                emission_rate_per_mj=10 + lot_index,
+            )
+        return operation
+
+    def get_operations(self, entity):
+        # the loop follows the order of the queryset, the details are aggregated in the order of their operations
+        return Operation.objects.filter(Q(credited_entity=entity) | Q(debited_entity=entity)).order_by("id")
+
+    def assert_same_balances(self, entity, group_by, unit, date_from=None, ges_bound_min=None, ges_bound_max=None):
+        args = (entity.id, group_by, unit, date_from, ges_bound_min, ges_bound_max)
+        expected = calculate_balance_legacy(self.get_operations(entity), *args)
+        balance = BalanceService.calculate_balance(self.get_operations(entity), *args)
+
+        self.assertEqual(set(balance), set(expected), args)
+        for key, entry in expected.items():
+            vectorized_entry = balance[key]
+            for field in ["available_balance", "pending_teneur", "declared_teneur", "saved_emissions"]:
+                self.assertAlmostEqual(vectorized_entry[field], entry[field], 1, (args, key, field))
+            self.assertAlmostEqual(vectorized_entry["quantity"]["credit"], entry["quantity"]["credit"], 1, (args, key))
+            self.assertAlmostEqual(vectorized_entry["quantity"]["debit"], entry["quantity"]["debit"], 1, (args, key))
+            for field in [
+                "pending_operations",
+                "emission_rate_per_mj",
+                "ghg_reduction_min",
+                "ghg_reduction_max",
+                "sector",
+                "customs_category",
+                "biofuel",
+            ]:
+                self.assertEqual(vectorized_entry[field], entry[field], (args, key, field))
+
+    def test_same_balances_as_the_operation_loop(self):
+        date_from = timezone.now() - timedelta(days=30)
+        for entity in [self.entity, self.other_entity]:
+            for group_by in [None, *BalanceService.GROUP_BY_ALL]:
+                for unit in ["l", "mj", "kg"]:
+                    self.assert_same_balances(entity, group_by, unit)
+                self.assert_same_balances(entity, group_by, "mj", date_from)
+                self.assert_same_balances(entity, group_by, "l", None, 52, 70)
+
+    def test_details_are_read_in_one_query(self):
+        # details, operations, biofuels
+        with self.assertNumQueries(3):
+            BalanceService.calculate_balance(
+                self.get_operations(self.entity), self.entity.id, BalanceService.GROUP_BY_LOT, "l"
+            )
+
+    def test_empty_balance(self):
+        balance = BalanceService.calculate_balance(Operation.objects.none(), self.entity.id, None, "l")
+        self.assertEqual(balance, {})
+
+    def test_prepare_data(self):
+        data = {
+            "debited_entity": self.entity,
+            "biofuel": self.eth,
+            "customs_category": MatierePremiere.CONV,
+            "enforced_volumes": [self.lots[0].id],
+            "target_volume": 100,
+        }
+        volumes, emissions, lot_ids, enforced_volumes, target_volume = TeneurService.prepare_data(data, "l")
+
+        balance = calculate_balance_legacy(
+            self.get_operations(self.entity).filter(biofuel=self.eth), self.entity.id, BalanceService.GROUP_BY_LOT, "l"
+        )
+        expected = {key[3]: entry for key, entry in balance.items()}
+        self.assertEqual(sorted(lot_ids.tolist()), sorted(expected))
+        for i, lot_id in enumerate(lot_ids.tolist()):
+            self.assertAlmostEqual(volumes[i], max(expected[lot_id]["available_balance"], 0), 1)
+            self.assertEqual(emissions[i], expected[lot_id]["emission_rate_per_mj"])
+            self.assertEqual(enforced_volumes[i], volumes[i] if lot_id == self.lots[0].id else 0)
+        self.assertEqual(target_volume, 100)
+
+    def test_benchmark_command(self):
+        call_command("benchmark_balance", entity=self.entity.id, details=50, lots=5)
+        # everything is rolled back
+        self.assertEqual(Operation.objects.count(), 12)
@@ -731,3 +731,88 @@ class ObjectiveServiceCalculateEnergyBasisTest(TestCase):
         result = ObjectiveService.calculate_energy_basis(queryset, year=9999)
 
         self.assertIsNone(result)
+
+
+class ObjectiveServiceGetEnergyBasesTest(TestCase):
+    """Unit tests for ObjectiveService.get_energy_bases() and merge_energy_bases() methods."""
+
+    def setUp(self):
+        from core.models import Entity
+        from tiruert.models import FossilFuelCategoryConsiderationRate, MacFossilFuel
+
+        ObjectiveServiceCalculateEnergyBasisTest.setUp(self)
+        self.other_entity = Entity.objects.create(name="Other Entity")
+
+        # a second year of rates must not count the macs twice
+        FossilFuelCategoryConsiderationRate.objects.create(
+            category_fuel=self.category_essence,
+            consideration_rate=0.5,
+            year=2026,
+        )
+
+        for operator, fuel, volume in [
+            (self.entity, self.fuel_essence, 1000),
+            (self.entity, self.fuel_essence, 500),
+            (self.entity, self.fuel_gazole, 1000),
+            (self.other_entity, self.fuel_gazole, 2000),
+        ]:
+            MacFossilFuel.objects.create(
+                fuel=fuel,
+                operator=operator,
+                volume=volume,
+                period=1,
+                year=2025,
+                start_date="2025-01-01",
+                end_date="2025-01-31",
+            )
+
+    def test_get_energy_bases_groups_by_operator_year_and_category(self):
+        """Test get_energy_bases returns the energy per category of each operator, in two queries."""
+        from tiruert.models import MacFossilFuel
+
+        with self.assertNumQueries(2):
+            energy_bases = ObjectiveService.get_energy_bases(MacFossilFuel.objects.all(), year=2025)
+
+        self.assertEqual(
+            energy_bases,
+            {
+                (self.entity.id, 2025): {"Essence": 1500 * 32 * 0.9, "Gazole": 1000 * 36 * 0.95},
+                (self.other_entity.id, 2025): {"Gazole": 2000 * 36 * 0.95},
+            },
+        )
+
+    def test_merge_energy_bases(self):
+        """Test merge_energy_bases sums the categories of all operators or of a single one."""
+        from tiruert.models import MacFossilFuel
+
+        energy_bases = ObjectiveService.get_energy_bases(MacFossilFuel.objects.all(), year=2025)
+
+        self.assertEqual(
+            ObjectiveService.merge_energy_bases(energy_bases),
+            {"Essence": 1500 * 32 * 0.9, "Gazole": 3000 * 36 * 0.95},
+        )
+        self.assertEqual(
+            ObjectiveService.merge_energy_bases(energy_bases, self.other_entity.id),
+            {"Gazole": 2000 * 36 * 0.95},
+        )
+        self.assertIsNone(ObjectiveService.merge_energy_bases(energy_bases, 0))
+
+    def test_calculate_objectives_and_penalties_per_sector(self):
+        """Test the sector energy basis is the same from the macs or from energy_per_category."""
+        from tiruert.models import MacFossilFuel, Objective
+
+        objective = Mock(target=0.1, target_type="REDUCTION", penalty=100)
+        objective.fuel_category.name = "Essence"
+        objectives = Mock()
+        objectives.filter.return_value = [objective]
+
+        def calculate(**kwargs):
+            balance = {"ESSENCE": {"pending_teneur": 0, "declared_teneur": 0}}
+            return ObjectiveService.calculate_objectives_and_penalties(balance, objectives, Objective.SECTOR, **kwargs)
+
+        from_macs = calculate(mac_queryset=MacFossilFuel.objects.filter(operator=self.entity), year=2025)
+        from_categories = calculate(energy_per_category={"Essence": 1500 * 32 * 0.9})
+
+        self.assertEqual(from_macs, from_categories)
+        self.assertEqual(from_macs[0]["energy_basis"], 1500 * 32 * 0.9)
+        self.assertAlmostEqual(from_macs[0]["objective"]["target_mj"], 1500 * 32 * 0.9 * 0.1)
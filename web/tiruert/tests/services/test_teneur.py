@@ -1,9 +1,13 @@
 from unittest.mock import Mock, patch
 
 import numpy as np
-from django.test import SimpleTestCase
+import scipy.optimize
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from scipy.optimize import OptimizeResult
 
 from tiruert.services.teneur import TeneurService, TeneurServiceErrors
+from tiruert.tests.services.legacy_teneur import optimize_biofuel_blending_legacy
 
 
 class TeneurServiceOptimizeBiofuelBlendingTest(SimpleTestCase):
@@ -116,6 +120,102 @@ class TeneurServiceOptimizeBiofuelBlendingTest(SimpleTestCase):
             self.assertEqual(volume, round(volume, 2))
 
 
+class TeneurServiceBlendingSolversTest(SimpleTestCase):
+    """Test the greedy and MILP solvers used by TeneurService.optimize_biofuel_blending()"""
+
+    def random_cases(self, count):
+        rng = np.random.default_rng(42)
+        for i in range(count):
+            n = int(rng.integers(2, 30))
+            volumes = rng.uniform(10, 500, n)
+            emissions = rng.uniform(10, 60, n)
+            target_volume = volumes.sum() * rng.uniform(0.05, 0.9)
+            enforced_volumes = None
+            if i % 3 == 0:
+                enforced_volumes = np.zeros(n)
+                enforced_volumes[0] = min(volumes[0], target_volume / 2)
+            max_n_batches = int(rng.integers(1, 6)) if i % 2 else None
+            yield volumes, emissions, target_volume, rng.uniform(10, 60), enforced_volumes, max_n_batches
+
+    def test_same_objective_as_the_dense_milp(self):
+        """Test that the greedy fast path and the sparse MILP find the same optimum as the previous solver"""
+        for case in self.random_cases(60):
+            try:
+                _, expected_fun = optimize_biofuel_blending_legacy(*case)
+            except ValueError as e:
+                with self.assertRaises(ValueError) as context:
+                    TeneurService.optimize_biofuel_blending(*case)
+                self.assertEqual(str(context.exception), str(e))
+                continue
+
+            selected_batches, fun = TeneurService.optimize_biofuel_blending(*case)
+            self.assertAlmostEqual(fun, expected_fun, 3)
+            self.assertAlmostEqual(sum(selected_batches.values()), case[2], 1)
+            if case[5] is not None:
+                self.assertLessEqual(len(selected_batches), case[5])
+
+    @patch("tiruert.services.teneur.scipy.optimize.milp")
+    def test_continuous_solution_skips_the_milp(self, mock_milp):
+        """Test that the MILP is not run when the continuous solution uses few enough batches"""
+        batches_volumes = np.array([100.0, 150.0, 200.0])
+        batches_emissions = np.array([50.0, 60.0, 70.0])
+
+        selected_batches, fun = TeneurService.optimize_biofuel_blending(
+            batches_volumes, batches_emissions, 250.0, 60.0, max_n_batches=3
+        )
+
+        mock_milp.assert_not_called()
+        self.assertEqual(selected_batches, {0: 50.0, 1: 150.0, 2: 50.0})
+        self.assertAlmostEqual(fun, 0.0)
+
+    @patch("tiruert.services.teneur.scipy.optimize.milp")
+    def test_fallback_when_the_milp_runs_out_of_time(self, mock_milp):
+        """Test that a solution respecting the constraints is found when the solver stops without any"""
+        mock_milp.return_value = OptimizeResult(x=None, success=False, status=1)
+        batches_volumes = np.array([100.0, 150.0, 200.0, 250.0])
+        batches_emissions = np.array([50.0, 55.0, 60.0, 65.0])
+
+        # the batches contributing the most to the continuous solution can't reach the target emission
+        with self.assertRaises(ValueError) as context:
+            TeneurService.optimize_biofuel_blending(batches_volumes, batches_emissions, 300.0, 58.0, max_n_batches=2)
+        self.assertEqual(str(context.exception), TeneurServiceErrors.NO_SUITABLE_LOTS_FOUND)
+
+        selected_batches, fun = TeneurService.optimize_biofuel_blending(
+            batches_volumes, batches_emissions, 300.0, 60.0, max_n_batches=2
+        )
+        self.assertLessEqual(len(selected_batches), 2)
+        self.assertAlmostEqual(sum(selected_batches.values()), 300.0)
+        self.assertGreaterEqual(fun, 0)
+
+    def test_fallback_solves_a_smaller_milp(self):
+        """Test that the solver is run again on a pool of batches after running out of time"""
+        milp = scipy.optimize.milp
+        calls = []
+
+        def milp_out_of_time_once(*args, **kwargs):
+            calls.append(len(args[0]))
+            if len(calls) == 1:
+                return OptimizeResult(x=None, success=False, status=1)
+            return milp(*args, **kwargs)
+
+        rng = np.random.default_rng(0)
+        batches_volumes = rng.uniform(100, 500, 100)
+        batches_emissions = rng.uniform(10, 60, 100)
+        target_volume = 1000.0
+
+        with patch("tiruert.services.teneur.scipy.optimize.milp", side_effect=milp_out_of_time_once):
+            selected_batches, fun = TeneurService.optimize_biofuel_blending(
+                batches_volumes, batches_emissions, target_volume, 30.0, max_n_batches=3
+            )
+
+        # the pool is smaller than the whole problem
+        self.assertEqual(len(calls), 2)
+        self.assertLess(calls[1], calls[0])
+        self.assertLessEqual(len(selected_batches), 3)
+        self.assertAlmostEqual(sum(selected_batches.values()), target_volume, 1)
+        self.assertGreaterEqual(fun, -1e-6)
+
+
 class TeneurServiceEmissionBoundsTest(SimpleTestCase):
     """Test TeneurService.emission_bounds() method"""
 
@@ -295,6 +395,40 @@ class TeneurServicePrepareDataAndOptimizeTest(SimpleTestCase):
         np.testing.assert_array_equal(call_args[1], emissions)
         self.assertEqual(call_args[2], target_volume)
 
+    @override_settings(TENEUR_SIMULATION_CACHE_TIMEOUT=60)
+    @patch("tiruert.services.teneur.TeneurService.prepare_data")
+    @patch("tiruert.services.teneur.TeneurService.optimize_biofuel_blending")
+    def test_prepare_data_and_optimize_memoizes_the_blending(self, mock_optimize, mock_prepare):
+        """Test that the same simulation on the same balance is only optimized once"""
+        cache.clear()
+        data = {
+            "debited_entity": Mock(id=1),
+            "biofuel": Mock(id=2, pci_litre=35.5),
+            "customs_category": "CONV",
+            "target_volume": 1000.0,
+            "target_emission": 1.5,
+        }
+        volumes = np.array([600.0, 700.0])
+        mock_prepare.return_value = (volumes, np.array([50.0, 60.0]), np.array([1, 2]), None, 1000.0)
+        mock_optimize.return_value = ({0: 600.0, 1: 400.0}, 0.5)
+
+        TeneurService.prepare_data_and_optimize(data, "l")
+        selected_lots, _, _, fun = TeneurService.prepare_data_and_optimize(data, "l")
+        self.assertEqual(mock_optimize.call_count, 1)
+        self.assertEqual((selected_lots, fun), ({0: 600.0, 1: 400.0}, 0.5))
+
+        # another target, or a change of the balance, are optimized again
+        TeneurService.prepare_data_and_optimize({**data, "target_emission": 1.6}, "l")
+        self.assertEqual(mock_optimize.call_count, 2)
+
+        mock_prepare.return_value = (volumes + 1, np.array([50.0, 60.0]), np.array([1, 2]), None, 1000.0)
+        TeneurService.prepare_data_and_optimize(data, "l")
+        self.assertEqual(mock_optimize.call_count, 3)
+
+        # each entity has its own solutions
+        TeneurService.prepare_data_and_optimize({**data, "debited_entity": Mock(id=3)}, "l")
+        self.assertEqual(mock_optimize.call_count, 4)
+
     @patch("tiruert.services.teneur.log_warning")
     def test_logs_negative_volumes(self, patched_log_warning):
         data = {"biofuel": "Biofuel infos", "customs_category": "Some category", "other_key": "Other value"}
@@ -25,6 +25,7 @@ class OperationViewSetPermissionsTest(TestCase, PermissionTestMixin):
                         "partial_update",
                         "destroy",
                         "export_operations_to_excel",
+                        "export_operations_to_excel_async",
                         "declare_teneur",
                     ],
                     [HasOperatorWriteRights()],
@@ -12,6 +12,7 @@ from tiruert.filters.elec_operation import ElecOperationFilterForBalance
 from tiruert.models import MacFossilFuel, Objective, Operation
 from tiruert.models.elec_operation import ElecOperation
 from tiruert.serializers import ObjectiveAdminInputSerializer, ObjectiveInputSerializer, ObjectiveOutputSerializer
+from tiruert.services.balance_ledger import BalanceLedgerService
 from tiruert.services.objective import ObjectiveService
 from tiruert.views.mixins import UnitMixin
 
@@ -116,6 +117,14 @@ class ObjectiveViewSet(UnitMixin, GenericViewSet):
         if not tiruert_liable_entities.exists():
             return Response({"error": "No Tiruert liable entities found."}, status=status.HTTP_404_NOT_FOUND)
 
+        # Energy bases of all the entities at once, read by _get_objectives from the execution cache
+        query_params = request.GET.copy()
+        query_params.pop("entity_id", None)
+        macs = MacFilter(query_params, queryset=MacFossilFuel.objects.all(), request=request).qs
+        self._execution_cache["energy_bases"] = ObjectiveService.get_energy_bases(
+            macs.filter(operator__in=tiruert_liable_entities), year=query_params.get("year")
+        )
+
         # Collect objectives for each entity
         objectives_list = []
         for entity in tiruert_liable_entities:
@@ -153,9 +162,14 @@ class ObjectiveViewSet(UnitMixin, GenericViewSet):
             else:
                 self._execution_cache["objectives"] = objectives
 
-        # MacFossilFuel
-        macs = MacFilter(query_params, queryset=MacFossilFuel.objects.all(), request=request).qs
-        if not macs.exists():
+        # Energy basis per fuel category (from MacFossilFuel)
+        if self._execution_cache.get("energy_bases") is not None:
+            energy_bases = self._execution_cache["energy_bases"]
+        else:
+            macs = MacFilter(query_params, queryset=MacFossilFuel.objects.all(), request=request).qs
+            energy_bases = ObjectiveService.get_energy_bases(macs, year=query_params.get("year"))
+        energy_per_category = ObjectiveService.merge_energy_bases(energy_bases, target_entity_id)
+        if energy_per_category is None:
             return
 
         # Operations
@@ -165,11 +179,11 @@ class ObjectiveViewSet(UnitMixin, GenericViewSet):
             return
 
         # 1. Calculate "assiette" used for objectives calculation (global, for categories and main objective)
-        energy_basis = ObjectiveService.calculate_energy_basis(macs, year=query_params.get("year"))
+        energy_basis = sum(energy_per_category.values())
 
         # 2. Calculate the balances per category and sector
         balance_per_category, balance_per_sector = ObjectiveService.get_balances_for_objectives_calculation(
-            operations, target_entity_id, date_from
+            operations, target_entity_id, date_from, BalanceLedgerService.get_filters(query_params, request.entity)
         )
 
         # 3. Calculate the objectives per category (using global energy_basis)
@@ -185,8 +199,7 @@ class ObjectiveViewSet(UnitMixin, GenericViewSet):
             balance_per_sector,
             objectives,
             Objective.SECTOR,
-            mac_queryset=macs,
-            year=query_params.get("year"),
+            energy_per_category=energy_per_category,
         )
 
         # 5. Calculate elec category
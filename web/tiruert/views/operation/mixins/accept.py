@@ -1,11 +1,13 @@
 from datetime import datetime
 
+from django.db import transaction
 from drf_spectacular.utils import OpenApiResponse, extend_schema
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from tiruert.models import Operation
+from tiruert.services.balance_ledger import BalanceLedgerService
 
 
 class AcceptActionMixinErrors:
@@ -93,6 +95,9 @@ class AcceptActionMixin:
         # month = queryset.first().created_at.month
         # queryset = queryset.filter(created_at__month=month)
 
-        queryset.update(status=Operation.DECLARED)
+        with transaction.atomic():
+            operation_ids = list(queryset.values_list("id", flat=True))
+            Operation.objects.filter(id__in=operation_ids).update(status=Operation.DECLARED)
+            BalanceLedgerService.refresh_operations(operation_ids)
 
         return Response({"status": "declared"}, status=status.HTTP_200_OK)
@@ -14,6 +14,7 @@ from tiruert.serializers import (
     BalanceSerializer,
 )
 from tiruert.services.balance import BalanceService
+from tiruert.services.balance_ledger import BalanceLedgerService
 
 
 class BalancePagination(MetadataPageNumberPagination):
@@ -89,6 +90,7 @@ class BalanceActionMixin:
             date_from,
             ges_bound_min,
             ges_bound_max,
+            ledger_filters=BalanceLedgerService.get_filters(request.query_params, request.entity),
         )
 
         # Convert balance to a list of dictionaries for serialization
@@ -72,6 +72,7 @@ class OperationViewSet(UnitMixin, ModelViewSet, ActionMixin):
             "partial_update",
             "destroy",
             "export_operations_to_excel",
+            "export_operations_to_excel_async",
             "declare_teneur",
         ]:
             return [HasOperatorWriteRights()]
@@ -1,5 +1,7 @@
 from django.contrib import admin, messages
+from django.db.models import Q
 
+from core.models import CarbureLot
 from entity.services import enable_depot
 from transactions.models import Airport, Depot, EntitySite, ProductionSite, Site
 
@@ -10,6 +12,19 @@ from .models import YearConfig
 class YearConfigAdmin(admin.ModelAdmin):
     list_display = ("year", "locked")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+
+        if "locked" in form.changed_data:
+            # the tasks module cannot be loaded while the admin is being discovered
+            from carbure.tasks import background_recheck_lots_for_data
+
+            # only the lots being edited during this year are concerned by the lock
+            lots = CarbureLot.objects.filter(year=obj.year).filter(
+                Q(lot_status=CarbureLot.DRAFT) | Q(correction_status=CarbureLot.IN_CORRECTION)
+            )
+            background_recheck_lots_for_data(lots, ["locked_years"])
+
 
 class EntitySiteInline(admin.TabularInline):
     model = EntitySite
@@ -4,13 +4,15 @@ from django.db import transaction
 from core.carburetypes import CarbureError
 from core.common import ErrorResponse, SuccessResponse
 from core.decorators import check_admin_rights
-from core.models import CarbureLot, CarbureLotComment, CarbureLotEvent, CarbureNotification, ExternalAdminRights
+from core.helpers import filter_lots_by_selection_token, load_selection_token
+from core.models import CarbureLot, CarbureLotComment, CarbureLotEvent, CarbureNotification, Entity, ExternalAdminRights
 from core.traceability import (
     LotNode,
     bulk_delete_traceability_nodes,
     bulk_update_traceability_nodes,
     get_traceability_nodes,
 )
+from transactions.repositories.admin_lots_repository import TransactionsAdminLotsRepository
 
 from .update_many import group_lots_by_entity, serialize_node
 
@@ -26,6 +28,15 @@ def delete_many(request):
     comment = form.cleaned_data["comment"]
     dry_run = form.cleaned_data["dry_run"]
     lots = form.cleaned_data["lots_ids"]
+    selection_token = form.cleaned_data["selection_token"]
+
+    if selection_token:
+        entity = Entity.objects.get(pk=entity_id)
+        # the token can only reach the lots of the admin list it was made from
+        selection = load_selection_token(selection_token, entity)
+        status = selection[0].get("status") if selection is not None else None
+        lots = TransactionsAdminLotsRepository.get_admin_lots_by_status(entity, status)
+        lots = filter_lots_by_selection_token(lots, selection_token, entity)
 
     # query the database for all the traceability nodes related to these lots
     nodes = get_traceability_nodes(lots)
@@ -119,6 +130,13 @@ class DeleteManyForm(forms.Form):
 
     # config fields
     entity_id = forms.IntegerField()
-    lots_ids = forms.ModelMultipleChoiceField(queryset=LOTS)
+    lots_ids = forms.ModelMultipleChoiceField(queryset=LOTS, required=False)
+    selection_token = forms.CharField(required=False)
     comment = forms.CharField()
     dry_run = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("lots_ids") and not cleaned_data.get("selection_token"):
+            raise forms.ValidationError("Either lots_ids or selection_token is required")
+        return cleaned_data
@@ -3,16 +3,22 @@ from django import forms
 from core.carburetypes import CarbureError
 from core.common import ErrorResponse, SuccessResponse
 from core.decorators import check_admin_rights
-from core.helpers import (
-    get_lots_filters_data,
-)
+from core.facets import LOT_FILTERS, get_lots_facets, get_lots_filters_data, serialize_facets
 from core.models import ExternalAdminRights
+from core.utils import MultipleValueField
 from transactions.repositories.admin_lots_repository import TransactionsAdminLotsRepository
 
 
 class AdminControlsLotsFiltersForm(forms.Form):
     status = forms.CharField()
-    field = forms.CharField()
+    field = forms.CharField(required=False)
+    fields = MultipleValueField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("field") and not cleaned_data.get("fields"):
+            raise forms.ValidationError("Either field or fields is required")
+        return cleaned_data
 
 
 @check_admin_rights(allow_external=[ExternalAdminRights.BIOFUEL])
@@ -23,9 +29,18 @@ def get_lots_filters(request, entity):
 
     status = form.cleaned_data["status"]
     field = form.cleaned_data["field"]
+    fields = form.cleaned_data["fields"]
 
     lots = TransactionsAdminLotsRepository.get_admin_lots_by_status(entity, status)
-    data = get_lots_filters_data(lots, request.GET, entity, field)
+    scope = f"admin:{status}"
+
+    if fields:
+        if not set(fields).issubset(LOT_FILTERS):
+            return ErrorResponse(400, CarbureError.UNKNOWN_ERROR)
+        facets = get_lots_facets(lots, request.GET, entity, fields, scope)
+        return SuccessResponse(serialize_facets(facets))
+
+    data = get_lots_filters_data(lots, request.GET, entity, field, scope)
 
     if data is None:
         return ErrorResponse(400, CarbureError.UNKNOWN_ERROR)
@@ -0,0 +1,64 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import CarbureLot, Entity
+from core.tests_utils import setup_current_user
+from transactions.factories import CarbureLotFactory
+
+
+class AdminLotsDeleteManyTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.admin = Entity.objects.filter(entity_type=Entity.ADMIN).first()
+        self.producer = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        self.user = setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.admin, "ADMIN")])
+
+        lot_data = {
+            "added_by": self.producer,
+            "carbure_supplier": self.producer,
+            "parent_lot": None,
+            "parent_stock": None,
+            "random_control_requested": False,
+            "ml_control_requested": False,
+        }
+        self.drafts = CarbureLotFactory.create_batch(3, lot_status=CarbureLot.DRAFT, **lot_data)
+        self.alerts = CarbureLotFactory.create_batch(
+            3, lot_status=CarbureLot.ACCEPTED, highlighted_by_admin=True, **lot_data
+        )
+        self.accepted = CarbureLotFactory.create_batch(
+            3, lot_status=CarbureLot.ACCEPTED, highlighted_by_admin=False, **lot_data
+        )
+
+    def get_token(self, status):
+        query = {"entity_id": self.admin.id, "status": status, "cursor": "", "limit": 1}
+        response = self.client.get(reverse("transactions-admin-lots"), query)
+        assert response.status_code == 200
+        return response.json()["data"]["selection_token"]
+
+    def delete_many(self, token):
+        query = {"entity_id": self.admin.id, "selection_token": token, "comment": "deleted"}
+        response = self.client.post(reverse("transactions-admin-lots-delete-many"), query)
+        assert response.status_code == 200
+        return CarbureLot.objects.filter(lot_status=CarbureLot.DELETED)
+
+    def test_selection_token_stays_in_the_listed_status(self):
+        token = self.get_token("ALERTS")
+
+        # neither the drafts nor the lots out of the alerts can be reached with the token
+        deleted = self.delete_many(token)
+        assert sorted(deleted.values_list("id", flat=True)) == sorted(lot.id for lot in self.alerts)
+        assert CarbureLot.objects.filter(id__in=[lot.id for lot in self.drafts]).count() == 3
+
+    def test_selection_token_never_reaches_drafts(self):
+        token = self.get_token("LOTS")
+
+        deleted = self.delete_many(token)
+        assert sorted(deleted.values_list("id", flat=True)) == sorted(lot.id for lot in self.alerts + self.accepted)
+        assert CarbureLot.objects.filter(id__in=[lot.id for lot in self.drafts]).count() == 3
@@ -1,17 +1,16 @@
 from django.http.response import JsonResponse
 
 from core.decorators import check_admin_rights
-from core.helpers import (
-    get_all_stock,
-    get_stock_filters_data,
-)
+from core.facets import STOCK_FACETS, get_stock_facets, get_stock_filters_data, serialize_facets
+from core.helpers import get_all_stock
 from core.models import ExternalAdminRights
 
 
 @check_admin_rights(allow_external=[ExternalAdminRights.BIOFUEL])
-def get_stock_filters(request, *args, **kwargs):
+def get_stock_filters(request, entity):
     field = request.GET.get("field", False)
-    if not field:
+    fields = request.GET.getlist("fields")
+    if not field and not fields:
         return JsonResponse(
             {
                 "status": "error",
@@ -20,7 +19,13 @@ def get_stock_filters(request, *args, **kwargs):
             status=400,
         )
     txs = get_all_stock()
-    data = get_stock_filters_data(txs, request.GET, field)
+    scope = "admin"
+    if fields:
+        if not set(fields).issubset(STOCK_FACETS):
+            return JsonResponse({"status": "error", "message": "Could not find specified filter"}, status=400)
+        facets = get_stock_facets(txs, request.GET, fields, entity, scope)
+        return JsonResponse({"status": "success", "data": serialize_facets(facets)})
+    data = get_stock_filters_data(txs, request.GET, field, entity, scope)
     if data is None:
         return JsonResponse(
             {"status": "error", "message": "Could not find specified filter"},
@@ -1,7 +1,7 @@
 from django.http.response import JsonResponse
 
 from core.decorators import check_user_rights
-from core.helpers import get_lots_filters_data
+from core.facets import LOT_FILTERS, get_lots_facets, get_lots_filters_data, serialize_facets
 from core.models import Entity
 from transactions.repositories.audit_lots_repository import TransactionsAuditLotsRepository
 
@@ -10,7 +10,8 @@ from transactions.repositories.audit_lots_repository import TransactionsAuditLot
 def get_lots_filters(request, entity):
     status = request.GET.get("status", False)
     field = request.GET.get("field", False)
-    if not field:
+    fields = request.GET.getlist("fields")
+    if not field and not fields:
         return JsonResponse(
             {
                 "status": "error",
@@ -19,7 +20,14 @@ def get_lots_filters(request, entity):
             status=400,
         )
     lots = TransactionsAuditLotsRepository.get_auditor_lots_by_status(entity, status, request)
-    data = get_lots_filters_data(lots, request.GET, entity, field)
+    # the audited lots depend on the rights of the user
+    scope = f"audit:{request.user.id}:{status}"
+    if fields:
+        if not set(fields).issubset(LOT_FILTERS):
+            return JsonResponse({"status": "error", "message": "Could not find specified filter"}, status=400)
+        facets = get_lots_facets(lots, request.GET, entity, fields, scope)
+        return JsonResponse({"status": "success", "data": serialize_facets(facets)})
+    data = get_lots_filters_data(lots, request.GET, entity, field, scope)
     if data is None:
         return JsonResponse(
             {"status": "error", "message": "Could not find specified filter"},
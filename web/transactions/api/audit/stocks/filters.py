@@ -1,14 +1,16 @@
 from django.http.response import JsonResponse
 
 from core.decorators import check_user_rights
-from core.helpers import get_auditor_stock, get_stock_filters_data
+from core.facets import STOCK_FACETS, get_stock_facets, get_stock_filters_data, serialize_facets
+from core.helpers import get_auditor_stock
 from core.models import Entity
 
 
 @check_user_rights(entity_type=[Entity.AUDITOR])
-def get_stock_filters(request):
+def get_stock_filters(request, entity):
     field = request.GET.get("field", False)
-    if not field:
+    fields = request.GET.getlist("fields")
+    if not field and not fields:
         return JsonResponse(
             {
                 "status": "error",
@@ -17,7 +19,14 @@ def get_stock_filters(request):
             status=400,
         )
     txs = get_auditor_stock(request.user)
-    data = get_stock_filters_data(txs, request.GET, field)
+    # the audited stocks depend on the rights of the user
+    scope = f"audit:{request.user.id}"
+    if fields:
+        if not set(fields).issubset(STOCK_FACETS):
+            return JsonResponse({"status": "error", "message": "Could not find specified filter"}, status=400)
+        facets = get_stock_facets(txs, request.GET, fields, entity, scope)
+        return JsonResponse({"status": "success", "data": serialize_facets(facets)})
+    data = get_stock_filters_data(txs, request.GET, field, entity, scope)
     if data is None:
         return JsonResponse(
             {"status": "error", "message": "Could not find specified filter"},
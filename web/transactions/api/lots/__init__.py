@@ -5,6 +5,7 @@ from .request_fix import request_fix
 from .submit_fix import submit_fix
 from .approve_fix import approve_fix
 from .lots import get_lots
+from .export import export_lots
 from .add import add_lot
 from .filters import get_lots_filters
 from .details import get_lot_details
@@ -29,6 +30,7 @@ from .toggle_warning import toggle_warning
 
 urlpatterns = [
     path("", get_lots, name="transactions-lots"),
+    path("export", export_lots, name="transactions-lots-export"),
     path("filters", get_lots_filters, name="transactions-lots-filters"),
     path("details", get_lot_details, name="transactions-lots-details"),
     path("summary", get_lots_summary, name="transactions-lots-summary"),
@@ -1,6 +1,7 @@
 from django.db import transaction
 
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.helpers import filter_lots, get_entity_lots_by_status
 from core.models import CarbureLot, CarbureLotEvent, Entity, UserRights
@@ -44,7 +45,7 @@ def accept_consumption(request, entity, entity_id):
     if len(errors) > 0:
         return ErrorResponse(400, AcceptConsumptionError.VALIDATION_FAILED, errors)
 
-    with transaction.atomic():
+    with transaction.atomic(), track_counters(lots=updated_lots):
         CarbureLot.objects.bulk_update(updated_lots, ["lot_status", "delivery_type"])
         CarbureLotEvent.objects.bulk_create(accepted_events)
 
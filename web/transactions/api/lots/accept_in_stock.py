@@ -1,9 +1,14 @@
 from django.db import transaction
 
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.helpers import filter_lots, get_entity_lots_by_status
 from core.models import CarbureLot, CarbureLotEvent, CarbureStock, Entity, UserRights
+from core.search import refresh_stock_search
+from core.traceability import Node
+from core.traceability.closure import index_nodes
+from transactions.services.send_lots import set_created_ids
 
 
 class AcceptStockError:
@@ -87,10 +92,13 @@ def accept_in_stock(request, *args, **kwargs):
     if len(errors) > 0:
         return ErrorResponse(400, AcceptStockError.STOCK_CREATION_FAILED, errors)
 
-    with transaction.atomic():
+    with transaction.atomic(), track_counters(lots=updated_lots) as counters:
         CarbureLot.objects.bulk_update(updated_lots, ["lot_status", "delivery_type"])
         CarbureLotEvent.objects.bulk_create(created_events)
-        bulk_create_stocks(created_stocks)
+        new_stocks = bulk_create_stocks(created_stocks)
+        counters.add_created_stocks(created_stocks)
+        refresh_stock_search([stock.id for stock in new_stocks])
+        index_nodes(Node.STOCK, [stock.id for stock in new_stocks])
 
     return SuccessResponse()
 
@@ -99,7 +107,7 @@ def accept_in_stock(request, *args, **kwargs):
 def bulk_create_stocks(stocks):
     # create the stock rows, then generate carbure_id for all of them
     CarbureStock.objects.bulk_create(stocks)
-    new_stocks = CarbureStock.objects.order_by("-id")[0 : len(stocks)]
-    [stock.generate_carbure_id() for stock in new_stocks]
-    CarbureStock.objects.bulk_update(new_stocks, ["carbure_id"])
-    return new_stocks
+    set_created_ids(stocks, CarbureStock.objects.filter(parent_lot_id__in=[stock.parent_lot_id for stock in stocks]))
+    [stock.generate_carbure_id() for stock in stocks]
+    CarbureStock.objects.bulk_update(stocks, ["carbure_id"])
+    return stocks
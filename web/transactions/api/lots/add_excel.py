@@ -60,25 +60,31 @@ def add_excel(request, *args, **kwargs):
         if len(lots_created) == 0:
             return JsonResponse({"status": "error", "message": "Something went wrong"}, status=500)
         background_bulk_scoring(lots_created)
+
+        lot_events = []
+        stock_events = []
         for lot in lots_created:
-            e = CarbureLotEvent()
-            e.event_type = CarbureLotEvent.CREATED
-            e.lot_id = lot.id
-            e.user = request.user
-            e.metadata = {"source": "EXCEL"}
-            e.entity = entity
-            e.save()
-            if lot.parent_stock:
-                event = CarbureStockEvent()
-                event.event_type = CarbureStockEvent.SPLIT
-                event.stock = lot.parent_stock
-                event.user = request.user
-                event.entity = entity
-                event.metadata = {
-                    "message": "Envoi lot.",
-                    "volume_to_deduct": lot.volume,
-                }
-                event.save()
+            lot_events.append(
+                CarbureLotEvent(
+                    event_type=CarbureLotEvent.CREATED,
+                    lot_id=lot.id,
+                    user=request.user,
+                    metadata={"source": "EXCEL"},
+                    entity=entity,
+                )
+            )
+            if lot.parent_stock_id:
+                stock_events.append(
+                    CarbureStockEvent(
+                        event_type=CarbureStockEvent.SPLIT,
+                        stock_id=lot.parent_stock_id,
+                        user=request.user,
+                        entity=entity,
+                        metadata={"message": "Envoi lot.", "volume_to_deduct": lot.volume},
+                    )
+                )
+        CarbureLotEvent.objects.bulk_create(lot_events, batch_size=1000)
+        CarbureStockEvent.objects.bulk_create(stock_events, batch_size=1000)
     return JsonResponse(
         {
             "status": "success",
@@ -2,6 +2,7 @@ from django import forms
 from django.db import transaction
 
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.models import CarbureLot, CarbureLotEvent, UserRights
 
@@ -30,7 +31,7 @@ def approve_fix(request, context):
         event = CarbureLotEvent(event_type=CarbureLotEvent.FIX_ACCEPTED, lot=lot, user=request.user, entity_id=entity_id)
         approve_fix_events.append(event)
 
-    with transaction.atomic():
+    with transaction.atomic(), track_counters(lots=lots):
         lots.update(correction_status=CarbureLot.NO_PROBLEMO)
         CarbureLotEvent.objects.bulk_create(approve_fix_events)
 
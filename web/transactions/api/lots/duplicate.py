@@ -31,6 +31,7 @@ def duplicate_lot(request, *args, **kwargs):
         "declared_by_client",
         "highlighted_by_admin",
         "highlighted_by_auditor",
+        "import_batch",
     ]
     lot_meta_fields = {f.name: f for f in CarbureLot._meta.get_fields()}
     for f in lot_fields_to_remove:
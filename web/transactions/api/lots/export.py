@@ -0,0 +1,32 @@
+import traceback
+
+from django.http.response import JsonResponse
+
+from core.common import ErrorResponse, SuccessResponse
+from core.decorators import check_user_rights
+from core.exports import ExportLimitReached, request_export
+from core.helpers import filter_lots, get_entity_lots_by_status, sort_lots
+from core.models import Entity, ExportJob
+from core.serializers import ExportJobSerializer
+
+
+@check_user_rights()
+def export_lots(request, *args, **kwargs):
+    context = kwargs["context"]
+    entity_id = context["entity_id"]
+    status = request.GET.get("status", False)
+    selection = request.GET.get("selection", False)
+    if not status and not selection:
+        return JsonResponse({"status": "error", "message": "Missing status"}, status=400)
+    try:
+        entity = Entity.objects.get(id=entity_id)
+        lots = get_entity_lots_by_status(entity, status, True)
+        lots = filter_lots(lots, request.GET, entity)
+        lots = sort_lots(lots, request.GET)
+        job = request_export(ExportJob.LOTS, entity, request.user, request.GET, lots)
+    except ExportLimitReached:
+        return ErrorResponse(429, message="Too many exports in progress, please wait for them to finish")
+    except Exception:
+        traceback.print_exc()
+        return JsonResponse({"status": "error", "message": "Could not export lots"}, status=400)
+    return SuccessResponse(ExportJobSerializer(job).data)
@@ -1,10 +1,8 @@
 from django.http.response import JsonResponse
 
 from core.decorators import check_user_rights
-from core.helpers import (
-    get_entity_lots_by_status,
-    get_lots_filters_data,
-)
+from core.facets import LOT_FILTERS, get_lots_facets, get_lots_filters_data, serialize_facets
+from core.helpers import get_entity_lots_by_status
 from core.models import (
     Entity,
 )
@@ -16,7 +14,8 @@ def get_lots_filters(request, *args, **kwargs):
     entity_id = context["entity_id"]
     status = request.GET.get("status", False)
     field = request.GET.get("field", False)
-    if not field:
+    fields = request.GET.getlist("fields")
+    if not field and not fields:
         return JsonResponse(
             {
                 "status": "error",
@@ -26,7 +25,13 @@ def get_lots_filters(request, *args, **kwargs):
         )
     entity = Entity.objects.get(id=entity_id)
     txs = get_entity_lots_by_status(entity, status)
-    data = get_lots_filters_data(txs, request.GET, entity, field)
+    scope = f"entity:{status}"
+    if fields:
+        if not set(fields).issubset(LOT_FILTERS):
+            return JsonResponse({"status": "error", "message": "Could not find specified filter"}, status=400)
+        facets = get_lots_facets(txs, request.GET, entity, fields, scope)
+        return JsonResponse({"status": "success", "data": serialize_facets(facets)})
+    data = get_lots_filters_data(txs, request.GET, entity, field, scope)
     if data is None:
         return JsonResponse(
             {"status": "error", "message": "Could not find specified filter"},
@@ -4,6 +4,7 @@ from django.db import transaction
 from carbure.tasks import background_bulk_sanity_checks
 from core.carburetypes import CarbureError
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.models import CarbureLot, CarbureLotEvent, UserRights
 from core.notifications import notify_correction_request, notify_lots_recalled
@@ -45,7 +46,7 @@ def request_fix(request, context):
 
         request_fix_events.append(event)
 
-    with transaction.atomic():
+    with transaction.atomic(), track_counters(lots=lots):
         lots.update(correction_status=CarbureLot.IN_CORRECTION)
         CarbureLotEvent.objects.bulk_create(request_fix_events)
 
@@ -3,6 +3,7 @@ from django.db import transaction
 from django.db.models import Q
 
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.models import CarbureLot, CarbureLotEvent, GenericError, UserRights
 from core.notifications import notify_correction_done
@@ -71,7 +72,7 @@ def submit_fix(request, context):
                     )
                 )
 
-    with transaction.atomic():
+    with transaction.atomic(), track_counters(lots=lots):
         rejected_lots.update(lot_status=CarbureLot.PENDING, correction_status=CarbureLot.NO_PROBLEMO)
         fix_lots.update(correction_status=CarbureLot.FIXED)
         own_lots.update(correction_status=CarbureLot.NO_PROBLEMO)
@@ -0,0 +1,99 @@
+import time
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import CarbureLot, CarbureLotEvent, CarbureStock
+from transactions.sanity_checks import get_prefetched_data, has_blocking_errors, sanity_checks
+
+
+class Rollback(Exception):
+    pass
+
+
+# both versions run in a transaction that is rolled back, so they start from the same drafts
+def run_and_rollback(send, entity, lot_ids):
+    prefetched_data = get_prefetched_data(entity)
+    lots = CarbureLot.objects.filter(id__in=lot_ids)
+
+    try:
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result, _ = send(lots, entity, None, prefetched_data)
+            duration = time.perf_counter() - start
+            raise Rollback
+    except Rollback:
+        pass
+
+    return len(queries), duration, result["sent"]
+
+
+# copy of the lots_send loop used before the bulk pipeline, kept as a reference point
+def send_lots_legacy(lots, entity, user, prefetched_data):
+    result = {"sent": 0}
+    created_lot_ids = []
+
+    for lot in lots:
+        errors = sanity_checks(lot, prefetched_data)
+        if has_blocking_errors(errors):
+            continue
+        result["sent"] += 1
+        CarbureLotEvent.objects.create(event_type=CarbureLotEvent.VALIDATED, lot=lot, user=user, entity=entity)
+
+        lot.lot_status = CarbureLot.PENDING
+        if lot.carbure_supplier != entity and lot.carbure_client != entity:
+            final_client = lot.carbure_client
+            lot.lot_status = CarbureLot.ACCEPTED
+            lot.delivery_type = CarbureLot.TRADING
+            lot.carbure_client = entity
+            lot.save()
+            first_lot_id = lot.id
+            CarbureLotEvent.objects.create(event_type=CarbureLotEvent.ACCEPTED, lot=lot, user=user, entity=entity)
+            lot.pk = None
+            lot.parent_lot_id = first_lot_id
+            lot.carbure_client = final_client
+            lot.unknown_supplier = ""
+            lot.carbure_supplier = lot.carbure_vendor
+            lot.supplier_certificate = lot.vendor_certificate
+            lot.supplier_certificate_type = lot.vendor_certificate_type
+            lot.carbure_vendor = None
+            lot.vendor_certificate = None
+            lot.vendor_certificate_type = ""
+            lot.lot_status = CarbureLot.PENDING
+            lot.delivery_type = CarbureLot.UNKNOWN
+            lot.save()
+            created_lot_ids.append(lot.id)
+            CarbureLotEvent.objects.create(event_type=CarbureLotEvent.ACCEPTED, lot=lot, user=user, entity=entity)
+        elif lot.carbure_client_id is None:
+            lot.lot_status = CarbureLot.ACCEPTED
+            lot.save()
+            CarbureLotEvent.objects.create(event_type=CarbureLotEvent.ACCEPTED, lot=lot, user=user, entity=entity)
+        elif lot.carbure_client == entity and lot.delivery_type not in (CarbureLot.UNKNOWN, None):
+            lot.lot_status = CarbureLot.ACCEPTED
+            lot.save()
+            CarbureLotEvent.objects.create(event_type=CarbureLotEvent.ACCEPTED, lot=lot, user=user, entity=entity)
+            if lot.delivery_type == CarbureLot.STOCK and lot.carbure_delivery_site is not None:
+                stock = CarbureStock(
+                    parent_lot=lot,
+                    depot=lot.carbure_delivery_site,
+                    carbure_client=lot.carbure_client,
+                    remaining_volume=lot.volume,
+                    remaining_weight=lot.weight,
+                    remaining_lhv_amount=lot.lhv_amount,
+                    feedstock=lot.feedstock,
+                    biofuel=lot.biofuel,
+                    country_of_origin=lot.country_of_origin,
+                    carbure_production_site=lot.carbure_production_site,
+                    unknown_production_site=lot.unknown_production_site,
+                    production_country=lot.production_country,
+                    carbure_supplier=lot.carbure_supplier,
+                    unknown_supplier=lot.unknown_supplier,
+                    ghg_reduction=lot.ghg_reduction,
+                    ghg_reduction_red_ii=lot.ghg_reduction_red_ii,
+                )
+                stock.save()
+                stock.carbure_id = "%sS%d" % (lot.carbure_id, stock.id)
+                stock.save()
+        lot.save()
+
+    return result, created_lot_ids
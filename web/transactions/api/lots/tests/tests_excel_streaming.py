@@ -0,0 +1,148 @@
+import datetime
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.common import convert_template_row_to_formdata
+from core.models import CarbureLot, CarbureLotEvent, Entity, GenericError
+from core.tests_utils import setup_current_user
+from transactions.factories import CarbureLotFactory
+from transactions.helpers import bulk_insert_lots, construct_carbure_lot
+from transactions.sanity_checks import get_prefetched_data
+
+HEADER = [
+    "champ_libre",
+    "volume",
+    "biocarburant_code",
+    "matiere_premiere_code",
+    "pays_origine_code",
+    "eec",
+    "dae",
+    "client",
+    "delivery_date",
+    "delivery_site",
+    "delivery_site_country",
+]
+
+
+def write_template(rows):
+    file, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(file)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+class LotsExcelStreamingTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.entity = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        self.user = setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.entity, "RW")])
+        self.prefetched_data = get_prefetched_data(self.entity)
+
+    def make_row(self, index, **kwargs):
+        row = {
+            "champ_libre": f"row {index}",
+            "volume": 1000 + index,
+            "biocarburant_code": "ETH",
+            "matiere_premiere_code": "BETTERAVE",
+            "pays_origine_code": "FR",
+            "eec": 1.5,
+            "dae": f"DAE{index}",
+            "client": "UNKNOWN CLIENT",
+            "delivery_date": datetime.datetime(2024, 3, 12),
+            "delivery_site": "UNKNOWN DEPOT",
+            "delivery_site_country": "FR",
+        }
+        row.update(kwargs)
+        return [row[column] for column in HEADER]
+
+    def test_rows_are_read_one_by_one(self):
+        path = write_template(
+            [
+                self.make_row(1),
+                [None] * len(HEADER),  # empty rows are skipped
+                self.make_row(2)[:4],  # missing cells are read as empty
+            ]
+        )
+
+        rows = convert_template_row_to_formdata(self.entity, self.prefetched_data, path)
+        first = next(rows)
+        assert first["free_field"] == "row 1"
+        assert first["volume"] == 1001
+        assert first["eec"] == 1.5
+        assert first["delivery_date"] == datetime.datetime(2024, 3, 12)
+        assert first["unknown_client"] == "UNKNOWN CLIENT"
+
+        second = next(rows)
+        assert second["volume"] == 1002
+        assert second["transport_document_reference"] == ""
+        assert second["delivery_date"] == ""
+        assert list(rows) == []
+        os.remove(path)
+
+    def test_lots_are_found_again_after_a_concurrent_insert(self):
+        path = write_template([self.make_row(index) for index in range(5)])
+        lots, errors = [], []
+        for index, row in enumerate(convert_template_row_to_formdata(self.entity, self.prefetched_data, path)):
+            lot, lot_errors = construct_carbure_lot(self.prefetched_data, self.entity, row)
+            lots.append(lot)
+            errors.append(lot_errors + [GenericError(error="IMPORT_CHECK", value=str(index), is_blocking=False)])
+        os.remove(path)
+
+        bulk_create = CarbureLot.objects.bulk_create
+
+        def bulk_create_during_another_import(objs, **kwargs):
+            created = bulk_create(objs, **kwargs)
+            CarbureLotFactory.create(added_by=self.entity, lot_status=CarbureLot.DRAFT)
+            return created
+
+        with patch.object(CarbureLot.objects, "bulk_create", bulk_create_during_another_import):
+            inserted_lots = bulk_insert_lots(self.entity, lots, errors, self.prefetched_data)
+
+        assert [lot.free_field for lot in inserted_lots] == [f"row {index}" for index in range(5)]
+        for index, lot in enumerate(inserted_lots):
+            assert GenericError.objects.get(lot=lot, error="IMPORT_CHECK").value == str(index)
+
+    def test_add_excel_creates_events_in_bulk(self):
+        path = write_template([self.make_row(index) for index in range(30)])
+        with open(path, "rb") as reader:
+            file = SimpleUploadedFile("template.xlsx", reader.read())
+        os.remove(path)
+
+        response = self.client.post(reverse("transactions-lots-add-excel"), {"entity_id": self.entity.id, "file": file})
+        assert response.status_code == 200
+        assert response.json()["data"]["lots"] == 30
+
+        lots = CarbureLot.objects.filter(added_by=self.entity)
+        assert lots.count() == 30
+        events = CarbureLotEvent.objects.filter(lot__in=lots, event_type=CarbureLotEvent.CREATED)
+        assert events.count() == 30
+        assert all(event.metadata == {"source": "EXCEL"} for event in events)
+
+    def test_benchmark_does_not_save_anything(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            call_command("benchmark_excel_import", entity=self.entity.id, rows=20)
+        assert "total:" in out.getvalue()
+        assert "20 lots" in out.getvalue()
+        assert CarbureLot.objects.filter(added_by=self.entity).count() == 0
@@ -1,4 +1,5 @@
 from datetime import date
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.db.models import Count
@@ -8,7 +9,9 @@ from django_otp.plugins.otp_email.models import EmailDevice
 
 from core.carburetypes import CarbureError
 from core.models import CarbureLot, CarbureStock, Entity, UserRights
+from transactions.api.lots.accept_in_stock import bulk_create_stocks
 from transactions.api.lots.tests.tests_utils import get_lot
+from transactions.factories import CarbureLotFactory
 from transactions.factories.certificate import GenericCertificateFactory
 from transactions.models import YearConfig
 
@@ -304,3 +307,32 @@ class LotsFlowTest(TestCase):
         lot = CarbureLot.objects.get(id=lot.id)
         assert lot.lot_status == CarbureLot.ACCEPTED
         assert lot.delivery_type == CarbureLot.DIRECT
+
+
+class BulkCreateStocksTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/depots.json",
+        "json/entities.json",
+    ]
+
+    def test_stocks_are_read_back_through_their_parent_lot(self):
+        lots = CarbureLotFactory.create_batch(2, parent_lot=None, parent_stock=None)
+        other_lot = CarbureLotFactory.create(parent_lot=None, parent_stock=None)
+        stocks = [CarbureStock(parent_lot=lot, carbure_client=lot.carbure_client) for lot in lots]
+        bulk_create = CarbureStock.objects.bulk_create
+
+        def bulk_create_then_insert(objs, **kwargs):
+            # another request creates a stock right after ours
+            created = bulk_create(objs, **kwargs)
+            CarbureStock.objects.create(parent_lot=other_lot, carbure_client=other_lot.carbure_client)
+            return created
+
+        with patch.object(CarbureStock.objects, "bulk_create", bulk_create_then_insert):
+            new_stocks = bulk_create_stocks(stocks)
+
+        assert [stock.parent_lot_id for stock in new_stocks] == [lot.id for lot in lots]
+        for stock in CarbureStock.objects.filter(parent_lot__in=lots):
+            assert stock.carbure_id.endswith(f"-{stock.id}")
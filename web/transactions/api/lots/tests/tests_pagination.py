@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import CarbureLot, CarbureLotComment, Entity, GenericError, UserRights
+from core.tests_utils import setup_current_user
+from transactions.factories import CarbureLotFactory
+
+
+class LotsPaginationTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        self.producer = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        self.user = setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.producer, UserRights.RW)])
+
+        self.lots = CarbureLotFactory.create_batch(25, added_by=self.producer, lot_status=CarbureLot.DRAFT, year=2021)
+        # some lots share the same sort values so the id is needed to order them
+        CarbureLot.objects.filter(id__in=[lot.id for lot in self.lots[:10]]).update(
+            volume=1000, ghg_reduction=50, feedstock=None
+        )
+        for lot in self.lots[:3]:
+            GenericError.objects.create(lot=lot, error="SOME_ERROR", display_to_creator=True)
+
+    def get_lots(self, **query):
+        query = {"entity_id": self.producer.id, "status": "DRAFTS", **query}
+        response = self.client.get(reverse("transactions-lots"), query)
+        assert response.status_code == 200
+        return response.json()["data"]
+
+    def get_all_pages(self, limit, **query):
+        ids = []
+        cursor = ""
+        while cursor is not None:
+            data = self.get_lots(cursor=cursor, limit=limit, **query)
+            assert data["returned"] <= limit
+            ids += [lot["id"] for lot in data["lots"]]
+            cursor = data["next_cursor"]
+        return ids
+
+    def test_cursor_pages_follow_offset_order(self):
+        for sort in [{}, {"sort_by": "volume"}, {"sort_by": "ghg_reduction", "order": "desc"}, {"sort_by": "feedstock"}]:
+            offset_data = self.get_lots(**sort)
+            cursor_ids = self.get_all_pages(4, **sort)
+
+            assert sorted(cursor_ids) == sorted(offset_data["ids"])
+            assert len(set(cursor_ids)) == 25
+            if not sort:
+                assert cursor_ids == offset_data["ids"]
+
+    def test_counters(self):
+        data = self.get_lots(cursor="", limit=5)
+
+        assert data["total"] == 25
+        assert data["total_errors"] == 3
+        assert data["returned"] == 5
+        assert "ids" not in data
+
+        data = self.get_lots(cursor="", limit=2, invalid="true")
+        assert data["total"] == 3
+        assert data["total_errors"] == 3
+        assert data["next_cursor"] is not None
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse("transactions-lots"),
+            {"entity_id": self.producer.id, "status": "DRAFTS", "cursor": "nope", "limit": 5},
+        )
+        assert response.status_code == 400
+
+    def comment(self, entity, token):
+        query = {"entity_id": entity.id, "status": "DRAFTS", "selection_token": token, "comment": "checked"}
+        response = self.client.post(reverse("transactions-lots-comment"), query)
+        assert response.status_code == 200
+        return CarbureLotComment.objects.filter(comment="checked")
+
+    def test_selection_token(self):
+        CarbureLot.objects.update(carbure_supplier=self.producer)
+        selected = [lot.id for lot in self.lots[:10]]
+        CarbureLot.objects.filter(id__in=selected).update(year=2020)
+        token = self.get_lots(year=2020, limit=1)["selection_token"]
+
+        # lots created after the token are not part of the selection
+        CarbureLotFactory.create(added_by=self.producer, lot_status=CarbureLot.DRAFT, year=2020)
+
+        comments = self.comment(self.producer, token)
+        assert sorted(comments.values_list("lot_id", flat=True)) == sorted(selected)
+
+    def test_selection_token_of_other_entity(self):
+        token = self.get_lots()["selection_token"]
+        other = Entity.objects.filter(entity_type=Entity.OPERATOR).first()
+        CarbureLot.objects.update(added_by=other, carbure_supplier=other)
+        UserRights.objects.create(entity=other, user=self.user, role=UserRights.RW)
+
+        # the token of the producer can't select the lots of another entity
+        assert self.comment(other, token).count() == 0
+        assert self.comment(other, "forged").count() == 0
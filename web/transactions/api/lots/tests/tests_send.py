@@ -0,0 +1,170 @@
+from datetime import date
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import CarbureLot, CarbureLotEvent, CarbureStock, Entity, UserRights
+from core.tests_utils import setup_current_user
+from transactions.api.lots.tests.legacy_send import run_and_rollback, send_lots_legacy
+from transactions.api.lots.tests.tests_utils import get_lot
+from transactions.factories.certificate import GenericCertificateFactory
+from transactions.sanity_checks import get_prefetched_data
+from transactions.services.send_lots import SendLotsError, send_lots
+
+# lot bought from an unknown producer and sold to a client
+TRADING = {
+    "production_site_commissioning_date": "12/12/2012",
+    "vendor_certificate": "VALID",
+    "carbure_producer": "",
+    "carbure_production_site": "",
+    "unknown_producer": "BIOFUEL GMBH",
+}
+
+
+class LotsSendTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/depots.json",
+        "json/entities.json",
+        "json/entities_sites.json",
+    ]
+
+    def setUp(self):
+        GenericCertificateFactory.create(certificate_id="VALID", valid_from=date(2000, 1, 1), valid_until=date(3000, 1, 1))
+
+        self.producer = (
+            Entity.objects.filter(entity_type=Entity.PRODUCER)
+            .annotate(psites=Count("entitysite__site"))
+            .filter(psites__gt=0)[0]
+        )
+        self.producer.default_certificate = "VALID"
+        self.producer.save()
+        self.operator = Entity.objects.filter(entity_type=Entity.OPERATOR)[0]
+
+        self.user = setup_current_user(self, "tester@carbure.local", "Tester", "gogogo", [(self.producer, UserRights.RW)])
+
+    def create_draft(self, **kwargs):
+        lot = get_lot(self.producer)
+        lot["supplier_certificate"] = "VALID"
+        lot["carbure_client_id"] = self.operator.id
+        lot.update(kwargs)
+        response = self.client.post(reverse("transactions-lots-add"), lot)
+        assert response.status_code == 200
+        return CarbureLot.objects.get(id=response.json()["data"]["id"])
+
+    def send(self, lots):
+        return self.client.post(
+            reverse("transactions-lots-send"),
+            {"entity_id": self.producer.id, "selection": [lot.id for lot in lots]},
+        )
+
+    def test_send_to_client(self):
+        lot = self.create_draft()
+
+        response = self.send([lot])
+        assert response.status_code == 200
+        assert response.json()["data"]["sent"] == 1
+
+        lot.refresh_from_db()
+        assert lot.lot_status == CarbureLot.PENDING
+        assert lot.carbure_id.startswith(f"L{lot.period}-")
+        assert lot.carbure_id.endswith(f"-{lot.id}")
+        assert CarbureLotEvent.objects.filter(lot=lot, event_type=CarbureLotEvent.VALIDATED).count() == 1
+
+    def test_send_trading(self):
+        lot = self.create_draft(**TRADING)
+
+        response = self.send([lot])
+        assert response.status_code == 200
+        assert response.json()["data"]["auto-accepted"] == 1
+
+        lot.refresh_from_db()
+        assert lot.lot_status == CarbureLot.ACCEPTED
+        assert lot.delivery_type == CarbureLot.TRADING
+        assert lot.carbure_client_id == self.producer.id
+
+        child = CarbureLot.objects.get(parent_lot=lot)
+        assert child.lot_status == CarbureLot.PENDING
+        assert child.delivery_type == CarbureLot.UNKNOWN
+        assert child.carbure_client_id == self.operator.id
+        assert child.supplier_certificate == "VALID"
+        assert child.vendor_certificate is None
+        assert child.carbure_id.endswith(f"-{child.id}")
+        assert CarbureLotEvent.objects.filter(lot=child, event_type=CarbureLotEvent.ACCEPTED).count() == 1
+
+    def test_send_rfc(self):
+        lot = self.create_draft(unknown_client="CLIENT MAC", delivery_type="RFC", carbure_client_id="")
+
+        response = self.send([lot])
+        assert response.status_code == 200
+
+        lot.refresh_from_db()
+        assert lot.lot_status == CarbureLot.ACCEPTED
+        assert lot.delivery_type == CarbureLot.RFC
+
+    def test_send_to_own_stock(self):
+        lot = self.create_draft(carbure_client_id=self.producer.id, delivery_type=CarbureLot.STOCK)
+
+        response = self.send([lot])
+        assert response.status_code == 200
+
+        lot.refresh_from_db()
+        assert lot.lot_status == CarbureLot.ACCEPTED
+        stock = CarbureStock.objects.get(parent_lot=lot)
+        assert stock.carbure_client_id == self.producer.id
+        assert stock.remaining_volume == lot.volume
+        assert stock.carbure_id.startswith(f"S{lot.period}-")
+        assert stock.carbure_id.endswith(f"-{stock.id}")
+
+    def test_lots_with_blocking_errors_stay_drafts(self):
+        valid_lot = self.create_draft()
+        invalid_lot = self.create_draft(eec=80)
+
+        response = self.send([valid_lot, invalid_lot])
+        assert response.status_code == 200
+        assert response.json()["data"]["sent"] == 1
+        assert response.json()["data"]["rejected"] == 1
+
+        invalid_lot.refresh_from_db()
+        assert invalid_lot.lot_status == CarbureLot.DRAFT
+
+        response = self.send([invalid_lot])
+        assert response.status_code == 400
+
+    def test_only_drafts_can_be_sent(self):
+        lot = self.create_draft()
+        CarbureLot.objects.filter(id=lot.id).update(lot_status=CarbureLot.PENDING)
+        lots = CarbureLot.objects.filter(id=lot.id)
+
+        with self.assertRaises(SendLotsError):
+            send_lots(lots, self.producer, self.user, get_prefetched_data(self.producer))
+        assert CarbureLotEvent.objects.filter(lot=lot, event_type=CarbureLotEvent.VALIDATED).count() == 0
+
+    def test_query_count_does_not_depend_on_the_number_of_lots(self):
+        def count_send_queries(lots):
+            lots = CarbureLot.objects.filter(id__in=[lot.id for lot in lots])
+            prefetched_data = get_prefetched_data(self.producer)
+            with CaptureQueriesContext(connection) as queries:
+                result, _ = send_lots(lots, self.producer, self.user, prefetched_data)
+            assert result["sent"] == lots.count()
+            return len(queries)
+
+        few_lots = [self.create_draft(), self.create_draft(**TRADING)]
+        many_lots = [self.create_draft() for _ in range(8)] + [self.create_draft(**TRADING) for _ in range(8)]
+
+        assert count_send_queries(few_lots) == count_send_queries(many_lots)
+
+    def test_fewer_queries_than_lot_by_lot(self):
+        lot_ids = [self.create_draft().id for _ in range(5)] + [self.create_draft(**TRADING).id for _ in range(5)]
+
+        legacy_queries, _, legacy_sent = run_and_rollback(send_lots_legacy, self.producer, lot_ids)
+        bulk_queries, _, bulk_sent = run_and_rollback(send_lots, self.producer, lot_ids)
+
+        assert legacy_sent == bulk_sent == 10
+        assert bulk_queries < legacy_queries / 5
+        assert CarbureLot.objects.filter(id__in=lot_ids, lot_status=CarbureLot.DRAFT).count() == 10
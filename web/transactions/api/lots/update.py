@@ -10,7 +10,7 @@ from core.traceability import LotNode, diff_to_metadata, get_traceability_nodes,
 from doublecount.helpers import get_lot_dc_agreement
 from transactions.forms import LotForm
 from transactions.helpers import compute_lot_quantity
-from transactions.sanity_checks.sanity_checks import bulk_sanity_checks, get_prefetched_data
+from transactions.sanity_checks import get_prefetched_data, incremental_sanity_checks
 
 
 class UpdateLotError:
@@ -93,7 +93,8 @@ def update_lot(request, *args, **kwargs):
     with transaction.atomic():
         lot_node.data.save()
 
-        bulk_sanity_checks([lot_node.data], prefetched_data)
+        # only re-run the checks impacted by the modified fields
+        incremental_sanity_checks(lot_node.data, lot_node.diff.keys(), prefetched_data, cleanup=True)
         background_bulk_scoring([lot_node.data], prefetched_data)
 
         if stock_error is not None:
@@ -1,10 +1,8 @@
 from django.http.response import JsonResponse
 
+from core.counters import get_entity_counters
 from core.decorators import check_user_rights
-from core.models import (
-    CarbureLot,
-    CarbureStock,
-)
+from core.models import CarbureLotCounter
 
 
 @check_user_rights()
@@ -20,35 +18,20 @@ def get_snapshot(request, *args, **kwargs):
     else:
         return JsonResponse({"status": "error", "message": "Missing year"}, status=400)
 
-    data = {}
-    lots = CarbureLot.objects.filter(year=year)
-
-    drafts = lots.filter(added_by_id=entity_id, lot_status=CarbureLot.DRAFT)
-    drafts_imported = drafts.exclude(parent_stock__isnull=False)
-    drafts_stocks = drafts.filter(parent_stock__isnull=False)
-
-    lots_in = lots.filter(carbure_client_id=entity_id).exclude(lot_status__in=[CarbureLot.DELETED, CarbureLot.DRAFT])
-    lots_in_pending = lots_in.filter(lot_status=CarbureLot.PENDING)
-    lots_in_tofix = lots_in.exclude(correction_status=CarbureLot.NO_PROBLEMO)
-
-    stock = CarbureStock.objects.filter(carbure_client_id=entity_id)
-    stock_not_empty = stock.filter(remaining_volume__gt=0)
-
-    lots_out = lots.filter(carbure_supplier_id=entity_id).exclude(lot_status__in=[CarbureLot.DELETED, CarbureLot.DRAFT])
-    lots_out_pending = lots_out.filter(lot_status=CarbureLot.PENDING)
-    lots_out_tofix = lots_out.exclude(correction_status=CarbureLot.NO_PROBLEMO)
+    counters = get_entity_counters(entity_id, year)
 
+    data = {}
     data["lots"] = {
-        "draft": drafts.count(),
-        "in_total": lots_in.count(),
-        "in_pending": lots_in_pending.count(),
-        "in_tofix": lots_in_tofix.count(),
-        "stock": stock_not_empty.count(),
-        "stock_total": stock.count(),
-        "out_total": lots_out.count(),
-        "out_pending": lots_out_pending.count(),
-        "out_tofix": lots_out_tofix.count(),
-        "draft_imported": drafts_imported.count(),
-        "draft_stocks": drafts_stocks.count(),
+        "draft": counters[CarbureLotCounter.DRAFT],
+        "in_total": counters[CarbureLotCounter.IN_TOTAL],
+        "in_pending": counters[CarbureLotCounter.IN_PENDING],
+        "in_tofix": counters[CarbureLotCounter.IN_TOFIX],
+        "stock": counters[CarbureLotCounter.STOCK],
+        "stock_total": counters[CarbureLotCounter.STOCK_TOTAL],
+        "out_total": counters[CarbureLotCounter.OUT_TOTAL],
+        "out_pending": counters[CarbureLotCounter.OUT_PENDING],
+        "out_tofix": counters[CarbureLotCounter.OUT_TOFIX],
+        "draft_imported": counters[CarbureLotCounter.DRAFT] - counters[CarbureLotCounter.DRAFT_STOCKS],
+        "draft_stocks": counters[CarbureLotCounter.DRAFT_STOCKS],
     }
     return JsonResponse({"status": "success", "data": data})
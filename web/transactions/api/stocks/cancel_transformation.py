@@ -3,6 +3,7 @@ from django.db import transaction
 
 from core.carburetypes import CarbureError
 from core.common import ErrorResponse, SuccessResponse
+from core.counters import track_counters
 from core.decorators import check_user_rights
 from core.models import CarbureStock, CarbureStockEvent, CarbureStockTransformation, UserRights
 from core.utils import MultipleValueField
@@ -48,7 +49,10 @@ def stock_cancel_transformation(request, entity):
             )
 
         CarbureStockEvent.objects.bulk_create(stock_events)
-        CarbureStock.objects.bulk_update(stocks_to_update, ["remaining_volume", "remaining_weight", "remaining_lhv_amount"])
+        with track_counters(stocks=stocks_to_update):
+            CarbureStock.objects.bulk_update(
+                stocks_to_update, ["remaining_volume", "remaining_weight", "remaining_lhv_amount"]
+            )
         CarbureStockTransformation.objects.filter(id__in=[t.id for t in stock_transformations]).delete()
 
     return SuccessResponse()
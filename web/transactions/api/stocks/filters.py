@@ -1,15 +1,15 @@
 from django.http.response import JsonResponse
 
 from core.decorators import check_user_rights
-from core.helpers import get_entity_stock, get_stock_filters_data
+from core.facets import STOCK_FACETS, get_stock_facets, get_stock_filters_data, serialize_facets
+from core.helpers import get_entity_stock
 
 
 @check_user_rights()
-def get_stock_filters(request, *args, **kwargs):
-    context = kwargs["context"]
-    entity_id = context["entity_id"]
+def get_stock_filters(request, entity):
     field = request.GET.get("field", False)
-    if not field:
+    fields = request.GET.getlist("fields")
+    if not field and not fields:
         return JsonResponse(
             {
                 "status": "error",
@@ -17,8 +17,14 @@ def get_stock_filters(request, *args, **kwargs):
             },
             status=400,
         )
-    txs = get_entity_stock(entity_id)
-    data = get_stock_filters_data(txs, request.GET, field)
+    txs = get_entity_stock(entity.id)
+    scope = "entity"
+    if fields:
+        if not set(fields).issubset(STOCK_FACETS):
+            return JsonResponse({"status": "error", "message": "Could not find specified filter"}, status=400)
+        facets = get_stock_facets(txs, request.GET, fields, entity, scope)
+        return JsonResponse({"status": "success", "data": serialize_facets(facets)})
+    data = get_stock_filters_data(txs, request.GET, field, entity, scope)
     if data is None:
         return JsonResponse(
             {"status": "error", "message": "Could not find specified filter"},
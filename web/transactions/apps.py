@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class TransactionsConfig(AppConfig):
     name = "transactions"
+
+    def ready(self):
+        from transactions.sanity_checks.reference_cache import connect_signals
+
+        connect_signals()
@@ -1,5 +1,6 @@
 import datetime
 import traceback
+import uuid
 from typing import List
 
 import dateutil
@@ -7,7 +8,9 @@ import pandas as pd
 from django.db.models.query import QuerySet
 
 from core.carburetypes import CarbureStockErrors, CarbureUnit
+from core.counters import track_counters
 from core.models import CarbureLot, CarbureStock, Entity, GenericError
+from core.search import refresh_lot_search
 from transactions.models import YearConfig
 from transactions.sanity_checks.sanity_checks import bulk_sanity_checks
 
@@ -608,7 +611,27 @@ def bulk_insert_lots(
     errors: List[GenericError],
     prefetched_data: dict,
 ) -> QuerySet:
-    CarbureLot.objects.bulk_create(lots, batch_size=100)
+    # bulk_create doesn't return the new ids on mysql, so the lots are tagged to be found again afterwards
+    import_batch = uuid.uuid4().hex
+    for lot in lots:
+        lot.import_batch = import_batch
+
+    with track_counters() as counters:
+        CarbureLot.objects.bulk_create(lots, batch_size=100)
+        counters.add_created_lots(lots)
+
+    # ids are given in insertion order, so they follow the order of the list
+    lot_ids = CarbureLot.objects.filter(import_batch=import_batch).order_by("id").values_list("id", flat=True)
+    for lot, lot_id, lot_errors in zip(lots, lot_ids, errors):
+        lot.id = lot_id
+        for e in lot_errors:
+            e.lot_id = lot_id
+    refresh_lot_search([lot.id for lot in lots])
+    # imported here as saf models load this module through core.excel
+    from core.traceability.closure import LOT, index_nodes  # noqa: E402
+
+    index_nodes(LOT, [lot.id for lot in lots])
+
     inserted_lots = (
         CarbureLot.objects.select_related(
             "carbure_producer",
@@ -643,13 +666,9 @@ def bulk_insert_lots(
             "carbure_production_site__productionsiteinput_set",
             "carbure_production_site__productionsiteoutput_set",
         )
-        .filter(added_by=entity)
-        .order_by("-id")[0 : len(lots)]
+        .filter(import_batch=import_batch)
+        .order_by("id")
     )
-    errors = reversed(errors)  # lots are fetched by DESC ID
-    for lot, lot_errors in zip(inserted_lots, errors):
-        for e in lot_errors:
-            e.lot_id = lot.id
-    bulk_sanity_checks(inserted_lots, prefetched_data)
+    bulk_sanity_checks(inserted_lots, prefetched_data, columnar=True)
     GenericError.objects.bulk_create([error for lot_errors in errors for error in lot_errors], batch_size=100)
     return inserted_lots
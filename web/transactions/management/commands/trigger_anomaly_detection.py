@@ -1,10 +1,27 @@
-from django.core.management.base import BaseCommand
-
-from transactions.services.anomaly_detection import anomaly_detection
-
-
-class Command(BaseCommand):
-    help = "Trigger anomly detection on biofuels"
-
-    def handle(self, *args, **options):
-        anomaly_detection()
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transactions.services.anomaly_detection import anomaly_detection
+
+
+class Command(BaseCommand):
+    help = "Trigger anomly detection on biofuels"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.ANOMALY_DETECTION_WORKERS,
+            help="Number of processes fitting the groups",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Refit the models on all the lots instead of scoring the lots created since the last run",
+        )
+
+    def handle(self, *args, **options):
+        timings = {}
+        anomaly_detection(workers=options["workers"], timings=timings, incremental=not options["full"])
+        for stage, duration in timings.items():
+            print(f"> {stage}: {duration:.2f}s")
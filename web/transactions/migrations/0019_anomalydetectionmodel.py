@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("transactions", "0018_alter_site_site_type"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnomalyDetectionModel",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("version", models.IntegerField()),
+                ("emission_category", models.CharField(max_length=8)),
+                ("group", models.CharField(max_length=255)),
+                ("group_filters", models.JSONField(default=dict)),
+                ("threshold", models.FloatField()),
+                ("estimators", models.BinaryField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("scored_until", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name": "Modèle de détection d'anomalies",
+                "verbose_name_plural": "Modèles de détection d'anomalies",
+                "db_table": "anomaly_detection_models",
+                "indexes": [models.Index(fields=["version"], name="anomaly_det_version_5f5f26_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("version", "emission_category", "group"), name="unique_anomaly_detection_model"
+                    )
+                ],
+            },
+        ),
+    ]
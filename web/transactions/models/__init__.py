@@ -4,3 +4,4 @@ from .entity_site import EntitySite
 from .depot import Depot
 from .production_site import ProductionSite
 from .airport import Airport
+from .anomaly_detection_model import AnomalyDetectionModel
@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class AnomalyDetectionModel(models.Model):
+    """
+    Outlier detectors fitted on a group of lots by the anomaly detection,
+    used to score the lots declared afterwards without refitting
+    """
+
+    version = models.IntegerField()
+    emission_category = models.CharField(max_length=8)
+    group = models.CharField(max_length=255)
+    group_filters = models.JSONField(default=dict)  # ex: {"feedstock_id": 12, "biofuel_id": 3}
+    threshold = models.FloatField()  # emissions of the chosen quantile of the group
+    estimators = models.BinaryField()  # pickled (LocalOutlierFactor, IsolationForest)
+    created_at = models.DateTimeField(auto_now_add=True)
+    scored_until = models.DateTimeField()  # lots created before were already scored
+
+    class Meta:
+        db_table = "anomaly_detection_models"
+        indexes = [models.Index(fields=["version"])]
+        constraints = [
+            models.UniqueConstraint(fields=["version", "emission_category", "group"], name="unique_anomaly_detection_model")
+        ]
+        verbose_name = "Modèle de détection d'anomalies"
+        verbose_name_plural = "Modèles de détection d'anomalies"
@@ -1,2 +1,3 @@
 from .sanity_checks import sanity_checks, bulk_sanity_checks, bulk_scoring
 from .helpers import has_blocking_errors, get_prefetched_data
+from .incremental import incremental_sanity_checks, recheck_lots_for_data
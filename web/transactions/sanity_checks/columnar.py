@@ -0,0 +1,613 @@
+"""
+Columnar engine for lot sanity checks.
+
+Instead of calling every check function on every lot, the lots are loaded as a pandas DataFrame
+and each rule is evaluated as one boolean mask over the whole batch. Rules that depend on
+reference data (certificates, ML stats, biofuel/feedstock compatibility...) are evaluated once
+per distinct combination of inputs and mapped back on the lots.
+
+The errors produced are exactly the same as the ones of the per-lot engine (`sanity_checks.sanity_checks`),
+in the same order, so both engines can be used interchangeably.
+"""
+
+import datetime
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from django.db.models import QuerySet
+
+from core.carburetypes import CarbureCertificatesErrors, CarbureMLGHGErrors, CarbureSanityCheckErrors
+from core.models import Biocarburant, CarbureLot, Entity, GenericError, MatierePremiere, Pays
+from saf.models.constants import SAF_BIOFUEL_TYPES
+from transactions.models import Depot
+
+from .biofuel_feedstock import get_biofuel_feedstock_incompatibilities, get_feedstock_origin_incompatibilities
+from .ghg import jan2021, oct2015
+from .helpers import PrefetchedData, generic_error, july1st2021
+
+# columns loaded for each lot, mapped to the lookup used to fetch them
+LOT_COLUMNS = {
+    "id": "id",
+    "lot_status": "lot_status",
+    "correction_status": "correction_status",
+    "delivery_type": "delivery_type",
+    "year": "year",
+    "period": "period",
+    "volume": "volume",
+    "eec": "eec",
+    "el": "el",
+    "ep": "ep",
+    "etd": "etd",
+    "ghg_reduction": "ghg_reduction",
+    "ghg_reduction_red_ii": "ghg_reduction_red_ii",
+    "delivery_date": "delivery_date",
+    "production_site_commissioning_date": "production_site_commissioning_date",
+    "transport_document_reference": "transport_document_reference",
+    "supplier_certificate": "supplier_certificate",
+    "vendor_certificate": "vendor_certificate",
+    "dc_certificate": "production_site_double_counting_certificate",
+    "biofuel_id": "biofuel_id",
+    "biofuel_code": "biofuel__code",
+    "feedstock_id": "feedstock_id",
+    "feedstock_code": "feedstock__code",
+    "feedstock_category": "feedstock__category",
+    "feedstock_is_dc": "feedstock__is_double_compte",
+    "country_of_origin_id": "country_of_origin_id",
+    "country_of_origin_code": "country_of_origin__code_pays",
+    "country_of_origin_in_europe": "country_of_origin__is_in_europe",
+    "delivery_site_country_id": "delivery_site_country_id",
+    "delivery_site_country_code": "delivery_site_country__code_pays",
+    "delivery_site_country_in_europe": "delivery_site_country__is_in_europe",
+    "carbure_producer_id": "carbure_producer_id",
+    "carbure_production_site_id": "carbure_production_site_id",
+    "carbure_supplier_id": "carbure_supplier_id",
+    "carbure_client_id": "carbure_client_id",
+    "carbure_client_type": "carbure_client__entity_type",
+    "added_by_id": "added_by_id",
+    "added_by_type": "added_by__entity_type",
+    "added_by_has_trading": "added_by__has_trading",
+    "carbure_delivery_site_id": "carbure_delivery_site_id",
+    "carbure_delivery_site_customs": "carbure_delivery_site__customs_id",
+    "carbure_delivery_site_type": "carbure_delivery_site__site_type",
+    "parent_lot_id": "parent_lot_id",
+    "parent_stock_id": "parent_stock_id",
+}
+
+FLOAT_COLUMNS = ["year", "period", "volume", "eec", "el", "ep", "etd", "ghg_reduction", "ghg_reduction_red_ii"]
+BOOL_COLUMNS = ["feedstock_is_dc", "country_of_origin_in_europe", "delivery_site_country_in_europe", "added_by_has_trading"]
+DATE_COLUMNS = ["delivery_date", "production_site_commissioning_date"]
+ID_COLUMNS = [column for column in LOT_COLUMNS if column == "id" or column.endswith("_id")]
+STRING_COLUMNS = [c for c in LOT_COLUMNS if c not in FLOAT_COLUMNS + BOOL_COLUMNS + DATE_COLUMNS + ID_COLUMNS]
+
+FRENCH_DELIVERY_TYPES = [CarbureLot.BLENDING, CarbureLot.TRADING, CarbureLot.STOCK, CarbureLot.DIRECT, CarbureLot.UNKNOWN]
+MAC_BIOFUELS = ("ED95", "B100", "ETH", "EMHV", "EMHU", "HVOC", "HVOE", "HVOG", "HOE", "HOG", "HOC")
+
+
+def columnar_sanity_checks(lots, prefetched_data: PrefetchedData) -> list[GenericError]:
+    """
+    Run all the sanity checks on the given lots (queryset or list of lots) at once.
+    Returns the same errors as running `sanity_checks` on every lot one by one.
+    """
+
+    df = load_lot_frame(lots)
+    if df.empty:
+        return []
+
+    df = df[df["lot_status"] != CarbureLot.FLUSHED].reset_index(drop=True)
+    ctx = LotFrameContext(df, prefetched_data)
+
+    # the per-lot engine skips the lots for which one of the checks crashes, do the same here
+    skipped = ctx.crashing_lots()
+
+    found: list[tuple[int, GenericError]] = []
+    for rule in RULES:
+        for mask, error_kwargs in rule(df, ctx):
+            positions = np.flatnonzero(np.asarray(mask, dtype=bool) & ~skipped)
+            found += [(position, build_error(df, position, error_kwargs)) for position in positions]
+
+    # stable sort by lot so the errors are ordered exactly like the per-lot engine
+    found.sort(key=lambda item: item[0])
+    return [error for _, error in found]
+
+
+def load_lot_frame(lots) -> pd.DataFrame:
+    if isinstance(lots, QuerySet):
+        rows = lots.values_list(*LOT_COLUMNS.values())
+    else:
+        rows = [[resolve_lookup(lot, lookup) for lookup in LOT_COLUMNS.values()] for lot in lots]
+
+    df = pd.DataFrame.from_records(list(rows), columns=list(LOT_COLUMNS.keys()))
+
+    # missing foreign keys become 0 and missing strings become "", so comparisons behave like the per-lot checks
+    for column in ID_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype("int64")
+    for column in STRING_COLUMNS:
+        df[column] = df[column].fillna("").astype(str)
+    for column in FLOAT_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    for column in BOOL_COLUMNS:
+        df[column] = df[column].eq(True)
+    for column in DATE_COLUMNS:
+        # keep the python dates for error values and a datetime64 version for comparisons
+        df[column] = df[column].map(lambda d: d if isinstance(d, datetime.date) else None)
+        df[f"{column}_dt"] = pd.to_datetime(df[column], errors="coerce")
+
+    return df
+
+
+def resolve_lookup(lot: CarbureLot, lookup: str):
+    value = lot
+    for attribute in lookup.split("__"):
+        if value is None:
+            return None
+        value = getattr(value, attribute, None)
+    return value
+
+
+def build_error(df: pd.DataFrame, position: int, error_kwargs: dict) -> GenericError:
+    kwargs = {key: value[position] if isinstance(value, np.ndarray) else value for key, value in error_kwargs.items()}
+    return generic_error(lot_id=int(df["id"].iat[position]), **kwargs)
+
+
+def is_empty(column: pd.Series) -> pd.Series:
+    return column == ""
+
+
+def as_date(value):
+    return pd.Timestamp(value)
+
+
+def pairs_in(first: pd.Series, second: pd.Series, pairs: set) -> np.ndarray:
+    if not pairs:
+        return np.zeros(len(first), dtype=bool)
+    return pd.MultiIndex.from_arrays([first, second]).isin(list(pairs))
+
+
+def distinct_ids(ids: pd.Series) -> list[int]:
+    return [int(pk) for pk in ids.unique() if pk > 0]
+
+
+def names(ids: pd.Series, instances: dict) -> pd.Series:
+    # same as formatting the related object with "%s", including "None" for missing ones
+    return ids.map({pk: str(instance) for pk, instance in instances.items()}).fillna("None")
+
+
+class LotFrameContext:
+    """
+    Reference data computed once per distinct value found in the lot frame.
+    """
+
+    def __init__(self, df: pd.DataFrame, prefetched_data: PrefetchedData):
+        self.df = df
+        self.data = prefetched_data
+
+        self.is_draft_or_in_correction = (df["lot_status"] == CarbureLot.DRAFT) | (
+            df["correction_status"] == CarbureLot.IN_CORRECTION
+        )
+        self.is_french_delivery = df["delivery_type"].isin(FRENCH_DELIVERY_TYPES) & (
+            df["delivery_site_country_code"] == "FR"
+        )
+        self.is_red_ii = df["delivery_date_dt"].isna() | (df["delivery_date_dt"] >= as_date(july1st2021))
+        self.ghg_reduction = np.where(self.is_red_ii, df["ghg_reduction_red_ii"], df["ghg_reduction"])
+
+        self.biofuels = Biocarburant.objects.in_bulk(distinct_ids(df["biofuel_id"]))
+        self.feedstocks = MatierePremiere.objects.in_bulk(distinct_ids(df["feedstock_id"]))
+        self.countries = Pays.objects.in_bulk(distinct_ids(df["country_of_origin_id"]))
+
+        self.load_double_counting()
+        self.load_certificates()
+
+    def crashing_lots(self) -> np.ndarray:
+        df = self.df
+        crashing = df["added_by_id"] == 0
+        crashing |= df[FLOAT_COLUMNS].isna().any(axis=1)
+        crashing |= self.has_certificate & df["delivery_date_dt"].isna()
+        crashing |= self.is_dc & self.has_dc_certificate & df["delivery_date_dt"].isna()
+        return crashing.to_numpy()
+
+    def load_double_counting(self):
+        df = self.df
+        dc_certificates = self.data["double_counting_certificates"]
+        keys = ["dc_certificate", "carbure_production_site_id"]
+
+        # replicate `double_counting.get_dc` once for each distinct (certificate, production site) couple
+        matches = []
+        for dc_cert_id, production_site_id in df[keys].drop_duplicates().itertuples(index=False):
+            for dc_cert in dc_certificates.get(dc_cert_id, []):
+                dc_site_id = dc_cert.production_site_id
+                if not production_site_id or not dc_site_id or dc_site_id == production_site_id:
+                    period = dc_cert.valid_until.year * 100 + dc_cert.valid_until.month
+                    matches.append((dc_cert_id, production_site_id, dc_cert.valid_from, dc_cert.valid_until, period))
+                    break
+
+        matched = pd.DataFrame(matches, columns=[*keys, "valid_from", "valid_until", "last_period"])
+        matched = matched.astype({"dc_certificate": str, "carbure_production_site_id": "int64", "last_period": "float64"})
+        certificates = df[keys].merge(matched, how="left", on=keys)
+
+        is_child = (df["parent_lot_id"] > 0) | (df["parent_stock_id"] > 0)
+        self.is_dc = (df["feedstock_id"] > 0) & df["feedstock_is_dc"] & ~is_child
+        self.has_dc_certificate = certificates["last_period"].notna().to_numpy() & ~is_child
+        self.dc_valid_from = pd.to_datetime(certificates["valid_from"], errors="coerce").to_numpy()
+        self.dc_valid_until = pd.to_datetime(certificates["valid_until"], errors="coerce").to_numpy()
+        self.dc_last_period = certificates["last_period"].to_numpy()
+
+    def load_certificates(self):
+        df = self.df
+        certificates = self.data["certificates"]
+        supplier_certificates = df["supplier_certificate"].str.upper()
+
+        valid_from = {certificate_id: c["valid_from"] for certificate_id, c in certificates.items()}
+        valid_until = {certificate_id: c["valid_until"] for certificate_id, c in certificates.items()}
+
+        self.has_certificate = ~is_empty(df["supplier_certificate"]) & supplier_certificates.isin(certificates.keys())
+        self.certificate_valid_from = pd.to_datetime(supplier_certificates.map(valid_from), errors="coerce")
+        self.certificate_valid_until = pd.to_datetime(supplier_certificates.map(valid_until), errors="coerce")
+
+    def etd(self) -> pd.Series:
+        etd_by_feedstock = {feedstock.pk: value for feedstock, value in self.data["etd"].items()}
+        return self.df["feedstock_id"].map(etd_by_feedstock).astype("float64")
+
+    def stats(self, key: pd.Series, stats: dict, attributes: list[str]) -> list[pd.Series]:
+        values = [{k: getattr(stat, attribute) for k, stat in stats.items()} for attribute in attributes]
+        return [key.map(by_key).astype("float64") for by_key in values]
+
+
+def check_mandatory_fields(df: pd.DataFrame, ctx: LotFrameContext):
+    today = as_date(datetime.date.today())
+    time_to_delivery = df["delivery_date_dt"] - today
+
+    yield (
+        (df["volume"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_VOLUME, "field": "volume", "is_blocking": True},
+    )
+    yield (
+        (df["biofuel_id"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_BIOFUEL, "field": "biofuel", "is_blocking": True},
+    )
+    yield (
+        (df["feedstock_id"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_FEEDSTOCK, "field": "feedstock", "is_blocking": True},
+    )
+    yield (
+        (df["carbure_producer_id"] > 0) & (df["carbure_production_site_id"] == 0),
+        {"error": CarbureSanityCheckErrors.UNKNOWN_PRODUCTION_SITE, "field": "production_site", "is_blocking": True},
+    )
+    yield (
+        (df["carbure_production_site_id"] == 0) & df["production_site_commissioning_date_dt"].isna(),
+        {
+            "error": CarbureSanityCheckErrors.MISSING_PRODUCTION_SITE_COMDATE,
+            "field": "production_site_commissioning_date",
+            "is_blocking": True,
+        },
+    )
+    yield (
+        ~df["delivery_type"].isin([CarbureLot.RFC, CarbureLot.FLUSHED]) & is_empty(df["transport_document_reference"]),
+        {
+            "error": CarbureSanityCheckErrors.MISSING_TRANSPORT_DOCUMENT_REFERENCE,
+            "field": "transport_document_reference",
+            "is_blocking": True,
+        },
+    )
+    yield (
+        ctx.is_french_delivery & (df["carbure_delivery_site_id"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_CARBURE_DELIVERY_SITE, "field": "delivery_site", "is_blocking": True},
+    )
+    yield (
+        ctx.is_french_delivery & (df["carbure_client_id"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_CARBURE_CLIENT, "field": "client", "is_blocking": True},
+    )
+    yield (
+        df["delivery_date_dt"].isna(),
+        {"error": CarbureSanityCheckErrors.MISSING_DELIVERY_DATE, "field": "delivery_date", "is_blocking": True},
+    )
+    yield (
+        (time_to_delivery > datetime.timedelta(days=3650)) | (time_to_delivery < datetime.timedelta(days=-3650)),
+        {"error": CarbureSanityCheckErrors.WRONG_DELIVERY_DATE, "field": "delivery_date", "is_blocking": True},
+    )
+    yield (
+        (df["delivery_site_country_id"] == 0),
+        {
+            "error": CarbureSanityCheckErrors.MISSING_DELIVERY_SITE_COUNTRY,
+            "field": "delivery_site_country",
+            "is_blocking": True,
+        },
+    )
+    yield (
+        df["delivery_site_country_in_europe"] & (df["country_of_origin_id"] == 0),
+        {
+            "error": CarbureSanityCheckErrors.MISSING_FEEDSTOCK_COUNTRY_OF_ORIGIN,
+            "field": "country_of_origin",
+            "is_blocking": True,
+        },
+    )
+    yield (
+        df["carbure_client_type"].isin([Entity.OPERATOR, Entity.POWER_OR_HEAT_PRODUCER])
+        & is_empty(df["supplier_certificate"])
+        & is_empty(df["vendor_certificate"]),
+        {
+            "error": CarbureCertificatesErrors.MISSING_SUPPLIER_CERTIFICATE,
+            "field": "supplier_certificate",
+            "is_blocking": True,
+        },
+    )
+    yield (
+        (df["carbure_client_id"] != df["added_by_id"])
+        & (df["carbure_supplier_id"] != df["added_by_id"])
+        & is_empty(df["vendor_certificate"]),
+        {"error": CarbureCertificatesErrors.MISSING_VENDOR_CERTIFICATE, "field": "vendor_certificate", "is_blocking": True},
+    )
+
+    is_simple_producer = (df["added_by_type"] == Entity.PRODUCER) & ~df["added_by_has_trading"]
+    has_production_info = (df["carbure_producer_id"] > 0) & (df["carbure_production_site_id"] > 0)
+    yield (
+        is_simple_producer & ~has_production_info,
+        {"error": CarbureSanityCheckErrors.MISSING_PRODUCTION_INFO, "field": "production_site", "is_blocking": True},
+    )
+
+
+def check_double_counting(df: pd.DataFrame, ctx: LotFrameContext):
+    is_saf = df["biofuel_code"].isin(SAF_BIOFUEL_TYPES)
+    is_dc = (df["feedstock_id"] > 0) & df["feedstock_is_dc"]
+
+    biofuel_names = names(df["biofuel_id"], ctx.biofuels)
+    feedstock_names = names(df["feedstock_id"], ctx.feedstocks)
+    yield (
+        is_dc & ~is_saf & is_empty(df["dc_certificate"]),
+        {
+            "error": CarbureSanityCheckErrors.MISSING_REF_DBL_COUNTING,
+            "is_blocking": True,
+            "extra": (biofuel_names + " de " + feedstock_names).to_numpy(),
+            "field": "production_site_double_counting_certificate",
+        },
+    )
+
+    yield (
+        ~is_empty(df["dc_certificate"]) & ctx.is_dc & ~ctx.has_dc_certificate,
+        {
+            "error": CarbureCertificatesErrors.UNKNOWN_DOUBLE_COUNTING_CERTIFICATE,
+            "is_blocking": True,
+            "display_to_recipient": True,
+            "field": "production_site_double_counting_certificate",
+        },
+    )
+
+    has_dc = ctx.is_dc & ctx.has_dc_certificate
+    is_expired_period = ctx.dc_last_period < df["period"]
+    yield (
+        has_dc & is_expired_period,
+        {
+            "error": CarbureCertificatesErrors.EXPIRED_DOUBLE_COUNTING_CERTIFICATE,
+            "display_to_recipient": True,
+            "is_blocking": True,
+            "field": "production_site_double_counting_certificate",
+        },
+    )
+    yield (
+        has_dc & ~is_expired_period & (ctx.dc_valid_until < df["delivery_date_dt"]),
+        {
+            "error": CarbureCertificatesErrors.EXPIRED_DOUBLE_COUNTING_CERTIFICATE,
+            "display_to_recipient": True,
+            "field": "production_site_double_counting_certificate",
+        },
+    )
+    yield (
+        has_dc & (ctx.dc_valid_from > df["delivery_date_dt"]),
+        {
+            "error": CarbureCertificatesErrors.INVALID_DOUBLE_COUNTING_CERTIFICATE,
+            "display_to_recipient": True,
+            "is_blocking": True,
+        },
+    )
+
+
+def check_biofuel_feedstock(df: pd.DataFrame, ctx: LotFrameContext):
+    # compute incompatibilities once per distinct (biofuel, feedstock) and (feedstock, origin) couples
+    pairs = df.loc[(df["biofuel_id"] > 0) & (df["feedstock_id"] > 0), ["biofuel_id", "feedstock_id"]].drop_duplicates()
+    incoherences = {
+        (b, f): list(get_biofuel_feedstock_incompatibilities(ctx.biofuels[b], ctx.feedstocks[f]))
+        for b, f in pairs.itertuples(index=False)
+    }
+    yield from expand_messages(
+        df,
+        list(zip(df["biofuel_id"], df["feedstock_id"])),
+        incoherences,
+        {"error": CarbureSanityCheckErrors.MP_BC_INCOHERENT, "is_blocking": True, "fields": ["biofuel", "feedstock"]},
+    )
+
+    pairs = df.loc[(df["feedstock_id"] > 0) & (df["country_of_origin_id"] > 0), ["feedstock_id", "country_of_origin_id"]]
+    provenances = {
+        (f, c): list(get_feedstock_origin_incompatibilities(ctx.feedstocks[f], ctx.countries[c]))
+        for f, c in pairs.drop_duplicates().itertuples(index=False)
+    }
+    yield from expand_messages(
+        df,
+        list(zip(df["feedstock_id"], df["country_of_origin_id"])),
+        provenances,
+        {"error": CarbureSanityCheckErrors.PROVENANCE_MP, "fields": ["feedstock", "country_of_origin"]},
+    )
+
+    yield (
+        (df["feedstock_code"] == "RESIDUS_VINIQUES"),
+        {"error": CarbureSanityCheckErrors.DEPRECATED_MP, "field": "feedstock"},
+    )
+
+
+def expand_messages(df: pd.DataFrame, keys: list, messages_by_key: dict, error_kwargs: dict):
+    """
+    Yield one mask per message rank so lots with several incompatibilities get one error per message,
+    in the same order as the generator checks of the per-lot engine.
+    """
+
+    messages = [messages_by_key.get(key, []) for key in keys]
+    max_messages = max((len(m) for m in messages), default=0)
+
+    # each mask is yielded separately, the final stable sort by lot restores the message order
+    for rank in range(max_messages):
+        extra = np.array([m[rank] if len(m) > rank else None for m in messages], dtype=object)
+        yield pd.notna(extra), {**error_kwargs, "extra": extra}
+
+
+def check_ghg(df: pd.DataFrame, ctx: LotFrameContext):
+    etd = ctx.etd()
+    yield (
+        etd.notna() & (df["etd"] > 2 * etd) & (df["etd"] > 5),
+        {"error": CarbureMLGHGErrors.ETD_ANORMAL_HIGH, "display_to_creator": False, "field": "etd"},
+    )
+    yield (
+        etd.notna() & ~df["country_of_origin_in_europe"] & (df["etd"] < etd),
+        {"error": CarbureMLGHGErrors.ETD_NO_EU_TOO_LOW, "display_to_creator": False, "field": "etd"},
+    )
+
+    has_eec_key = (df["feedstock_id"] > 0) & (df["country_of_origin_id"] > 0)
+    eec_key = (df["feedstock_code"] + df["country_of_origin_code"]).where(has_eec_key)
+    eec_default, eec_average = ctx.stats(eec_key, ctx.data["eec"], ["default_value", "average"])
+    yield (
+        df["eec"] < 0.7 * np.minimum(eec_default, eec_average),
+        {"error": CarbureMLGHGErrors.EEC_ANORMAL_LOW, "display_to_creator": False, "field": "eec"},
+    )
+    yield (
+        df["eec"] > 1.3 * np.maximum(eec_default, eec_average),
+        {"error": CarbureMLGHGErrors.EEC_ANORMAL_HIGH, "display_to_creator": False, "field": "eec"},
+    )
+
+    has_ep_key = (df["feedstock_id"] > 0) & (df["biofuel_id"] > 0)
+    ep_key = (df["feedstock_code"] + df["biofuel_code"]).where(has_ep_key)
+    ep_attributes = ["average", "default_value_min_ep", "default_value_max_ep"]
+    ep_average, ep_min, ep_max = ctx.stats(ep_key, ctx.data["ep"], ep_attributes)
+    yield (
+        df["ep"] < 0.5 * np.minimum(ep_average, ep_min),
+        {"error": CarbureMLGHGErrors.EP_ANORMAL_LOW, "display_to_creator": False, "field": "ep"},
+    )
+    yield (
+        df["ep"] > 1.5 * np.maximum(ep_average, ep_max),
+        {"error": CarbureMLGHGErrors.EP_ANORMAL_HIGH, "display_to_creator": False, "field": "ep"},
+    )
+
+    yield (df["etd"] <= 0), {"error": CarbureSanityCheckErrors.GHG_ETD_0, "is_blocking": True, "field": "etd"}
+    yield (df["ep"] <= 0), {"error": CarbureSanityCheckErrors.GHG_EP_0, "is_blocking": True, "field": "ep"}
+    yield (df["el"] < 0), {"error": CarbureSanityCheckErrors.GHG_EL_NEG, "field": "el"}
+
+    is_conv = (df["feedstock_id"] > 0) & (df["feedstock_category"] == "CONV")
+    feedstock_names = names(df["feedstock_id"], ctx.feedstocks)
+    yield (
+        is_conv & (df["eec"] == 0),
+        {
+            "error": CarbureSanityCheckErrors.GHG_EEC_0,
+            "is_blocking": True,
+            "extra": ("GES Culture 0 pour MP conventionnelle (" + feedstock_names + ")").to_numpy(),
+            "field": "eec",
+        },
+    )
+    yield (
+        (df["feedstock_id"] > 0) & ~is_conv & (df["feedstock_code"] != "EP2") & (df["eec"] != 0),
+        {"error": CarbureSanityCheckErrors.EEC_WITH_RESIDUE, "field": "eec"},
+    )
+
+    reduction = ctx.ghg_reduction
+    yield (reduction >= 100), {"error": CarbureSanityCheckErrors.GHG_REDUC_SUP_100}
+    yield (reduction < 100) & (reduction > 99), {"error": CarbureSanityCheckErrors.GHG_REDUC_SUP_99}
+    yield (reduction < 50), {"error": CarbureSanityCheckErrors.GHG_REDUC_INF_50, "is_blocking": True}
+
+    commissioning_date = df["production_site_commissioning_date_dt"]
+    is_inf_65 = (commissioning_date >= as_date(jan2021)) & (reduction < 65)
+    is_inf_60 = (commissioning_date > as_date(oct2015)) & (reduction < 60)
+    yield is_inf_65, {"error": CarbureSanityCheckErrors.GHG_REDUC_INF_65, "is_blocking": True}
+    yield ~is_inf_65 & is_inf_60, {"error": CarbureSanityCheckErrors.GHG_REDUC_INF_60, "is_blocking": True}
+
+
+def check_general(df: pd.DataFrame, ctx: LotFrameContext):
+    declarations = {
+        (entity_id, period)
+        for entity_id, periods in ctx.data["declarations_by_entity"].items()
+        for period, declared in periods.items()
+        if declared
+    }
+    is_declared = pairs_in(df["added_by_id"], df["period"].fillna(0).astype("int64"), declarations)
+    yield (
+        ctx.is_draft_or_in_correction & is_declared,
+        {"error": CarbureSanityCheckErrors.DECLARATION_ALREADY_VALIDATED, "is_blocking": True, "field": "delivery_date"},
+    )
+
+    yield (
+        (df["volume"] < 2000) & ~df["delivery_type"].isin([CarbureLot.RFC, CarbureLot.FLUSHED]),
+        {"error": CarbureSanityCheckErrors.VOLUME_FAIBLE, "field": "volume"},
+    )
+
+    is_locked = df["year"].isin(ctx.data["locked_years"]) | (df["year"] <= 2015)
+    yield (
+        ctx.is_draft_or_in_correction & is_locked,
+        {
+            "error": CarbureSanityCheckErrors.YEAR_LOCKED,
+            "field": "delivery_date",
+            "extra": df["year"].fillna(0).astype("int64").astype(str).to_numpy(),
+            "is_blocking": True,
+        },
+    )
+
+    is_rfc = df["delivery_type"] == CarbureLot.RFC
+    yield (
+        is_rfc & (df["biofuel_id"] > 0) & ~df["biofuel_code"].isin(MAC_BIOFUELS),
+        {"error": CarbureSanityCheckErrors.MAC_BC_WRONG, "is_blocking": True, "fields": ["biofuel", "delivery_type"]},
+    )
+    yield (
+        is_rfc & (df["carbure_delivery_site_id"] > 0) & (df["carbure_delivery_site_type"] != Depot.EFPE),
+        {"error": CarbureSanityCheckErrors.MAC_NOT_EFPE, "fields": ["delivery_type"]},
+    )
+
+    in_two_weeks = as_date(datetime.date.today() + datetime.timedelta(days=15))
+    yield (
+        df["delivery_date_dt"] > in_two_weeks,
+        {
+            "error": CarbureSanityCheckErrors.DELIVERY_IN_THE_FUTURE,
+            "extra": "La date de livraison est dans le futur",
+            "value": df["delivery_date"].to_numpy(),
+            "field": "delivery_date",
+            "is_blocking": True,
+        },
+    )
+
+    entity_depots = {(entity_id, depot) for entity_id, depots in ctx.data["depotsbyentity"].items() for depot in depots}
+    is_configured = pairs_in(df["carbure_client_id"], df["carbure_delivery_site_customs"], entity_depots)
+    yield (
+        (df["carbure_client_id"] > 0)
+        & (df["delivery_type"] != CarbureLot.TRADING)
+        & (df["carbure_delivery_site_id"] > 0)
+        & ~is_configured,
+        {
+            "error": CarbureSanityCheckErrors.DEPOT_NOT_CONFIGURED,
+            "display_to_recipient": True,
+            "display_to_creator": False,
+            "display_to_admin": False,
+            "display_to_auditor": False,
+            "field": "delivery_site",
+        },
+    )
+
+    delivery_date = df["delivery_date_dt"]
+    is_invalid = (ctx.certificate_valid_from > delivery_date) | (ctx.certificate_valid_until < delivery_date)
+    yield (
+        ~is_empty(df["supplier_certificate"]) & (~ctx.has_certificate | is_invalid),
+        {"error": CarbureSanityCheckErrors.INVALID_CERTIFICATE, "is_blocking": True, "field": "supplier_certificate"},
+    )
+
+    yield (
+        (df["delivery_type"] == CarbureLot.UNKNOWN) & (df["carbure_client_id"] == 0),
+        {"error": CarbureSanityCheckErrors.MISSING_DELIVERY_TYPE, "is_blocking": True, "field": "delivery_type"},
+    )
+
+
+# same order as the checks listed in `sanity_checks.sanity_checks`
+RULES = [
+    check_mandatory_fields,
+    check_double_counting,
+    check_biofuel_feedstock,
+    check_ghg,
+    check_general,
+]
+
+
+def get_lot_ids(lots: Iterable[CarbureLot] | QuerySet) -> list[int]:
+    if isinstance(lots, QuerySet):
+        return list(lots.values_list("id", flat=True))
+    return [lot.id for lot in lots]
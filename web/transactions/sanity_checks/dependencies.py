@@ -0,0 +1,277 @@
+from typing import Callable, NamedTuple
+
+from core.carburetypes import CarbureCertificatesErrors, CarbureMLGHGErrors, CarbureSanityCheckErrors
+
+from .biofuel_feedstock import check_deprecated_mp, check_mp_bc_incoherent, check_provenance_mp
+from .certificates import check_certificate_validity
+from .double_counting import (
+    check_expired_double_counting_certificate,
+    check_invalid_double_counting_certificate,
+    check_missing_ref_dbl_counting,
+    check_unknown_double_counting_certificate,
+)
+from .general import (
+    check_declaration_already_validated,
+    check_delivery_in_the_future,
+    check_depot_not_configured,
+    check_mac_bc_wrong,
+    check_mac_not_efpe,
+    check_missing_delivery_type,
+    check_volume_faible,
+    check_year_locked,
+)
+from .ghg import (
+    check_eec_anormal_high,
+    check_eec_anormal_low,
+    check_eec_with_residue,
+    check_ep_anormal_high,
+    check_ep_anormal_low,
+    check_etd_anormal_high,
+    check_etd_no_eu_too_low,
+    check_ghg_eec_0,
+    check_ghg_el_neg,
+    check_ghg_ep_0,
+    check_ghg_etd_0,
+    check_ghg_reduc,
+    check_ghg_reduc_for_production_site,
+)
+from .mandatory import (
+    check_missing_biofuel,
+    check_missing_carbure_client,
+    check_missing_carbure_delivery_site,
+    check_missing_delivery_date,
+    check_missing_delivery_site_country,
+    check_missing_feedstock,
+    check_missing_feedstock_country_of_origin,
+    check_missing_production_site_comdate,
+    check_missing_supplier_certificate,
+    check_missing_transport_document_reference,
+    check_missing_vendor_certificate,
+    check_missing_volume,
+    check_production_info,
+    check_unkown_production_site,
+    check_wrong_delivery_date,
+)
+
+
+class CheckDependencies(NamedTuple):
+    check: Callable
+    fields: frozenset[str]  # CarbureLot fields read by the check
+    data: frozenset[str]  # PrefetchedData keys read by the check
+    errors: frozenset[str]  # errors that the check can generate
+    many: bool = False  # True if the check yields a list of errors
+
+
+def depends(check, fields, errors, data=(), many=False):
+    return CheckDependencies(check, frozenset(fields), frozenset(data), frozenset(errors), many)
+
+
+FRENCH_DELIVERY = ("delivery_type", "delivery_site_country")
+GHG_REDUCTION = ("delivery_date", "ghg_reduction", "ghg_reduction_red_ii")
+DOUBLE_COUNTING = (
+    "production_site_double_counting_certificate",
+    "parent_lot",
+    "parent_stock",
+    "feedstock",
+    "carbure_production_site",
+)
+
+# same order as the checks listed in `sanity_checks.sanity_checks`
+CHECK_DEPENDENCIES = [
+    # mandatory fields errors
+    depends(check_missing_volume, ["volume"], [CarbureSanityCheckErrors.MISSING_VOLUME]),
+    depends(check_missing_biofuel, ["biofuel"], [CarbureSanityCheckErrors.MISSING_BIOFUEL]),
+    depends(check_missing_feedstock, ["feedstock"], [CarbureSanityCheckErrors.MISSING_FEEDSTOCK]),
+    depends(
+        check_unkown_production_site,
+        ["carbure_producer", "carbure_production_site"],
+        [CarbureSanityCheckErrors.UNKNOWN_PRODUCTION_SITE],
+    ),
+    depends(
+        check_missing_production_site_comdate,
+        ["carbure_production_site", "production_site_commissioning_date"],
+        [CarbureSanityCheckErrors.MISSING_PRODUCTION_SITE_COMDATE],
+    ),
+    depends(
+        check_missing_transport_document_reference,
+        ["delivery_type", "transport_document_reference"],
+        [CarbureSanityCheckErrors.MISSING_TRANSPORT_DOCUMENT_REFERENCE],
+    ),
+    depends(
+        check_missing_carbure_delivery_site,
+        [*FRENCH_DELIVERY, "carbure_delivery_site"],
+        [CarbureSanityCheckErrors.MISSING_CARBURE_DELIVERY_SITE],
+    ),
+    depends(
+        check_missing_carbure_client,
+        [*FRENCH_DELIVERY, "carbure_client"],
+        [CarbureSanityCheckErrors.MISSING_CARBURE_CLIENT],
+    ),
+    depends(check_missing_delivery_date, ["delivery_date"], [CarbureSanityCheckErrors.MISSING_DELIVERY_DATE]),
+    depends(check_wrong_delivery_date, ["delivery_date"], [CarbureSanityCheckErrors.WRONG_DELIVERY_DATE]),
+    depends(
+        check_missing_delivery_site_country,
+        ["delivery_site_country"],
+        [CarbureSanityCheckErrors.MISSING_DELIVERY_SITE_COUNTRY],
+    ),
+    depends(
+        check_missing_feedstock_country_of_origin,
+        ["delivery_site_country", "country_of_origin"],
+        [CarbureSanityCheckErrors.MISSING_FEEDSTOCK_COUNTRY_OF_ORIGIN],
+    ),
+    depends(
+        check_missing_supplier_certificate,
+        ["carbure_client", "supplier_certificate", "vendor_certificate"],
+        [CarbureCertificatesErrors.MISSING_SUPPLIER_CERTIFICATE],
+    ),
+    depends(
+        check_missing_vendor_certificate,
+        ["carbure_client", "carbure_supplier", "added_by", "vendor_certificate"],
+        [CarbureCertificatesErrors.MISSING_VENDOR_CERTIFICATE],
+    ),
+    depends(
+        check_production_info,
+        ["added_by", "carbure_producer", "carbure_production_site"],
+        [CarbureSanityCheckErrors.MISSING_PRODUCTION_INFO],
+    ),
+    # double counting errors
+    depends(
+        check_missing_ref_dbl_counting,
+        ["feedstock", "biofuel", "production_site_double_counting_certificate"],
+        [CarbureSanityCheckErrors.MISSING_REF_DBL_COUNTING],
+    ),
+    depends(
+        check_unknown_double_counting_certificate,
+        DOUBLE_COUNTING,
+        [CarbureCertificatesErrors.UNKNOWN_DOUBLE_COUNTING_CERTIFICATE],
+        data=["double_counting_certificates"],
+    ),
+    depends(
+        check_expired_double_counting_certificate,
+        [*DOUBLE_COUNTING, "period", "delivery_date"],
+        [CarbureCertificatesErrors.EXPIRED_DOUBLE_COUNTING_CERTIFICATE],
+        data=["double_counting_certificates"],
+    ),
+    depends(
+        check_invalid_double_counting_certificate,
+        [*DOUBLE_COUNTING, "delivery_date"],
+        [CarbureCertificatesErrors.INVALID_DOUBLE_COUNTING_CERTIFICATE],
+        data=["double_counting_certificates"],
+    ),
+    # biofuel/feedstock errors
+    depends(check_mp_bc_incoherent, ["biofuel", "feedstock"], [CarbureSanityCheckErrors.MP_BC_INCOHERENT], many=True),
+    depends(check_provenance_mp, ["feedstock", "country_of_origin"], [CarbureSanityCheckErrors.PROVENANCE_MP], many=True),
+    depends(check_deprecated_mp, ["feedstock"], [CarbureSanityCheckErrors.DEPRECATED_MP]),
+    # ghg errors
+    depends(check_etd_anormal_high, ["feedstock", "etd"], [CarbureMLGHGErrors.ETD_ANORMAL_HIGH], data=["etd"]),
+    depends(
+        check_etd_no_eu_too_low,
+        ["feedstock", "country_of_origin", "etd"],
+        [CarbureMLGHGErrors.ETD_NO_EU_TOO_LOW],
+        data=["etd"],
+    ),
+    depends(
+        check_eec_anormal_low,
+        ["feedstock", "country_of_origin", "eec"],
+        [CarbureMLGHGErrors.EEC_ANORMAL_LOW],
+        data=["eec"],
+    ),
+    depends(
+        check_eec_anormal_high,
+        ["feedstock", "country_of_origin", "eec"],
+        [CarbureMLGHGErrors.EEC_ANORMAL_HIGH],
+        data=["eec"],
+    ),
+    depends(check_ep_anormal_low, ["feedstock", "biofuel", "ep"], [CarbureMLGHGErrors.EP_ANORMAL_LOW], data=["ep"]),
+    depends(check_ep_anormal_high, ["feedstock", "biofuel", "ep"], [CarbureMLGHGErrors.EP_ANORMAL_HIGH], data=["ep"]),
+    depends(check_ghg_etd_0, ["etd"], [CarbureSanityCheckErrors.GHG_ETD_0]),
+    depends(check_ghg_ep_0, ["ep"], [CarbureSanityCheckErrors.GHG_EP_0]),
+    depends(check_ghg_el_neg, ["el"], [CarbureSanityCheckErrors.GHG_EL_NEG]),
+    depends(check_ghg_eec_0, ["feedstock", "eec"], [CarbureSanityCheckErrors.GHG_EEC_0]),
+    depends(check_eec_with_residue, ["feedstock", "eec"], [CarbureSanityCheckErrors.EEC_WITH_RESIDUE]),
+    depends(
+        check_ghg_reduc,
+        GHG_REDUCTION,
+        [
+            CarbureSanityCheckErrors.GHG_REDUC_SUP_100,
+            CarbureSanityCheckErrors.GHG_REDUC_SUP_99,
+            CarbureSanityCheckErrors.GHG_REDUC_INF_50,
+        ],
+    ),
+    depends(
+        check_ghg_reduc_for_production_site,
+        [*GHG_REDUCTION, "production_site_commissioning_date"],
+        [CarbureSanityCheckErrors.GHG_REDUC_INF_65, CarbureSanityCheckErrors.GHG_REDUC_INF_60],
+    ),
+    # general errors
+    depends(
+        check_declaration_already_validated,
+        ["lot_status", "correction_status", "added_by", "period"],
+        [CarbureSanityCheckErrors.DECLARATION_ALREADY_VALIDATED],
+        data=["declarations_by_entity"],
+    ),
+    depends(check_volume_faible, ["volume", "delivery_type"], [CarbureSanityCheckErrors.VOLUME_FAIBLE]),
+    depends(
+        check_year_locked,
+        ["lot_status", "correction_status", "year"],
+        [CarbureSanityCheckErrors.YEAR_LOCKED],
+        data=["locked_years"],
+    ),
+    depends(check_mac_bc_wrong, ["delivery_type", "biofuel"], [CarbureSanityCheckErrors.MAC_BC_WRONG]),
+    depends(check_mac_not_efpe, ["delivery_type", "carbure_delivery_site"], [CarbureSanityCheckErrors.MAC_NOT_EFPE]),
+    depends(check_delivery_in_the_future, ["delivery_date"], [CarbureSanityCheckErrors.DELIVERY_IN_THE_FUTURE]),
+    depends(
+        check_depot_not_configured,
+        ["carbure_client", "delivery_type", "carbure_delivery_site"],
+        [CarbureSanityCheckErrors.DEPOT_NOT_CONFIGURED],
+        data=["depotsbyentity"],
+    ),
+    depends(
+        check_certificate_validity,
+        ["supplier_certificate", "delivery_date"],
+        [CarbureSanityCheckErrors.INVALID_CERTIFICATE],
+        data=["certificates"],
+    ),
+    depends(
+        check_missing_delivery_type,
+        ["delivery_type", "carbure_client"],
+        [CarbureSanityCheckErrors.MISSING_DELIVERY_TYPE],
+    ),
+]
+
+# every error that can be generated by a sanity check
+SANITY_CHECK_ERRORS = frozenset(error for dependencies in CHECK_DEPENDENCIES for error in dependencies.errors)
+
+# fields that are recomputed from other fields when a lot is updated
+DERIVED_FIELDS = {
+    "delivery_date": {"year", "period"},
+    "eec": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "el": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "ep": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "etd": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "eu": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "esca": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "eccs": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "eccr": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "eee": {"ghg_reduction", "ghg_reduction_red_ii"},
+    "carbure_production_site": {"production_site_commissioning_date"},
+    "carbure_delivery_site": {"delivery_site_country"},
+}
+
+
+def normalize_fields(fields) -> set[str]:
+    # accept both "biofuel" and "biofuel_id" style names, and add the fields computed from them
+    normalized = {field.removesuffix("_id") for field in fields}
+    for field in list(normalized):
+        normalized |= DERIVED_FIELDS.get(field, set())
+    return normalized
+
+
+def get_checks_for_fields(fields) -> list[CheckDependencies]:
+    fields = normalize_fields(fields)
+    return [dependencies for dependencies in CHECK_DEPENDENCIES if dependencies.fields & fields]
+
+
+def get_checks_for_data(keys) -> list[CheckDependencies]:
+    keys = set(keys)
+    return [dependencies for dependencies in CHECK_DEPENDENCIES if dependencies.data & keys]
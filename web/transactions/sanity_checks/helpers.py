@@ -19,6 +19,8 @@ from producers.models import ProductionSiteInput, ProductionSiteOutput
 from transactions.models import Depot, EntitySite, ProductionSite
 from transactions.models.year_config import YearConfig
 
+from .reference_cache import get_reference_snapshot
+
 july1st2021 = datetime.date(year=2021, month=7, day=1)
 
 
@@ -120,14 +122,36 @@ class PrefetchedData(TypedDict):
 
 
 def get_prefetched_data(entity=None):
+    # the reference data is shared by all entities, so it is built once and cached until one of its models changes
     data: PrefetchedData = {
+        **get_reference_snapshot(get_reference_data),
+        "my_production_sites": {},
+        "my_vendor_certificates": [],
+        # used as cache in CarbureLot model - recalc reliability score
+        "checked_certificates": {},
+    }
+
+    if entity:
+        # get only my production sites
+        entity_psites = ProductionSite.objects.filter(created_by=entity).prefetch_related(
+            "productionsiteinput_set", "productionsiteoutput_set", "productionsitecertificate_set"
+        )
+        data["my_production_sites"] = {ps.name.upper(): ps for ps in entity_psites}
+
+        # get all my linked certificates
+        entity_certs = EntityCertificate.objects.filter(entity=entity)
+        data["my_vendor_certificates"] = [c.certificate.certificate_id for c in entity_certs]
+
+    return data
+
+
+def get_reference_data():
+    data = {
         "countries": {},
         "biofuels": {},
         "depots": {},
         "depotsbyname": {},
         "locked_years": [],
-        "my_production_sites": {},
-        "my_vendor_certificates": [],
         "depotsbyentity": {},
         "entity_certificates": {},
         "production_sites": {},
@@ -138,7 +162,6 @@ def get_prefetched_data(entity=None):
         "etd": {},
         "eec": {},
         "ep": {},
-        "checked_certificates": {},
     }
 
     data["countries"] = {p.code_pays: p for p in Pays.objects.all()}
@@ -148,17 +171,6 @@ def get_prefetched_data(entity=None):
     data["depotsbyname"] = {d.name.upper(): d for d in data["depots"].values()}
     data["locked_years"] = [locked_year.year for locked_year in YearConfig.objects.filter(locked=True)]
 
-    if entity:
-        # get only my production sites
-        entity_psites = ProductionSite.objects.filter(created_by=entity).prefetch_related(
-            "productionsiteinput_set", "productionsiteoutput_set", "productionsitecertificate_set"
-        )
-        data["my_production_sites"] = {ps.name.upper(): ps for ps in entity_psites}
-
-        # get all my linked certificates
-        entity_certs = EntityCertificate.objects.filter(entity=entity)
-        data["my_vendor_certificates"] = [c.certificate.certificate_id for c in entity_certs]
-
     # MAPPING OF ENTITIES AND DELIVERY SITES
     # dict {'entity1': [depot1, depot2], 'entity2': [depot42]}
     depotsbyentities = {}
@@ -246,9 +258,6 @@ def get_prefetched_data(entity=None):
     eps = EPStats.objects.select_related("feedstock", "biofuel").all()
     data["ep"] = {s.feedstock.code + s.biofuel.code: s for s in eps}
 
-    # used as cache in CarbureLot model - recalc reliability score
-    data["checked_certificates"] = {}
-
     data["declarations_by_entity"] = defaultdict(dict)
     declarations = SustainabilityDeclaration.objects.filter(declared=True).order_by("entity", "period")
     for declaration in declarations:
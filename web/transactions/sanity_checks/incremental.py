@@ -0,0 +1,124 @@
+import traceback
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from core.models import CarbureLot, GenericError
+
+from .dependencies import SANITY_CHECK_ERRORS, CheckDependencies, get_checks_for_data, get_checks_for_fields
+from .helpers import get_prefetched_data
+from .sanity_checks import annotate_lots
+
+
+def incremental_sanity_checks(lot: CarbureLot, changed_fields, prefetched_data=None, dry_run=False, cleanup=False):
+    """
+    Re-run only the checks that read one of the changed fields of the lot,
+    then update the lot errors generated by these checks without touching the others.
+    With `cleanup`, errors that weren't generated by a sanity check (ex: stock volume errors) are also removed,
+    like `bulk_sanity_checks` does.
+    """
+
+    checks = get_checks_for_fields(changed_fields)
+    return bulk_incremental_sanity_checks([lot], checks, prefetched_data, dry_run, cleanup)
+
+
+def recheck_lots_for_data(lots, data_keys, prefetched_data=None, dry_run=False):
+    """
+    Re-run the checks that depend on the given PrefetchedData keys (ex: "locked_years", "depotsbyentity")
+    after a change of reference data, only for the given lots.
+    """
+
+    checks = get_checks_for_data(data_keys)
+    return bulk_incremental_sanity_checks(lots, checks, prefetched_data, dry_run)
+
+
+def bulk_incremental_sanity_checks(
+    lots,
+    checks: list[CheckDependencies],
+    prefetched_data=None,
+    dry_run=False,
+    cleanup=False,
+):
+    if len(checks) == 0 and not cleanup:
+        return []
+
+    if isinstance(lots, QuerySet):
+        lots = annotate_lots(lots)
+
+    if prefetched_data is None:
+        prefetched_data = get_prefetched_data()
+
+    errors = []
+    for lot in lots:
+        # flushed lots never have errors, and lots that crash a check lose their errors like in `bulk_sanity_checks`
+        if lot.lot_status == CarbureLot.FLUSHED:
+            continue
+
+        try:
+            errors += run_checks(lot, checks, prefetched_data)
+        except Exception:
+            traceback.print_exc()
+
+    if not dry_run:
+        sync_errors([lot.id for lot in lots], checks, errors, cleanup)
+
+    return errors
+
+
+def run_checks(lot: CarbureLot, checks: list[CheckDependencies], prefetched_data) -> list[GenericError]:
+    lot_errors = []
+    for dependencies in checks:
+        # only the checks that read reference data need it as argument
+        result = dependencies.check(lot, prefetched_data) if dependencies.data else dependencies.check(lot)
+
+        if dependencies.many:
+            lot_errors += list(result or [])
+        elif result:
+            lot_errors.append(result)
+    return lot_errors
+
+
+@transaction.atomic
+def sync_errors(lot_ids: list[int], checks: list[CheckDependencies], errors: list[GenericError], cleanup=False):
+    """
+    Compare the errors previously saved for the given checks with the new ones:
+    identical errors are kept as is, outdated ones are deleted and only the new ones are created.
+    """
+
+    checked_errors = Q(error__in={error for dependencies in checks for error in dependencies.errors})
+    if cleanup:
+        checked_errors |= ~Q(error__in=SANITY_CHECK_ERRORS)
+
+    previous_errors = defaultdict(list)
+    for error in GenericError.objects.filter(checked_errors, lot_id__in=lot_ids):
+        previous_errors[error_key(error)].append(error.id)
+
+    new_errors = []
+    for error in errors:
+        previous = previous_errors.get(error_key(error))
+        if previous:
+            previous.pop()
+        else:
+            new_errors.append(error)
+
+    outdated_error_ids = [error_id for error_ids in previous_errors.values() for error_id in error_ids]
+
+    GenericError.objects.filter(id__in=outdated_error_ids).delete()
+    GenericError.objects.bulk_create(new_errors, batch_size=1000)
+
+
+def error_key(error: GenericError):
+    return (
+        error.lot_id,
+        error.error,
+        error.field,
+        str(error.fields) if error.fields is not None else None,
+        str(error.value) if error.value is not None else None,
+        error.extra,
+        error.is_blocking,
+        error.display_to_creator,
+        error.display_to_recipient,
+        error.display_to_admin,
+        error.display_to_auditor,
+    )
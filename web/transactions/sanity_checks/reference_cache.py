@@ -0,0 +1,192 @@
+import datetime
+import logging
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from certificates.models import DoubleCountingRegistration
+from core.models import (
+    Biocarburant,
+    Entity,
+    EntityCertificate,
+    GenericCertificate,
+    MatierePremiere,
+    Pays,
+    SustainabilityDeclaration,
+)
+from ml.models import EECStats, EPStats, ETDStats
+from producers.models import ProductionSiteInput, ProductionSiteOutput
+from transactions.models import Depot, EntitySite, ProductionSite, Site, YearConfig
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "prefetched_data:version"
+SNAPSHOT_KEY = "prefetched_data:snapshot:{version}:{day}"
+
+# number of snapshots kept in memory by each worker
+LOCAL_CACHE_SIZE = 2
+
+# every model read when building the reference data snapshot
+REFERENCE_MODELS = [
+    Pays,
+    Biocarburant,
+    MatierePremiere,
+    Site,
+    Depot,
+    ProductionSite,
+    YearConfig,
+    EntitySite,
+    EntityCertificate,
+    ProductionSiteInput,
+    ProductionSiteOutput,
+    Entity,
+    GenericCertificate,
+    DoubleCountingRegistration,
+    ETDStats,
+    EECStats,
+    EPStats,
+    SustainabilityDeclaration,
+]
+
+
+class SnapshotStats:
+    """
+    Counters of the current worker, used to monitor the efficiency of the cache.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.build_time = 0.0
+
+    def count(self, name, build_time=0.0):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.build_time += build_time
+
+    def as_dict(self):
+        total = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.shared_hits) / total if total else 0.0,
+            "average_build_time": self.build_time / self.misses if self.misses else 0.0,
+        }
+
+
+class LocalSnapshots:
+    """
+    Small in-process LRU placed in front of the shared cache,
+    so a worker doesn't download and unpickle the same snapshot for every request.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.snapshots = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.snapshots:
+                return None
+            self.snapshots.move_to_end(key)
+            return self.snapshots[key]
+
+    def set(self, key, snapshot):
+        with self.lock:
+            self.snapshots[key] = snapshot
+            self.snapshots.move_to_end(key)
+            while len(self.snapshots) > self.size:
+                self.snapshots.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.snapshots.clear()
+
+
+stats = SnapshotStats()
+local_snapshots = LocalSnapshots(LOCAL_CACHE_SIZE)
+
+
+def get_reference_snapshot(build):
+    """
+    Return the entity-independent reference data, built with the given function when no up-to-date snapshot is found.
+    The snapshot is looked up in the worker memory first, then in the shared cache.
+    """
+
+    timeout = settings.PREFETCHED_DATA_CACHE_TIMEOUT
+    if not timeout:
+        return build_snapshot(build)
+
+    # certificate validity depends on the current day so snapshots are also bound to it
+    key = SNAPSHOT_KEY.format(version=get_data_version(), day=datetime.date.today().isoformat())
+
+    snapshot = local_snapshots.get(key)
+    if snapshot is not None:
+        stats.count("local_hits")
+        return snapshot
+
+    payload = cache.get(key)
+    if payload is not None:
+        snapshot = pickle.loads(zlib.decompress(payload))
+        stats.count("shared_hits")
+    else:
+        snapshot = build_snapshot(build)
+        cache.set(key, zlib.compress(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)), timeout)
+
+    local_snapshots.set(key, snapshot)
+    return snapshot
+
+
+def build_snapshot(build):
+    start = time.perf_counter()
+    snapshot = build()
+    build_time = time.perf_counter() - start
+
+    stats.count("misses", build_time)
+    logger.info("Reference data snapshot built in %.3fs (%s)", build_time, stats.as_dict())
+    return snapshot
+
+
+def get_data_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from a unique value so snapshots built before an eviction of the counter are never reused
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_reference_data():
+    """
+    Outdate the current snapshot, to be called after changes that don't trigger model signals (bulk operations, raw sql).
+    """
+
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def on_reference_data_change(sender, **kwargs):
+    # wait for the commit so no other worker can rebuild a snapshot with the previous data under the new version
+    transaction.on_commit(invalidate_reference_data)
+
+
+def connect_signals():
+    for model in REFERENCE_MODELS:
+        post_save.connect(on_reference_data_change, sender=model, dispatch_uid=f"prefetched_data_{model.__name__}_save")
+        post_delete.connect(on_reference_data_change, sender=model, dispatch_uid=f"prefetched_data_{model.__name__}_delete")
@@ -7,6 +7,7 @@ from core.models import CarbureLot, CarbureLotReliabilityScore, GenericError
 
 from .biofuel_feedstock import check_deprecated_mp, check_mp_bc_incoherent, check_provenance_mp
 from .certificates import check_certificate_validity
+from .columnar import columnar_sanity_checks, get_lot_ids
 from .double_counting import (
     check_expired_double_counting_certificate,
     check_invalid_double_counting_certificate,
@@ -122,27 +123,30 @@ def sanity_checks(lot: CarbureLot, prefetched_data) -> list[GenericError]:
     return [error for error in errors if error]
 
 
-def bulk_sanity_checks(lots, prefetched_data=None, dry_run=False):
-    if isinstance(lots, QuerySet):
-        lots = annotate_lots(lots)
-
+def bulk_sanity_checks(lots, prefetched_data=None, dry_run=False, columnar=False):
     if prefetched_data is None:
         prefetched_data = get_prefetched_data()
 
-    errors = []
+    if columnar:
+        # evaluate each rule over the whole batch at once, see columnar.py
+        lot_ids = get_lot_ids(lots)
+        errors = columnar_sanity_checks(lots, prefetched_data)
+    else:
+        if isinstance(lots, QuerySet):
+            lots = annotate_lots(lots)
 
-    # cleanup previous errors
-    if not dry_run:
-        GenericError.objects.filter(lot_id__in=[lot.id for lot in lots]).delete()
+        lot_ids = [lot.id for lot in lots]
+        errors = []
 
-    for lot in lots:
-        try:
-            errors += sanity_checks(lot, prefetched_data)
-        except Exception:
-            traceback.print_exc()
+        for lot in lots:
+            try:
+                errors += sanity_checks(lot, prefetched_data)
+            except Exception:
+                traceback.print_exc()
 
-    # save new errors
+    # replace previous errors with the new ones
     if not dry_run:
+        GenericError.objects.filter(lot_id__in=lot_ids).delete()
         GenericError.objects.bulk_create(errors, batch_size=1000)
 
     return errors
@@ -0,0 +1,140 @@
+import datetime
+import random
+
+from django.test import TestCase
+
+from certificates.models import DoubleCountingRegistration
+from core.models import Biocarburant, CarbureLot, Entity, MatierePremiere, Pays, SustainabilityDeclaration
+from transactions.factories import CarbureLotFactory
+from transactions.factories.certificate import GenericCertificateFactory
+from transactions.models import Depot, ProductionSite, YearConfig
+
+from ..helpers import get_prefetched_data
+from ..sanity_checks import bulk_sanity_checks
+
+
+def error_signature(error):
+    return (
+        error.lot_id,
+        error.error,
+        error.field,
+        error.fields,
+        error.value,
+        error.extra,
+        error.is_blocking,
+        error.display_to_creator,
+        error.display_to_recipient,
+        error.display_to_admin,
+        error.display_to_auditor,
+    )
+
+
+class ColumnarSanityChecksTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+        "json/ml.json",
+        "json/entities_sites.json",
+    ]
+
+    def setUp(self):
+        random.seed(42)
+        today = datetime.date.today()
+
+        GenericCertificateFactory(certificate_id="VALID", valid_from=today.replace(day=1), valid_until=today)
+        self.production_site = ProductionSite.objects.first()
+        DoubleCountingRegistration.objects.create(
+            certificate_id="FR_00999_2023",
+            production_site=self.production_site,
+            valid_from=datetime.date(2023, 1, 1),
+            valid_until=datetime.date(2024, 12, 31),
+        )
+
+        YearConfig.objects.create(year=today.year - 1, locked=True)
+
+        self.producer = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        SustainabilityDeclaration.objects.create(entity=self.producer, declared=True, period=today.replace(day=1))
+
+        self.create_random_lots(200)
+        self.prefetched_data = get_prefetched_data()
+
+    def create_random_lots(self, count):
+        biofuels = [*Biocarburant.objects.all(), None]
+        feedstocks = [*MatierePremiere.biofuel.all(), None]
+        countries = [*Pays.objects.all(), None]
+        entities = [*Entity.objects.all(), None]
+        depots = [*Depot.objects.all(), None]
+
+        today = datetime.date.today()
+        commissioning_dates = [None, datetime.date(2010, 1, 1), datetime.date(2022, 1, 1)]
+        dates = [today, today.replace(year=today.year - 1), today + datetime.timedelta(days=30), datetime.date(2021, 1, 1)]
+
+        for _ in range(count):
+            CarbureLotFactory.create(
+                lot_status=random.choice([CarbureLot.DRAFT, CarbureLot.PENDING, CarbureLot.ACCEPTED, CarbureLot.FLUSHED]),
+                correction_status=random.choice([CarbureLot.NO_PROBLEMO, CarbureLot.IN_CORRECTION]),
+                delivery_type=random.choice([t for t, _ in CarbureLot.DELIVERY_TYPES]),
+                volume=random.choice([1000, 5000]),
+                biofuel=random.choice(biofuels),
+                feedstock=random.choice(feedstocks),
+                country_of_origin=random.choice(countries),
+                delivery_site_country=random.choice(countries),
+                carbure_client=random.choice(entities),
+                carbure_supplier=random.choice(entities),
+                added_by=random.choice([self.producer, *entities]),
+                carbure_delivery_site=random.choice(depots),
+                carbure_production_site=random.choice([self.production_site, None]),
+                production_site_commissioning_date=random.choice(commissioning_dates),
+                production_site_double_counting_certificate=random.choice(["", "UNKNOWN", "FR_00999_2023"]),
+                supplier_certificate=random.choice(["", "VALID", "UNKNOWN"]),
+                vendor_certificate=random.choice([None, "VENDOR"]),
+                transport_document_reference=random.choice(["", "DAE"]),
+                delivery_date=random.choice(dates),
+                eec=random.choice([0, 5, 50]),
+                ep=random.choice([-1, 5, 50]),
+                etd=random.choice([0, 2, 30]),
+                el=random.choice([-1, 0, 1]),
+                ghg_reduction=random.choice([10, 55, 62, 99.5, 100]),
+                ghg_reduction_red_ii=random.choice([10, 55, 62, 99.5, 100]),
+            )
+
+        # bypass the pre_save signal that computes the volume from the weight
+        CarbureLot.objects.filter(feedstock=None).update(volume=0)
+
+    def assert_same_errors(self, lots):
+        lot_by_lot = bulk_sanity_checks(lots, self.prefetched_data, dry_run=True)
+        columnar = bulk_sanity_checks(lots, self.prefetched_data, dry_run=True, columnar=True)
+
+        assert len(lot_by_lot) > 0
+        self.assertEqual([error_signature(e) for e in lot_by_lot], [error_signature(e) for e in columnar])
+
+    def test_same_errors_for_queryset(self):
+        self.assert_same_errors(CarbureLot.objects.all().order_by("id"))
+
+    def test_same_errors_for_lot_list(self):
+        lots = list(CarbureLot.objects.all().order_by("id"))
+
+        # in-memory changes must be taken into account like for the per-lot engine
+        for lot in lots[:20]:
+            lot.volume = 0
+            lot.biofuel = None
+
+        self.assert_same_errors(lots)
+
+    def test_skip_lots_that_cannot_be_checked(self):
+        lot = CarbureLotFactory.create(added_by=None)
+
+        errors = bulk_sanity_checks([lot], self.prefetched_data, dry_run=True, columnar=True)
+        assert errors == []
+
+    def test_save_errors(self):
+        lots = CarbureLot.objects.all().order_by("id")
+
+        errors = bulk_sanity_checks(lots, self.prefetched_data, columnar=True)
+
+        lot_ids = {lot.id for lot in lots if lot.lot_status != CarbureLot.FLUSHED}
+        assert {error.lot_id for error in errors} <= lot_ids
+        assert lots[0].genericerror_set.count() == len([e for e in errors if e.lot_id == lots[0].id])
@@ -0,0 +1,99 @@
+import datetime
+
+from django.test import TestCase
+
+from core.carburetypes import CarbureSanityCheckErrors
+from core.models import CarbureLot, GenericError
+from transactions.factories import CarbureLotFactory
+from transactions.models import YearConfig
+
+from ..dependencies import CHECK_DEPENDENCIES, get_checks_for_data, get_checks_for_fields, normalize_fields
+from ..helpers import get_prefetched_data
+from ..incremental import incremental_sanity_checks, recheck_lots_for_data, run_checks
+from ..sanity_checks import bulk_sanity_checks, sanity_checks
+
+
+def error_signature(error):
+    return (error.lot_id, error.error, error.field, error.value, error.extra, error.is_blocking)
+
+
+class IncrementalSanityChecksTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+        "json/ml.json",
+        "json/entities_sites.json",
+    ]
+
+    def setUp(self):
+        self.lots = [CarbureLotFactory.create(lot_status=CarbureLot.DRAFT) for _ in range(20)]
+        self.prefetched_data = get_prefetched_data()
+
+    def saved_errors(self, lot):
+        return sorted(error_signature(e) for e in GenericError.objects.filter(lot=lot))
+
+    def test_dependencies_cover_all_checks(self):
+        for lot in self.lots:
+            expected = [error_signature(e) for e in sanity_checks(lot, self.prefetched_data)]
+            errors = [error_signature(e) for e in run_checks(lot, CHECK_DEPENDENCIES, self.prefetched_data)]
+            self.assertEqual(errors, expected)
+
+    def test_normalize_fields(self):
+        fields = normalize_fields(["biofuel_id", "delivery_date"])
+
+        assert {"biofuel", "delivery_date", "year", "period"} <= fields
+        assert "biofuel_id" not in fields
+
+    def test_checks_for_fields(self):
+        checks = get_checks_for_fields(["volume"])
+        errors = {error for dependencies in checks for error in dependencies.errors}
+
+        assert CarbureSanityCheckErrors.MISSING_VOLUME in errors
+        assert CarbureSanityCheckErrors.MISSING_BIOFUEL not in errors
+        assert get_checks_for_fields(["unrelated_field"]) == []
+
+    def test_update_only_impacted_errors(self):
+        lot = self.lots[0]
+        bulk_sanity_checks([lot], self.prefetched_data)
+        unrelated_ids = set(
+            GenericError.objects.filter(lot=lot).exclude(error=CarbureSanityCheckErrors.MISSING_VOLUME).values_list("id")
+        )
+
+        CarbureLot.objects.filter(id=lot.id).update(volume=0)
+        lot.refresh_from_db()
+        incremental_sanity_checks(lot, ["volume"], self.prefetched_data)
+
+        errors = GenericError.objects.filter(lot=lot)
+        assert errors.filter(error=CarbureSanityCheckErrors.MISSING_VOLUME).exists()
+        # errors of the other checks were left untouched
+        assert unrelated_ids <= set(errors.values_list("id"))
+
+        full_errors = bulk_sanity_checks([lot], self.prefetched_data, dry_run=True)
+        self.assertEqual(self.saved_errors(lot), sorted(error_signature(e) for e in full_errors))
+
+    def test_cleanup_removes_non_sanity_errors(self):
+        lot = self.lots[0]
+        bulk_sanity_checks([lot], self.prefetched_data)
+        GenericError.objects.create(lot=lot, error="CUSTOM_ERROR", is_blocking=True)
+
+        incremental_sanity_checks(lot, ["volume"], self.prefetched_data)
+        assert GenericError.objects.filter(lot=lot, error="CUSTOM_ERROR").exists()
+
+        incremental_sanity_checks(lot, ["volume"], self.prefetched_data, cleanup=True)
+        assert not GenericError.objects.filter(lot=lot, error="CUSTOM_ERROR").exists()
+
+    def test_recheck_lots_for_data(self):
+        year = datetime.date.today().year
+        lots = CarbureLot.objects.filter(id__in=[lot.id for lot in self.lots])
+        lots.update(year=year)
+        bulk_sanity_checks(lots, self.prefetched_data)
+        assert not GenericError.objects.filter(lot__in=lots, error=CarbureSanityCheckErrors.YEAR_LOCKED).exists()
+
+        YearConfig.objects.create(year=year, locked=True)
+        recheck_lots_for_data(lots, ["locked_years"])
+
+        assert GenericError.objects.filter(lot__in=lots, error=CarbureSanityCheckErrors.YEAR_LOCKED).count() == len(lots)
+        assert len(get_checks_for_data(["locked_years"])) == 1
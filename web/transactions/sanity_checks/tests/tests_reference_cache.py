@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import Entity
+from transactions.models import Depot, YearConfig
+
+from ..helpers import get_prefetched_data
+from ..reference_cache import local_snapshots, stats
+
+
+@override_settings(PREFETCHED_DATA_CACHE_TIMEOUT=60)
+class ReferenceCacheTest(TestCase):
+    fixtures = [
+        "json/biofuels.json",
+        "json/feedstock.json",
+        "json/countries.json",
+        "json/entities.json",
+        "json/depots.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        local_snapshots.clear()
+        stats.reset()
+
+    def test_snapshot_is_reused(self):
+        first = get_prefetched_data()
+        with self.assertNumQueries(0):
+            second = get_prefetched_data()
+
+        assert second["depots"] is first["depots"]
+        # per-call data is never shared
+        assert second["checked_certificates"] is not first["checked_certificates"]
+        assert stats.as_dict()["local_hits"] == 1
+        assert stats.as_dict()["misses"] == 1
+
+    def test_shared_cache_is_used_by_other_workers(self):
+        get_prefetched_data()
+        local_snapshots.clear()
+
+        data = get_prefetched_data()
+
+        assert set(data["depots"]) == {depot.depot_id for depot in Depot.objects.all()}
+        assert stats.as_dict()["shared_hits"] == 1
+        assert stats.as_dict()["hit_rate"] == 0.5
+
+    def test_model_changes_invalidate_snapshot(self):
+        assert get_prefetched_data()["locked_years"] == []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            YearConfig.objects.create(year=2020, locked=True)
+
+        assert get_prefetched_data()["locked_years"] == [2020]
+        assert stats.as_dict()["misses"] == 2
+
+    def test_entity_data_is_not_cached(self):
+        entity = Entity.objects.filter(entity_type=Entity.PRODUCER).first()
+        get_prefetched_data()
+
+        data = get_prefetched_data(entity)
+
+        assert data["my_vendor_certificates"] == []
+        assert get_prefetched_data()["my_production_sites"] == {}
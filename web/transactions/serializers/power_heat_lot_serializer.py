@@ -4,6 +4,43 @@ from core.models import CarbureLot
 from core.serializers import CarbureLotAdminSerializer, CarbureLotCSVSerializer, CarbureLotPublicSerializer
 from transactions.models import Depot
 
+REF_ELECTRICITY = 183.0  # gCO2/MJ
+REF_HEAT = 80.0  # gCO2/MJ
+
+
+# compute the emissions of the electricity and heat produced from a lot, based on the plant characteristics
+def get_power_or_heat_emissions(plant_type, E_total, electrical_efficiency, thermal_efficiency, useful_temperature):
+    R_elec = electrical_efficiency or 0  # Rendement électrique
+    C_elec = 1  # Fraction de l'exergie dans l'électricité (100%)
+
+    R_chaleur = thermal_efficiency or 0  # Rendement thermique
+    C_chaleur = (
+        useful_temperature / (useful_temperature + 273.15) if useful_temperature else 0
+    )  # Fraction de l'exergie dans la chaleur utile
+
+    E_elec = None
+    if plant_type == Depot.COGENERATION_PLANT:
+        E_elec = (E_total / R_elec) * ((C_elec * R_elec) / (C_elec * R_elec + C_chaleur * R_chaleur))
+    elif plant_type == Depot.POWER_PLANT:
+        E_elec = E_total / R_elec
+
+    E_chaleur = None
+    if plant_type == Depot.COGENERATION_PLANT:
+        E_chaleur = (E_total / R_chaleur) * ((C_chaleur * R_chaleur) / (C_elec * R_elec + C_chaleur * R_chaleur))
+    if plant_type == Depot.HEAT_PLANT:
+        E_chaleur = E_total / R_chaleur
+
+    return (
+        round(E_elec, 2) if E_elec else None,
+        round(E_chaleur, 2) if E_chaleur else None,
+    )
+
+
+def get_emission_reduction(reference, emission):
+    if emission is None:
+        return None
+    return round(100 * (reference - emission) / reference, 2)
+
 
 # mixin serializer to add specific GHG info for power and heat production
 class CarbureLotPowerOrHeatSerializer(serializers.ModelSerializer):
@@ -15,62 +52,28 @@ class CarbureLotPowerOrHeatSerializer(serializers.ModelSerializer):
     def get_emission_electricity(self, obj):
         if obj.carbure_delivery_site is None:
             return None
-
-        plant, E_total, R_elec, C_elec, R_chaleur, C_chaleur = self.get_emission_operands(obj)
-
-        E_elec = None
-        if plant.depot_type == Depot.COGENERATION_PLANT:
-            E_elec = (E_total / R_elec) * ((C_elec * R_elec) / (C_elec * R_elec + C_chaleur * R_chaleur))
-        elif plant.depot_type == Depot.POWER_PLANT:
-            E_elec = E_total / R_elec
-
-        return round(E_elec, 2) if E_elec else None
+        return self.get_emissions(obj)[0]
 
     def get_total_reduction_electricity(self, obj):
-        Ref_elec = 183.0  # gCO2/MJ
-        E_elec = self.get_emission_electricity(obj)
-
-        if E_elec is None:
-            return None
-
-        return round(100 * (Ref_elec - E_elec) / Ref_elec, 2)
+        return get_emission_reduction(REF_ELECTRICITY, self.get_emission_electricity(obj))
 
     def get_emission_heat(self, obj):
         if obj.carbure_delivery_site is None:
             return None
-
-        plant, E_total, R_elec, C_elec, R_chaleur, C_chaleur = self.get_emission_operands(obj)
-
-        E_chaleur = None
-        if plant.depot_type == Depot.COGENERATION_PLANT:
-            E_chaleur = (E_total / R_chaleur) * ((C_chaleur * R_chaleur) / (C_elec * R_elec + C_chaleur * R_chaleur))
-        if plant.depot_type == Depot.HEAT_PLANT:
-            E_chaleur = E_total / R_chaleur
-
-        return round(E_chaleur, 2) if E_chaleur else None
+        return self.get_emissions(obj)[1]
 
     def get_total_reduction_heat(self, obj):
-        Ref_chaleur = 80.0  # gCO2/MJ
-        E_chaleur = self.get_emission_heat(obj)
+        return get_emission_reduction(REF_HEAT, self.get_emission_heat(obj))
 
-        if E_chaleur is None:
-            return None
-
-        return round(100 * (Ref_chaleur - E_chaleur) / Ref_chaleur, 2)
-
-    def get_emission_operands(self, obj):
+    def get_emissions(self, obj):
         plant = obj.carbure_delivery_site
-        E_total = obj.ghg_total  # Total des émissions du lot en amont
-
-        R_elec = plant.electrical_efficiency or 0  # Rendement électrique
-        C_elec = 1  # Fraction de l'exergie dans l'électricité (100%)
-
-        R_chaleur = plant.thermal_efficiency or 0  # Rendement thermique
-        C_chaleur = (
-            plant.useful_temperature / (plant.useful_temperature + 273.15) if plant.useful_temperature else 0
-        )  # Fraction de l'exergie dans la chaleur utile
-
-        return plant, E_total, R_elec, C_elec, R_chaleur, C_chaleur
+        return get_power_or_heat_emissions(
+            plant.depot_type,
+            obj.ghg_total,  # Total des émissions du lot en amont
+            plant.electrical_efficiency,
+            plant.thermal_efficiency,
+            plant.useful_temperature,
+        )
 
     class Meta:
         model = CarbureLot
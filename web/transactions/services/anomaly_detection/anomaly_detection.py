@@ -1,29 +1,32 @@
+import datetime
+import logging
 import os
 import pathlib
+import time
 import warnings
+from contextlib import contextmanager
 
 import pandas as pd
 from django.conf import settings
+from django.utils import timezone
 
 warnings.filterwarnings("ignore")
 
+logger = logging.getLogger(__name__)
+
 DB_TABLE_NAMES = [
     "carbure_lots",
     "biocarburants",
     "double_counting_registrations",
     "entities",
-    "entity_depot",
-    "entity_site",
     "matieres_premieres",
     "pays",
-    "production_sites_certificates",
-    "production_sites_input",
-    "production_sites_output",
     "sites",
 ]
 
 CHOSEN_QUANTILE = 0.05
 COMPUTED_QUANTILES = [0.01, 0.05, 0.10]
+RANDOM_SEED = 0
 
 E_MIN, E_MAX = (0.0, 45.0)
 EMISSION_COLS = ["eec", "ep", "etd", "eccr"]
@@ -79,29 +82,58 @@ def anomaly_detection(
     categorical_variables=CATEGORICAL_VARIABLES,
     if_params=DEFAULT_IF_PARAMS,
     lof_params=DEFAULT_LOF_PARAMS,
+    workers=None,
+    seed=RANDOM_SEED,
+    timings=None,
+    incremental=False,
+    retrain_months=None,
 ):
     """
     Detect outliers in lots based on their categories and GHG profile.
     Original implementation: https://gitlab.com/la-fabrique-numerique/carbure_datascience
-    """
 
-    from sklearn.ensemble import IsolationForest
-    from sklearn.neighbors import LocalOutlierFactor
+    The groups are fitted in `workers` processes (ANOMALY_DETECTION_WORKERS by default), and the
+    fitted detectors are saved. In `incremental` mode, only the lots created since the last run are
+    loaded and scored with the saved detectors, unless they are older than `retrain_months`
+    (ANOMALY_DETECTION_RETRAIN_MONTHS by default) or can't be loaded: then all the lots are loaded and
+    the detectors refitted.
+    The duration of each stage is logged, and stored in `timings` if given.
+    """
 
     from .create_errors import create_errors
     from .create_groups import create_groups
     from .default_values import flag_default_values
     from .detect_outliers import detect_outliers
+    from .incremental import ModelLoadError, get_current_version, mark_scored, save_models, score_lots
     from .load_db import load_db
 
     data_dir = pathlib.Path(settings.BASE_DIR) / "transactions/services/anomaly_detection/data"
 
-    all_tables: dict[str, pd.DataFrame] = load_db(
-        database_url=os.environ["DATABASE_URL"],
-        tables_names=table_names,
-        filters=["delivery_date >= '2022-03-01'"],
-        retrieve_unknown=["production_site", "producer"],
-    )
+    if workers is None:
+        workers = settings.ANOMALY_DETECTION_WORKERS
+    if retrain_months is None:
+        retrain_months = settings.ANOMALY_DETECTION_RETRAIN_MONTHS
+    if timings is None:
+        timings = {}
+
+    # lots created during the run will be scored by the next one
+    started_at = timezone.now()
+    current_version = get_current_version(retrain_months) if incremental else None
+    if incremental and current_version is None:
+        logger.info("Anomaly detection: no recent models, all the lots are used to refit them")
+
+    filters = ["delivery_date >= '2022-03-01'"]
+    if current_version is not None:
+        scored_until = current_version[1].astimezone(datetime.timezone.utc)
+        filters.append(f"created_at >= '{scored_until:%Y-%m-%d %H:%M:%S}'")
+
+    with timed("load", timings):
+        all_tables: dict[str, pd.DataFrame] = load_db(
+            database_url=os.environ["DATABASE_URL"],
+            tables_names=table_names,
+            filters=filters,
+            retrieve_unknown=["production_site", "producer"],
+        )
 
     biocarburants = all_tables["biocarburants"]
     carbure_lots = all_tables["carbure_lots"]
@@ -118,23 +150,75 @@ def anomaly_detection(
         "country_of_origin_id": pays["name"],
     }
 
-    carbure_lots[emission_cols] = carbure_lots[emission_cols].clip(e_min, e_max)
-    ghg = carbure_lots[emission_cols + categorical_variables]
-    ddv_flags = flag_default_values(ghg, data_dir, emission_cols=emission_cols)
-    flagged_df = ghg.join(ddv_flags)
-    flagged_df["is_default_eccr"] = False  # Add eccr for convenience, but it has no default values.
-
-    df_ep = create_groups(flagged_df, "ep", emission_group_cols, categorical_variables, id_names_mapping)
-    df_eec = create_groups(flagged_df, "eec", emission_group_cols, categorical_variables, id_names_mapping)
-    df_etd = create_groups(flagged_df, "etd", emission_group_cols, categorical_variables, id_names_mapping)
+    with timed("default values", timings):
+        carbure_lots[emission_cols] = carbure_lots[emission_cols].clip(e_min, e_max)
+        ghg = carbure_lots[emission_cols + categorical_variables]
+        ddv_flags = flag_default_values(ghg, data_dir, emission_cols=emission_cols)
+        flagged_df = ghg.join(ddv_flags)
+        flagged_df["is_default_eccr"] = False  # Add eccr for convenience, but it has no default values.
+
+    if current_version is not None:
+        version = current_version[0]
+        try:
+            with timed("scoring", timings):
+                outliers = score_lots(flagged_df, version, ["ep", "eec", "etd"], emission_group_cols)
+        except ModelLoadError:
+            logger.exception("Anomaly detection: the saved models can't be loaded, all the lots are used to refit them")
+            return anomaly_detection(
+                table_names=table_names,
+                chosen_quantile=chosen_quantile,
+                computed_quantiles=computed_quantiles,
+                e_min=e_min,
+                e_max=e_max,
+                emission_cols=emission_cols,
+                emission_group_cols=emission_group_cols,
+                categorical_variables=categorical_variables,
+                if_params=if_params,
+                lof_params=lof_params,
+                workers=workers,
+                seed=seed,
+                timings=timings,
+                incremental=False,
+            )
+    else:
+        with timed("groups", timings):
+            df_ep = create_groups(flagged_df, "ep", emission_group_cols, categorical_variables, id_names_mapping)
+            df_eec = create_groups(flagged_df, "eec", emission_group_cols, categorical_variables, id_names_mapping)
+            df_etd = create_groups(flagged_df, "etd", emission_group_cols, categorical_variables, id_names_mapping)
+
+        outliers = {}
+        fitted_models = {}
+        for emission_category, df in [("ep", df_ep), ("eec", df_eec), ("etd", df_etd)]:
+            fitted_models[emission_category] = []
+            with timed(f"outliers {emission_category}", timings):
+                outliers[emission_category] = detect_outliers(
+                    df,
+                    emission_category,
+                    emission_group_cols,
+                    chosen_quantile,
+                    computed_quantiles,
+                    if_params,
+                    lof_params,
+                    workers=workers,
+                    seed=seed,
+                    fitted_models=fitted_models[emission_category],
+                )
+
+    with timed("errors", timings):
+        lot_ids = create_errors(outliers)
+
+    if current_version is not None:
+        mark_scored(version, started_at)
+    else:
+        with timed("save models", timings):
+            save_models(fitted_models, started_at)
 
-    clf_if = IsolationForest(**if_params)
-    clf_lof = LocalOutlierFactor(**lof_params)
-
-    outliers_ep = detect_outliers(df_ep, "ep", emission_group_cols, chosen_quantile, computed_quantiles, clf_if, clf_lof)
-    outliers_eec = detect_outliers(df_eec, "eec", emission_group_cols, chosen_quantile, computed_quantiles, clf_if, clf_lof)
-    outliers_etd = detect_outliers(df_etd, "etd", emission_group_cols, chosen_quantile, computed_quantiles, clf_if, clf_lof)
+    return lot_ids
 
-    lot_ids = create_errors({"ep": outliers_ep, "eec": outliers_eec, "etd": outliers_etd})
 
-    return lot_ids
+@contextmanager
+def timed(stage: str, timings: dict[str, float]):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+    logger.info("Anomaly detection: %s in %.2fs", stage, timings[stage])
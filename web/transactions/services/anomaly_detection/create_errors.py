@@ -29,22 +29,25 @@ def create_errors(outliers_by_emission_category: dict[str, pd.DataFrame]):
 
     for emission_category, outliers in outliers_by_emission_category.items():
         lof_outlier_filters = Q()
-        lof_outliers = outliers[outliers["is_lof_outlier"]].drop(columns=["is_lof_outlier", "is_if_outlier"])
+        lof_outliers = outliers[outliers["is_lof_outlier"].astype(bool)].drop(columns=["is_lof_outlier", "is_if_outlier"])
         for _, row in lof_outliers.iterrows():
             filters = row.to_dict()
             lof_outlier_filters |= Q(**filters)
 
-        lof_outlier_lot_ids = processed_lots.filter(lof_outlier_filters).distinct().values_list("id", flat=True)
-        errors += [create_error("LOF_OUTLIER", emission_category, lot_id) for lot_id in lof_outlier_lot_ids]
+        # an empty Q would match all the lots
+        if lof_outlier_filters:
+            lof_outlier_lot_ids = processed_lots.filter(lof_outlier_filters).distinct().values_list("id", flat=True)
+            errors += [create_error("LOF_OUTLIER", emission_category, lot_id) for lot_id in lof_outlier_lot_ids]
 
         if_outlier_filters = Q()
-        if_outliers = outliers[outliers["is_if_outlier"]].drop(columns=["is_lof_outlier", "is_if_outlier"])
+        if_outliers = outliers[outliers["is_if_outlier"].astype(bool)].drop(columns=["is_lof_outlier", "is_if_outlier"])
         for _, row in if_outliers.iterrows():
             filters = row.to_dict()
             if_outlier_filters |= Q(**filters)
 
-        if_outlier_lot_ids = processed_lots.filter(if_outlier_filters).distinct().values_list("id", flat=True)
-        errors += [create_error("IF_OUTLIER", emission_category, lot_id) for lot_id in if_outlier_lot_ids]
+        if if_outlier_filters:
+            if_outlier_lot_ids = processed_lots.filter(if_outlier_filters).distinct().values_list("id", flat=True)
+            errors += [create_error("IF_OUTLIER", emission_category, lot_id) for lot_id in if_outlier_lot_ids]
 
     lot_ids: list[int] = [e.lot_id for e in errors]
     GenericError.objects.filter(error__in=["LOF_OUTLIER", "IF_OUTLIER"], lot_id__in=lot_ids).delete()
@@ -1,7 +1,13 @@
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from sklearn.neighbors import LocalOutlierFactor
 
+OUTLIER_COLUMNS = ["is_lof_outlier", "is_if_outlier"]
+
 
 def detect_outliers(
     df: pd.DataFrame,
@@ -9,32 +15,92 @@ def detect_outliers(
     emission_group_cols: dict[str, list[str]],
     chosen_quantile: float,
     computed_quantiles: list[float],
-    clf_lof: IsolationForest,
-    clf_if: LocalOutlierFactor,
+    if_params: dict,
+    lof_params: dict,
+    workers: int = 1,
+    seed: int | None = 0,
+    fitted_models: list[dict] | None = None,
 ) -> pd.DataFrame:
-    outliers = pd.DataFrame(columns=df.columns.tolist() + ["is_lof_outlier", "is_if_outlier"])
+    """
+    Fit the outlier detectors on each group of lots, in `workers` processes.
+    The isolation forest of each group is seeded from `seed` and the group name,
+    so the outliers don't depend on the number of workers or on the other groups.
+    If `fitted_models` is given, the detectors and threshold of each group are appended to it.
+    """
+    groups = [(key, group) for key, group in df.groupby("group", observed=True) if key != "Autres"]
 
-    for key, group in df.groupby("group", observed=True):
-        if key == "Autres":
-            continue
+    fits = [
+        (
+            group[[emission_category]].to_numpy(dtype=float),
+            if_params,
+            lof_params,
+            get_group_seed(seed, emission_category, key),
+            fitted_models is not None,
+        )
+        for key, group in groups
+    ]
+    if workers > 1 and len(fits) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fit_group, *zip(*fits)))
+    else:
+        results = [fit_group(*fit) for fit in fits]
 
+    all_outliers = []
+    for (key, group), (is_lof_outlier, is_if_outlier, estimators) in zip(groups, results):
         group_quantiles = group[emission_category].quantile(computed_quantiles)
         chosen_quantile_emissions: float = group_quantiles.loc[chosen_quantile]
 
-        group["is_lof_outlier"] = clf_lof.fit_predict(group[[emission_category]]) == -1
-        group["is_if_outlier"] = clf_if.fit_predict(group[[emission_category]]) == -1
+        if fitted_models is not None:
+            group_cols = emission_group_cols.get(emission_category, [])
+            fitted_models.append(
+                {
+                    "group": key,
+                    "group_filters": {col: group[col].iloc[0].item() for col in group_cols},
+                    "threshold": chosen_quantile_emissions,
+                    "estimators": estimators,
+                }
+            )
 
+        group = group.assign(is_lof_outlier=is_lof_outlier, is_if_outlier=is_if_outlier)
         group_outliers = group[
             (group["is_lof_outlier"] | group["is_if_outlier"]) & (group[emission_category] < chosen_quantile_emissions)
         ]
+        all_outliers.append(group_outliers)
 
-        outliers = pd.concat([outliers, group_outliers], axis=0)
+    if all_outliers:
+        outliers = pd.concat(all_outliers, axis=0)
+    else:
+        outliers = pd.DataFrame(columns=df.columns.tolist() + OUTLIER_COLUMNS)
 
     # Now we only keep categorical data for each type of emission
     # The idea is to have a frame containing all the filters that match outlying values
-    outlier_columns = ["is_lof_outlier", "is_if_outlier"]
     if emission_category in emission_group_cols:
-        cols = [emission_category] + emission_group_cols[emission_category] + outlier_columns
+        cols = [emission_category] + emission_group_cols[emission_category] + OUTLIER_COLUMNS
         outliers = outliers[cols]
 
     return outliers
+
+
+def fit_group(values: np.ndarray, if_params: dict, lof_params: dict, random_state: int | None, keep_estimators=False):
+    """
+    Returns the LOF and isolation forest outlier masks of the emission values of a group,
+    and the fitted detectors if `keep_estimators` is set
+    """
+    if random_state is not None:
+        if_params = {**if_params, "random_state": random_state}
+
+    # fitted in novelty mode to be able to score new lots later, the outliers of the fitted values
+    # are the ones fit_predict would return without novelty
+    lof = LocalOutlierFactor(**{**lof_params, "novelty": True}).fit(values)
+    is_lof_outlier = lof.negative_outlier_factor_ < lof.offset_
+    isolation_forest = IsolationForest(**if_params).fit(values)
+    is_if_outlier = isolation_forest.predict(values) == -1
+
+    estimators = (lof, isolation_forest) if keep_estimators else None
+    return is_lof_outlier, is_if_outlier, estimators
+
+
+def get_group_seed(seed: int | None, emission_category: str, key) -> int | None:
+    if seed is None:
+        return None
+    return (seed + zlib.crc32(f"{emission_category}:{key}".encode())) % 2**32
@@ -0,0 +1,116 @@
+"""Persisted anomaly detection models.
+
+A full run of the anomaly detection saves the detectors fitted on each group of lots
+under a new version. The following runs only load the lots created since the last run
+and score them with these detectors, until the models are older than the retraining cadence.
+"""
+
+import pickle
+from datetime import datetime
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from transactions.models import AnomalyDetectionModel
+
+from .detect_outliers import OUTLIER_COLUMNS
+
+
+class ModelLoadError(Exception):
+    """The saved detectors can't be loaded, for example after an upgrade of scikit-learn."""
+
+
+def get_current_version(retrain_months: int) -> tuple[int, datetime] | None:
+    """
+    Returns the version of the saved models and the date until which lots were scored,
+    or None if there are no models or they should be retrained
+    """
+    latest = AnomalyDetectionModel.objects.order_by("-version").values("version", "created_at").first()
+    if latest is None or latest["created_at"] < timezone.now() - relativedelta(months=retrain_months):
+        return None
+
+    scored_until = AnomalyDetectionModel.objects.filter(version=latest["version"]).aggregate(
+        scored_until=Max("scored_until")
+    )["scored_until"]
+    return latest["version"], scored_until
+
+
+@transaction.atomic
+def save_models(fitted_models: dict[str, list[dict]], scored_until: datetime) -> int:
+    """Save the detectors fitted on each group, per emission category, as a new version replacing the previous ones."""
+    version = (AnomalyDetectionModel.objects.aggregate(version=Max("version"))["version"] or 0) + 1
+
+    AnomalyDetectionModel.objects.bulk_create(
+        [
+            AnomalyDetectionModel(
+                version=version,
+                emission_category=emission_category,
+                group=str(model["group"])[:255],
+                group_filters=model["group_filters"],
+                threshold=model["threshold"],
+                estimators=pickle.dumps(model["estimators"]),
+                scored_until=scored_until,
+            )
+            for emission_category, models in fitted_models.items()
+            for model in models
+        ],
+        batch_size=100,
+    )
+    AnomalyDetectionModel.objects.filter(version__lt=version).delete()
+    return version
+
+
+def mark_scored(version: int, scored_until: datetime) -> None:
+    AnomalyDetectionModel.objects.filter(version=version).update(scored_until=scored_until)
+
+
+def score_lots(
+    df: pd.DataFrame,
+    version: int,
+    emission_categories: list[str],
+    emission_group_cols: dict[str, list[str]],
+) -> dict[str, pd.DataFrame]:
+    """
+    Score the lots with the saved detectors of their group, without refitting them.
+    Returns the outliers per emission category, in the format of detect_outliers.
+    Raises ModelLoadError if the detectors of a group can't be unpickled.
+    """
+    outliers = {}
+    for emission_category in emission_categories:
+        group_cols = emission_group_cols.get(emission_category, [])
+        columns = [emission_category] + group_cols
+        candidates = df.loc[~df[f"is_default_{emission_category}"], columns].dropna(subset=group_cols)
+        candidates = candidates.drop_duplicates()
+
+        group_outliers = []
+        models = AnomalyDetectionModel.objects.filter(version=version, emission_category=emission_category)
+        for model in models.iterator():
+            mask = pd.Series(True, index=candidates.index)
+            for col, value in model.group_filters.items():
+                mask &= candidates[col] == value
+            group = candidates[mask]
+            if group.empty:
+                continue
+
+            try:
+                lof, isolation_forest = pickle.loads(model.estimators)
+            except Exception as e:
+                raise ModelLoadError(f"Cannot load the detectors of group {model.group}") from e
+            values = group[[emission_category]].to_numpy(dtype=float)
+            group = group.assign(
+                is_lof_outlier=lof.predict(values) == -1,
+                is_if_outlier=isolation_forest.predict(values) == -1,
+            )
+            group_outliers.append(
+                group[(group["is_lof_outlier"] | group["is_if_outlier"]) & (group[emission_category] < model.threshold)]
+            )
+
+        if group_outliers:
+            outliers[emission_category] = pd.concat(group_outliers, axis=0)
+        else:
+            outliers[emission_category] = pd.DataFrame(columns=columns + OUTLIER_COLUMNS)
+
+    return outliers
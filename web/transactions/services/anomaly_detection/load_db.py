@@ -9,6 +9,32 @@ import difflib
 
 import pandas as pd
 
+NAME_COLUMNS = {"id": "int64", "name": "string"}
+
+# Only the columns used by the anomaly detection are loaded, with explicit dtypes
+# (nullable foreign keys are read as floats, like pandas does for columns containing NULL)
+TABLE_COLUMNS: dict[str, dict[str, str]] = {
+    "carbure_lots": {
+        "id": "int64",
+        "eec": "float64",
+        "ep": "float64",
+        "etd": "float64",
+        "eccr": "float64",
+        "biofuel_id": "float64",
+        "feedstock_id": "float64",
+        "carbure_producer_id": "float64",
+        "carbure_production_site_id": "float64",
+        "country_of_origin_id": "float64",
+        "production_site_double_counting_certificate": "string",
+    },
+    "biocarburants": NAME_COLUMNS,
+    "matieres_premieres": NAME_COLUMNS,
+    "pays": NAME_COLUMNS,
+    "sites": NAME_COLUMNS,
+    "entities": {**NAME_COLUMNS, "entity_type": "category"},
+    "double_counting_registrations": {"id": "int64", "certificate_id": "string", "production_site_id": "float64"},
+}
+
 
 def value_closest_match(targets: pd.Series, sources: pd.Series, cutoff: float = 0.8):
     """Return closest string matches of an array.
@@ -46,13 +72,19 @@ def load_db(
     # Load database
     conn = database_url
 
+    table_columns = {table: dict(columns) for table, columns in TABLE_COLUMNS.items()}
+    for field in retrieve_unknown:
+        table_columns["carbure_lots"][f"unknown_{field}"] = "string"
+        table_columns["carbure_lots"][f"carbure_{field}_id"] = "float64"
+
     all_tables: dict[str, pd.DataFrame] = {}
     for table in tables_names:
-        query = f"SELECT * FROM {table}"
+        columns = table_columns.get(table)
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
         if table == "carbure_lots":
             query = " ".join([query] + lots_query_filters)
         query += ";"
-        all_tables[table] = pd.read_sql(query, conn)
+        all_tables[table] = pd.read_sql(query, conn, dtype=columns)
         try:
             all_tables[table].set_index("id", inplace=True)
         except KeyError:
@@ -84,7 +116,9 @@ def load_db(
                 sources=sources[field],
                 cutoff=retrieve_cutoff,
             )
-            unknown_reverse_mappings[field] = sources[field].drop_duplicates().reset_index().set_index("name").squeeze()
+            unknown_reverse_mappings[field] = (
+                sources[field].drop_duplicates().reset_index().set_index("name").squeeze(axis=1)
+            )
             retrieved = unknown_closest_matches[field].dropna()
             all_tables["carbure_lots"].loc[retrieved.index, f"carbure_{field}_id"] = retrieved.map(
                 unknown_reverse_mappings[field]
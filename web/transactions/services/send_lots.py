@@ -0,0 +1,170 @@
+import copy
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+from core.counters import track_counters
+from core.facets import invalidate_filters
+from core.models import CarbureLot, CarbureLotEvent, CarbureStock, Entity
+from core.search import refresh_lot_search
+from core.traceability import Node
+from core.traceability.closure import index_nodes
+from transactions.sanity_checks.columnar import columnar_sanity_checks
+from transactions.services.carbure_id import bulk_generate_lot_carbure_id, bulk_generate_stock_carbure_id
+
+
+class SendLotsError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def send_lots(lots: QuerySet[CarbureLot], entity: Entity, user, prefetched_data):
+    """
+    Send the given drafts of the entity to their clients with a fixed number of queries, whatever the number of lots:
+    all lots are checked at once, then the status changes, trading copies, stocks and events are written in bulk.
+    Raises SendLotsError if one of the lots can't be sent, before anything is written.
+    """
+
+    lot_list = list(lots)
+    result = {"submitted": len(lot_list), "sent": 0, "auto-accepted": 0, "ignored": 0, "rejected": 0}
+
+    for lot in lot_list:
+        if lot.added_by_id != entity.id:
+            raise SendLotsError("Entity not authorized to send this lot", status=403)
+        if lot.lot_status != CarbureLot.DRAFT:
+            raise SendLotsError("Lot is not a draft")
+
+    errors = columnar_sanity_checks(lots, prefetched_data) if lot_list else []
+    blocked_lot_ids = {error.lot_id for error in errors if error.is_blocking}
+
+    sent_lots = []
+    trading_copies = []
+    new_stocks = []
+    events = []
+
+    def add_event(event_type, lot):
+        events.append(CarbureLotEvent(event_type=event_type, lot=lot, user=user, entity=entity))
+
+    for lot in lot_list:
+        if lot.id in blocked_lot_ids:
+            result["rejected"] += 1
+            continue
+
+        result["sent"] += 1
+        sent_lots.append(lot)
+        add_event(CarbureLotEvent.VALIDATED, lot)
+
+        lot.lot_status = CarbureLot.PENDING
+
+        # I AM NEITHER THE PRODUCER NOR THE CLIENT (Trading)
+        # the lot is split in two transactions, unknown producer/supplier -> me and me -> client
+        if lot.carbure_supplier_id != entity.id and lot.carbure_client_id != entity.id:
+            result["auto-accepted"] += 1
+            trading_copies.append(make_trading_copy(lot))
+            lot.lot_status = CarbureLot.ACCEPTED
+            lot.delivery_type = CarbureLot.TRADING
+            lot.carbure_client = entity
+            add_event(CarbureLotEvent.ACCEPTED, lot)
+
+        # RFC or EXPORT
+        elif lot.carbure_client_id is None:
+            result["auto-accepted"] += 1
+            lot.lot_status = CarbureLot.ACCEPTED
+            add_event(CarbureLotEvent.ACCEPTED, lot)
+
+        elif lot.carbure_client_id == entity.id and lot.delivery_type not in (CarbureLot.UNKNOWN, None):
+            lot.lot_status = CarbureLot.ACCEPTED
+            add_event(CarbureLotEvent.ACCEPTED, lot)
+            if lot.delivery_type == CarbureLot.STOCK:
+                if lot.carbure_delivery_site_id is None:
+                    raise SendLotsError("Cannot add stock into unknown Depot")
+                new_stocks.append(make_stock(lot))
+
+    if not sent_lots:
+        return result, []
+
+    sent_lot_ids = [lot.id for lot in sent_lots]
+
+    with transaction.atomic(), track_counters(lots=sent_lot_ids) as counters:
+        CarbureLot.objects.bulk_update(sent_lots, ["lot_status", "delivery_type", "carbure_client"], batch_size=1000)
+
+        if trading_copies:
+            CarbureLot.objects.bulk_create(trading_copies, batch_size=1000)
+            set_created_ids(trading_copies, CarbureLot.objects.filter(parent_lot_id__in=sent_lot_ids))
+            counters.add_created_lots(trading_copies)
+            for copy_lot in trading_copies:
+                add_event(CarbureLotEvent.ACCEPTED, copy_lot)
+
+        CarbureLotEvent.objects.bulk_create(events, batch_size=1000)
+
+        created_lot_ids = [lot.id for lot in trading_copies]
+        bulk_generate_lot_carbure_id(CarbureLot.objects.filter(id__in=sent_lot_ids + created_lot_ids), save=True)
+
+        if new_stocks:
+            CarbureStock.objects.bulk_create(new_stocks, batch_size=1000)
+            created_stocks = CarbureStock.objects.filter(parent_lot_id__in=sent_lot_ids)
+            set_created_ids(new_stocks, created_stocks)
+            counters.add_created_stocks(new_stocks)
+            bulk_generate_stock_carbure_id(created_stocks.filter(id__in=[stock.id for stock in new_stocks]), save=True)
+
+        refresh_lot_search(sent_lot_ids + created_lot_ids)
+        index_nodes(Node.LOT, created_lot_ids)
+        index_nodes(Node.STOCK, [stock.id for stock in new_stocks])
+
+        entity_ids = {entity.id}
+        for lot in sent_lots + trading_copies:
+            entity_ids.update([lot.carbure_client_id, lot.carbure_supplier_id, lot.carbure_vendor_id])
+        transaction.on_commit(lambda: invalidate_filters(entity_ids))
+
+    return result, created_lot_ids
+
+
+def make_trading_copy(lot: CarbureLot):
+    copy_lot = copy.copy(lot)
+    copy_lot.pk = None
+    copy_lot._state.adding = True
+    copy_lot.parent_lot_id = lot.id
+    copy_lot.carbure_client_id = lot.carbure_client_id
+    copy_lot.unknown_supplier = ""
+    copy_lot.carbure_supplier_id = lot.carbure_vendor_id
+    copy_lot.supplier_certificate = lot.vendor_certificate
+    copy_lot.supplier_certificate_type = lot.vendor_certificate_type
+    copy_lot.carbure_vendor = None
+    copy_lot.vendor_certificate = None
+    copy_lot.vendor_certificate_type = ""
+    copy_lot.lot_status = CarbureLot.PENDING
+    copy_lot.delivery_type = CarbureLot.UNKNOWN
+    copy_lot.carbure_id = ""
+    return copy_lot
+
+
+def make_stock(lot: CarbureLot):
+    return CarbureStock(
+        parent_lot_id=lot.id,
+        depot_id=lot.carbure_delivery_site_id,
+        carbure_client_id=lot.carbure_client_id,
+        remaining_volume=lot.volume,
+        remaining_weight=lot.weight,
+        remaining_lhv_amount=lot.lhv_amount,
+        feedstock_id=lot.feedstock_id,
+        biofuel_id=lot.biofuel_id,
+        country_of_origin_id=lot.country_of_origin_id,
+        carbure_production_site_id=lot.carbure_production_site_id,
+        unknown_production_site=lot.unknown_production_site,
+        production_country_id=lot.production_country_id,
+        carbure_supplier_id=lot.carbure_supplier_id,
+        unknown_supplier=lot.unknown_supplier,
+        ghg_reduction=lot.ghg_reduction,
+        ghg_reduction_red_ii=lot.ghg_reduction_red_ii,
+    )
+
+
+def set_created_ids(objects, created):
+    # mysql doesn't return the ids of rows inserted with bulk_create, so they are read back through their parent lot
+    if all(obj.pk is not None for obj in objects):
+        return
+    ids_by_parent = dict(created.order_by("id").values_list("parent_lot_id", "id"))
+    for obj in objects:
+        obj.pk = ids_by_parent[obj.parent_lot_id]
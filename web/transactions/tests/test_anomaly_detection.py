@@ -0,0 +1,230 @@
+import pickle
+import sqlite3
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+import pandas as pd
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from sklearn.ensemble import IsolationForest
+from sklearn.neighbors import LocalOutlierFactor
+
+from transactions.models import AnomalyDetectionModel
+from transactions.services.anomaly_detection.anomaly_detection import (
+    CHOSEN_QUANTILE,
+    COMPUTED_QUANTILES,
+    DEFAULT_IF_PARAMS,
+    DEFAULT_LOF_PARAMS,
+    EMISSION_GROUP_COLS,
+    anomaly_detection,
+)
+from transactions.services.anomaly_detection.create_errors import create_errors
+from transactions.services.anomaly_detection.detect_outliers import OUTLIER_COLUMNS, detect_outliers
+from transactions.services.anomaly_detection.incremental import (
+    ModelLoadError,
+    get_current_version,
+    mark_scored,
+    save_models,
+    score_lots,
+)
+from transactions.services.anomaly_detection.load_db import load_db
+from transactions.tests.legacy_anomaly_detection import detect_outliers_legacy
+from transactions.tests.utils import create_synthetic_groups
+
+
+class DetectOutliersTest(SimpleTestCase):
+    def setUp(self):
+        self.df = create_synthetic_groups(nb_groups=4, nb_lots=300, seed=1)
+        self.args = (self.df, "eec", EMISSION_GROUP_COLS, CHOSEN_QUANTILE, COMPUTED_QUANTILES)
+
+    def test_same_outliers_as_the_sequential_loop(self):
+        if_params = {**DEFAULT_IF_PARAMS, "random_state": 42}
+        # the legacy call passed the isolation forest as clf_lof and the LOF as clf_if
+        expected = detect_outliers_legacy(
+            *self.args, IsolationForest(**if_params), LocalOutlierFactor(**DEFAULT_LOF_PARAMS)
+        ).rename(columns={"is_lof_outlier": "is_if_outlier", "is_if_outlier": "is_lof_outlier"})
+
+        outliers = detect_outliers(*self.args, if_params, DEFAULT_LOF_PARAMS, seed=None)
+
+        self.assertFalse(outliers.empty)
+        pd.testing.assert_frame_equal(outliers, expected[outliers.columns], check_dtype=False)
+
+    def test_outliers_do_not_depend_on_the_workers(self):
+        sequential = detect_outliers(*self.args, DEFAULT_IF_PARAMS, DEFAULT_LOF_PARAMS, workers=1)
+        parallel = detect_outliers(*self.args, DEFAULT_IF_PARAMS, DEFAULT_LOF_PARAMS, workers=2)
+        pd.testing.assert_frame_equal(sequential, parallel)
+
+        # the seed of a group doesn't depend on the other groups
+        first_group = self.df[self.df["group"] == "Feedstock 0"]
+        alone = detect_outliers(first_group, *self.args[1:], DEFAULT_IF_PARAMS, DEFAULT_LOF_PARAMS)
+        pd.testing.assert_frame_equal(alone, sequential[sequential["feedstock_id"] == 0])
+
+    def test_other_groups_are_skipped(self):
+        df = self.df.assign(group=pd.Categorical(["Autres"] * len(self.df)))
+        outliers = detect_outliers(df, *self.args[1:], DEFAULT_IF_PARAMS, DEFAULT_LOF_PARAMS)
+        self.assertTrue(outliers.empty)
+        self.assertEqual(outliers.columns.tolist(), ["eec", "feedstock_id", "is_lof_outlier", "is_if_outlier"])
+
+    def test_benchmark_command(self):
+        call_command("benchmark_anomaly_detection", groups=2, lots=100, workers=[1])
+
+
+class IncrementalAnomalyDetectionTest(TestCase):
+    def setUp(self):
+        self.df = create_synthetic_groups(nb_groups=3, nb_lots=300, seed=1)
+        self.fitted_models = []
+        detect_outliers(
+            self.df,
+            "eec",
+            EMISSION_GROUP_COLS,
+            CHOSEN_QUANTILE,
+            COMPUTED_QUANTILES,
+            DEFAULT_IF_PARAMS,
+            DEFAULT_LOF_PARAMS,
+            fitted_models=self.fitted_models,
+        )
+        self.now = timezone.now()
+        self.version = save_models({"eec": self.fitted_models}, self.now)
+
+    def test_fitted_models_are_saved_per_group(self):
+        self.assertEqual(len(self.fitted_models), 3)
+        self.assertEqual(self.fitted_models[0]["group_filters"], {"feedstock_id": 0.0})
+        self.assertEqual(AnomalyDetectionModel.objects.filter(version=self.version).count(), 3)
+        self.assertEqual(get_current_version(retrain_months=6), (self.version, self.now))
+
+        # a new full run replaces the models
+        version = save_models({"eec": self.fitted_models[:1]}, self.now)
+        self.assertEqual(version, self.version + 1)
+        self.assertEqual(AnomalyDetectionModel.objects.get().version, version)
+
+    def test_models_are_retrained_after_the_cadence(self):
+        AnomalyDetectionModel.objects.update(created_at=self.now - timedelta(days=200))
+        self.assertIsNone(get_current_version(retrain_months=6))
+        self.assertIsNotNone(get_current_version(retrain_months=12))
+
+    def test_mark_scored(self):
+        later = self.now + timedelta(days=30)
+        mark_scored(self.version, later)
+        self.assertEqual(get_current_version(retrain_months=6), (self.version, later))
+
+    def test_new_lots_are_scored_without_refitting(self):
+        group = self.df[self.df["feedstock_id"] == 0]["eec"]
+        new_lots = pd.DataFrame(
+            {
+                "eec": [group.median(), group.min() / 10, group.min() / 10, group.min() / 10],
+                "feedstock_id": [0.0, 0.0, 0.0, 99.0],
+                "is_default_eec": [False, False, True, False],
+                "ep": [10.0] * 4,
+                "biofuel_id": [1.0] * 4,
+                "is_default_ep": [False] * 4,
+            }
+        )
+
+        outliers = score_lots(new_lots, self.version, ["eec", "ep"], EMISSION_GROUP_COLS)
+
+        # only the very low value of the known group, declared values only
+        self.assertEqual(outliers["eec"]["eec"].tolist(), [group.min() / 10])
+        self.assertEqual(outliers["eec"]["feedstock_id"].tolist(), [0.0])
+        self.assertTrue((outliers["eec"]["is_lof_outlier"] | outliers["eec"]["is_if_outlier"]).all())
+        self.assertTrue(outliers["ep"].empty)
+        self.assertEqual(outliers["ep"].columns.tolist(), ["ep", "feedstock_id", "biofuel_id", *OUTLIER_COLUMNS])
+
+    def test_unreadable_models_are_refitted(self):
+        # estimators pickled by another version of scikit-learn can fail to load
+        AnomalyDetectionModel.objects.update(estimators=pickle.dumps("not estimators"))
+        with self.assertRaises(ModelLoadError):
+            score_lots(self.df.assign(is_default_eec=False), self.version, ["eec"], EMISSION_GROUP_COLS)
+
+        # groups need lots from several producers to be fitted
+        lots = self.df.drop(columns="group").assign(
+            ep=10.0, etd=1.0, eccr=0.0, biofuel_id=1.0, carbure_production_site_id=1.0, country_of_origin_id=1.0
+        )
+        lots["carbure_producer_id"] = (lots.index % 20).astype(float)
+        lots.index.name = "id"
+        names = pd.DataFrame({"name": ["Name"]}, index=[1])
+        tables = {
+            "carbure_lots": lots,
+            "biocarburants": names,
+            "matieres_premieres": pd.DataFrame({"name": [f"Feedstock {i}" for i in range(3)]}, index=range(3)),
+            "entities": names,
+            "sites": names,
+            "pays": names,
+        }
+
+        with (
+            patch("transactions.services.anomaly_detection.load_db.load_db", return_value=tables) as load_db,
+            patch("transactions.services.anomaly_detection.create_errors.create_errors", return_value=[]),
+            patch.dict("os.environ", {"DATABASE_URL": "sqlite://"}),
+            self.assertLogs("transactions.services.anomaly_detection.anomaly_detection", "ERROR"),
+        ):
+            anomaly_detection(workers=1, incremental=True)
+
+        # the new lots were loaded first, then all of them to refit the models
+        self.assertEqual(load_db.call_count, 2)
+        self.assertEqual(len(load_db.call_args.kwargs["filters"]), 1)
+        models = AnomalyDetectionModel.objects.all()
+        self.assertEqual({model.version for model in models}, {self.version + 1})
+        eec_models = models.filter(emission_category="eec")
+        self.assertEqual(eec_models.count(), 3)
+        self.assertTrue(all(len(pickle.loads(model.estimators)) == 2 for model in eec_models))
+
+    def test_no_outliers_create_no_errors(self):
+        columns = ["eec", "feedstock_id", *OUTLIER_COLUMNS]
+        self.assertEqual(create_errors({"eec": pd.DataFrame(columns=columns)}), [])
+
+
+class LoadDbTest(SimpleTestCase):
+    def setUp(self):
+        self.db = tempfile.NamedTemporaryFile(suffix=".sqlite3")
+        connection = sqlite3.connect(self.db.name)
+        lots = {
+            "id": [1, 2, 3],
+            "eec": [10.0, None, 30.0],
+            "ep": [1.0, 2.0, 3.0],
+            "etd": [1.0, 2.0, 3.0],
+            "eccr": [0.0, 0.0, 0.0],
+            "biofuel_id": [1, 1, None],
+            "feedstock_id": [1, 1, 1],
+            "carbure_producer_id": [1, None, None],
+            "carbure_production_site_id": [None, None, None],
+            "country_of_origin_id": [1, 1, 1],
+            "unknown_producer": [None, "Producteur Un", ""],
+            "unknown_production_site": [None, None, None],
+            "production_site_double_counting_certificate": [None, None, None],
+            "production_site_commissioning_date": ["2020-01-01", "2020-01-01", "2020-01-01"],
+            "delivery_date": ["2023-01-01", "2023-01-01", "2021-01-01"],
+            "lot_status": ["ACCEPTED", "ACCEPTED", "ACCEPTED"],
+            "unused": ["a", "b", "c"],
+        }
+        pd.DataFrame(lots).to_sql("carbure_lots", connection, index=False)
+        pd.DataFrame({"id": [1], "name": ["Producteur 1"], "entity_type": ["Producteur"]}).to_sql(
+            "entities", connection, index=False
+        )
+        pd.DataFrame({"id": [1], "name": ["Site 1"]}).to_sql("sites", connection, index=False)
+        pd.DataFrame({"id": [1], "certificate_id": ["DC_1"], "production_site_id": [1]}).to_sql(
+            "double_counting_registrations", connection, index=False
+        )
+        connection.close()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_load_only_the_needed_columns(self):
+        tables = load_db(
+            database_url=f"sqlite:///{self.db.name}",
+            tables_names=["carbure_lots", "entities", "sites", "double_counting_registrations"],
+            filters=["delivery_date >= '2022-03-01'"],
+            retrieve_unknown=["production_site", "producer"],
+        )
+        lots = tables["carbure_lots"]
+
+        self.assertEqual(lots.index.tolist(), [1, 2])
+        self.assertNotIn("unused", lots.columns)
+        self.assertEqual(lots["eec"].dtype, "float64")
+        self.assertEqual(lots["biofuel_id"].dtype, "float64")
+        self.assertEqual(lots["unknown_producer"].dtype, "string")
+        self.assertEqual(tables["entities"]["entity_type"].dtype, "category")
+        # the unknown producer is matched with the closest entity name
+        self.assertEqual(lots["carbure_producer_id"].tolist(), [1, 1])
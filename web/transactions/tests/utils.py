@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+
+def create_synthetic_groups(nb_groups: int, nb_lots: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    feedstock_ids = np.repeat(np.arange(nb_groups), nb_lots)
+    averages = rng.uniform(5, 35, nb_groups)[feedstock_ids]
+    eec = np.clip(rng.normal(averages, averages / 10), 0, 45)
+    # a few lots far below their group
+    low = rng.random(len(eec)) < 0.01
+    eec[low] = eec[low] / 5
+
+    return pd.DataFrame(
+        {
+            "eec": eec,
+            "feedstock_id": feedstock_ids.astype(float),
+            "group": pd.Categorical([f"Feedstock {i}" for i in feedstock_ids]),
+        }
+    )